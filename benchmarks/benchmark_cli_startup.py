@@ -0,0 +1,77 @@
+"""
+Reports how long python -m evaluate takes to start for each subcommand, and which heavy modules it imports before the
+subcommand runs (i.e. until its arguments are parsed), compared with the cost of importing these modules.
+
+Usage: python benchmarks/benchmark_cli_startup.py [--repeats 10]
+"""
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).absolute().parent.parent))
+import argparse
+import statistics
+import subprocess
+import time
+
+REPO_DIR = Path(__file__).absolute().parent.parent
+HEAVY_MODULES = ["pandas", "numpy", "pysam", "intervaltree"]
+# modules each subcommand imports when it runs (see evaluate.commands)
+SUBCOMMAND_TO_MODULES = {
+    "make-probeset": ["evaluate.query", "evaluate.filtered_vcf_file", "evaluate.vcf_filters"],
+    "map-probes": ["evaluate.bwa"],
+    "precision-report": ["evaluate.masker", "evaluate.reporter", "evaluate.query_name_groups_filter"],
+    "recall-report": ["evaluate.masker", "evaluate.reporter"],
+    "pool-truth-probesets": ["evaluate.pooled_truth_probeset"],
+    "pooled-recall-report": ["evaluate.masker", "evaluate.reporter", "evaluate.pooled_truth_probeset"],
+    "split-pooled-recall-report": ["evaluate.reporter", "evaluate.binary_report"],
+    "calculate-precision": ["evaluate.calculator"],
+    "calculate-recall": ["evaluate.calculator"],
+    "export-report": ["evaluate.binary_report"],
+}
+
+
+def get_median_wall_time_s(command, repeats: int) -> float:
+    wall_times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=REPO_DIR, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        wall_times.append(time.perf_counter() - start)
+    return statistics.median(wall_times)
+
+
+def get_heavy_modules_imported(subcommand: str) -> str:
+    code = f"""
+import contextlib, io, sys
+from evaluate.cli import get_parser
+try:
+    with contextlib.redirect_stdout(io.StringIO()):
+        get_parser().parse_args(["{subcommand}", "--help"])
+except SystemExit:
+    pass
+print(",".join(module for module in {HEAVY_MODULES} if module in sys.modules))
+"""
+    completed_process = subprocess.run([sys.executable, "-c", code], cwd=REPO_DIR, check=True,
+                                       stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True)
+    return completed_process.stdout.strip() or "-"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    print("command\tmedian_wall_time_s\theavy_modules_imported")
+    print(f"python -c pass\t{get_median_wall_time_s([sys.executable, '-c', 'pass'], args.repeats):.3f}\t-")
+    for module in HEAVY_MODULES:
+        wall_time_s = get_median_wall_time_s([sys.executable, "-c", f"import {module}"], args.repeats)
+        print(f"python -c 'import {module}'\t{wall_time_s:.3f}\t{module}")
+    for subcommand, modules in SUBCOMMAND_TO_MODULES.items():
+        wall_time_s = get_median_wall_time_s([sys.executable, "-m", "evaluate", subcommand, "--help"], args.repeats)
+        print(f"python -m evaluate {subcommand} --help\t{wall_time_s:.3f}\t{get_heavy_modules_imported(subcommand)}")
+        # startup of the subcommand up to the point where it starts working
+        imports = "; ".join(f"import {module}" for module in ["evaluate.cli", "evaluate.commands"] + modules)
+        wall_time_s = get_median_wall_time_s([sys.executable, "-c", imports], args.repeats)
+        print(f"python -m evaluate {subcommand} (imports)\t{wall_time_s:.3f}\t-")
+
+
+if __name__ == "__main__":
+    main()
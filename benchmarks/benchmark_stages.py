@@ -0,0 +1,232 @@
+"""
+Times the stages of the evaluation on a synthetic dataset (see benchmarks/synthetic_data.py) and compares them with the
+baselines stored in benchmarks/baselines.json: VCF loading, probe making, precision and recall report creation
+(classifiers and reporters, from the SAMs bwa would output), recall report construction and the calculators.
+
+The time of a stage is the best of --repeats runs. A stage regresses if it is more than --max-slowdown times slower than
+its baseline (and slower by more than 50 ms, to ignore the noise of the fastest stages); the exit code is then 1.
+
+Usage: python benchmarks/benchmark_stages.py [--preset small] [--repeats 3] [--stages recall_calculation ...]
+                                             [--save-baseline] [--max-slowdown 1.25]
+
+Baselines depend on the machine: run with --save-baseline on the machine the comparisons are made on, e.g. before a
+change, and without it after the change.
+"""
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).absolute().parent.parent))
+from typing import Dict, List, NamedTuple
+import argparse
+import json
+import tempfile
+import time
+
+import pandas as pd
+import pysam
+
+from benchmarks.synthetic_data import SyntheticDataConfig, SyntheticDataGenerator, SyntheticDataset
+from evaluate.calculator import PrecisionCalculator, RecallCalculator
+from evaluate.commands import _get_VCF_creator_method, create_precision_report, create_recall_report
+from evaluate.instrumentation import instrumentation
+from evaluate.query import Query
+from evaluate.report import PrecisionReport, RecallReport
+from evaluate.vcf_file import VCFFile
+
+BASELINES = Path(__file__).absolute().parent / "baselines.json"
+MIN_DIFFERENCE_S = 0.05
+# in the order of the pipeline: each stage reads what the previous ones wrote
+STAGES = ["vcf_loading", "make_probes", "precision_report_creation", "recall_report_creation",
+          "recall_report_construction", "precision_calculation", "recall_calculation"]
+PRESETS = {
+    "small": SyntheticDataConfig(nb_of_samples=3, nb_of_genes=50),
+    "medium": SyntheticDataConfig(nb_of_samples=6, nb_of_genes=200),
+    "large": SyntheticDataConfig(nb_of_samples=10, nb_of_genes=1000),
+}
+
+
+class StageResult(NamedTuple):
+    stage: str
+    nb_of_records: int
+    time_s: float
+
+
+class StageBenchmarks:
+    """
+    One method per stage (see STAGES), returning the number of records it processed. Reports are written to work_dir.
+    """
+
+    def __init__(self, dataset: SyntheticDataset, work_dir: Path, gt_conf_percentiles: List[int]):
+        self.dataset = dataset
+        self.work_dir = work_dir
+        self.gt_conf_percentiles = gt_conf_percentiles
+
+    def _load_vcf_file(self, vcf: Path) -> VCFFile:
+        with pysam.VariantFile(str(vcf)) as pysam_variant_file:
+            return VCFFile(pysam_variant_file, _get_VCF_creator_method(vcf))
+
+    def _get_precision_report(self, sample: str, tool: str) -> Path:
+        return self.work_dir / f"{tool}_{sample}.precision_report.npz"
+
+    def _get_recall_report(self, sample: str, tool: str, sample1: str, sample2: str) -> Path:
+        return self.work_dir / f"{tool}_{sample}.{sample1}_and_{sample2}.threshold_sweep.report.npz"
+
+    def _get_recall_report_for_calculator(self, sample: str, tool: str) -> Path:
+        return self.work_dir / f"{tool}_{sample}.recall_report_for_calculator.npz"
+
+    def vcf_loading(self) -> int:
+        nb_of_records = 0
+        for vcf in sorted(set(self.dataset.vcfs.values())):
+            vcf_file = self._load_vcf_file(vcf)
+            nb_of_records += sum(len(records) for records in vcf_file.sample_to_gene_to_VCFs.values()
+                                 for records in records.values())
+        return nb_of_records
+
+    def make_probes(self) -> int:
+        nb_of_probes = 0
+        for vcf in sorted(set(self.dataset.vcfs.values())):
+            vcf_file = self._load_vcf_file(vcf)
+            samples = [sample for (sample, tool), sample_vcf in self.dataset.vcfs.items() if sample_vcf == vcf]
+            query = Query(vcf_file, self.dataset.vcf_ref, samples=samples, flank_width=self.dataset.config.flank_width)
+            nb_of_probes += sum(probes.count(">") for probes in query.make_probes().values())
+        return nb_of_probes
+
+    def precision_report_creation(self) -> int:
+        counter = "nb_of_records_before_mapq_sam_records_filter"
+        nb_of_records_before = instrumentation.get_counters().get(counter, 0)
+        for (sample, tool), sam in self.dataset.precision_sams.items():
+            create_precision_report(sam, self.dataset.mask_bitmaps[sample], sample, tool,
+                                    self._get_precision_report(sample, tool),
+                                    self.work_dir / f"{tool}_{sample}.nb_of_records_removed.csv")
+        return instrumentation.get_counters()[counter] - nb_of_records_before
+
+    def recall_report_creation(self) -> int:
+        nb_of_rows = 0
+        for (sample, tool, sample1, sample2), sam in self.dataset.recall_sams.items():
+            # one SAM per GT_CONF percentile in the pipeline: the same one here
+            nb_of_rows += create_recall_report([sam] * len(self.gt_conf_percentiles),
+                                               self.dataset.mask_bitmaps[sample], sample, self.gt_conf_percentiles,
+                                               self._get_recall_report(sample, tool, sample1, sample2))
+        return nb_of_rows
+
+    def recall_report_construction(self) -> int:
+        nb_of_rows = 0
+        for sample in self.dataset.samples:
+            for tool in self.dataset.config.tools:
+                reports = [self._get_recall_report(sample, tool, sample1, sample2)
+                           for (recall_sample, recall_tool, sample1, sample2) in self.dataset.recall_sams
+                           if (recall_sample, recall_tool) == (sample, tool)]
+                recall_report = RecallReport.from_files(reports,
+                                                        concatenate_dfs_one_by_one_keeping_only_best_mappings=True)
+                recall_report.save_report(self._get_recall_report_for_calculator(sample, tool))
+                nb_of_rows += len(recall_report.report)
+        return nb_of_rows
+
+    def precision_calculation(self) -> int:
+        nb_of_rows = 0
+        for tool in self.dataset.config.tools:
+            reports = [self._get_precision_report(sample, tool) for sample in self.dataset.samples]
+            precision_report = PrecisionReport.from_files(reports, encode_columns=True,
+                                                          columns=PrecisionReport.columns_needed_by_calculator)
+            PrecisionCalculator(precision_report).get_precision_report(self.gt_conf_percentiles)
+            nb_of_rows += len(precision_report.report)
+        return nb_of_rows
+
+    def recall_calculation(self) -> int:
+        nb_of_rows = 0
+        for tool in self.dataset.config.tools:
+            reports = [self._get_recall_report_for_calculator(sample, tool) for sample in self.dataset.samples]
+            recall_report = RecallReport.from_files(reports,
+                                                    concatenate_dfs_one_by_one_keeping_only_best_mappings=False,
+                                                    encode_columns=True,
+                                                    columns=RecallReport.columns_needed_by_calculator)
+            RecallCalculator(recall_report).get_recall_report(self.gt_conf_percentiles)
+            nb_of_rows += len(recall_report.report)
+        return nb_of_rows
+
+    def run(self, stages: List[str], repeats: int) -> List[StageResult]:
+        results = []
+        for stage in STAGES:
+            run_stage = getattr(self, stage)
+            times = []
+            for _ in range(repeats if stage in stages else 1):
+                start = time.perf_counter()
+                nb_of_records = run_stage()
+                times.append(time.perf_counter() - start)
+            # the stages that are not benchmarked still run once, for the outputs the next stages read
+            if stage in stages:
+                results.append(StageResult(stage, nb_of_records, min(times)))
+        return results
+
+
+def load_baselines(baselines_file: Path) -> Dict[str, Dict[str, float]]:
+    if not baselines_file.exists():
+        return {}
+    with open(baselines_file) as file:
+        return json.load(file)
+
+
+def save_baselines(baselines: Dict[str, Dict[str, float]], baselines_file: Path) -> None:
+    with open(baselines_file, "w") as file:
+        json.dump(baselines, file, indent=4, sort_keys=True)
+        file.write("\n")
+
+
+def compare_with_baselines(results: List[StageResult], baselines: Dict[str, float],
+                           max_slowdown: float) -> pd.DataFrame:
+    rows = []
+    for result in results:
+        baseline_time_s = baselines.get(result.stage)
+        if baseline_time_s is None:
+            slowdown, status = None, "no_baseline"
+        else:
+            slowdown = result.time_s / baseline_time_s if baseline_time_s > 0 else float("inf")
+            regressed = slowdown > max_slowdown and result.time_s - baseline_time_s > MIN_DIFFERENCE_S
+            status = "REGRESSION" if regressed else "ok"
+        rows.append({
+            "stage": result.stage,
+            "nb_of_records": result.nb_of_records,
+            "time_s": round(result.time_s, 4),
+            "records_per_s": round(result.nb_of_records / result.time_s) if result.time_s > 0 else None,
+            "baseline_time_s": baseline_time_s,
+            "slowdown": None if slowdown is None else round(slowdown, 2),
+            "status": status,
+        })
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preset", choices=list(PRESETS), default="small", help="Size of the synthetic dataset")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES, help="Stages to time (default: all)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--nb-of-gt-conf-percentiles", type=int, default=5)
+    parser.add_argument("--baselines", type=Path, default=BASELINES)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Store the times as the baselines of the preset instead of comparing with them")
+    parser.add_argument("--max-slowdown", type=float, default=1.25)
+    parser.add_argument("--data-dir", type=Path,
+                        help="Where to generate the dataset and the reports (default: a temporary directory)")
+    args = parser.parse_args()
+
+    gt_conf_percentiles = list(range(0, 100, 100 // args.nb_of_gt_conf_percentiles))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = args.data_dir or Path(tmp_dir)
+        dataset = SyntheticDataGenerator(PRESETS[args.preset]).generate(data_dir / "dataset")
+        work_dir = data_dir / "reports"
+        work_dir.mkdir(parents=True, exist_ok=True)
+        results = StageBenchmarks(dataset, work_dir, gt_conf_percentiles).run(args.stages, args.repeats)
+
+    baselines = load_baselines(args.baselines)
+    if args.save_baseline:
+        baselines.setdefault(args.preset, {}).update({result.stage: round(result.time_s, 4) for result in results})
+        save_baselines(baselines, args.baselines)
+
+    comparison = compare_with_baselines(results, baselines.get(args.preset, {}), args.max_slowdown)
+    comparison.insert(0, "preset", args.preset)
+    print(comparison.to_csv(sep="\t", index=False), end="")
+    if (comparison["status"] == "REGRESSION").any():
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Reports how long building the targets of the Snakefile (TargetManifest) takes against the number of samples, and the
+cost of the input function lookups compared with data.xs().
+
+Usage: python benchmarks/benchmark_target_manifest.py [--nb-of-samples 10 50 100 200]
+"""
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).absolute().parent.parent))
+import argparse
+import itertools
+import time
+
+import pandas as pd
+
+from pipeline.scripts.target_manifest import TargetManifest
+
+TOOLS = ["pandora_illumina_nodenovo", "pandora_illumina_withdenovo", "pandora_nanopore_nodenovo",
+         "pandora_nanopore_withdenovo", "snippy_ref1", "samtools_ref1", "medaka_ref1", "nanopolish_ref1"]
+COVERAGES = ["100x"]
+COVERAGE_FILTERS = [0, 5, 10]
+STRAND_BIAS_FILTERS = [0.0, 0.05]
+GAPS_FILTERS = [0.5, 0.8, 1.0]
+
+
+def create_data_and_samples(nb_of_samples: int):
+    sample_ids = [f"sample_{index}" for index in range(nb_of_samples)]
+    samples = pd.DataFrame({"sample_id": sample_ids,
+                            "reference_assembly": [f"/data/{sample_id}.ref.fa" for sample_id in sample_ids],
+                            "mask": [f"/data/{sample_id}.mask.bed" for sample_id in sample_ids]})
+    variant_calls = pd.DataFrame([
+        {"sample_id": sample_id, "tool": tool, "coverage": coverage, "vcf_reference": f"/data/{tool}.ref.fa",
+         "vcf": f"/data/{tool}.{sample_id}.{coverage}.vcf"}
+        for sample_id in sample_ids for tool in TOOLS for coverage in COVERAGES
+    ])
+    data = pd.merge(variant_calls, samples, on="sample_id").set_index(["sample_id", "coverage", "tool"], drop=False)
+    samples = samples.set_index(["sample_id"], drop=False)
+    sample_pairs = list(itertools.combinations(sorted(samples["sample_id"]), r=2))
+    return data, samples, sample_pairs
+
+
+def benchmark(nb_of_samples: int) -> dict:
+    data, samples, sample_pairs = create_data_and_samples(nb_of_samples)
+
+    start = time.perf_counter()
+    manifest = TargetManifest(data, samples, sample_pairs, "/output", COVERAGE_FILTERS, STRAND_BIAS_FILTERS,
+                              GAPS_FILTERS)
+    manifest_build_time = time.perf_counter() - start
+
+    keys = list(data.index)
+    start = time.perf_counter()
+    for key in keys:
+        data.xs(key)["vcf"]
+    xs_lookup_time = (time.perf_counter() - start) / len(keys)
+
+    start = time.perf_counter()
+    for key in keys:
+        manifest.sample_cov_and_tool_to_variant_call[key]["vcf"]
+    dict_lookup_time = (time.perf_counter() - start) / len(keys)
+
+    nb_of_recall_reports = sum(len(report_files) for report_files
+                               in manifest.sample_cov_tool_and_filters_to_recall_report_files.values())
+    return {
+        "nb_of_samples": nb_of_samples,
+        "nb_of_sample_pairs": len(sample_pairs),
+        "nb_of_recall_reports": nb_of_recall_reports,
+        "manifest_build_time_s": round(manifest_build_time, 4),
+        "xs_lookup_time_us": round(xs_lookup_time * 1e6, 2),
+        "dict_lookup_time_us": round(dict_lookup_time * 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nb-of-samples", type=int, nargs="+", default=[10, 25, 50, 100, 200])
+    args = parser.parse_args()
+
+    results = pd.DataFrame([benchmark(nb_of_samples) for nb_of_samples in args.nb_of_samples])
+    print(results.to_csv(sep="\t", index=False), end="")
+
+
+if __name__ == "__main__":
+    main()
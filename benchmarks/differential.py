@@ -0,0 +1,688 @@
+"""
+Differential tests of the fast paths of the evaluation: each engine runs a fast path and the reference implementation
+it replaces on the same inputs, and their outputs (probesets, report rows, precision/recall tables) are compared. The
+speedup of the fast path over the reference is reported alongside.
+
+Outputs are compared as tables. Values must be equal, except in the float columns an engine declares in
+float_tolerances (columns the fast path computes in a different order than the reference, e.g. a cumulative sum
+instead of a sum per threshold), which may differ by at most the declared absolute tolerance. Rows are compared in
+order, unless the engine declares that the order of its rows is not part of its output.
+
+An engine is a subclass of Engine decorated with @register_engine; it then runs with all the others:
+python benchmarks/differential.py [--preset small | --inputs inputs.json] [--engines precision_sweep ...]
+
+The exit code is 1 if any engine disagrees with its reference. --inputs runs the engines on real data, described by a
+JSON file with the same fields as DifferentialInputs.
+"""
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).absolute().parent.parent))
+from typing import Any, Dict, Iterator, List, NamedTuple, Tuple, Type
+import argparse
+import json
+import math
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pysam
+from intervaltree import Interval
+
+from benchmarks.synthetic_data import SyntheticDataConfig, SyntheticDataGenerator, SyntheticDataset
+from evaluate.aligned_pairs import AlignedPairs, AlignmentType
+from evaluate.binary_report import load_binary_report, read_report_file
+from evaluate.calculator import PrecisionCalculator, RecallCalculator
+from evaluate.classification import Classification
+from evaluate.commands import _get_VCF_creator_method, create_pooled_recall_report, create_precision_report, \
+    create_recall_report, split_pooled_recall_report
+from evaluate.mask_bitmaps import MaskBitmaps
+from evaluate.masker import Masker, PrecisionMasker, RecallMasker
+from evaluate.partial_aggregates import PartialAggregates
+from evaluate.pooled_truth_probeset import PooledTruthProbeset
+from evaluate.query import Query
+from evaluate.recall_metrics_cube import RecallMetricsCube
+from evaluate.report import PrecisionReport, RecallReport
+from evaluate.vcf_file import VCFFile
+
+PRESETS = {
+    "small": SyntheticDataConfig(nb_of_samples=3, nb_of_genes=50),
+    "medium": SyntheticDataConfig(nb_of_samples=6, nb_of_genes=200),
+}
+MAX_NB_OF_THRESHOLDS = 100
+MAX_NB_OF_DIFFERENCES_SHOWN = 5
+
+
+class DifferentialInputs(NamedTuple):
+    vcf_ref: Path
+    vcfs: Dict[Path, List[str]]  # VCF -> samples to make probes for
+    precision_sams: List[Tuple[Path, str, str, Path]]  # (SAM, sample, tool, mask BED)
+    recall_sams: List[Tuple[Path, str, str, Path]]  # (SAM, sample, tool, mask BED)
+    flank_width: int = 100
+
+    @classmethod
+    def from_synthetic_dataset(cls, dataset: SyntheticDataset) -> "DifferentialInputs":
+        vcfs = {}
+        for (sample, tool), vcf in sorted(dataset.vcfs.items()):
+            vcfs.setdefault(vcf, []).append(sample)
+        return cls(
+            vcf_ref=dataset.vcf_ref,
+            vcfs=vcfs,
+            precision_sams=[(sam, sample, tool, dataset.masks[sample])
+                            for (sample, tool), sam in sorted(dataset.precision_sams.items())],
+            recall_sams=[(sam, sample, tool, dataset.masks[sample])
+                         for (sample, tool, sample1, sample2), sam in sorted(dataset.recall_sams.items())],
+            flank_width=dataset.config.flank_width,
+        )
+
+    @classmethod
+    def from_json(cls, json_file: Path) -> "DifferentialInputs":
+        """
+        Paths are relative to the directory of the JSON file, e.g.
+        {"vcf_ref": "ref.fa", "vcfs": {"pandora.vcf": ["sample_1", "sample_2"]},
+         "precision_sams": [["snippy_sample_1.sam", "sample_1", "snippy", "sample_1.mask.bed"]],
+         "recall_sams": [["snippy_sample_1.sample_1_and_sample_2.sam", "sample_1", "snippy", "sample_1.mask.bed"]]}
+        """
+        with open(json_file) as file:
+            fields = json.load(file)
+        directory = json_file.parent
+
+        def get_sams(sams: List[list]) -> List[Tuple[Path, str, str, Path]]:
+            return [(directory / sam, sample, tool, directory / mask) for sam, sample, tool, mask in sams]
+
+        return cls(
+            vcf_ref=directory / fields["vcf_ref"],
+            vcfs={directory / vcf: samples for vcf, samples in fields.get("vcfs", {}).items()},
+            precision_sams=get_sams(fields.get("precision_sams", [])),
+            recall_sams=get_sams(fields.get("recall_sams", [])),
+            flank_width=fields.get("flank_width", 100),
+        )
+
+
+class Engine:
+    """
+    A fast path and the reference implementation it must agree with. get_cases() prepares the inputs of each case
+    (untimed); run_reference() and run_engine() compute the output of a case as a table (timed).
+    """
+    name: str = ""
+    description: str = ""
+    # column -> maximal absolute difference with the reference, for the float columns computed in a different order
+    float_tolerances: Dict[str, float] = {}
+    ignore_row_order: bool = False
+
+    def get_cases(self, inputs: DifferentialInputs, work_dir: Path) -> Iterator[Tuple[str, Any]]:
+        raise NotImplementedError()
+
+    def run_reference(self, case: Any) -> pd.DataFrame:
+        raise NotImplementedError()
+
+    def run_engine(self, case: Any) -> pd.DataFrame:
+        raise NotImplementedError()
+
+
+ENGINES: Dict[str, Type[Engine]] = {}
+
+
+def register_engine(engine_class: Type[Engine]) -> Type[Engine]:
+    if engine_class.name in ENGINES:
+        raise ValueError(f"An engine named {engine_class.name} is already registered")
+    ENGINES[engine_class.name] = engine_class
+    return engine_class
+
+
+class Comparison(NamedTuple):
+    equal: bool
+    within_tolerance: bool
+    differences: List[str]
+
+
+def _sort_rows(df: pd.DataFrame, float_tolerances: Dict[str, float]) -> pd.DataFrame:
+    # the columns compared with a tolerance do not order the rows: they may differ between the two tables
+    by = [column for column in df.columns if column not in float_tolerances] or list(df.columns)
+    return df.sort_values(by=by, kind="stable").reset_index(drop=True)
+
+
+def _values_are_equal(reference: pd.Series, actual: pd.Series) -> np.ndarray:
+    # values, not dtypes, are compared: an int column equals a float column holding the same numbers
+    both_missing = reference.isna().to_numpy() & actual.isna().to_numpy()
+    return (reference.astype(object).to_numpy() == actual.astype(object).to_numpy()) | both_missing
+
+
+def compare_tables(reference: pd.DataFrame, actual: pd.DataFrame, float_tolerances: Dict[str, float] = None,
+                   ignore_row_order: bool = False) -> Comparison:
+    float_tolerances = float_tolerances or {}
+    if list(reference.columns) != list(actual.columns):
+        return Comparison(False, False, [f"columns: {list(reference.columns)} != {list(actual.columns)}"])
+    if len(reference) != len(actual):
+        return Comparison(False, False, [f"number of rows: {len(reference)} != {len(actual)}"])
+
+    if ignore_row_order:
+        reference = _sort_rows(reference, float_tolerances)
+        actual = _sort_rows(actual, float_tolerances)
+    else:
+        reference = reference.reset_index(drop=True)
+        actual = actual.reset_index(drop=True)
+
+    differences = []
+    equal = True
+    for column in reference.columns:
+        values_are_equal = _values_are_equal(reference[column], actual[column])
+        if values_are_equal.all():
+            continue
+        equal = False
+        if column in float_tolerances:
+            values_are_close = np.isclose(reference[column].to_numpy(dtype=float), actual[column].to_numpy(dtype=float),
+                                          rtol=0, atol=float_tolerances[column], equal_nan=True)
+            if values_are_close.all():
+                continue
+            values_are_equal = values_are_close
+        for row in np.flatnonzero(~values_are_equal)[:MAX_NB_OF_DIFFERENCES_SHOWN]:
+            differences.append(f"row {row}, {column}: {reference[column].iloc[row]!r} != {actual[column].iloc[row]!r}")
+
+    return Comparison(equal, not differences, differences)
+
+
+class DifferentialResult(NamedTuple):
+    engine: str
+    case: str
+    nb_of_rows: int
+    status: str  # identical, within_tolerance or DIFFERENT
+    reference_time_s: float
+    engine_time_s: float
+    differences: List[str]
+
+    @property
+    def speedup(self) -> float:
+        return self.reference_time_s / self.engine_time_s if self.engine_time_s > 0 else float("inf")
+
+
+def _time(function, case: Any) -> Tuple[pd.DataFrame, float]:
+    start = time.perf_counter()
+    output = function(case)
+    return output, time.perf_counter() - start
+
+
+def run_engine(engine: Engine, inputs: DifferentialInputs, work_dir: Path) -> Iterator[DifferentialResult]:
+    engine_dir = work_dir / engine.name
+    engine_dir.mkdir(parents=True, exist_ok=True)
+    for case_name, case in engine.get_cases(inputs, engine_dir):
+        expected, reference_time_s = _time(engine.run_reference, case)
+        actual, engine_time_s = _time(engine.run_engine, case)
+        comparison = compare_tables(expected, actual, engine.float_tolerances, engine.ignore_row_order)
+        if comparison.equal:
+            status = "identical"
+        elif comparison.within_tolerance:
+            status = "within_tolerance"
+        else:
+            status = "DIFFERENT"
+        yield DifferentialResult(engine.name, case_name, len(expected), status, reference_time_s, engine_time_s,
+                                 comparison.differences)
+
+
+def run_engines(engine_names: List[str], inputs: DifferentialInputs, work_dir: Path) -> List[DifferentialResult]:
+    results = []
+    for engine_name in engine_names:
+        results.extend(run_engine(ENGINES[engine_name](), inputs, work_dir))
+    return results
+
+
+def results_to_df(results: List[DifferentialResult]) -> pd.DataFrame:
+    return pd.DataFrame([{
+        "engine": result.engine,
+        "case": result.case,
+        "nb_of_rows": result.nb_of_rows,
+        "status": result.status,
+        "reference_time_s": round(result.reference_time_s, 4),
+        "engine_time_s": round(result.engine_time_s, 4),
+        "speedup": round(result.speedup, 2),
+        "differences": "; ".join(result.differences),
+    } for result in results], columns=["engine", "case", "nb_of_rows", "status", "reference_time_s", "engine_time_s",
+                                       "speedup", "differences"])
+
+
+def _load_vcf_file(vcf: Path) -> VCFFile:
+    with pysam.VariantFile(str(vcf)) as pysam_variant_file:
+        return VCFFile(pysam_variant_file, _get_VCF_creator_method(vcf))
+
+
+def _probes_to_df(sample: str, probes: str) -> pd.DataFrame:
+    lines = probes.splitlines()
+    return pd.DataFrame({"sample": sample, "header": lines[::2], "sequence": lines[1::2]},
+                        columns=["sample", "header", "sequence"])
+
+
+def _compile_mask(mask: Path, work_dir: Path) -> Path:
+    bitmaps = work_dir / f"{mask.name}.bitmaps"
+    if not bitmaps.exists():
+        with open(mask) as bed:
+            MaskBitmaps.from_regions(Masker.get_regions_from_bed(bed)).save(bitmaps)
+    return bitmaps
+
+
+def _get_thresholds(gt_confs: pd.Series) -> List[float]:
+    """
+    0 and at most MAX_NB_OF_THRESHOLDS distinct GT_CONFs of the report, which are the thresholds where the metrics
+    change.
+    """
+    distinct_gt_confs = np.unique(gt_confs.to_numpy(dtype=float))
+    step = max(1, len(distinct_gt_confs) // MAX_NB_OF_THRESHOLDS)
+    return [0.0] + distinct_gt_confs[::step].tolist()
+
+
+@register_engine
+class MultisampleProbesEngine(Engine):
+    name = "multisample_probes"
+    description = "probes of all samples of a VCF made at once, instead of one Query per sample as the pipeline does"
+
+    def get_cases(self, inputs: DifferentialInputs, work_dir: Path) -> Iterator[Tuple[str, Any]]:
+        for vcf, samples in inputs.vcfs.items():
+            yield vcf.name, (vcf, inputs.vcf_ref, samples, inputs.flank_width)
+
+    def run_reference(self, case: Any) -> pd.DataFrame:
+        vcf, vcf_ref, samples, flank_width = case
+        dfs = []
+        for sample in samples:
+            query = Query(_load_vcf_file(vcf), vcf_ref, samples=[sample], flank_width=flank_width)
+            dfs.append(_probes_to_df(sample, query.make_probes()[sample]))
+        return pd.concat(dfs, ignore_index=True)
+
+    def run_engine(self, case: Any) -> pd.DataFrame:
+        vcf, vcf_ref, samples, flank_width = case
+        probes = Query(_load_vcf_file(vcf), vcf_ref, samples=samples, flank_width=flank_width).make_probes()
+        return pd.concat([_probes_to_df(sample, probes[sample]) for sample in samples], ignore_index=True)
+
+
+class MaskerEngine(Engine):
+    """
+    Masks the records of each SAM with the bitmaps, in batches, instead of querying the interval index of the BED record
+    by record.
+    """
+    masker_class: Type[Masker] = Masker
+
+    def _get_sams(self, inputs: DifferentialInputs) -> List[Tuple[Path, str, str, Path]]:
+        raise NotImplementedError()
+
+    def get_cases(self, inputs: DifferentialInputs, work_dir: Path) -> Iterator[Tuple[str, Any]]:
+        for sam, sample, tool, mask in self._get_sams(inputs):
+            with pysam.AlignmentFile(str(sam)) as alignment_file:
+                records = [Classification(record) for record in alignment_file]
+            yield sam.name, (records, mask, _compile_mask(mask, work_dir))
+
+    def _to_df(self, records: List[Classification], overlaps_mask) -> pd.DataFrame:
+        return pd.DataFrame({"query_name": [record.query_name for record in records],
+                             "overlaps_mask": [bool(overlaps) for overlaps in overlaps_mask]})
+
+    def run_reference(self, case: Any) -> pd.DataFrame:
+        records, mask, bitmaps = case
+        with open(mask) as bed:
+            masker = self.masker_class.from_bed(bed)
+        return self._to_df(records, [masker.record_overlaps_mask(record) for record in records])
+
+    def run_engine(self, case: Any) -> pd.DataFrame:
+        records, mask, bitmaps = case
+        masker = self.masker_class.from_bitmaps(bitmaps)
+        return self._to_df(records, masker.records_overlap_mask(records))
+
+
+@register_engine
+class PrecisionMaskBitmapsEngine(MaskerEngine):
+    name = "precision_mask_bitmaps"
+    description = "PrecisionMasker from the mask bitmaps, in batches, instead of the BED interval index record by record"
+    masker_class = PrecisionMasker
+
+    def _get_sams(self, inputs: DifferentialInputs) -> List[Tuple[Path, str, str, Path]]:
+        return inputs.precision_sams
+
+
+@register_engine
+class RecallMaskBitmapsEngine(MaskerEngine):
+    name = "recall_mask_bitmaps"
+    description = "RecallMasker from the mask bitmaps, in batches, instead of the BED interval index record by record"
+    masker_class = RecallMasker
+
+    def _get_sams(self, inputs: DifferentialInputs) -> List[Tuple[Path, str, str, Path]]:
+        return inputs.recall_sams
+
+
+@register_engine
+class CompactAlignmentEngine(Engine):
+    name = "compact_alignment"
+    description = "probe intervals scored on the CIGAR and MD tag, instead of on the aligned pairs of pysam"
+
+    def get_cases(self, inputs: DifferentialInputs, work_dir: Path) -> Iterator[Tuple[str, Any]]:
+        for sam, sample, tool, mask in inputs.precision_sams + inputs.recall_sams:
+            with pysam.AlignmentFile(str(sam)) as alignment_file:
+                records = [record for record in alignment_file if not record.is_unmapped]
+            intervals = [Classification(record).get_probe_query_interval() for record in records]
+            yield sam.name, (records, intervals)
+
+    @staticmethod
+    def _to_df(records: List[pysam.AlignedSegment], scores: List[tuple]) -> pd.DataFrame:
+        df = pd.DataFrame(scores, columns=["nb_of_matches", "nb_of_aligned_pairs", "ref_start", "ref_end"])
+        df.insert(0, "query_name", [record.query_name for record in records])
+        return df
+
+    def run_reference(self, case: Any) -> pd.DataFrame:
+        records, intervals = case
+        scores = []
+        for record, (query_start, query_end) in zip(records, intervals):
+            aligned_pairs = AlignedPairs(record.get_aligned_pairs(with_seq=True))
+            start, stop = aligned_pairs.get_index_of_query_interval(Interval(query_start, query_end))
+            pairs_in_interval = AlignedPairs(aligned_pairs[start:stop])
+            nb_of_matches = pairs_in_interval.get_alignment_types().count(AlignmentType.MATCH)
+            ref_positions = aligned_pairs.get_ref_positions(transform_Nones_into_halfway_positions=True)[start:stop]
+            if ref_positions:
+                scores.append((nb_of_matches, len(pairs_in_interval), math.floor(ref_positions[0]),
+                               math.ceil(ref_positions[-1]) + 1))
+            else:
+                scores.append((nb_of_matches, len(pairs_in_interval), None, None))
+        return self._to_df(records, scores)
+
+    def run_engine(self, case: Any) -> pd.DataFrame:
+        records, intervals = case
+        scores = []
+        for record, (query_start, query_end) in zip(records, intervals):
+            scores.append(tuple(Classification(record).get_compact_alignment().score_query_interval(query_start,
+                                                                                                    query_end)))
+        return self._to_df(records, scores)
+
+
+class ReportsEngine(Engine):
+    """
+    Creates the reports of each SAM with the reference report creation (untimed), for the engines that read reports.
+    """
+
+    @staticmethod
+    def _create_precision_reports(inputs: DifferentialInputs, work_dir: Path) -> Dict[str, List[Path]]:
+        tool_to_reports = {}
+        for sam, sample, tool, mask in inputs.precision_sams:
+            report = work_dir / f"{sam.stem}.precision_report.npz"
+            create_precision_report(sam, _compile_mask(mask, work_dir), sample, tool, report,
+                                    work_dir / f"{sam.stem}.nb_of_records_removed.csv")
+            tool_to_reports.setdefault(tool, []).append(report)
+        return tool_to_reports
+
+    @staticmethod
+    def _create_recall_reports(inputs: DifferentialInputs, work_dir: Path) -> Dict[str, List[Path]]:
+        tool_to_sample_to_reports = {}
+        for index, (sam, sample, tool, mask) in enumerate(inputs.recall_sams):
+            report = work_dir / f"{index}.{sam.stem}.recall_report.npz"
+            create_recall_report([sam], _compile_mask(mask, work_dir), sample, [0], report)
+            tool_to_sample_to_reports.setdefault(tool, {}).setdefault(sample, []).append(report)
+
+        # the reports of the calculator keep the best mapping of each truth probe of a sample, as in the pipeline
+        tool_to_reports = {}
+        for tool, sample_to_reports in tool_to_sample_to_reports.items():
+            for sample, reports in sample_to_reports.items():
+                report = work_dir / f"{tool}_{sample}.recall_report_for_calculator.npz"
+                RecallReport.from_files(reports, concatenate_dfs_one_by_one_keeping_only_best_mappings=True) \
+                    .save_report(report)
+                tool_to_reports.setdefault(tool, []).append(report)
+        return tool_to_reports
+
+
+@register_engine
+class PrecisionSweepEngine(ReportsEngine):
+    name = "precision_sweep"
+    description = "precision at every threshold read from a precision curve, instead of filtering the report"
+
+    def get_cases(self, inputs: DifferentialInputs, work_dir: Path) -> Iterator[Tuple[str, Any]]:
+        for tool, reports in self._create_precision_reports(inputs, work_dir).items():
+            report = PrecisionReport.from_files(reports, encode_columns=True,
+                                                columns=PrecisionReport.columns_needed_by_calculator)
+            yield tool, (report, _get_thresholds(report.report["GT_CONF"]))
+
+    def run_reference(self, case: Any) -> pd.DataFrame:
+        report, thresholds = case
+        return PrecisionCalculator(report).get_precision_report_by_filtering_the_report(thresholds)
+
+    def run_engine(self, case: Any) -> pd.DataFrame:
+        report, thresholds = case
+        return PrecisionCalculator(report).get_precision_report(thresholds)
+
+
+@register_engine
+class RecallSweepEngine(ReportsEngine):
+    name = "recall_sweep"
+    description = "recall at every threshold read from a single sweep, instead of rebuilding the report at each"
+
+    def get_cases(self, inputs: DifferentialInputs, work_dir: Path) -> Iterator[Tuple[str, Any]]:
+        for tool, reports in self._create_recall_reports(inputs, work_dir).items():
+            # all columns: the reference rebuilds the report at each threshold, keeping the best mappings again
+            report = RecallReport.from_files(reports, concatenate_dfs_one_by_one_keeping_only_best_mappings=False)
+            yield tool, (report, _get_thresholds(report.report["GT_CONF"]))
+
+    def run_reference(self, case: Any) -> pd.DataFrame:
+        report, thresholds = case
+        return RecallCalculator(report).get_recall_report_by_filtering_the_report(thresholds)
+
+    def run_engine(self, case: Any) -> pd.DataFrame:
+        report, thresholds = case
+        return RecallCalculator(report).get_recall_report(thresholds)
+
+
+@register_engine
+class IncrementalRecallMetricsEngine(Engine):
+    name = "incremental_recall_metrics"
+    description = ("recall metrics of all sample pairs from the stored partial aggregates of the previous pairs and the "
+                   "new pairs only, instead of loading every report")
+
+    def get_cases(self, inputs: DifferentialInputs, work_dir: Path) -> Iterator[Tuple[str, Any]]:
+        tool_to_samples_sample_pairs_and_reports = {}
+        for index, (sam, sample, tool, mask) in enumerate(inputs.recall_sams):
+            report = work_dir / f"{index}.{sam.stem}.recall_report.npz"
+            create_recall_report([sam], _compile_mask(mask, work_dir), sample, [0], report)
+            tool_to_samples_sample_pairs_and_reports.setdefault(tool, []).append((sample, f"pair_{index}", report))
+
+        for tool, samples_sample_pairs_and_reports in tool_to_samples_sample_pairs_and_reports.items():
+            # the last report of each sample plays the pair of the sample added to the cohort
+            sample_to_last_report = {sample: report for sample, _, report in samples_sample_pairs_and_reports}
+            previous_samples_sample_pairs_and_reports = [
+                (sample, sample_pair, report) for sample, sample_pair, report in samples_sample_pairs_and_reports
+                if report != sample_to_last_report[sample]]
+            partial_aggregates = PartialAggregates(work_dir / f"{tool}.partial_aggregates", "recall_metrics_cube")
+            if previous_samples_sample_pairs_and_reports:
+                RecallMetricsCube.from_files(previous_samples_sample_pairs_and_reports,
+                                             partial_aggregates=partial_aggregates)
+            yield tool, (samples_sample_pairs_and_reports, partial_aggregates)
+
+    @staticmethod
+    def _get_recall_metrics(recall_metrics_cube: RecallMetricsCube) -> pd.DataFrame:
+        return pd.concat([recall_metrics_cube.get_recall_report_per_sample([0]),
+                          recall_metrics_cube.get_recall_report_per_sample_pair([0])], ignore_index=True)
+
+    def run_reference(self, case: Any) -> pd.DataFrame:
+        samples_sample_pairs_and_reports, _ = case
+        return self._get_recall_metrics(RecallMetricsCube.from_files(samples_sample_pairs_and_reports))
+
+    def run_engine(self, case: Any) -> pd.DataFrame:
+        samples_sample_pairs_and_reports, partial_aggregates = case
+        return self._get_recall_metrics(RecallMetricsCube.from_files(samples_sample_pairs_and_reports,
+                                                                     partial_aggregates=partial_aggregates))
+
+
+@register_engine
+class BinaryReportEngine(Engine):
+    name = "binary_report"
+    description = ("report rows, and precision and recall metrics, of reports written and read in the binary format, "
+                   "instead of as TSV files")
+
+    def get_cases(self, inputs: DifferentialInputs, work_dir: Path) -> Iterator[Tuple[str, Any]]:
+        for output in ["rows", "metrics"]:
+            for sam, sample, tool, mask in inputs.precision_sams:
+                yield f"{sam.name}.{output}", (output, "precision", sam, _compile_mask(mask, work_dir), sample, tool,
+                                               work_dir / f"{sam.stem}.{output}")
+            for index, (sam, sample, tool, mask) in enumerate(inputs.recall_sams):
+                yield f"{sam.name}.{output}", (output, "recall", sam, _compile_mask(mask, work_dir), sample, tool,
+                                               work_dir / f"{index}.{sam.stem}.{output}")
+
+    @staticmethod
+    def _get_rows_or_metrics(case: Any, suffix: str) -> pd.DataFrame:
+        output, kind, sam, mask_bitmaps, sample, tool, prefix = case
+        report = Path(f"{prefix}.report{suffix}")
+        if kind == "precision":
+            create_precision_report(sam, mask_bitmaps, sample, tool, report,
+                                    Path(f"{prefix}{suffix}.nb_of_records_removed.csv"))
+            if output == "rows":
+                return read_report_file(report, dtypes=PrecisionReport.column_dtypes)
+            precision_report = PrecisionReport.from_files([report], encode_columns=True,
+                                                          columns=PrecisionReport.columns_needed_by_calculator)
+            # the reference calculator sums the assessments as they are loaded
+            return PrecisionCalculator(precision_report).get_precision_report_by_filtering_the_report(
+                _get_thresholds(precision_report.report["GT_CONF"]))
+        # a threshold sweep report, of which the cube selects the rows of a GT_CONF percentile
+        create_recall_report([sam, sam], mask_bitmaps, sample, [0, 10], report)
+        if output == "rows":
+            return read_report_file(report, dtypes=RecallReport.column_dtypes)
+        recall_metrics_cube = RecallMetricsCube.from_files([(sample, sam.stem, report)], gt_conf_percentile=10)
+        return IncrementalRecallMetricsEngine._get_recall_metrics(recall_metrics_cube)
+
+    def run_reference(self, case: Any) -> pd.DataFrame:
+        return self._get_rows_or_metrics(case, ".tsv")
+
+    def run_engine(self, case: Any) -> pd.DataFrame:
+        return self._get_rows_or_metrics(case, ".npz")
+
+
+@register_engine
+class ParallelReporterEngine(Engine):
+    name = "parallel_reporter"
+    description = ("report entries of the precision and recall SAMs classified, filtered and assessed by 2 processes "
+                   "instead of 1")
+    processes = 2
+
+    def get_cases(self, inputs: DifferentialInputs, work_dir: Path) -> Iterator[Tuple[str, Any]]:
+        for sam, sample, tool, mask in inputs.precision_sams:
+            yield sam.name, ("precision", sam, _compile_mask(mask, work_dir), sample, tool, work_dir / sam.stem)
+        for index, (sam, sample, tool, mask) in enumerate(inputs.recall_sams):
+            yield sam.name, ("recall", sam, _compile_mask(mask, work_dir), sample, tool,
+                             work_dir / f"{index}.{sam.stem}")
+
+    def _create_report(self, case: Any, processes: int) -> pd.DataFrame:
+        kind, sam, mask_bitmaps, sample, tool, prefix = case
+        report = Path(f"{prefix}.{processes}_processes.npz")
+        if kind == "precision":
+            nb_of_records_removed_file = Path(f"{prefix}.{processes}_processes.nb_of_records_removed.csv")
+            create_precision_report(sam, mask_bitmaps, sample, tool, report, nb_of_records_removed_file, processes)
+            # the MAPQ filter runs in the workers, which send back their counts: they are compared as extra columns
+            nb_of_records_removed = pd.read_csv(nb_of_records_removed_file).iloc[0]
+            return load_binary_report(report).assign(**nb_of_records_removed.to_dict())
+        create_recall_report([sam], mask_bitmaps, sample, [0], report, processes)
+        return load_binary_report(report)
+
+    def run_reference(self, case: Any) -> pd.DataFrame:
+        return self._create_report(case, processes=1)
+
+    def run_engine(self, case: Any) -> pd.DataFrame:
+        return self._create_report(case, processes=self.processes)
+
+
+@register_engine
+class PooledTruthProbesEngine(Engine):
+    name = "pooled_truth_probes"
+    description = ("recall reports of all the sample pairs of a sample from its pooled truth probeset, instead of one "
+                   "report per pair")
+
+    @staticmethod
+    def _get_records_per_query(sam: Path) -> Iterator[List[pysam.AlignedSegment]]:
+        with pysam.AlignmentFile(str(sam)) as alignment_file:
+            records = []
+            for record in alignment_file:
+                if records and record.query_name != records[0].query_name:
+                    yield records
+                    records = []
+                records.append(record)
+            if records:
+                yield records
+
+    def _pool(self, sams: List[Path], work_dir: Path) -> Tuple[List[str], Path, Path]:
+        """
+        Pools the truth probesets the SAMs are the mappings of, and writes the SAM bwa would output for the pooled
+        probeset: the mappings of the first probe with each sequence, renamed after its pooled probe.
+        """
+        sample_pairs = [f"pair_{index}" for index in range(len(sams))]
+        sample_pair_to_truth_probeset = {}
+        for sample_pair, sam in zip(sample_pairs, sams):
+            truth_probeset = work_dir / f"{sample_pair}.truth_probeset.fa"
+            with open(truth_probeset, "w") as fasta:
+                for records in self._get_records_per_query(sam):
+                    fasta.write(f">{records[0].query_name}\n{records[0].query_sequence}\n")
+            sample_pair_to_truth_probeset[sample_pair] = truth_probeset
+        pooled = PooledTruthProbeset.from_truth_probesets(sample_pair_to_truth_probeset)
+        pooled_truth_probeset, probes_table = work_dir / "pooled.truth_probeset.fa", work_dir / "pooled.probes.tsv"
+        pooled.save(pooled_truth_probeset, probes_table)
+
+        sequence_to_pooled_probe = {sequence: PooledTruthProbeset.get_pooled_probe_name(index)
+                                    for index, sequence in enumerate(pooled.sequences)}
+        pooled_sam = work_dir / "pooled.sam"
+        mapped_pooled_probes = set()
+        with pysam.AlignmentFile(str(sams[0])) as template, \
+                pysam.AlignmentFile(str(pooled_sam), "w", template=template) as pooled_alignment_file:
+            for sam in sams:
+                for records in self._get_records_per_query(sam):
+                    pooled_probe = sequence_to_pooled_probe[records[0].query_sequence]
+                    if pooled_probe in mapped_pooled_probes:
+                        continue
+                    mapped_pooled_probes.add(pooled_probe)
+                    for record in records:
+                        record.query_name = pooled_probe
+                        pooled_alignment_file.write(record)
+        return sample_pairs, pooled_sam, probes_table
+
+    def get_cases(self, inputs: DifferentialInputs, work_dir: Path) -> Iterator[Tuple[str, Any]]:
+        sample_and_tool_to_sams = {}
+        for sam, sample, tool, mask in inputs.recall_sams:
+            sample_and_tool_to_sams.setdefault((sample, tool, mask), []).append(sam)
+        for (sample, tool, mask), sams in sample_and_tool_to_sams.items():
+            case_dir = work_dir / f"{tool}_{sample}"
+            case_dir.mkdir(parents=True, exist_ok=True)
+            sample_pairs, pooled_sam, probes_table = self._pool(sams, case_dir)
+            yield f"{tool}_{sample}", (sample, sams, sample_pairs, pooled_sam, probes_table,
+                                       _compile_mask(mask, work_dir), case_dir)
+
+    def run_reference(self, case: Any) -> pd.DataFrame:
+        sample, sams, sample_pairs, pooled_sam, probes_table, mask_bitmaps, case_dir = case
+        dfs = []
+        for sample_pair, sam in zip(sample_pairs, sams):
+            report = case_dir / f"{sample_pair}.report.npz"
+            create_recall_report([sam], mask_bitmaps, sample, [0], report)
+            dfs.append(load_binary_report(report).assign(sample_pair=sample_pair))
+        return pd.concat(dfs, ignore_index=True)
+
+    def run_engine(self, case: Any) -> pd.DataFrame:
+        sample, sams, sample_pairs, pooled_sam, probes_table, mask_bitmaps, case_dir = case
+        pooled_report = case_dir / "pooled.report.npz"
+        create_pooled_recall_report([pooled_sam], probes_table, mask_bitmaps, sample, [0], pooled_report)
+        reports = [case_dir / f"{sample_pair}.split_report.npz" for sample_pair in sample_pairs]
+        split_pooled_recall_report(pooled_report, sample_pairs, reports)
+        return pd.concat([load_binary_report(report).assign(sample_pair=sample_pair)
+                          for sample_pair, report in zip(sample_pairs, reports)], ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preset", choices=list(PRESETS), default="small", help="Size of the synthetic dataset")
+    parser.add_argument("--inputs", type=Path, help="JSON file describing real inputs, instead of a synthetic dataset")
+    parser.add_argument("--engines", nargs="+", choices=list(ENGINES), default=list(ENGINES),
+                        help="Engines to test (default: all)")
+    parser.add_argument("--data-dir", type=Path,
+                        help="Where to generate the dataset and the outputs (default: a temporary directory)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = args.data_dir or Path(tmp_dir)
+        if args.inputs is not None:
+            inputs = DifferentialInputs.from_json(args.inputs)
+        else:
+            dataset = SyntheticDataGenerator(PRESETS[args.preset]).generate(data_dir / "dataset")
+            inputs = DifferentialInputs.from_synthetic_dataset(dataset)
+        results = run_engines(args.engines, inputs, data_dir / "outputs")
+
+    results_df = results_to_df(results)
+    print(results_df.to_csv(sep="\t", index=False), end="")
+    if (results_df["status"] == "DIFFERENT").any():
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
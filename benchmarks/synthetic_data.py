@@ -0,0 +1,419 @@
+"""
+Fabricates an evaluation dataset of any size: a VCF reference (a panel of genes), the truth assembly and mask of each
+sample, a multisample pandora VCF and single-sample snippy/samtools/medaka/nanopolish VCFs, the truth probesets of each
+sample pair, and the SAMs bwa would output when mapping the variant call probes to the truth assemblies (precision) and
+the truth probes to the references mutated with the calls (recall), so that the stages after mapping can be benchmarked
+without bwa.
+
+The variants are SNPs: each variant site of the pangenome has a ref and an alt base, and each sample has one of them.
+Each tool calls a fraction (recall) of the alt bases of each sample, plus false calls at other positions.
+
+Usage: python benchmarks/synthetic_data.py <output_dir> [--nb-of-samples 4] [--nb-of-genes 100] [--gene-length 1000]
+                                                         [--variant-density 0.01] [--seed 42]
+"""
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).absolute().parent.parent))
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+import argparse
+import itertools
+
+import numpy as np
+
+from evaluate.mask_bitmaps import MaskBitmaps
+from evaluate.probe import ProbeHeader, ProbeInterval
+
+BASES = "ACGT"
+TOOLS = ("pandora_illumina", "snippy", "samtools", "medaka", "nanopolish")
+
+
+class SyntheticDataConfig(NamedTuple):
+    nb_of_samples: int = 4
+    nb_of_genes: int = 100
+    gene_length: int = 1000
+    variant_density: float = 0.01  # variant sites per base of the VCF reference
+    recall: float = 0.9  # proportion of the alt bases of a sample called by each tool
+    false_call_rate: float = 0.1  # false calls per true call
+    mask_fraction: float = 0.02  # proportion of each truth assembly that is masked
+    flank_width: int = 100
+    tools: Tuple[str, ...] = TOOLS
+    seed: int = 42
+
+
+class Call(NamedTuple):
+    gene: int
+    pos: int  # 0-based
+    ref: str
+    alt: str
+    gt_conf: float
+
+
+class SyntheticDataset(NamedTuple):
+    config: SyntheticDataConfig
+    samples: List[str]
+    sample_pairs: List[Tuple[str, str]]
+    vcf_ref: Path
+    truth_assemblies: Dict[str, Path]
+    masks: Dict[str, Path]
+    mask_bitmaps: Dict[str, Path]
+    vcfs: Dict[Tuple[str, str], Path]  # (sample, tool) -> VCF (the same multisample VCF for all samples of pandora)
+    truth_probesets: Dict[Tuple[str, str, str], Path]  # (sample, sample1, sample2) -> probes of sample
+    precision_sams: Dict[Tuple[str, str], Path]  # (sample, tool) -> call probes mapped to the truth assembly
+    recall_sams: Dict[Tuple[str, str, str, str], Path]  # (sample, tool, sample1, sample2) -> truth probes mapped
+
+    def get_sample_pair_as_str(self, sample_pair: Tuple[str, str]) -> str:
+        return f"{sample_pair[0]}_and_{sample_pair[1]}"
+
+
+def get_gene_name(gene: int) -> str:
+    return f"GC{gene:08d}"
+
+
+def get_probe_name(header: ProbeHeader) -> str:
+    """
+    Name of the probe in the probeset FASTA, and of its mappings in the SAM.
+    """
+    return str(header)[1:]
+
+
+def get_md_and_nm(query: str, ref: str) -> Tuple[str, int]:
+    """
+    MD and NM tags of query aligned to ref without indels.
+    """
+    md = []
+    nb_of_matches = 0
+    nb_of_mismatches = 0
+    for query_base, ref_base in zip(query, ref):
+        if query_base == ref_base:
+            nb_of_matches += 1
+        else:
+            md.append(f"{nb_of_matches}{ref_base}")
+            nb_of_matches = 0
+            nb_of_mismatches += 1
+    md.append(str(nb_of_matches))
+    return "".join(md), nb_of_mismatches
+
+
+class SyntheticDataGenerator:
+    def __init__(self, config: SyntheticDataConfig = SyntheticDataConfig()):
+        self.config = config
+        self.random = np.random.default_rng(config.seed)
+        self.samples = [f"sample_{index}" for index in range(config.nb_of_samples)]
+        self.sample_pairs = list(itertools.combinations(self.samples, r=2))
+
+        self.genes = [self._random_sequence(config.gene_length) for _ in range(config.nb_of_genes)]
+        nb_of_sites_per_gene = max(1, int(config.gene_length * config.variant_density))
+        # gene -> sorted positions of the variant sites, and the alt base of each site
+        self.sites = [np.sort(self.random.choice(config.gene_length, nb_of_sites_per_gene, replace=False))
+                      for _ in self.genes]
+        self.site_alts = [[self._other_base(gene[pos]) for pos in positions]
+                          for gene, positions in zip(self.genes, self.sites)]
+        # sample -> gene -> whether the sample has the alt base of each site of the gene
+        self.sample_has_alt = {sample: [self.random.random(len(positions)) < 0.5 for positions in self.sites]
+                               for sample in self.samples}
+        self.truth_genes = {sample: [self._mutate(gene, self._get_alt_calls_of_sample(sample, gene_index))
+                                     for gene_index, gene in enumerate(self.genes)]
+                            for sample in self.samples}
+        self.calls = {(sample, tool): self._make_calls(sample) for sample in self.samples for tool in config.tools}
+        for tool in config.tools:
+            if tool.startswith("pandora"):
+                self._add_ref_calls(tool)
+
+    def _random_sequence(self, length: int) -> str:
+        return "".join(BASES[base] for base in self.random.integers(0, 4, length))
+
+    @staticmethod
+    def _other_base(base: str) -> str:
+        return BASES[(BASES.index(base) + 1) % 4]
+
+    @staticmethod
+    def _mutate(sequence: str, calls: Iterable[Call]) -> str:
+        bases = list(sequence)
+        for call in calls:
+            bases[call.pos] = call.alt
+        return "".join(bases)
+
+    def _get_alt_calls_of_sample(self, sample: str, gene_index: int) -> List[Call]:
+        gene = self.genes[gene_index]
+        return [Call(gene_index, int(pos), gene[pos], alt, 0.0)
+                for pos, alt, has_alt in zip(self.sites[gene_index], self.site_alts[gene_index],
+                                             self.sample_has_alt[sample][gene_index]) if has_alt]
+
+    def _make_calls(self, sample: str) -> List[Call]:
+        calls = []
+        for gene_index, gene in enumerate(self.genes):
+            true_calls = [call._replace(gt_conf=self._random_gt_conf(50, 300))
+                          for call in self._get_alt_calls_of_sample(sample, gene_index)
+                          if self.random.random() < self.config.recall]
+            nb_of_false_calls = self.random.binomial(len(true_calls) + 1, self.config.false_call_rate)
+            sites = set(self.sites[gene_index].tolist())
+            false_positions = {int(pos) for pos in self.random.choice(len(gene), nb_of_false_calls, replace=False)
+                               if pos not in sites}
+            false_calls = [Call(gene_index, pos, gene[pos], self._other_base(gene[pos]),
+                                self._random_gt_conf(1, 100)) for pos in false_positions]
+            calls.extend(sorted(true_calls + false_calls))
+        return calls
+
+    def _add_ref_calls(self, tool: str) -> None:
+        """
+        Pandora genotypes all samples at each site of its multisample VCF: the samples without a call at a site get a
+        ref call (alt == ref) there.
+        """
+        positions = {(call.gene, call.pos) for sample in self.samples for call in self.calls[sample, tool]}
+        for sample in self.samples:
+            called_positions = {(call.gene, call.pos) for call in self.calls[sample, tool]}
+            ref_calls = [Call(gene_index, pos, self.genes[gene_index][pos], self.genes[gene_index][pos],
+                              self._random_gt_conf(1, 300))
+                         for gene_index, pos in sorted(positions - called_positions)]
+            self.calls[sample, tool] = sorted(self.calls[sample, tool] + ref_calls)
+
+    def _random_gt_conf(self, low: float, high: float) -> float:
+        # a multiple of 1/8, so that it is the same once read back by pysam as a float32
+        return round(self.random.uniform(low, high) * 8) / 8
+
+    def _get_probe_interval(self, pos: int) -> Tuple[int, int]:
+        return max(0, pos - self.config.flank_width), min(self.config.gene_length, pos + 1 + self.config.flank_width)
+
+    def generate(self, output_dir: Path) -> SyntheticDataset:
+        output_dir.mkdir(parents=True, exist_ok=True)
+        vcf_ref = output_dir / "vcf_ref.fa"
+        self._write_fasta(vcf_ref, ((get_gene_name(index), gene) for index, gene in enumerate(self.genes)))
+
+        truth_assemblies, masks, mask_bitmaps = {}, {}, {}
+        for sample in self.samples:
+            truth_assemblies[sample] = output_dir / f"{sample}.truth.fa"
+            self._write_fasta(truth_assemblies[sample], ((get_gene_name(index), gene)
+                                                         for index, gene in enumerate(self.truth_genes[sample])))
+            masks[sample] = output_dir / f"{sample}.mask.bed"
+            mask_bitmaps[sample] = output_dir / f"{sample}.mask.bed.bitmaps"
+            self._write_mask(masks[sample], mask_bitmaps[sample])
+
+        vcfs = {}
+        for tool in self.config.tools:
+            if tool.startswith("pandora"):
+                vcf = output_dir / f"{tool}_multisample.vcf"
+                self._write_pandora_vcf(vcf, tool)
+                vcfs.update({(sample, tool): vcf for sample in self.samples})
+            else:
+                for sample in self.samples:
+                    vcfs[sample, tool] = output_dir / f"{tool}_{sample}.vcf"
+                    self._write_single_sample_vcf(vcfs[sample, tool], sample, tool)
+
+        precision_sams = {}
+        for sample, tool in self.calls:
+            precision_sams[sample, tool] = output_dir / f"{tool}_{sample}.precision.sam"
+            self._write_precision_sam(precision_sams[sample, tool], sample, tool)
+
+        truth_probesets, recall_sams = {}, {}
+        for sample1, sample2 in self.sample_pairs:
+            for sample in (sample1, sample2):
+                truth_probes = list(self._get_truth_probes(sample, sample1, sample2))
+                truth_probesets[sample, sample1, sample2] = output_dir / f"{sample}.{sample1}_and_{sample2}.truth_probeset.fa"
+                self._write_fasta(truth_probesets[sample, sample1, sample2],
+                                  ((header, sequence) for header, sequence, *_ in truth_probes))
+                for tool in self.config.tools:
+                    recall_sams[sample, tool, sample1, sample2] = \
+                        output_dir / f"{tool}_{sample}.{sample1}_and_{sample2}.recall.sam"
+                    self._write_recall_sam(recall_sams[sample, tool, sample1, sample2], sample, tool, truth_probes)
+
+        return SyntheticDataset(self.config, self.samples, self.sample_pairs, vcf_ref, truth_assemblies, masks,
+                                mask_bitmaps, vcfs, truth_probesets, precision_sams, recall_sams)
+
+    @staticmethod
+    def _write_fasta(path: Path, records: Iterable[Tuple[str, str]]) -> None:
+        with open(path, "w") as fasta:
+            for name, sequence in records:
+                fasta.write(f">{name}\n{sequence}\n")
+
+    def _write_mask(self, bed: Path, bitmaps: Path) -> None:
+        regions = []
+        mask_length = 100
+        for gene_index in range(len(self.genes)):
+            nb_of_regions = self.random.binomial(self.config.gene_length // mask_length, self.config.mask_fraction)
+            for start in self.random.integers(0, self.config.gene_length - mask_length, nb_of_regions):
+                regions.append((get_gene_name(gene_index), int(start), int(start) + mask_length))
+        with open(bed, "w") as bed_file:
+            bed_file.writelines(f"{chrom}\t{start}\t{end}\n" for chrom, start, end in regions)
+        MaskBitmaps.from_regions(regions).save(bitmaps)
+
+    def _write_contigs_header(self, vcf_file) -> None:
+        for gene_index in range(len(self.genes)):
+            vcf_file.write(f"##contig=<ID={get_gene_name(gene_index)},length={self.config.gene_length}>\n")
+
+    def _write_pandora_vcf(self, vcf: Path, tool: str) -> None:
+        sample_to_calls = {sample: {(call.gene, call.pos): call for call in self.calls[sample, tool]}
+                           for sample in self.samples}
+        with open(vcf, "w") as vcf_file:
+            vcf_file.write(PANDORA_VCF_HEADER)
+            self._write_contigs_header(vcf_file)
+            vcf_file.write("\t".join(["#CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER", "INFO", "FORMAT",
+                                      *self.samples]) + "\n")
+            for gene_index, pos in sorted(sample_to_calls[self.samples[0]]):
+                calls = [sample_to_calls[sample][gene_index, pos] for sample in self.samples]
+                ref = calls[0].ref
+                alt = next(call.alt for call in calls if call.alt != call.ref)
+                samples_data = [
+                    f"0:20,0:20,0:20,0:20,0:400,0:400,0:0,1:-10.0,-150.0:{call.gt_conf}" if call.alt == ref else
+                    f"1:0,20:0,20:0,20:0,20:0,400:0,400:1,0:-150.0,-10.0:{call.gt_conf}"
+                    for call in calls
+                ]
+                vcf_file.write("\t".join([get_gene_name(gene_index), str(pos + 1), ".", ref, alt, ".", ".",
+                                          "SVTYPE=SNP;GRAPHTYPE=SIMPLE", PANDORA_FORMAT, *samples_data]) + "\n")
+
+    def _write_single_sample_vcf(self, vcf: Path, sample: str, tool: str) -> None:
+        header, info, format_, sample_data = SINGLE_SAMPLE_VCF_FORMATS[tool]
+        with open(vcf, "w") as vcf_file:
+            vcf_file.write(header)
+            self._write_contigs_header(vcf_file)
+            vcf_file.write("\t".join(["#CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER", "INFO", "FORMAT",
+                                      sample]) + "\n")
+            for call in self.calls[sample, tool]:
+                vcf_file.write("\t".join([get_gene_name(call.gene), str(call.pos + 1), ".", call.ref, call.alt,
+                                          str(call.gt_conf), "PASS", info, format_, sample_data]) + "\n")
+
+    def _write_sam_header(self, sam_file, sample: str) -> None:
+        sam_file.write("@HD\tVN:1.5\tSO:unsorted\tGO:query\n")
+        for gene_index in range(len(self.genes)):
+            sam_file.write(f"@SQ\tSN:{get_gene_name(gene_index)}\tLN:{self.config.gene_length}\n")
+        sam_file.write(f"@PG\tID:bwa\tPN:bwa\tVN:0.7.17-r1188\tCL:bwa mem -t 1 {sample}\n")
+
+    @staticmethod
+    def _write_sam_record(sam_file, query_name: str, query: str, ref_name: str, ref: str, start: int) -> None:
+        md, nm = get_md_and_nm(query, ref)
+        score = len(query) - 5 * nm
+        sam_file.write(f"{query_name}\t0\t{ref_name}\t{start + 1}\t60\t{len(query)}M\t*\t0\t0\t{query}\t*\t"
+                       f"NM:i:{nm}\tMD:Z:{md}\tAS:i:{score}\tXS:i:0\n")
+
+    def _write_precision_sam(self, sam: Path, sample: str, tool: str) -> None:
+        """
+        Probes of the calls, as made by Query.make_probes(), mapped to where they come from in the truth assembly.
+        """
+        svtype, coverage = TOOL_PROBE_SVTYPE_AND_COVERAGE[tool.split("_")[0]]
+        with open(sam, "w") as sam_file:
+            self._write_sam_header(sam_file, sample)
+            for call in self.calls[sample, tool]:
+                start, end = self._get_probe_interval(call.pos)
+                gene = self.genes[call.gene]
+                query = gene[start:call.pos] + call.alt + gene[call.pos + 1:end]
+                header = ProbeHeader(chrom=get_gene_name(call.gene), sample=sample, pos=call.pos + 1, ref_length=1,
+                                     interval=ProbeInterval(call.pos - start, call.pos - start + 1), svtype=svtype,
+                                     gt_conf=call.gt_conf, coverage=coverage)
+                self._write_sam_record(sam_file, get_probe_name(header), query, get_gene_name(call.gene),
+                                       self.truth_genes[sample][call.gene][start:end], start)
+
+    def _get_truth_probes(self, sample: str, sample1: str, sample2: str) -> Iterable[Tuple[str, str, int, int]]:
+        """
+        Probes of the allele of sample at each variant site where sample1 and sample2 differ, as
+        (header, sequence, gene, start).
+        """
+        pangenome_variation_id = 0
+        for gene_index, positions in enumerate(self.sites):
+            has_alt_1 = self.sample_has_alt[sample1][gene_index]
+            has_alt_2 = self.sample_has_alt[sample2][gene_index]
+            for site_index, pos in enumerate(positions):
+                pangenome_variation_id += 1
+                if has_alt_1[site_index] == has_alt_2[site_index]:
+                    continue
+                allele_id = int(self.sample_has_alt[sample][gene_index][site_index])
+                nb_of_samples = sum(int(self.sample_has_alt[other_sample][gene_index][site_index] == allele_id)
+                                    for other_sample in self.samples)
+                start, end = self._get_probe_interval(int(pos))
+                header = ProbeHeader(sample=sample, chrom=get_gene_name(gene_index), pos=int(pos) + 1,
+                                     interval=ProbeInterval(int(pos) - start, int(pos) - start + 1),
+                                     pangenome_variation_id=pangenome_variation_id, number_of_alleles=2,
+                                     allele_id=allele_id, number_of_different_allele_sequences=2,
+                                     allele_sequence_id=allele_id, nb_of_samples=nb_of_samples)
+                yield get_probe_name(header), self.truth_genes[sample][gene_index][start:end], gene_index, start
+
+    def _write_recall_sam(self, sam: Path, sample: str, tool: str,
+                          truth_probes: List[Tuple[str, str, int, int]]) -> None:
+        """
+        Truth probes mapped to where they come from in the VCF reference mutated with the calls of sample.
+        """
+        calls_per_gene: Dict[int, List[Call]] = {}
+        for call in self.calls[sample, tool]:
+            calls_per_gene.setdefault(call.gene, []).append(call)
+        with open(sam, "w") as sam_file:
+            self._write_sam_header(sam_file, sample)
+            mutated_genes = {}
+            for header, sequence, gene_index, start in truth_probes:
+                if gene_index not in mutated_genes:
+                    mutated_genes[gene_index] = self._mutate(self.genes[gene_index], calls_per_gene.get(gene_index, []))
+                mutated_gene = mutated_genes[gene_index]
+                self._write_sam_record(sam_file, header, sequence, get_gene_name(gene_index),
+                                       mutated_gene[start:start + len(sequence)], start)
+
+
+PANDORA_FORMAT = "GT:MEAN_FWD_COVG:MEAN_REV_COVG:MED_FWD_COVG:MED_REV_COVG:SUM_FWD_COVG:SUM_REV_COVG:GAPS:LIKELIHOOD:GT_CONF"
+PANDORA_VCF_HEADER = """##fileformat=VCFv4.3
+##ALT=<ID=SNP,Description="SNP">
+##INFO=<ID=SVTYPE,Number=1,Type=String,Description="Type of variant">
+##INFO=<ID=GRAPHTYPE,Number=1,Type=String,Description="Type of graph feature">
+##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">
+##FORMAT=<ID=MEAN_FWD_COVG,Number=R,Type=Integer,Description="Mean forward coverage">
+##FORMAT=<ID=MEAN_REV_COVG,Number=R,Type=Integer,Description="Mean reverse coverage">
+##FORMAT=<ID=MED_FWD_COVG,Number=R,Type=Integer,Description="Med forward coverage">
+##FORMAT=<ID=MED_REV_COVG,Number=R,Type=Integer,Description="Med reverse coverage">
+##FORMAT=<ID=SUM_FWD_COVG,Number=R,Type=Integer,Description="Sum forward coverage">
+##FORMAT=<ID=SUM_REV_COVG,Number=R,Type=Integer,Description="Sum reverse coverage">
+##FORMAT=<ID=GAPS,Number=R,Type=Float,Description="Number of gap bases">
+##FORMAT=<ID=LIKELIHOOD,Number=R,Type=Float,Description="Likelihood">
+##FORMAT=<ID=GT_CONF,Number=1,Type=Float,Description="Genotype confidence">
+"""
+
+# tool -> (SVTYPE, COVERAGE) in the headers of the probes of its calls, as given by its VCF class
+TOOL_PROBE_SVTYPE_AND_COVERAGE = {
+    "pandora": ("SNP", 40),
+    "snippy": ("snp", 1000),
+    "samtools": ("SNP", 66),
+    "medaka": ("NA", 1000),
+    "nanopolish": ("NA", 26),
+}
+
+# tool -> (header, INFO, FORMAT, sample data) of its calls
+SINGLE_SAMPLE_VCF_FORMATS = {
+    "snippy": ("""##fileformat=VCFv4.2
+##INFO=<ID=DP,Number=1,Type=Integer,Description="Total read depth at the locus">
+##INFO=<ID=AO,Number=A,Type=Integer,Description="Count of full observations of this alternate haplotype.">
+##INFO=<ID=TYPE,Number=A,Type=String,Description="The type of allele, either snp, mnp, ins, del, or complex.">
+##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">
+##FORMAT=<ID=DP,Number=1,Type=Integer,Description="Read Depth">
+""", "DP=75;AO=75;TYPE=snp", "GT:DP", "1/1:75"),
+    "samtools": ("""##fileformat=VCFv4.2
+##INFO=<ID=INDEL,Number=0,Type=Flag,Description="Indicates that the variant is an INDEL.">
+##INFO=<ID=DP,Number=1,Type=Integer,Description="Raw read depth">
+##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">
+""", "DP=66", "GT", "1"),
+    "medaka": ("""##fileformat=VCFv4.1
+##FORMAT=<ID=GT,Number=1,Type=String,Description="Medaka genotype">
+##FORMAT=<ID=GQ,Number=1,Type=Integer,Description="Medaka genotype quality score">
+""", ".", "GT:GQ", "1:42"),
+    "nanopolish": ("""##fileformat=VCFv4.2
+##INFO=<ID=BaseCalledReadsWithVariant,Number=1,Type=Integer,Description="The number of base-space reads that support the variant">
+##INFO=<ID=TotalReads,Number=1,Type=Integer,Description="The number of event-space reads used to call the variant">
+##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">
+""", "BaseCalledReadsWithVariant=26;TotalReads=89", "GT", "1"),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output_dir", type=Path)
+    defaults = SyntheticDataConfig()
+    parser.add_argument("--nb-of-samples", type=int, default=defaults.nb_of_samples)
+    parser.add_argument("--nb-of-genes", type=int, default=defaults.nb_of_genes)
+    parser.add_argument("--gene-length", type=int, default=defaults.gene_length)
+    parser.add_argument("--variant-density", type=float, default=defaults.variant_density)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    args = parser.parse_args()
+
+    config = SyntheticDataConfig(nb_of_samples=args.nb_of_samples, nb_of_genes=args.nb_of_genes,
+                                 gene_length=args.gene_length, variant_density=args.variant_density, seed=args.seed)
+    dataset = SyntheticDataGenerator(config).generate(args.output_dir)
+    print(f"nb_of_samples\tnb_of_genes\tnb_of_vcfs\tnb_of_sams\n"
+          f"{len(dataset.samples)}\t{config.nb_of_genes}\t{len(set(dataset.vcfs.values()))}\t"
+          f"{len(dataset.precision_sams) + len(dataset.recall_sams)}")
+
+
+if __name__ == "__main__":
+    main()
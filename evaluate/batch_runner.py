@@ -0,0 +1,277 @@
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import runpy
+import sys
+import threading
+import traceback
+
+from evaluate.instrumentation import instrumentation
+from evaluate.job_metrics import JobMetricsRecorder, start_measuring_forked_job
+
+# imported once by the long-lived interpreter, so that the jobs forked from it do not pay for them
+PRELOADED_MODULES = [
+    "numpy", "pandas", "pysam", "intervaltree",
+    "evaluate.classification", "evaluate.classifier", "evaluate.masker", "evaluate.reporter", "evaluate.report",
+    "evaluate.calculator", "evaluate.recall_metrics_cube", "evaluate.query_name_groups_filter",
+    "evaluate.job_metrics",
+]
+
+
+class ScriptJobError(Exception):
+    pass
+
+
+class NamedList(list):
+    """
+    Minimal equivalent of snakemake.io.Namedlist: a list whose items can also be accessed by name, e.g.
+    snakemake.input.mask_bitmaps. Named values that are lists are flattened into the list, as in Snakemake.
+    """
+    def __init__(self, items: Iterable = (), names: Optional[Dict[str, object]] = None):
+        super().__init__(items)
+        self._names = dict(names) if names is not None else {}
+
+    @classmethod
+    def from_value(cls, value: Union[None, str, Sequence, Dict[str, object]]) -> "NamedList":
+        """
+        value is a dict of named items, a list of unnamed items, a single item or None.
+        """
+        if value is None:
+            return cls()
+        if isinstance(value, dict):
+            items = []
+            for item in value.values():
+                items.extend(item if isinstance(item, (list, tuple)) else [item])
+            return cls(items, value)
+        if isinstance(value, (list, tuple)):
+            return cls(value)
+        return cls([value])
+
+    @classmethod
+    def from_namedlist(cls, namedlist) -> "NamedList":
+        return cls(list(namedlist), dict(namedlist.items()))
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            return self._names[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def items(self) -> Iterable[Tuple[str, object]]:
+        return self._names.items()
+
+    def keys(self) -> Iterable[str]:
+        return self._names.keys()
+
+    def get(self, name: str, default=None):
+        return self._names.get(name, default)
+
+    def to_value(self) -> Union[list, Dict[str, object]]:
+        return dict(self._names) if self._names else list(self)
+
+    def __str__(self) -> str:
+        return " ".join(map(str, self))
+
+
+class ScriptJob:
+    """
+    A job of a rule with a script: directive. It is the snakemake object the script sees, with the same attributes
+    Snakemake gives it (input, output, params, wildcards, log, threads, resources, rule, config), so that scripts run
+    unchanged in a forked interpreter instead of a new one. The job metrics recorders the script creates (see
+    evaluate.job_metrics.record_job_metrics()) are added to job_metrics_recorders, and saved by run_script().
+    """
+    def __init__(self, rule: str, script: Union[str, Path], input=None, output=None, params=None, wildcards=None,
+                 log=None, threads: int = 1, resources=None, config: Optional[dict] = None):
+        self.rule = rule
+        self.script = str(script)
+        self.input = self._to_named_list(input)
+        self.output = self._to_named_list(output)
+        self.params = self._to_named_list(params)
+        self.wildcards = self._to_named_list(wildcards)
+        self.log = self._to_named_list(log)
+        self.threads = threads
+        self.resources = self._to_named_list(resources)
+        self.config = config if config is not None else {}
+        self.job_metrics_recorders = []
+
+    def add_job_metrics_recorder(self, recorder: JobMetricsRecorder) -> None:
+        self.job_metrics_recorders.append(recorder)
+
+    @staticmethod
+    def _to_named_list(value) -> NamedList:
+        if isinstance(value, NamedList):
+            return value
+        if hasattr(value, "items") and not isinstance(value, dict):
+            return NamedList.from_namedlist(value)
+        return NamedList.from_value(value)
+
+    @classmethod
+    def from_dict(cls, job: dict) -> "ScriptJob":
+        return cls(**job)
+
+    def to_dict(self) -> dict:
+        return {
+            "rule": self.rule,
+            "script": self.script,
+            "input": self.input.to_value(),
+            "output": self.output.to_value(),
+            "params": self.params.to_value(),
+            "wildcards": self.wildcards.to_value(),
+            "log": self.log.to_value(),
+            "threads": self.threads,
+            "resources": self.resources.to_value(),
+            "config": self.config,
+        }
+
+    def __repr__(self) -> str:
+        return f"ScriptJob(rule={self.rule}, script={self.script}, wildcards={dict(self.wildcards.items())})"
+
+
+def preload_modules(modules: Iterable[str] = PRELOADED_MODULES) -> None:
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            logging.warning(f"preload_modules: could not import {module}, it will be imported by each job")
+
+
+_forkserver_context = None
+_forkserver_context_lock = threading.Lock()
+
+
+def _get_forkserver_context() -> multiprocessing.context.BaseContext:
+    """
+    The context of the forkserver run_script_in_fork() forks the jobs from, with PRELOADED_MODULES imported. It is only
+    configured when the first job runs, and the server only started then. It is a new interpreter with a single
+    thread, unlike Snakemake's, so it is safe to fork whatever threads Snakemake runs.
+    """
+    global _forkserver_context
+    with _forkserver_context_lock:
+        if _forkserver_context is None:
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(PRELOADED_MODULES)
+            _forkserver_context = context
+    return _forkserver_context
+
+
+def _reset_process_state() -> None:
+    # the job must not inherit the logging handlers and stage metrics of the interpreter it is forked from, nor count
+    # its memory: its script configures its own log and saves its own metrics
+    start_measuring_forked_job()
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    instrumentation.reset()
+
+
+def run_script(job: ScriptJob) -> int:
+    """
+    Runs the script of job in this interpreter, as Snakemake would run it in a new one, and returns its exit code.
+    The job metrics recorded by the script are saved when it finishes, even if it fails. The script's own exit handlers
+    (atexit) are not run: the job ends with the process it is forked in, which exits without running them.
+    """
+    # as with the script: directive, modules next to the script can be imported
+    sys.path.insert(0, str(Path(job.script).parent.absolute()))
+    exit_code = 0
+    try:
+        runpy.run_path(job.script, init_globals={"snakemake": job}, run_name="__main__")
+    except SystemExit as error:
+        exit_code = error.code if isinstance(error.code, int) else (0 if error.code is None else 1)
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        for recorder in job.job_metrics_recorders:
+            recorder.save()
+    return exit_code
+
+
+def start_job_in_fork(job: ScriptJob) -> int:
+    """
+    Forks this interpreter and runs job in the child. Returns the pid of the child. Only the calling thread exists in
+    the child, so a lock held by another thread at fork time would stay held forever in it: this interpreter must not
+    run other threads (Snakemake's does, see run_script_in_fork()).
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        exit_code = 1
+        try:
+            _reset_process_state()
+            exit_code = run_script(job)
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(exit_code)
+    return pid
+
+
+def _get_exit_code(wait_status: int) -> int:
+    if os.WIFSIGNALED(wait_status):
+        return -os.WTERMSIG(wait_status)
+    return os.WEXITSTATUS(wait_status)
+
+
+def _run_job_in_child(job: ScriptJob) -> None:
+    _reset_process_state()
+    sys.exit(run_script(job))
+
+
+def run_script_in_fork(job: ScriptJob) -> None:
+    """
+    Runs job in a fork of the forkserver (see _get_forkserver_context()) and waits for it. To be called from the run:
+    directive of a rule, so that the job uses an interpreter that already loaded the modules. The job is not forked
+    from Snakemake's interpreter itself, which runs several threads.
+    """
+    process = _get_forkserver_context().Process(target=_run_job_in_child, args=(job,))
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        raise ScriptJobError(f"{job} failed with exit code {process.exitcode}, see {job.log}")
+
+
+def run_jobs(jobs: Iterable[ScriptJob], processes: int = 1) -> List[Tuple[ScriptJob, int]]:
+    """
+    Runs jobs, each in a fork of this interpreter, with up to processes jobs at a time. Jobs are independent: a job
+    that fails does not stop the others. Returns the failed jobs and their exit codes, in the order of jobs.
+    """
+    jobs = list(jobs)
+    pid_to_job_index = {}
+    failed_job_indexes_and_exit_codes = []
+    for job_index, job in enumerate(jobs):
+        if len(pid_to_job_index) >= processes:
+            failed_job_indexes_and_exit_codes.extend(_wait_for_any_job(pid_to_job_index, jobs))
+        logging.info(f"run_jobs: starting {job}")
+        pid_to_job_index[start_job_in_fork(job)] = job_index
+    while pid_to_job_index:
+        failed_job_indexes_and_exit_codes.extend(_wait_for_any_job(pid_to_job_index, jobs))
+    return [(jobs[job_index], exit_code) for job_index, exit_code in sorted(failed_job_indexes_and_exit_codes)]
+
+
+def _wait_for_any_job(pid_to_job_index: Dict[int, int], jobs: List[ScriptJob]) -> List[Tuple[int, int]]:
+    pid, wait_status = os.wait()
+    if pid not in pid_to_job_index:
+        return []
+    job_index = pid_to_job_index.pop(pid)
+    exit_code = _get_exit_code(wait_status)
+    if exit_code != 0:
+        logging.error(f"run_jobs: {jobs[job_index]} failed with exit code {exit_code}")
+        return [(job_index, exit_code)]
+    return []
+
+
+def load_jobs(jobs_file: Union[str, Path]) -> List[ScriptJob]:
+    with open(jobs_file) as file:
+        return [ScriptJob.from_dict(job) for job in json.load(file)]
+
+
+def save_jobs(jobs: Iterable[ScriptJob], jobs_file: Union[str, Path]) -> None:
+    with open(jobs_file, "w") as file:
+        json.dump([job.to_dict() for job in jobs], file, indent=4)
@@ -0,0 +1,195 @@
+from array import array
+from pathlib import Path
+import numbers
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+import numpy as np
+import pandas as pd
+
+BINARY_REPORT_SUFFIX = ".npz"
+
+
+class ColumnNotStorableError(Exception):
+    pass
+
+
+class MissingColumnsError(Exception):
+    pass
+
+
+def is_binary_report_path(file) -> bool:
+    return isinstance(file, (str, Path)) and Path(file).suffix == BINARY_REPORT_SUFFIX
+
+
+def _strings_to_array(strings: Iterable[str]) -> np.ndarray:
+    # strings are stored as one UTF-8 buffer, each followed by a newline (reports are line-based, so fields never
+    # contain one). This is much more compact than a fixed-width unicode array for long probe headers.
+    return np.frombuffer("".join(f"{string}\n" for string in strings).encode("utf-8"), dtype=np.uint8)
+
+
+def _array_to_strings(buffer: np.ndarray) -> List[str]:
+    return buffer.tobytes().decode("utf-8").split("\n")[:-1]
+
+
+def save_binary_report(df: pd.DataFrame, path: Path) -> None:
+    """
+    Saves a report as a .npz file with one array per column. String columns (object or categorical) are
+    dictionary-encoded as <column>.codes and <column>.categories, other columns are saved with their dtype as
+    <column>.values, so that they are loaded back already parsed.
+    """
+    arrays = {"__columns__": _strings_to_array(df.columns)}
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype) or values.dtype == object:
+            categorical = pd.Categorical(values)
+            categories = categorical.categories
+            if pd.api.types.infer_dtype(categories, skipna=False) not in ("string", "empty"):
+                raise ColumnNotStorableError(f"Column {column} has non-string values, can't save it in a binary report")
+            if any("\n" in category for category in categories):
+                raise ColumnNotStorableError(f"Column {column} has values with newlines, can't save it in a binary report")
+            arrays[f"{column}.codes"] = categorical.codes
+            arrays[f"{column}.categories"] = _strings_to_array(categories)
+        else:
+            arrays[f"{column}.values"] = values.to_numpy()
+
+    with open(path, "wb") as file:
+        np.savez(file, **arrays)
+
+
+def get_binary_report_columns(path: Path) -> List[str]:
+    with np.load(path) as npz:
+        return _array_to_strings(npz["__columns__"])
+
+
+def _check_has_columns(path: Union[str, Path], columns_of_the_report: Iterable[str], columns: Sequence[str]) -> None:
+    columns_of_the_report = set(columns_of_the_report)
+    missing_columns = [column for column in columns if column not in columns_of_the_report]
+    if missing_columns:
+        raise MissingColumnsError(f"Report {path} has no column {', '.join(missing_columns)}")
+
+
+def _get_columns_to_load(all_columns: Sequence[str], columns: Optional[Sequence[str]],
+                         optional_columns: Sequence[str]) -> Optional[List[str]]:
+    if columns is None:
+        return None
+    return [column for column in all_columns if column in columns or column in optional_columns]
+
+
+def load_binary_report(path: Path, columns: Optional[Sequence[str]] = None, as_categorical: bool = False,
+                       optional_columns: Sequence[str] = ()) -> pd.DataFrame:
+    """
+    Loads a report saved with save_binary_report(). If columns is given, only these columns, which must be in the
+    report (MissingColumnsError otherwise), and those of optional_columns that are in the report, are read from disk.
+    String columns are returned as object columns, or as categoricals if as_categorical.
+    """
+    with np.load(path) as npz:
+        all_columns = _array_to_strings(npz["__columns__"])
+        if columns is None:
+            columns_to_load = all_columns
+        else:
+            _check_has_columns(path, all_columns, columns)
+            columns_to_load = _get_columns_to_load(all_columns, columns, optional_columns)
+
+        column_to_values = {}
+        for column in columns_to_load:
+            if f"{column}.values" in npz.files:
+                column_to_values[column] = npz[f"{column}.values"]
+                continue
+            categorical = pd.Categorical.from_codes(
+                npz[f"{column}.codes"], categories=_array_to_strings(npz[f"{column}.categories"]))
+            column_to_values[column] = categorical if as_categorical else np.asarray(categorical, dtype=object)
+
+    return pd.DataFrame(column_to_values, columns=columns_to_load)
+
+
+def _get_typecode(value) -> Optional[str]:
+    """
+    The typecode of the array a column starting with value is stored in, or None if it is dictionary-encoded.
+    """
+    if isinstance(value, (bool, np.bool_)):
+        return "b"
+    if isinstance(value, numbers.Integral):
+        return "q"
+    if isinstance(value, numbers.Real):
+        return "d"
+    return None
+
+
+class BinaryReportWriter:
+    """
+    Builds a binary report row by row, keeping the type of each column, as save_binary_report() does from a DataFrame.
+    The type of a column is inferred from its value in the first row: numbers (e.g. the assessments of precision
+    reports, or GT_CONF percentiles) are stored as int64, float64 or bool arrays; anything else is stored as a string,
+    dictionary-encoded as it goes. Memory is then one number or integer code per cell plus the distinct strings, so
+    reports can be streamed into it like they are streamed into a TSV.
+    """
+    typecode_to_dtype = {"b": np.bool_, "q": np.int64, "d": np.float64}
+
+    def __init__(self, columns: Sequence[str]):
+        self.columns = list(columns)
+        self._typecodes: Optional[List[Optional[str]]] = None
+        self._value_to_code: List[Dict[str, int]] = [{} for _ in self.columns]
+        self._values: List[array] = []
+
+    def write_row(self, row: Sequence) -> None:
+        if self._typecodes is None:
+            self._typecodes = [_get_typecode(value) for value in row]
+            self._values = [array(typecode or "l") for typecode in self._typecodes]
+
+        for column, value, typecode, value_to_code, values in zip(
+                self.columns, row, self._typecodes, self._value_to_code, self._values):
+            if typecode is None:
+                value = str(value)
+                code = value_to_code.get(value)
+                if code is None:
+                    code = value_to_code[value] = len(value_to_code)
+                values.append(code)
+            elif _get_typecode(value) not in (typecode, "q" if typecode == "d" else typecode):
+                raise ColumnNotStorableError(
+                    f"Column {column} was inferred to hold numbers of typecode {typecode} from its first value, "
+                    f"can't store {value!r} in it")
+            else:
+                values.append(value)
+
+    def to_df(self) -> pd.DataFrame:
+        if self._typecodes is None:
+            # no rows: the columns have no type, they are stored as strings
+            return pd.DataFrame({column: pd.Categorical([]) for column in self.columns}, columns=self.columns)
+
+        column_to_values = {}
+        for column, typecode, value_to_code, values in zip(
+                self.columns, self._typecodes, self._value_to_code, self._values):
+            if typecode is None:
+                column_to_values[column] = pd.Categorical.from_codes(np.frombuffer(values, dtype=np.int_),
+                                                                     categories=list(value_to_code))
+            else:
+                column_to_values[column] = np.frombuffer(values, dtype=self.typecode_to_dtype[typecode])
+        return pd.DataFrame(column_to_values, columns=self.columns)
+
+    def save(self, path: Path) -> None:
+        save_binary_report(self.to_df(), path)
+
+
+def read_report_file(path: Union[str, Path], columns: Optional[Sequence[str]] = None,
+                     as_categorical: bool = False, dtypes: Optional[Dict[str, str]] = None,
+                     optional_columns: Sequence[str] = ()) -> pd.DataFrame:
+    """
+    Reads a report in any of the two formats: binary if the path ends with .npz, TSV otherwise. columns and
+    optional_columns are as in load_binary_report(): a column of columns the report does not have raises a
+    MissingColumnsError, optional columns (e.g. helper columns the report can derive from the others) are loaded if
+    present.
+    dtypes declares the dtypes of TSV columns ("str" columns are read as categoricals if as_categorical), so that
+    pandas does not infer them. Binary reports are already typed.
+    """
+    if is_binary_report_path(path):
+        return load_binary_report(path, columns=columns, as_categorical=as_categorical,
+                                  optional_columns=optional_columns)
+
+    if dtypes is not None and as_categorical:
+        dtypes = {column: "category" if dtype == "str" else dtype for column, dtype in dtypes.items()}
+    if columns is None:
+        return pd.read_csv(path, sep="\t", keep_default_na=False, dtype=dtypes)
+
+    all_columns = pd.read_csv(path, sep="\t", nrows=0).columns
+    _check_has_columns(path, all_columns, columns)
+    return pd.read_csv(path, sep="\t", keep_default_na=False, dtype=dtypes,
+                       usecols=_get_columns_to_load(all_columns, columns, optional_columns))
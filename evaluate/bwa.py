@@ -1,5 +1,7 @@
 import subprocess
-from typing import Tuple, List
+import tempfile
+from contextlib import contextmanager
+from typing import BinaryIO, ContextManager, Iterator, Tuple, List, Optional
 
 import pysam
 from pathlib import Path
@@ -36,6 +38,66 @@ class BWA:
 
         return bwa_mem.stdout.decode(), bwa_mem.stderr.decode()
 
+    @contextmanager
+    def open_alignments(self, query: Path, output: Optional[Path] = None) -> Iterator[pysam.AlignmentFile]:
+        """
+        Streams the alignments of bwa mem straight from its output, as they are produced, instead of writing them to
+        a SAM file and reading it back. If output is given, a copy of the SAM is also written there (e.g. to debug).
+        The alignments must be read until the end, and errors of bwa are raised as in align() when they are.
+        """
+        with tempfile.TemporaryFile() as stderr_file:
+            processes = self._start_bwa_mem(query, stderr_file, output)
+            sam_stream = processes[-1].stdout
+            try:
+                with self._open_sam_stream(sam_stream, processes, stderr_file) as alignment_file:
+                    yield alignment_file
+            except BaseException:
+                for process in processes:
+                    process.kill()
+                    process.wait()
+                raise
+            finally:
+                sam_stream.close()
+            self._check_processes(processes, stderr_file)
+
+    def _start_bwa_mem(self, query: Path, stderr_file: BinaryIO, output: Optional[Path]) -> List[subprocess.Popen]:
+        options = self.get_options()
+        bwa_mem = subprocess.Popen(
+            ["bwa", "mem", *options, str(self.reference), str(query)],
+            stdout=subprocess.PIPE,
+            stderr=stderr_file,
+        )
+        if output is None:
+            return [bwa_mem]
+        tee = subprocess.Popen(["tee", str(output)], stdin=bwa_mem.stdout, stdout=subprocess.PIPE)
+        # tee is now the only reader of the output of bwa, so that bwa gets SIGPIPE if tee exits
+        bwa_mem.stdout.close()
+        return [bwa_mem, tee]
+
+    def _open_sam_stream(self, sam_stream: BinaryIO, processes: List[subprocess.Popen],
+                         stderr_file: BinaryIO) -> pysam.AlignmentFile:
+        try:
+            return pysam.AlignmentFile(sam_stream)
+        except ValueError:
+            # bwa failed before writing the SAM header: raise its error instead
+            self._check_processes(processes, stderr_file)
+            raise
+
+    @staticmethod
+    def _check_processes(processes: List[subprocess.Popen], stderr_file: BinaryIO) -> None:
+        for process in processes:
+            process.wait()
+        bwa_mem = processes[0]
+        if bwa_mem.returncode != 0:
+            stderr_file.seek(0)
+            stderr = stderr_file.read()
+            if b"fail to locate the index" in stderr:
+                raise IndexError("Reference must be indexed by BWA before alignment.")
+            raise subprocess.CalledProcessError(bwa_mem.returncode, bwa_mem.args, stderr=stderr)
+        for process in processes[1:]:
+            if process.returncode != 0:
+                raise subprocess.CalledProcessError(process.returncode, process.args)
+
     def get_options(self):
         options = []
         options.extend(["-t", str(self.threads)])
@@ -74,3 +136,14 @@ class BWA:
             output.write_text(stdout)
 
         return bwa.parse_sam_string(stdout)
+
+    @staticmethod
+    def stream_query_to_ref(query: Path, ref: Path, threads: int = 1,
+                            output: Optional[Path] = None) -> ContextManager[pysam.AlignmentFile]:
+        """
+        Same as map_query_to_ref(), but the alignments are streamed (see open_alignments()) and only written to output
+        if it is given.
+        """
+        bwa = BWA(threads)
+        bwa.reference = str(ref)
+        return bwa.open_alignments(query, output)
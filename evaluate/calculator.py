@@ -2,9 +2,11 @@ from .report import Report, PrecisionReport, RecallReport
 from collections import Counter
 from enum import Enum
 from .classification import AlignmentAssessment
+from .instrumentation import stage
 import pandas as pd
-from typing import Tuple
+from typing import Iterable, List, Tuple
 import math
+import numpy as np
 
 
 class EmptyReportError(Exception):
@@ -47,13 +49,115 @@ class Calculator:
         self.report = report
 
 
+def _add_exactly(partials: List[float], values: List[float]) -> List[float]:
+    """
+    Floats whose exact sum is the exact sum of partials and values: the correctly rounded sum first, then the correctly
+    rounded remainders, which shrink by a factor of at least 2**52 each, until the remainder is 0.
+    """
+    terms = partials + values
+    exact_sum = []
+    while True:
+        total = math.fsum(terms)
+        if total == 0.0:
+            return exact_sum
+        exact_sum.append(total)
+        terms.append(-total)
+
+
+def get_prefix_sums(values: np.ndarray, prefix_lengths: np.ndarray) -> np.ndarray:
+    """
+    math.fsum(values[:prefix_length]) for each of prefix_lengths, in a single pass over values: the sum of the values
+    so far is carried exactly, so that each prefix sum is correctly rounded, as the sum of the same values in any
+    order with math.fsum would be. A cumulative sum would instead accumulate one rounding error per value.
+    """
+    prefix_lengths = np.asarray(prefix_lengths, dtype=np.int64)
+    prefix_sums = np.zeros(len(prefix_lengths), dtype=float)
+    partials = []
+    previous_prefix_length = 0
+    for index in np.argsort(prefix_lengths, kind="stable"):
+        prefix_length = prefix_lengths[index]
+        partials = _add_exactly(partials, values[previous_prefix_length:prefix_length].tolist())
+        previous_prefix_length = prefix_length
+        prefix_sums[index] = math.fsum(partials)
+    return prefix_sums
+
+
+class PrecisionCurve:
+    """
+    Number of correct and total calls at any GT_CONF threshold, from the calls sorted once by GT_CONF: the calls at or
+    above a threshold are then a prefix of the sorted calls, found with a searchsorted. The assessments of each prefix
+    are summed with get_prefix_sums(), so the number of correct calls is the correctly rounded sum, whatever the order
+    of the calls, and equals the one of the reference calculation (see
+    PrecisionCalculator._calculate_precision_for_a_given_confidence()).
+    """
+    def __init__(self, gt_confs: np.ndarray, assessments: np.ndarray):
+        order = np.argsort(gt_confs, kind="stable")[::-1]
+        self.gt_confs_descending = gt_confs[order]
+        self.assessments_descending = assessments[order].astype(float)
+
+    @classmethod
+    def from_report(cls, report: PrecisionReport) -> "PrecisionCurve":
+        return cls(report.report["GT_CONF"].to_numpy(dtype=float),
+                   report.report["classification"].to_numpy(dtype=float))
+
+    @property
+    def distinct_gt_confs(self) -> np.ndarray:
+        return np.unique(self.gt_confs_descending)
+
+    def get_nb_of_correct_and_total_calls(self, conf_thresholds: Iterable[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns, for each threshold, the sum of the assessments and the number of calls with GT_CONF >= threshold.
+        """
+        conf_thresholds = np.asarray(list(conf_thresholds), dtype=float)
+        # searchsorted needs ascending values, so we search -threshold in -GT_CONF
+        nb_of_total_calls = np.searchsorted(-self.gt_confs_descending, -conf_thresholds, side="right")
+        nb_of_correct_calls = get_prefix_sums(self.assessments_descending, nb_of_total_calls)
+        return nb_of_correct_calls, nb_of_total_calls.astype(float)
+
+
 class PrecisionCalculator(Calculator):
     def __init__(self, report: PrecisionReport):
         super().__init__(report)
+        with stage("PrecisionCurve.from_report") as building:
+            self.precision_curve = PrecisionCurve.from_report(report)
+            building.add_records(len(report.report))
 
+    def get_precision_report(self, all_gts) -> pd.DataFrame:
+        """
+        Same as get_precision_report_by_filtering_the_report(), but reads every threshold from the precision curve.
+        Thresholds without any call are skipped.
+        """
+        all_gts = list(all_gts)
+        with stage("PrecisionCalculator.get_precision_report") as calculating:
+            nb_of_correct_calls, nb_of_total_calls = self.precision_curve.get_nb_of_correct_and_total_calls(all_gts)
+            calculating.add_records(len(all_gts))
+        there_are_calls = nb_of_total_calls > 0
+        gts = [gt for gt, there_are_calls_for_gt in zip(all_gts, there_are_calls) if there_are_calls_for_gt]
+        nb_of_correct_calls = nb_of_correct_calls[there_are_calls]
+        nb_of_total_calls = nb_of_total_calls[there_are_calls]
+        precisions = nb_of_correct_calls / nb_of_total_calls
+
+        precision_df = pd.DataFrame(
+            data={
+                "GT": gts,
+                "step_GT": list(range(len(gts))),
+                "precision": precisions,
+                "error_rate": 1 - precisions,
+                "nb_of_correct_calls": nb_of_correct_calls,
+                "nb_of_total_calls": nb_of_total_calls
+            }
+        )
+
+        return precision_df
+
+    def get_precision_report_for_every_gt_conf(self) -> pd.DataFrame:
+        return self.get_precision_report(self.precision_curve.distinct_gt_confs.tolist())
 
     # Note: not tested, this is just data gathering
-    def get_precision_report(self, all_gts) -> pd.DataFrame:
+    def get_precision_report_by_filtering_the_report(self, all_gts) -> pd.DataFrame:
+        """
+        The slower reference version of get_precision_report(): filters the report at each threshold.
+        """
         gts = []
         precisions = []
         error_rates = []
@@ -86,18 +190,159 @@ class PrecisionCalculator(Calculator):
     def _calculate_precision_for_a_given_confidence(self, conf_threshold: float = 0.0) -> PrecisionInfo:
         report_satisfying_confidence_threshold = self.report.get_report_satisfying_confidence_threshold(conf_threshold)
         confident_classifications = report_satisfying_confidence_threshold.get_classifications_as_list()
-        true_positives = sum(confident_classifications)
+        # correctly rounded, so that the sum does not depend on the order of the calls
+        true_positives = math.fsum(confident_classifications)
         number_of_calls = len(confident_classifications)
         return PrecisionInfo(true_positives, number_of_calls)
 
 
+class RecallSweep:
+    """
+    All recall metrics at any GT_CONF threshold, as get_report_satisfying_confidence_threshold() would give them.
+
+    Each truth probe, each variant, and each allele sequence/allele of a variant is counted from the highest threshold
+    at which it is present or found, computed once. The metrics at a threshold t are then counts (or sums) over
+    these thresholds being >= t, read with a searchsorted on sorted arrays:
+        -truth probes: present/found at their own GT_CONF;
+        -variants: present at the highest GT_CONF of their truth probes;
+        -allele sequences and alleles: found at the highest GT_CONF of their truth probes with a good evaluation; the
+        proportions of alleles found are summed exactly (see _get_alleles_found_thresholds_and_changes_of_proportions());
+        -a variant has all its allele sequences found when exactly NUMBER_OF_DIFFERENT_ALLELE_SEQUENCES are found, i.e.
+        for t in (threshold of its (n+1)-th found allele sequence, threshold of its n-th found allele sequence].
+    """
+    def __init__(self, report: RecallReport):
+        df = report.report
+        gt_confs = df["GT_CONF"].to_numpy(dtype=float)
+        good_eval = df["good_eval"].to_numpy(dtype=bool)
+
+        self._truth_probes_thresholds = self._sort_descending(gt_confs)
+        self._truth_probes_found_thresholds = self._sort_descending(gt_confs[good_eval])
+
+        variant_thresholds = df.groupby("PANGENOME_VARIATION_ID")["GT_CONF"].max()
+        self._variants_thresholds = self._sort_descending(variant_thresholds.to_numpy(dtype=float))
+
+        good_df = df[good_eval]
+        self._alleles_found_thresholds, self._changes_of_proportions_of_alleles_found = \
+            self._get_alleles_found_thresholds_and_changes_of_proportions(df, good_df)
+        self._all_allele_seqs_found_from, self._all_allele_seqs_found_until = \
+            self._get_thresholds_where_all_allele_seqs_are_found(df, good_df)
+
+    @staticmethod
+    def _sort_descending(array: np.ndarray) -> np.ndarray:
+        return np.sort(array)[::-1]
+
+    @staticmethod
+    def _count_at_or_above(thresholds_descending: np.ndarray, conf_thresholds: np.ndarray) -> np.ndarray:
+        return np.searchsorted(-thresholds_descending, -conf_thresholds, side="right")
+
+    @staticmethod
+    def _get_variant_to_total(df: pd.DataFrame, field_containing_total_nb_of_objects: str) -> pd.Series:
+        variant_to_total = df[["PANGENOME_VARIATION_ID", field_containing_total_nb_of_objects]].drop_duplicates()
+        assert not variant_to_total["PANGENOME_VARIATION_ID"].duplicated().any()
+        return variant_to_total.set_index("PANGENOME_VARIATION_ID")[field_containing_total_nb_of_objects]
+
+    @staticmethod
+    def _get_found_thresholds(good_df: pd.DataFrame, object_to_find: str) -> pd.DataFrame:
+        return good_df.groupby(["PANGENOME_VARIATION_ID", object_to_find], as_index=False)["GT_CONF"].max()
+
+    def _get_alleles_found_thresholds_and_changes_of_proportions(
+            self, df: pd.DataFrame, good_df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The k-th allele found of a variant with n alleles changes its proportion of alleles found from (k-1)/n to k/n:
+        both are kept, as two terms of opposite signs, so that the exact sum of the terms of the alleles found at a
+        threshold is the sum of the proportions k/n of the variants, as the reference calculation gives them. They are
+        summed with get_prefix_sums(), which rounds this exact sum correctly, as math.fsum does in the reference.
+        """
+        variant_to_nb_of_alleles = self._get_variant_to_total(df, "NUMBER_OF_ALLELES")
+        alleles_found = self._get_found_thresholds(good_df, "ALLELE_ID")
+        nbs_of_alleles = alleles_found["PANGENOME_VARIATION_ID"].map(variant_to_nb_of_alleles).to_numpy(dtype=float)
+        ranks = alleles_found.groupby("PANGENOME_VARIATION_ID")["GT_CONF"] \
+            .rank(method="first", ascending=False).to_numpy(dtype=float)
+        changes_of_proportions = np.column_stack([ranks / nbs_of_alleles, -((ranks - 1) / nbs_of_alleles)])
+
+        order = np.argsort(alleles_found["GT_CONF"].to_numpy(dtype=float), kind="stable")[::-1]
+        thresholds = alleles_found["GT_CONF"].to_numpy(dtype=float)[order]
+        return thresholds, changes_of_proportions[order].ravel()
+
+    def _get_thresholds_where_all_allele_seqs_are_found(
+            self, df: pd.DataFrame, good_df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        variant_to_nb_of_allele_seqs = self._get_variant_to_total(df, "NUMBER_OF_DIFFERENT_ALLELE_SEQUENCES")
+        allele_seqs_found = self._get_found_thresholds(good_df, "ALLELE_SEQUENCE_ID")
+        allele_seqs_found["rank"] = allele_seqs_found.groupby("PANGENOME_VARIATION_ID")["GT_CONF"] \
+            .rank(method="first", ascending=False)
+        allele_seqs_found["NUMBER_OF_DIFFERENT_ALLELE_SEQUENCES"] = \
+            allele_seqs_found["PANGENOME_VARIATION_ID"].map(variant_to_nb_of_allele_seqs)
+
+        # all allele seqs are found from the threshold of the n-th found allele seq, until (excluding) the (n+1)-th
+        nth_found = allele_seqs_found[allele_seqs_found["rank"] == allele_seqs_found["NUMBER_OF_DIFFERENT_ALLELE_SEQUENCES"]]
+        n_plus_1th_found = allele_seqs_found[allele_seqs_found["rank"] == allele_seqs_found["NUMBER_OF_DIFFERENT_ALLELE_SEQUENCES"] + 1]
+        found_from = nth_found.set_index("PANGENOME_VARIATION_ID")["GT_CONF"]
+        found_until = n_plus_1th_found.set_index("PANGENOME_VARIATION_ID")["GT_CONF"] \
+            .reindex(found_from.index, fill_value=-np.inf)
+        return self._sort_descending(found_from.to_numpy(dtype=float)), \
+               self._sort_descending(found_until.to_numpy(dtype=float))
+
+    def get_recall_infos(self, conf_thresholds: Iterable[float]) -> pd.DataFrame:
+        """
+        Returns, for each threshold, the counts RecallInfo is built from.
+        """
+        conf_thresholds = np.asarray(list(conf_thresholds), dtype=float)
+        count = self._count_at_or_above
+        return pd.DataFrame(data={
+            "truth_probes_true_positives": count(self._truth_probes_found_thresholds, conf_thresholds),
+            "truth_probes_total": count(self._truth_probes_thresholds, conf_thresholds),
+            "nb_variants_where_all_allele_seqs_were_found":
+                count(self._all_allele_seqs_found_from, conf_thresholds) -
+                count(self._all_allele_seqs_found_until, conf_thresholds),
+            "nb_variants_found_wrt_alleles":
+                get_prefix_sums(self._changes_of_proportions_of_alleles_found,
+                                2 * count(self._alleles_found_thresholds, conf_thresholds)),
+            "variants_total": count(self._variants_thresholds, conf_thresholds),
+        })
+
+
 class RecallCalculator(Calculator):
     def __init__(self, report: RecallReport):
         super().__init__(report)
 
 
-    # Note: not tested, this is just data gathering
     def get_recall_report(self, all_gts) -> pd.DataFrame:
+        """
+        Same as get_recall_report_by_filtering_the_report(), but reads every threshold from a single RecallSweep.
+        Thresholds without truth probes are skipped.
+        """
+        all_gts = list(all_gts)
+        with stage("RecallCalculator.get_recall_report") as calculating:
+            recall_infos = RecallSweep(self.report).get_recall_infos(all_gts)
+            calculating.add_records(len(all_gts))
+        recall_infos["GT"] = all_gts
+        recall_infos = recall_infos[recall_infos["truth_probes_total"] > 0].reset_index(drop=True)
+
+        recall_df = pd.DataFrame(
+            data={
+                "GT": recall_infos["GT"].to_list(),
+                "step_GT": list(range(len(recall_infos))),
+                "recalls_wrt_truth_probes":
+                    recall_infos["truth_probes_true_positives"] / recall_infos["truth_probes_total"],
+                "nbs_of_truth_probes_found": recall_infos["truth_probes_true_positives"],
+                "nbs_of_truth_probes_in_total": recall_infos["truth_probes_total"],
+                "recalls_wrt_variants_where_all_allele_seqs_were_found":
+                    recall_infos["nb_variants_where_all_allele_seqs_were_found"] / recall_infos["variants_total"],
+                "recalls_wrt_variants_found_wrt_alleles":
+                    recall_infos["nb_variants_found_wrt_alleles"] / recall_infos["variants_total"],
+                "nbs_variants_where_all_allele_seqs_were_found": recall_infos["nb_variants_where_all_allele_seqs_were_found"],
+                "nbs_variants_found_wrt_alleles": recall_infos["nb_variants_found_wrt_alleles"],
+                "nbs_variants_total": recall_infos["variants_total"],
+            }
+        )
+
+        return recall_df
+
+    # Note: not tested, this is just data gathering
+    def get_recall_report_by_filtering_the_report(self, all_gts) -> pd.DataFrame:
+        """
+        The slower reference version of get_recall_report(): rebuilds the report at each threshold.
+        """
         gts = []
         recalls_wrt_truth_probes = []
         nbs_of_truth_probes_found = []
@@ -237,7 +482,8 @@ class RecallCalculator(Calculator):
         nb_variants_where_all_allele_seqs_were_found = sum(proportions_of_allele_seqs_found)
 
         proportions_of_alleles_found = report.get_proportion_of_alleles_found_for_each_variant()
-        nb_variants_found_wrt_alleles = sum(proportions_of_alleles_found)
+        # correctly rounded, so that the sum does not depend on the order of the variants
+        nb_variants_found_wrt_alleles = math.fsum(proportions_of_alleles_found)
 
         variants_total = report.get_number_of_variants()
 
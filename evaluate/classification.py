@@ -1,62 +1,136 @@
-from collections import Counter
 from enum import Enum
+import copy
+from typing import NamedTuple, Optional, Tuple, Union
 
 import pysam
-from intervaltree import Interval
 
-from evaluate.aligned_pairs import AlignmentType, AlignedPairs
+from evaluate.compact_alignment import CompactAlignment
 from .probe import Probe, ProbeHeader, DELIM
 
+# SAM flags, see the SAM specification
+BAM_FUNMAP = 4
+BAM_FSECONDARY = 256
+BAM_FSUPPLEMENTARY = 2048
+
+
+class SamRecord(NamedTuple):
+    """
+    The fields of a SAM record a Classification is built from, as plain values, with the attributes of
+    pysam.AlignedSegment that Classification reads. Unlike the pysam record, it is cheap to pickle, so that the records
+    are sent to worker processes in batches and classified there (see Reporter).
+    """
+    query_name: str
+    flag: int
+    mapping_quality: int
+    query_alignment_start: Optional[int]
+    query_alignment_end: Optional[int]
+    cigartuples: Optional[Tuple[Tuple[int, int], ...]]
+    reference_start: int
+    reference_name: Optional[str]
+    query_sequence: Optional[str]
+    md: Optional[str]
+
+    @classmethod
+    def from_record(cls, record: pysam.AlignedSegment) -> "SamRecord":
+        cigartuples = record.cigartuples
+        return cls(
+            query_name=record.query_name,
+            flag=record.flag,
+            mapping_quality=record.mapping_quality,
+            query_alignment_start=record.query_alignment_start,
+            query_alignment_end=record.query_alignment_end,
+            cigartuples=tuple(cigartuples) if cigartuples is not None else None,
+            reference_start=record.reference_start,
+            reference_name=record.reference_name,
+            query_sequence=record.query_sequence,
+            md=record.get_tag("MD") if record.has_tag("MD") else None,
+        )
 
-class Classification:
-    def __init__(self, record: pysam.AlignedSegment = None):
-        self.record = record
+    @property
+    def is_unmapped(self) -> bool:
+        return bool(self.flag & BAM_FUNMAP)
+
+    def has_tag(self, tag: str) -> bool:
+        return tag == "MD" and self.md is not None
 
-        if self.record is not None:
+    def get_tag(self, tag: str) -> str:
+        if not self.has_tag(tag):
+            raise KeyError(f"tag '{tag}' not present")
+        return self.md
+
+
+class Classification:
+    """
+    Holds everything the evaluation needs from a SAM record, extracted once, so that the same object can be passed
+    through the SAM records filters, the masker and the classifier without keeping the pysam record alive.
+    """
+
+    __slots__ = (
+        "query_name",
+        "flag",
+        "mapping_quality",
+        "query_alignment_start",
+        "query_alignment_end",
+        "compact_alignment",
+        "query_probe",
+        "ref_probe",
+    )
+
+    def __init__(self, record: Union[pysam.AlignedSegment, SamRecord] = None):
+        if record is not None:
+            self.query_name = record.query_name
+            self.flag = record.flag
+            self.mapping_quality = record.mapping_quality
+            self.query_alignment_start = record.query_alignment_start
+            self.query_alignment_end = record.query_alignment_end
+            self.compact_alignment = CompactAlignment.from_record(record)
             self.query_probe = Probe(
-                header=ProbeHeader.from_string(self.record.query_name),
-                full_sequence=self.record.query_sequence,
+                header=ProbeHeader.from_string(record.query_name),
+                full_sequence=record.query_sequence,
             )
 
-            reference_name = self.record.reference_name or ""
-            if reference_name.startswith(">"):
-                reference_name = self.record.reference_name
-            else:
+            reference_name = record.reference_name or ""
+            if not reference_name.startswith(">"):
                 reference_name = f"CHROM={reference_name}{DELIM}"
             self.ref_probe = Probe(header=ProbeHeader.from_string(reference_name))
         else:
+            self.query_name = None
+            self.flag = 0
+            self.mapping_quality = 0
+            self.query_alignment_start = None
+            self.query_alignment_end = None
+            self.compact_alignment = CompactAlignment()
             self.query_probe = Probe()
             self.ref_probe = Probe()
 
     def __eq__(self, other: "Classification") -> bool:
         return self.query_probe == other.query_probe
 
+    def with_query_name(self, query_name: str) -> "Classification":
+        """
+        Copy of this classification for another probe with the same sequence, hence the same mapping: only the query
+        name and the header of the query probe change. The alignment is shared, not copied.
+        """
+        classification = copy.copy(self)
+        classification.query_name = query_name
+        classification.query_probe = Probe(header=ProbeHeader.from_string(query_name),
+                                           full_sequence=self.query_probe.full_sequence)
+        return classification
+
     @property
     def is_unmapped(self) -> bool:
-        return self.record.is_unmapped
+        return bool(self.flag & BAM_FUNMAP)
 
     @property
     def is_secondary(self) -> bool:
-        return self.record.is_secondary
+        return bool(self.flag & BAM_FSECONDARY)
 
     @property
     def is_supplementary(self) -> bool:
-        return self.record.is_supplementary
+        return bool(self.flag & BAM_FSUPPLEMENTARY)
 
-    def get_aligned_pairs(
-        self, matches_only: bool = False, with_seq: bool = False
-    ) -> AlignedPairs:
-        return AlignedPairs(
-            self.record.get_aligned_pairs(matches_only=matches_only, with_seq=with_seq)
-        )
-
-    @property
-    def query_alignment_start(self) -> int:
-        return self.record.query_alignment_start
-
-    @property
-    def query_alignment_end(self) -> int:
-        return self.record.query_alignment_end
+    def get_compact_alignment(self) -> CompactAlignment:
+        return self.compact_alignment
 
     def _whole_query_probe_maps(self) -> bool:
         if self.is_unmapped:
@@ -74,31 +148,23 @@ class Classification:
         return True
 
     def _get_query_probe_mapping_score(self) -> float:
-        probe_aligned_pairs = self.get_probe_aligned_pairs()
-        alignment_types = probe_aligned_pairs.get_alignment_types()
-        alignment_type_count = Counter(alignment_types)
-
-        total_nb_of_alignments_checked = len(probe_aligned_pairs)
-        query_probe_mapping_score = (
-            alignment_type_count[AlignmentType.MATCH] / total_nb_of_alignments_checked
+        score = self.get_compact_alignment().score_query_interval(
+            *self.get_probe_query_interval()
         )
+        query_probe_mapping_score = score.nb_of_matches / score.nb_of_aligned_pairs
 
         assert 0.0 <= query_probe_mapping_score <= 1.0
 
         return query_probe_mapping_score
 
-    def get_probe_aligned_pairs(self) -> AlignedPairs:
+    def get_probe_query_interval(self) -> Tuple[int, int]:
         if not self.query_probe.is_deletion:
             query_start = self.query_probe.interval.start
             query_stop = self.query_probe.interval.end
         else:
             query_start = max(0, self.query_probe.interval.start - 1)
             query_stop = self.query_probe.interval.end + 1
-
-        probe_aligned_pairs = AlignedPairs(self.get_aligned_pairs(with_seq=True))
-        return probe_aligned_pairs.get_pairs_in_query_interval(
-            Interval(query_start, query_stop)
-        )
+        return query_start, query_stop
 
     def assessment(self) -> str:
         raise NotImplementedError()
@@ -119,6 +185,8 @@ class AlignmentAssessment(Enum):
 
 
 class RecallClassification(Classification):
+    __slots__ = ()
+
     def is_correct(self) -> bool:
         return self._get_query_probe_mapping_score() == 1.0
 
@@ -152,6 +220,8 @@ class RecallClassification(Classification):
 
 
 class PrecisionClassification(Classification):
+    __slots__ = ()
+
     def assessment(self) -> float:
         query_probe_does_not_map_completely = (
             self.is_unmapped or not self._whole_query_probe_maps()
@@ -1,4 +1,4 @@
-from typing import Iterable, List
+from typing import Iterable, Iterator, List, Optional, Union
 
 import pysam
 
@@ -6,23 +6,42 @@ from evaluate.classification import (
     Classification,
     RecallClassification,
     PrecisionClassification,
+    SamRecord,
 )
+from evaluate.filter import Filter
 
 
 class Classifier:
-    def __init__(self, sam: Iterable[pysam.AlignedSegment] = None, name: str = ""):
+    """
+    If records_filter is given, it is applied to the classifications made from the records of sam, so that the filter
+    runs wherever the records are classified, in the reporter's worker processes if there are any.
+    """
+    def __init__(self, sam: Iterable[Union[Classification, pysam.AlignedSegment, SamRecord]] = None, name: str = "",
+                 records_filter: Optional[Filter] = None):
         if sam is None:
             sam = []
         self.sam = sam
         self.name = name
+        self.records_filter = records_filter
 
     def classify(self) -> List[Classification]:
-        classifications = []
-        for record in self.sam:
-            classification = self.make_classification(record=record)
-            classifications.append(classification)
-
-        return classifications
+        return list(self.generate_classifications())
+
+    def generate_classifications(self) -> Iterator[Classification]:
+        """
+        Lazy version of classify(): records are only read from self.sam when the classification is requested.
+        """
+        classifications = self._generate_classifications_of_records(self.sam)
+        if self.records_filter is not None:
+            classifications = self.records_filter.filter_records_lazily(classifications)
+        yield from classifications
+
+    def _generate_classifications_of_records(self, records: Iterable) -> Iterator[Classification]:
+        for record in records:
+            if isinstance(record, Classification):
+                yield record
+            else:
+                yield self.make_classification(record=record)
 
     def make_classification(self, record):
         return Classification(record)
@@ -0,0 +1,283 @@
+"""
+Runs the steps of the evaluation outside of Snakemake: python -m evaluate <subcommand> --help
+
+Only the standard library is imported until a subcommand runs, and each subcommand only imports what it needs (see
+evaluate.commands), so light subcommands start fast.
+"""
+from typing import List, Optional, Tuple
+import argparse
+import logging
+
+
+def _parse_metadata_item(item: str) -> Tuple[str, str]:
+    key, separator, value = item.partition("=")
+    if not separator:
+        raise argparse.ArgumentTypeError(f"should be KEY=VALUE, got {item}")
+    return key, value
+
+
+def _add_metadata_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--metadata", action="append", type=_parse_metadata_item, metavar="KEY=VALUE",
+                        help="Column added to the output with the given value, in the given order (repeatable), "
+                             "e.g. --metadata tool=pandora --metadata coverage=100x")
+
+
+def _set_same_lengths(parser: argparse.ArgumentParser, *options: Tuple[str, str]) -> None:
+    """The given pairs of nargs="+" options must have as many values; the second option of a pair may be omitted."""
+    parser.set_defaults(parser=parser, same_lengths=options)
+
+
+def _check_same_lengths(args: argparse.Namespace) -> None:
+    for option, other_option in getattr(args, "same_lengths", ()):
+        values = getattr(args, option.lstrip("-").replace("-", "_"))
+        other_values = getattr(args, other_option.lstrip("-").replace("-", "_"))
+        if other_values is not None and len(values) != len(other_values):
+            args.parser.error(f"got {len(values)} {option} but {len(other_values)} {other_option}")
+
+
+def _make_probeset(args: argparse.Namespace) -> None:
+    from evaluate.commands import make_probeset
+    make_probeset(vcf=args.vcf, vcf_ref=args.vcf_ref, sample_id=args.sample_id,
+                  coverage_threshold=args.coverage_threshold, strand_bias_threshold=args.strand_bias_threshold,
+                  gaps_threshold=args.gaps_threshold, flank_width=args.flank_width, output=args.output)
+
+
+def _map_probes(args: argparse.Namespace) -> None:
+    from evaluate.commands import map_probes
+    map_probes(query=args.query, refs=args.refs, outputs=args.outputs, threads=args.threads)
+
+
+def _create_precision_report(args: argparse.Namespace) -> None:
+    from evaluate.commands import create_precision_report
+    create_precision_report(sam=args.sam, mask_bitmaps=args.mask_bitmaps, sample_id=args.sample_id, tool=args.tool,
+                            report=args.report, nb_of_records_removed_file=args.nb_of_records_removed,
+                            processes=args.processes)
+
+
+def _create_recall_report(args: argparse.Namespace) -> None:
+    from evaluate.commands import create_recall_report
+    create_recall_report(sams=args.sams, mask_bitmaps=args.mask_bitmaps, sample_id=args.sample_id,
+                         gt_conf_percentiles=args.gt_conf_percentiles, report=args.report,
+                         processes=args.processes)
+
+
+def _map_and_create_precision_report(args: argparse.Namespace) -> None:
+    from evaluate.commands import map_and_create_precision_report
+    map_and_create_precision_report(query=args.query, ref=args.ref, mask_bitmaps=args.mask_bitmaps,
+                                    sample_id=args.sample_id, tool=args.tool, report=args.report,
+                                    nb_of_records_removed_file=args.nb_of_records_removed, threads=args.threads,
+                                    processes=args.processes, sam_to_keep=args.keep_sam)
+
+
+def _map_and_create_recall_report(args: argparse.Namespace) -> None:
+    from evaluate.commands import map_and_create_recall_report
+    map_and_create_recall_report(query=args.query, refs=args.refs, mask_bitmaps=args.mask_bitmaps,
+                                 sample_id=args.sample_id, gt_conf_percentiles=args.gt_conf_percentiles,
+                                 report=args.report, threads=args.threads, processes=args.processes,
+                                 sams_to_keep=args.keep_sams)
+
+
+def _pool_truth_probesets(args: argparse.Namespace) -> None:
+    from evaluate.commands import pool_truth_probesets
+    pool_truth_probesets(truth_probesets=args.truth_probesets, sample_pairs=args.sample_pairs,
+                         pooled_truth_probeset=args.pooled_truth_probeset, probes_table=args.probes_table)
+
+
+def _create_pooled_recall_report(args: argparse.Namespace) -> None:
+    from evaluate.commands import create_pooled_recall_report
+    create_pooled_recall_report(sams=args.sams, probes_table=args.probes_table, mask_bitmaps=args.mask_bitmaps,
+                                sample_id=args.sample_id, gt_conf_percentiles=args.gt_conf_percentiles,
+                                report=args.report, processes=args.processes)
+
+
+def _map_and_create_pooled_recall_report(args: argparse.Namespace) -> None:
+    from evaluate.commands import map_and_create_pooled_recall_report
+    map_and_create_pooled_recall_report(query=args.query, refs=args.refs, probes_table=args.probes_table,
+                                        mask_bitmaps=args.mask_bitmaps, sample_id=args.sample_id,
+                                        gt_conf_percentiles=args.gt_conf_percentiles, report=args.report,
+                                        threads=args.threads, processes=args.processes, sams_to_keep=args.keep_sams)
+
+
+def _split_pooled_recall_report(args: argparse.Namespace) -> None:
+    from evaluate.commands import split_pooled_recall_report
+    split_pooled_recall_report(pooled_report=args.pooled_report, sample_pairs=args.sample_pairs,
+                               reports=args.reports)
+
+
+def _calculate_precision(args: argparse.Namespace) -> None:
+    from evaluate.commands import calculate_precision
+    calculate_precision(reports=args.reports, output=args.output, gt_conf_percentiles=args.gt_conf_percentiles,
+                        metadata=dict(args.metadata or []), threads=args.threads, index=not args.no_index)
+
+
+def _calculate_recall(args: argparse.Namespace) -> None:
+    from evaluate.commands import calculate_recall
+    calculate_recall(reports=args.reports, output=args.output, gt_conf_percentiles=args.gt_conf_percentiles,
+                     metadata=dict(args.metadata or []), threads=args.threads)
+
+
+def _export_report(args: argparse.Namespace) -> None:
+    from evaluate.commands import export_report
+    export_report(binary_report=args.binary_report, tsv_report=args.tsv_report)
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m evaluate", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", help="Log file (default: stderr)")
+    parser.add_argument("--log-level", default="INFO", help="Log level (default INFO)")
+    subparsers = parser.add_subparsers(dest="subcommand", metavar="subcommand")
+    subparsers.required = True
+
+    subparser = subparsers.add_parser("make-probeset", help="Filters a VCF and makes the probes of its calls")
+    subparser.add_argument("--vcf", required=True)
+    subparser.add_argument("--vcf-ref", required=True, help="Reference the VCF calls are on")
+    subparser.add_argument("--sample-id", required=True)
+    subparser.add_argument("--coverage-threshold", default="Not_App")
+    subparser.add_argument("--strand-bias-threshold", default="Not_App")
+    subparser.add_argument("--gaps-threshold", default="Not_App")
+    subparser.add_argument("--flank-width", type=int, required=True)
+    subparser.add_argument("--output", required=True, help="Probeset (FASTA)")
+    subparser.set_defaults(run=_make_probeset)
+
+    subparser = subparsers.add_parser("map-probes", help="Maps a probeset to one or more references with bwa mem")
+    subparser.add_argument("--query", required=True, help="Probeset (FASTA)")
+    subparser.add_argument("--refs", nargs="+", required=True, help="Indexed references")
+    subparser.add_argument("--outputs", nargs="+", required=True, help="SAM of each reference")
+    subparser.add_argument("--threads", type=int, default=1)
+    subparser.set_defaults(run=_map_probes)
+    _set_same_lengths(subparser, ("--refs", "--outputs"))
+
+    subparser = subparsers.add_parser("precision-report", help="Classifies the mappings of the variant call probes")
+    subparser.add_argument("--sam", required=True)
+    subparser.add_argument("--mask-bitmaps", required=True)
+    subparser.add_argument("--sample-id", required=True)
+    subparser.add_argument("--tool", required=True)
+    subparser.add_argument("--report", required=True, help="Report (.npz for a binary report)")
+    subparser.add_argument("--nb-of-records-removed", required=True,
+                           help="CSV with the number of records removed by the MAPQ SAM records filter")
+    subparser.add_argument("--processes", type=int, default=1)
+    subparser.set_defaults(run=_create_precision_report)
+
+    subparser = subparsers.add_parser("recall-report", help="Classifies the mappings of the truth probes")
+    subparser.add_argument("--sams", nargs="+", required=True, help="SAM of each GT_CONF percentile")
+    subparser.add_argument("--gt-conf-percentiles", type=int, nargs="+", required=True)
+    subparser.add_argument("--mask-bitmaps", required=True)
+    subparser.add_argument("--sample-id", required=True)
+    subparser.add_argument("--report", required=True, help="Threshold sweep report (.npz for a binary report)")
+    subparser.add_argument("--processes", type=int, default=1)
+    subparser.set_defaults(run=_create_recall_report)
+    _set_same_lengths(subparser, ("--sams", "--gt-conf-percentiles"))
+
+    subparser = subparsers.add_parser("map-and-precision-report",
+                                      help="map-probes and precision-report, streaming the SAM records from bwa")
+    subparser.add_argument("--query", required=True, help="Variant call probeset (FASTA)")
+    subparser.add_argument("--ref", required=True, help="Indexed truth reference")
+    subparser.add_argument("--mask-bitmaps", required=True)
+    subparser.add_argument("--sample-id", required=True)
+    subparser.add_argument("--tool", required=True)
+    subparser.add_argument("--report", required=True, help="Report (.npz for a binary report)")
+    subparser.add_argument("--nb-of-records-removed", required=True,
+                           help="CSV with the number of records removed by the MAPQ SAM records filter")
+    subparser.add_argument("--threads", type=int, default=1, help="bwa threads")
+    subparser.add_argument("--processes", type=int, default=1)
+    subparser.add_argument("--keep-sam", help="Also write the SAM there (to debug)")
+    subparser.set_defaults(run=_map_and_create_precision_report)
+
+    subparser = subparsers.add_parser("map-and-recall-report",
+                                      help="map-probes and recall-report, streaming the SAM records from bwa")
+    subparser.add_argument("--query", required=True, help="Truth probeset (FASTA)")
+    subparser.add_argument("--refs", nargs="+", required=True, help="Indexed mutated ref of each GT_CONF percentile")
+    subparser.add_argument("--gt-conf-percentiles", type=int, nargs="+", required=True)
+    subparser.add_argument("--mask-bitmaps", required=True)
+    subparser.add_argument("--sample-id", required=True)
+    subparser.add_argument("--report", required=True, help="Threshold sweep report (.npz for a binary report)")
+    subparser.add_argument("--threads", type=int, default=1, help="bwa threads")
+    subparser.add_argument("--processes", type=int, default=1)
+    subparser.add_argument("--keep-sams", nargs="+", help="Also write the SAM of each ref there (to debug)")
+    subparser.set_defaults(run=_map_and_create_recall_report)
+    _set_same_lengths(subparser, ("--refs", "--gt-conf-percentiles"), ("--refs", "--keep-sams"))
+
+    subparser = subparsers.add_parser("pool-truth-probesets",
+                                      help="Pools the truth probesets of a sample, one probe per distinct sequence")
+    subparser.add_argument("--truth-probesets", nargs="+", required=True, help="Truth probeset of each sample pair")
+    subparser.add_argument("--sample-pairs", nargs="+", required=True)
+    subparser.add_argument("--pooled-truth-probeset", required=True, help="Pooled truth probeset (FASTA)")
+    subparser.add_argument("--probes-table", required=True, help="Probes of each sample pair of each pooled probe (TSV)")
+    subparser.set_defaults(run=_pool_truth_probesets)
+    _set_same_lengths(subparser, ("--truth-probesets", "--sample-pairs"))
+
+    subparser = subparsers.add_parser("pooled-recall-report",
+                                      help="Classifies the mappings of a pooled truth probeset for each sample pair")
+    subparser.add_argument("--sams", nargs="+", required=True, help="SAM of each GT_CONF percentile")
+    subparser.add_argument("--gt-conf-percentiles", type=int, nargs="+", required=True)
+    subparser.add_argument("--probes-table", required=True, help="Probes table of the pooled truth probeset")
+    subparser.add_argument("--mask-bitmaps", required=True)
+    subparser.add_argument("--sample-id", required=True)
+    subparser.add_argument("--report", required=True,
+                           help="Threshold sweep report with a sample_pair column (.npz for a binary report)")
+    subparser.add_argument("--processes", type=int, default=1)
+    subparser.set_defaults(run=_create_pooled_recall_report)
+    _set_same_lengths(subparser, ("--sams", "--gt-conf-percentiles"))
+
+    subparser = subparsers.add_parser("map-and-pooled-recall-report",
+                                      help="map-probes and pooled-recall-report, streaming the SAM records from bwa")
+    subparser.add_argument("--query", required=True, help="Pooled truth probeset (FASTA)")
+    subparser.add_argument("--refs", nargs="+", required=True, help="Indexed mutated ref of each GT_CONF percentile")
+    subparser.add_argument("--gt-conf-percentiles", type=int, nargs="+", required=True)
+    subparser.add_argument("--probes-table", required=True, help="Probes table of the pooled truth probeset")
+    subparser.add_argument("--mask-bitmaps", required=True)
+    subparser.add_argument("--sample-id", required=True)
+    subparser.add_argument("--report", required=True,
+                           help="Threshold sweep report with a sample_pair column (.npz for a binary report)")
+    subparser.add_argument("--threads", type=int, default=1, help="bwa threads")
+    subparser.add_argument("--processes", type=int, default=1)
+    subparser.add_argument("--keep-sams", nargs="+", help="Also write the SAM of each ref there (to debug)")
+    subparser.set_defaults(run=_map_and_create_pooled_recall_report)
+    _set_same_lengths(subparser, ("--refs", "--gt-conf-percentiles"), ("--refs", "--keep-sams"))
+
+    subparser = subparsers.add_parser("split-pooled-recall-report",
+                                      help="Writes the recall report of each sample pair from a pooled recall report")
+    subparser.add_argument("--pooled-report", required=True)
+    subparser.add_argument("--sample-pairs", nargs="+", required=True)
+    subparser.add_argument("--reports", nargs="+", required=True, help="Report of each sample pair")
+    subparser.set_defaults(run=_split_pooled_recall_report)
+    _set_same_lengths(subparser, ("--sample-pairs", "--reports"))
+
+    subparser = subparsers.add_parser("calculate-precision", help="Precision at each GT_CONF percentile")
+    subparser.add_argument("--reports", nargs="+", required=True)
+    subparser.add_argument("--output", required=True)
+    subparser.add_argument("--gt-conf-percentiles", type=int, nargs="+", default=[0])
+    subparser.add_argument("--threads", type=int, default=1)
+    subparser.add_argument("--no-index", action="store_true", help="Do not write the row numbers")
+    _add_metadata_argument(subparser)
+    subparser.set_defaults(run=_calculate_precision)
+
+    subparser = subparsers.add_parser("calculate-recall", help="Recall at each GT_CONF percentile")
+    subparser.add_argument("--reports", nargs="+", required=True, help="Recall reports per sample for the calculator")
+    subparser.add_argument("--output", required=True)
+    subparser.add_argument("--gt-conf-percentiles", type=int, nargs="+", default=[0])
+    subparser.add_argument("--threads", type=int, default=1)
+    _add_metadata_argument(subparser)
+    subparser.set_defaults(run=_calculate_recall)
+
+    subparser = subparsers.add_parser("export-report", help="Exports a binary report (.npz) to TSV")
+    subparser.add_argument("binary_report")
+    subparser.add_argument("tsv_report")
+    subparser.set_defaults(run=_export_report)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = get_parser().parse_args(argv)
+    _check_same_lengths(args)
+    logging.basicConfig(
+        filename=args.log,
+        level=args.log_level,
+        format="[%(asctime)s]:%(levelname)s: %(message)s",
+        datefmt="%d/%m/%Y %I:%M:%S %p",
+    )
+    args.run(args)
+    logging.info("Done")
+
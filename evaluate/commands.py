@@ -0,0 +1,385 @@
+"""
+The steps of the evaluation, as plain functions of their input and output files, shared by the evaluate CLI
+(python -m evaluate) and the Snakemake scripts. Heavy dependencies (pandas, pysam, intervaltree...) are imported inside
+each function, so that importing this module, and running a step that does not need them, stays fast.
+"""
+from pathlib import Path
+from typing import Callable, ContextManager, Dict, Iterable, List, Optional, Union
+import logging
+
+from evaluate.instrumentation import count, stage
+
+PathLike = Union[str, Path]
+# opens an iterable of alignments (pysam.AlignmentFile), either from a SAM file or streamed from bwa
+AlignmentFileOpener = Callable[[], ContextManager]
+
+
+def _get_VCF_creator_method(vcf_filepath: PathLike):
+    from evaluate.vcf import VCFFactory
+
+    vcf_filename = Path(vcf_filepath).name
+    if vcf_filename.startswith("pandora"):
+        return VCFFactory.create_Pandora_VCF_from_VariantRecord_and_Sample
+    elif vcf_filename.startswith("snippy"):
+        return VCFFactory.create_Snippy_VCF_from_VariantRecord_and_Sample
+    elif vcf_filename.startswith("samtools"):
+        return VCFFactory.create_Samtools_VCF_from_VariantRecord_and_Sample
+    elif vcf_filename.startswith("medaka"):
+        return VCFFactory.create_Medaka_VCF_from_VariantRecord_and_Sample
+    elif vcf_filename.startswith("nanopolish"):
+        return VCFFactory.create_Nanopolish_VCF_from_VariantRecord_and_Sample
+    raise RuntimeError("VCFs should be from either pandora or snippy or samtools or medaka or nanopolish (should start with either these values)")
+
+
+def make_probeset(vcf: PathLike, vcf_ref: PathLike, sample_id: str, coverage_threshold: str,
+                  strand_bias_threshold: str, gaps_threshold: str, flank_width: int, output: PathLike) -> None:
+    import pysam
+    from evaluate.filtered_vcf_file import FilteredVCFFile
+    from evaluate.query import Query
+    from evaluate.vcf_filters import VCF_Filters
+
+    logging.info(f"Applying filters to {vcf}")
+    filters = VCF_Filters.get_all_VCF_Filters(
+        coverage_threshold=coverage_threshold,
+        strand_bias_threshold=strand_bias_threshold,
+        gaps_threshold=gaps_threshold,
+    )
+    VCF_creator_method = _get_VCF_creator_method(vcf)
+    with pysam.VariantFile(str(vcf)) as pysam_variant_file:
+        filtered_vcf_file = FilteredVCFFile(pysam_variant_file=pysam_variant_file, filters=filters,
+                                            VCF_creator_method=VCF_creator_method)
+
+    logging.info(f"Making probes")
+    query_vcf = Query(
+        filtered_vcf_file,
+        Path(vcf_ref),
+        samples=[sample_id],
+        flank_width=flank_width,
+    )
+    vcf_probes: Dict[str, str] = query_vcf.make_probes()
+
+    logging.info(f"Writing probes")
+    Path(output).write_text(vcf_probes[sample_id])
+
+
+def map_probes(query: PathLike, refs: Iterable[PathLike], outputs: Iterable[PathLike], threads: int = 1) -> None:
+    """
+    Maps query to each ref, writing the SAM of each ref to the corresponding output.
+    """
+    from evaluate.bwa import BWA
+
+    for ref, output in zip(refs, outputs):
+        logging.info(f"Mapping {query} to {ref}")
+        with stage("BWA.map_query_to_ref"):
+            BWA.map_query_to_ref(query=Path(query), ref=Path(ref), output=Path(output), threads=threads)
+
+
+def _open_sam_file(sam: PathLike) -> AlignmentFileOpener:
+    def open_sam_file():
+        import pysam
+        logging.info(f"Reading SAM records of {sam}")
+        return pysam.AlignmentFile(str(sam))
+    return open_sam_file
+
+
+def _open_bwa_stream(query: PathLike, ref: PathLike, threads: int,
+                     sam_to_keep: Optional[PathLike]) -> AlignmentFileOpener:
+    def open_bwa_stream():
+        from evaluate.bwa import BWA
+        logging.info(f"Streaming SAM records of {query} mapped to {ref}")
+        output = None
+        if sam_to_keep:
+            output = Path(sam_to_keep)
+            output.parent.mkdir(parents=True, exist_ok=True)
+        return BWA.stream_query_to_ref(query=Path(query), ref=Path(ref), threads=threads, output=output)
+    return open_bwa_stream
+
+
+def create_precision_report(sam: PathLike, mask_bitmaps: PathLike, sample_id: str, tool: str, report: PathLike,
+                            nb_of_records_removed_file: PathLike, processes: int = 1) -> None:
+    _create_precision_report(_open_sam_file(sam), mask_bitmaps, sample_id, tool, report, nb_of_records_removed_file,
+                             processes)
+
+
+def map_and_create_precision_report(query: PathLike, ref: PathLike, mask_bitmaps: PathLike, sample_id: str, tool: str,
+                                    report: PathLike, nb_of_records_removed_file: PathLike, threads: int = 1,
+                                    processes: int = 1, sam_to_keep: Optional[PathLike] = None) -> None:
+    """
+    map_probes() followed by create_precision_report(), with the SAM records streamed from bwa into the classifier
+    instead of going through a SAM file. The SAM is only written if sam_to_keep is given.
+    """
+    _create_precision_report(_open_bwa_stream(query, ref, threads, sam_to_keep), mask_bitmaps, sample_id, tool,
+                             report, nb_of_records_removed_file, processes)
+
+
+def _create_precision_report(open_alignment_file: AlignmentFileOpener, mask_bitmaps: PathLike, sample_id: str,
+                             tool: str, report: PathLike, nb_of_records_removed_file: PathLike,
+                             processes: int) -> None:
+    import pandas as pd
+    from evaluate.classifier import PrecisionClassifier
+    from evaluate.masker import PrecisionMasker
+    from evaluate.query_name_groups_filter import QueryNameGroupsFilter
+    from evaluate.reporter import PrecisionReporter
+
+    logging.info(f"Creating masker from {mask_bitmaps}")
+    with stage("PrecisionMasker.from_bitmaps"):
+        masker = PrecisionMasker.from_bitmaps(mask_bitmaps)
+
+    # records are streamed one query at a time through the classifier, the MAPQ SAM records filter and the masker,
+    # straight into the report file (in the reporter's worker processes if processes > 1)
+    query_name_groups_filter = QueryNameGroupsFilter(masker=masker)
+    with open_alignment_file() as sam_file:
+        logging.info("Creating classifier, applying MAPQ SAM records filter and masking SAM records")
+        classifier = PrecisionClassifier(sam=sam_file, name=sample_id, records_filter=query_name_groups_filter)
+
+        logging.info("Creating reporter")
+        reporter = PrecisionReporter(classifiers=[classifier], processes=processes)
+
+        logging.info("Generating and saving report")
+        reporter.write_report(report)
+
+    nb_of_records_before_mapq_sam_records_filter = query_name_groups_filter.nb_of_records_before_mapq_sam_records_filter
+    nb_of_records_after_mapq_sam_records_filter = query_name_groups_filter.nb_of_records_after_mapq_sam_records_filter
+    nb_of_records_removed_with_mapq_sam_records_filter = query_name_groups_filter.nb_of_records_removed_with_mapq_sam_records_filter
+    count("nb_of_records_before_mapq_sam_records_filter", nb_of_records_before_mapq_sam_records_filter)
+    count("nb_of_records_removed_with_mapq_sam_records_filter", nb_of_records_removed_with_mapq_sam_records_filter)
+    nb_of_records_removed_with_mapq_sam_records_filter_proportion = nb_of_records_removed_with_mapq_sam_records_filter/nb_of_records_before_mapq_sam_records_filter if nb_of_records_before_mapq_sam_records_filter>0 else 0
+
+    nb_of_records_removed_with_mapq_sam_records_filter_df = pd.DataFrame({
+        "tool": [tool],
+        "nb_of_records_before_mapq_sam_records_filter": [nb_of_records_before_mapq_sam_records_filter],
+        "nb_of_records_after_mapq_sam_records_filter": [nb_of_records_after_mapq_sam_records_filter],
+        "nb_of_records_removed_with_mapq_sam_records_filter": [nb_of_records_removed_with_mapq_sam_records_filter],
+        "nb_of_records_removed_with_mapq_sam_records_filter_proportion": [nb_of_records_removed_with_mapq_sam_records_filter_proportion]
+    })
+    nb_of_records_removed_with_mapq_sam_records_filter_df.to_csv(nb_of_records_removed_file, index=False)
+
+
+def create_recall_report(sams: Iterable[PathLike], mask_bitmaps: PathLike, sample_id: str,
+                         gt_conf_percentiles: List[int], report: PathLike, processes: int = 1) -> int:
+    """
+    Threshold sweep report of the SAMs of the truth probes mapped to the mutated refs of each GT_CONF percentile
+    (sams and gt_conf_percentiles in the same order). Returns the number of rows written.
+    """
+    return _create_recall_report([_open_sam_file(sam) for sam in sams], mask_bitmaps, sample_id, gt_conf_percentiles,
+                                 report, processes)
+
+
+def map_and_create_recall_report(query: PathLike, refs: Iterable[PathLike], mask_bitmaps: PathLike, sample_id: str,
+                                 gt_conf_percentiles: List[int], report: PathLike, threads: int = 1,
+                                 processes: int = 1, sams_to_keep: Optional[Iterable[PathLike]] = None) -> int:
+    """
+    map_probes() followed by create_recall_report(), with the SAM records of each ref (one ref per GT_CONF percentile,
+    in the same order) streamed from bwa into its classifier instead of going through a SAM file. The SAMs are only
+    written if sams_to_keep is given.
+    """
+    refs = list(refs)
+    sams_to_keep = list(sams_to_keep) if sams_to_keep else [None] * len(refs)
+    if len(sams_to_keep) != len(refs):
+        raise ValueError(f"Got {len(refs)} refs but {len(sams_to_keep)} SAMs to keep")
+    open_alignment_files = [_open_bwa_stream(query, ref, threads, sam_to_keep)
+                            for ref, sam_to_keep in zip(refs, sams_to_keep)]
+    return _create_recall_report(open_alignment_files, mask_bitmaps, sample_id, gt_conf_percentiles, report,
+                                 processes)
+
+
+def _create_recall_report(open_alignment_files: List[AlignmentFileOpener], mask_bitmaps: PathLike, sample_id: str,
+                          gt_conf_percentiles: List[int], report: PathLike, processes: int) -> int:
+    from evaluate.classifier import RecallClassifier
+    from evaluate.masker import RecallMasker
+    from evaluate.reporter import RecallReporter
+
+    logging.info(f"Creating masker from {mask_bitmaps}")
+    with stage("RecallMasker.from_bitmaps"):
+        masker = RecallMasker.from_bitmaps(mask_bitmaps)
+
+    def get_records(open_alignment_file):
+        # lazy: each SAM is only opened when its classifier is reached, so one SAM (or bwa process) is open at a time
+        with open_alignment_file() as sam:
+            yield from sam
+
+    logging.info("Creating one classifier per GT_CONF percentile, masking SAM records")
+    classifiers = [RecallClassifier(sam=get_records(open_alignment_file), name=sample_id, records_filter=masker)
+                   for open_alignment_file in open_alignment_files]
+
+    logging.info("Creating reporter")
+    reporter = RecallReporter(classifiers=classifiers, processes=processes)
+
+    logging.info("Generating and saving threshold sweep report")
+    # TODO: we are passing gt_conf_percentile (values in [0, 100, 1]) as gt_conf
+    # TODO: fix this? It does not really matter as we use step gt (which is gt_conf_percentile) anyway later
+    nb_of_rows = reporter.write_threshold_sweep_report(report, gt_conf_percentiles)
+    logging.info(f"Saved {nb_of_rows} report rows")
+    return nb_of_rows
+
+
+def pool_truth_probesets(truth_probesets: Iterable[PathLike], sample_pairs: Iterable[str],
+                         pooled_truth_probeset: PathLike, probes_table: PathLike) -> None:
+    """
+    Pools the truth probesets of a sample (one per sample pair, truth_probesets and sample_pairs in the same order) into
+    one probeset with each distinct sequence once, and the table of the probes of each pair each pooled probe stands
+    for (see PooledTruthProbeset).
+    """
+    from evaluate.pooled_truth_probeset import PooledTruthProbeset
+
+    with stage("PooledTruthProbeset.from_truth_probesets") as pooling:
+        pooled = PooledTruthProbeset.from_truth_probesets(dict(zip(sample_pairs, truth_probesets)))
+        pooling.add_records(len(pooled.probes))
+    logging.info(f"Pooled {len(pooled.probes)} truth probes into {len(pooled.sequences)} distinct probes")
+    count("nb_of_truth_probes_before_pooling", len(pooled.probes))
+    count("nb_of_truth_probes_after_pooling", len(pooled.sequences))
+    pooled.save(pooled_truth_probeset, probes_table)
+
+
+def create_pooled_recall_report(sams: Iterable[PathLike], probes_table: PathLike, mask_bitmaps: PathLike,
+                                sample_id: str, gt_conf_percentiles: List[int], report: PathLike,
+                                processes: int = 1) -> int:
+    """
+    create_recall_report() of all the sample pairs of a sample at once, from the SAMs of its pooled truth probeset
+    mapped to the mutated refs of each GT_CONF percentile (see pool_truth_probesets()). The report has an extra
+    sample_pair column; split_pooled_recall_report() gives back the report of each pair.
+    """
+    return _create_pooled_recall_report([_open_sam_file(sam) for sam in sams], probes_table, mask_bitmaps, sample_id,
+                                        gt_conf_percentiles, report, processes)
+
+
+def map_and_create_pooled_recall_report(query: PathLike, refs: Iterable[PathLike], probes_table: PathLike,
+                                        mask_bitmaps: PathLike, sample_id: str, gt_conf_percentiles: List[int],
+                                        report: PathLike, threads: int = 1, processes: int = 1,
+                                        sams_to_keep: Optional[Iterable[PathLike]] = None) -> int:
+    """
+    map_probes() of the pooled truth probeset followed by create_pooled_recall_report(), streaming the SAM records from
+    bwa as map_and_create_recall_report() does.
+    """
+    refs = list(refs)
+    sams_to_keep = list(sams_to_keep) if sams_to_keep else [None] * len(refs)
+    if len(sams_to_keep) != len(refs):
+        raise ValueError(f"Got {len(refs)} refs but {len(sams_to_keep)} SAMs to keep")
+    open_alignment_files = [_open_bwa_stream(query, ref, threads, sam_to_keep)
+                            for ref, sam_to_keep in zip(refs, sams_to_keep)]
+    return _create_pooled_recall_report(open_alignment_files, probes_table, mask_bitmaps, sample_id,
+                                        gt_conf_percentiles, report, processes)
+
+
+def _create_pooled_recall_report(open_alignment_files: List[AlignmentFileOpener], probes_table: PathLike,
+                                 mask_bitmaps: PathLike, sample_id: str, gt_conf_percentiles: List[int],
+                                 report: PathLike, processes: int) -> int:
+    from evaluate.classification import RecallClassification
+    from evaluate.classifier import RecallClassifier
+    from evaluate.masker import RecallMasker
+    from evaluate.pooled_truth_probeset import PooledTruthProbeset
+    from evaluate.reporter import PooledRecallReporter
+
+    logging.info(f"Loading the probes table {probes_table}")
+    pooled_truth_probeset = PooledTruthProbeset.load(probes_table)
+
+    logging.info(f"Creating masker from {mask_bitmaps}")
+    with stage("RecallMasker.from_bitmaps"):
+        masker = RecallMasker.from_bitmaps(mask_bitmaps)
+
+    def get_classifiers_of_each_sample_pair(open_alignment_file):
+        # lazy: the mappings of each GT_CONF percentile are only read and attributed when the reporter reaches them.
+        # The masker needs the probe of each pair, so records are masked after being attributed
+        with open_alignment_file() as sam:
+            sample_pair_to_classifications = pooled_truth_probeset.attribute(
+                RecallClassification(record) for record in sam)
+        for sample_pair, classifications in sample_pair_to_classifications.items():
+            yield sample_pair, RecallClassifier(sam=masker.filter_records_lazily(classifications), name=sample_id)
+
+    logging.info("Creating the classifiers of each sample pair per GT_CONF percentile")
+    reporter = PooledRecallReporter(classifiers=[get_classifiers_of_each_sample_pair(open_alignment_file)
+                                                 for open_alignment_file in open_alignment_files],
+                                    processes=processes)
+
+    logging.info("Generating and saving pooled threshold sweep report")
+    nb_of_rows = reporter.write_threshold_sweep_report(report, gt_conf_percentiles)
+    logging.info(f"Saved {nb_of_rows} report rows")
+    return nb_of_rows
+
+
+def split_pooled_recall_report(pooled_report: PathLike, sample_pairs: Iterable[str],
+                               reports: Iterable[PathLike]) -> None:
+    """
+    Writes the report of each sample pair (sample_pairs and reports in the same order) from a pooled recall report
+    (see create_pooled_recall_report()), as create_recall_report() would have written it from the SAMs of the pair.
+    """
+    import pandas as pd
+    from evaluate.binary_report import read_report_file
+    from evaluate.reporter import PooledRecallReporter
+
+    sample_pair_column = PooledRecallReporter.sample_pair_column
+    df = read_report_file(pooled_report, as_categorical=True, dtypes={sample_pair_column: "str"})
+    reporter = PooledRecallReporter(classifiers=[])
+    for sample_pair, report in zip(sample_pairs, reports):
+        with stage("split_pooled_recall_report") as splitting:
+            sample_pair_df = df[df[sample_pair_column] == sample_pair].drop(columns=sample_pair_column)
+            sample_pair_df = sample_pair_df.reset_index(drop=True)
+            # the categories of the other pairs would be saved with the report otherwise
+            for column in sample_pair_df.columns:
+                if isinstance(sample_pair_df[column].dtype, pd.CategoricalDtype):
+                    sample_pair_df[column] = sample_pair_df[column].cat.remove_unused_categories()
+            reporter.save_report(sample_pair_df, report)
+            splitting.add_records(len(sample_pair_df))
+        logging.info(f"Saved the {len(sample_pair_df)} rows of {sample_pair} in {report}")
+
+
+def _add_metadata(df: "pd.DataFrame", metadata: Dict[str, str]) -> "pd.DataFrame":
+    import pandas as pd
+
+    metadata_df = pd.DataFrame(data={column: [value] * len(df) for column, value in metadata.items()})
+    return pd.concat([df, metadata_df], axis=1)
+
+
+def calculate_precision(reports: Iterable[PathLike], output: PathLike, gt_conf_percentiles: Iterable[int],
+                        metadata: Dict[str, str], threads: int = 1, index: bool = True) -> None:
+    """
+    Precision at each GT_CONF percentile of the calls in reports, with a column for each item of metadata.
+    """
+    from evaluate.calculator import PrecisionCalculator
+    from evaluate.report import PrecisionReport
+
+    logging.info(f"Loading report")
+    precision_report = PrecisionReport.from_files(list(reports), encode_columns=True,
+                                                  columns=PrecisionReport.columns_needed_by_calculator,
+                                                  threads=threads)
+
+    logging.info(f"Creating calculator")
+    precision_calculator = PrecisionCalculator(precision_report)
+
+    logging.info(f"Calculating precision")
+    precision_df = precision_calculator.get_precision_report(gt_conf_percentiles)
+
+    logging.info(f"Outputting precision file")
+    _add_metadata(precision_df, metadata).to_csv(output, sep="\t", index=index)
+
+
+def calculate_recall(reports: Iterable[PathLike], output: PathLike, gt_conf_percentiles: Iterable[int],
+                     metadata: Dict[str, str], threads: int = 1) -> None:
+    """
+    Recall at each GT_CONF percentile of the recall reports per sample for the calculator, with a column for each
+    item of metadata.
+    """
+    from evaluate.calculator import RecallCalculator
+    from evaluate.report import RecallReport
+
+    logging.info(f"Loading report")
+    recall_report = RecallReport.from_files(list(reports),
+                                            concatenate_dfs_one_by_one_keeping_only_best_mappings=False,
+                                            encode_columns=True,
+                                            columns=RecallReport.columns_needed_by_calculator,
+                                            threads=threads)
+
+    logging.info(f"Creating calculator")
+    recall_calculator = RecallCalculator(recall_report)
+
+    logging.info(f"Calculating recall")
+    recall_df = recall_calculator.get_recall_report(gt_conf_percentiles)
+
+    logging.info(f"Outputting recall file")
+    _add_metadata(recall_df, metadata).to_csv(output, sep="\t")
+
+
+def export_report(binary_report: PathLike, tsv_report: PathLike) -> None:
+    from evaluate.binary_report import load_binary_report
+
+    load_binary_report(binary_report).to_csv(tsv_report, sep="\t", header=True, index=False)
@@ -0,0 +1,169 @@
+from bisect import bisect_left
+from typing import NamedTuple, Optional, Sequence, Tuple
+import re
+
+import pysam
+
+# CIGAR operations, see the SAM specification
+BAM_CMATCH = 0
+BAM_CINS = 1
+BAM_CDEL = 2
+BAM_CREF_SKIP = 3
+BAM_CSOFT_CLIP = 4
+BAM_CHARD_CLIP = 5
+BAM_CPAD = 6
+BAM_CEQUAL = 7
+BAM_CDIFF = 8
+
+MATCH_OPERATIONS = {BAM_CMATCH, BAM_CEQUAL, BAM_CDIFF}
+QUERY_ONLY_OPERATIONS = {BAM_CINS, BAM_CSOFT_CLIP, BAM_CPAD}
+REF_ONLY_OPERATIONS = {BAM_CDEL, BAM_CREF_SKIP}
+
+
+class MDTagNotFoundError(Exception):
+    pass
+
+
+class QueryIntervalScore(NamedTuple):
+    nb_of_matches: int = 0
+    nb_of_aligned_pairs: int = 0
+    ref_start: Optional[int] = None
+    ref_end: Optional[int] = None
+
+
+class CompactAlignment:
+    """
+    Compact representation of the alignment of a SAM record: its CIGAR operations, the reference start and the
+    indexes (among the bases aligned by M/=/X operations) of the mismatches described by the MD tag. mismatch_indexes
+    is None if the record has no MD tag, in which case the alignment can not be scored.
+
+    It answers the same questions that AlignedPairs answers on pysam's get_aligned_pairs(with_seq=True), but walks the
+    CIGAR operations once instead of materialising one tuple per aligned base.
+    """
+
+    __slots__ = ("cigartuples", "reference_start", "mismatch_indexes")
+
+    md_regex = re.compile(r"(\d+)|(\^[A-Za-z]+)|([A-Za-z])")
+
+    def __init__(
+        self,
+        cigartuples: Sequence[Tuple[int, int]] = (),
+        reference_start: int = 0,
+        mismatch_indexes: Optional[Sequence[int]] = (),
+    ):
+        self.cigartuples = tuple(cigartuples)
+        self.reference_start = reference_start
+        self.mismatch_indexes = tuple(mismatch_indexes) if mismatch_indexes is not None else None
+
+    def __eq__(self, other: "CompactAlignment") -> bool:
+        return (
+            self.cigartuples == other.cigartuples
+            and self.reference_start == other.reference_start
+            and self.mismatch_indexes == other.mismatch_indexes
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"CompactAlignment(cigartuples={self.cigartuples}, reference_start={self.reference_start}, "
+            f"mismatch_indexes={self.mismatch_indexes})"
+        )
+
+    @classmethod
+    def from_record(cls, record: pysam.AlignedSegment) -> "CompactAlignment":
+        if record.is_unmapped or record.cigartuples is None:
+            return cls()
+
+        if record.has_tag("MD"):
+            mismatch_indexes = cls.get_mismatch_indexes_from_md(record.get_tag("MD"))
+        else:
+            mismatch_indexes = None
+
+        return cls(
+            cigartuples=record.cigartuples,
+            reference_start=record.reference_start,
+            mismatch_indexes=mismatch_indexes,
+        )
+
+    @staticmethod
+    def get_mismatch_indexes_from_md(md: str) -> Tuple[int, ...]:
+        """
+        Returns the indexes, counting only bases aligned by M/=/X operations, of the mismatches in the MD tag.
+        Deleted reference bases (^ACG) do not consume aligned bases.
+        """
+        mismatch_indexes = []
+        aligned_base_index = 0
+        for number_of_matches, deleted_bases, mismatch in CompactAlignment.md_regex.findall(md):
+            if number_of_matches:
+                aligned_base_index += int(number_of_matches)
+            elif mismatch:
+                mismatch_indexes.append(aligned_base_index)
+                aligned_base_index += 1
+        return tuple(mismatch_indexes)
+
+    def _count_mismatches(self, first_aligned_base_index: int, last_aligned_base_index: int) -> int:
+        return bisect_left(self.mismatch_indexes, last_aligned_base_index) - bisect_left(
+            self.mismatch_indexes, first_aligned_base_index
+        )
+
+    def score_query_interval(self, query_start: int, query_end: int) -> QueryIntervalScore:
+        """
+        Scores the aligned pairs that AlignedPairs.get_pairs_in_query_interval() would select for [query_start, query_end):
+        query bases in the interval, and reference-only bases (deletions, skips) lying strictly between two query bases of
+        the interval.
+
+        ref_start and ref_end are the half-open reference span PrecisionMasker computes from the selected pairs, where a
+        pair without reference position sits halfway between its neighbours. They are None if no pair is selected.
+        """
+        if self.mismatch_indexes is None:
+            raise MDTagNotFoundError("MD tag not present in the record, can't score the alignment")
+
+        nb_of_matches = 0
+        nb_of_aligned_pairs = 0
+        ref_start = None
+        ref_end = None
+
+        query_pos = 0
+        ref_pos = self.reference_start
+        aligned_base_index = 0
+        last_query_pos = -1
+        last_ref_pos = self.reference_start - 1
+
+        for operation, length in self.cigartuples:
+            if operation in MATCH_OPERATIONS:
+                lo = max(query_pos, query_start)
+                hi = min(query_pos + length, query_end)
+                if lo < hi:
+                    offset_lo, offset_hi = lo - query_pos, hi - query_pos
+                    nb_of_aligned_pairs += hi - lo
+                    nb_of_matches += (hi - lo) - self._count_mismatches(
+                        aligned_base_index + offset_lo, aligned_base_index + offset_hi
+                    )
+                    if ref_start is None:
+                        ref_start = ref_pos + offset_lo
+                    ref_end = ref_pos + offset_hi
+                query_pos += length
+                ref_pos += length
+                aligned_base_index += length
+                last_query_pos = query_pos - 1
+                last_ref_pos = ref_pos - 1
+            elif operation in QUERY_ONLY_OPERATIONS:
+                lo = max(query_pos, query_start)
+                hi = min(query_pos + length, query_end)
+                if lo < hi:
+                    nb_of_aligned_pairs += hi - lo
+                    if ref_start is None:
+                        ref_start = last_ref_pos
+                    ref_end = last_ref_pos + 2
+                query_pos += length
+                last_query_pos = query_pos - 1
+            elif operation in REF_ONLY_OPERATIONS:
+                lies_between_query_bases_of_the_interval = query_start <= last_query_pos <= query_end - 2
+                if lies_between_query_bases_of_the_interval:
+                    nb_of_aligned_pairs += length
+                    if ref_start is None:
+                        ref_start = ref_pos
+                    ref_end = ref_pos + length
+                ref_pos += length
+                last_ref_pos = ref_pos - 1
+
+        return QueryIntervalScore(nb_of_matches, nb_of_aligned_pairs, ref_start, ref_end)
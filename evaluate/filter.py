@@ -1,13 +1,27 @@
-from typing import Iterable, List
+from typing import Dict, Iterable, Iterator, List
 
 
 class Filter:
     def filter_records(self, records: Iterable) -> List:
-        return [
+        return list(self.filter_records_lazily(records))
+
+    def filter_records_lazily(self, records: Iterable) -> Iterator:
+        return (
             record
             for record in records
             if not self.record_should_be_filtered_out(record)
-        ]
+        )
 
     def record_should_be_filtered_out(self, record) -> bool:
         raise NotImplementedError()
+
+    def get_counts(self) -> Dict[str, int]:
+        """
+        The counters the filter updates as records are consumed, if any, so that the counts of copies of the filter
+        run in worker processes can be added back with add_counts().
+        """
+        return {}
+
+    def add_counts(self, counts: Dict[str, int]) -> None:
+        for name, value in counts.items():
+            setattr(self, name, getattr(self, name) + value)
@@ -0,0 +1,177 @@
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List
+import logging
+import threading
+import time
+
+
+class StageMetrics:
+    """
+    Metrics of a stage, accumulated over all the times it ran in the process. Times of nested stages are included in
+    the times of the stages around them. CPU time is the CPU time of the whole process while the stage ran.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.nb_of_runs = 0
+        self.wall_time_s = 0.0
+        self.cpu_time_s = 0.0
+        self.nb_of_records = 0
+
+    @property
+    def records_per_s(self) -> float:
+        return self.nb_of_records / self.wall_time_s if self.wall_time_s > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "stage": self.name,
+            "nb_of_runs": self.nb_of_runs,
+            "wall_time_s": self.wall_time_s,
+            "cpu_time_s": self.cpu_time_s,
+            "nb_of_records": self.nb_of_records,
+            "records_per_s": self.records_per_s,
+        }
+
+    def __str__(self) -> str:
+        return f"Stage {self.name}: {self.wall_time_s:.3f}s wall, {self.cpu_time_s:.3f}s CPU, " \
+               f"{self.nb_of_records} records ({self.records_per_s:.1f} records/s)"
+
+
+class Stage:
+    """
+    Handle of a running stage, to count the records it processes.
+    """
+    def __init__(self, instrumentation: "Instrumentation", metrics: StageMetrics):
+        self._instrumentation = instrumentation
+        self._metrics = metrics
+
+    def add_records(self, nb_of_records: int = 1) -> None:
+        with self._instrumentation.lock:
+            self._metrics.nb_of_records += nb_of_records
+
+
+class Instrumentation:
+    """
+    Wall time, CPU time and records processed of the stages of a process, plus free-form counters. Stages are
+    instrumented at a coarse grain (a whole file, a batch of records), so that timing them costs nothing measurable.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._name_to_stage_metrics: Dict[str, StageMetrics] = {}
+        self._counters: Dict[str, int] = {}
+
+    def _get_stage_metrics(self, name: str) -> StageMetrics:
+        if name not in self._name_to_stage_metrics:
+            self._name_to_stage_metrics[name] = StageMetrics(name)
+        return self._name_to_stage_metrics[name]
+
+    def _add_run(self, name: str, wall_time_s: float, cpu_time_s: float, nb_of_records: int = 0) -> StageMetrics:
+        with self.lock:
+            metrics = self._get_stage_metrics(name)
+            metrics.nb_of_runs += 1
+            metrics.wall_time_s += wall_time_s
+            metrics.cpu_time_s += cpu_time_s
+            metrics.nb_of_records += nb_of_records
+            return metrics
+
+    @contextmanager
+    def stage(self, name: str, log: bool = True) -> Iterator[Stage]:
+        with self.lock:
+            metrics = self._get_stage_metrics(name)
+        start_wall_time, start_cpu_time = time.perf_counter(), time.process_time()
+        nb_of_records_before = metrics.nb_of_records
+        try:
+            yield Stage(self, metrics)
+        finally:
+            metrics = self._add_run(name, time.perf_counter() - start_wall_time, time.process_time() - start_cpu_time)
+            if log:
+                logging.info(f"Stage {name}: {self._format_last_run(metrics, nb_of_records_before)}")
+
+    @staticmethod
+    def _format_last_run(metrics: StageMetrics, nb_of_records_before: int) -> str:
+        return f"done ({metrics.nb_of_records - nb_of_records_before} records); total so far: " \
+               f"{metrics.wall_time_s:.3f}s wall, {metrics.cpu_time_s:.3f}s CPU, {metrics.nb_of_records} records"
+
+    def iterate(self, name: str, iterable: Iterable, log: bool = True) -> Iterator:
+        """
+        Yields the items of iterable, timing only the time spent producing them (not the time the consumer spends on
+        them), and counting each item as a record. This is how lazy pipelines of generators are instrumented.
+        """
+        iterator = iter(iterable)
+        wall_time_s, cpu_time_s, nb_of_records = 0.0, 0.0, 0
+        try:
+            while True:
+                start_wall_time, start_cpu_time = time.perf_counter(), time.process_time()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    wall_time_s += time.perf_counter() - start_wall_time
+                    cpu_time_s += time.process_time() - start_cpu_time
+                nb_of_records += 1
+                yield item
+        finally:
+            metrics = self._add_run(name, wall_time_s, cpu_time_s, nb_of_records)
+            if log:
+                logging.info(str(metrics))
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self.lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def get_stage_metrics(self) -> List[StageMetrics]:
+        with self.lock:
+            return list(self._name_to_stage_metrics.values())
+
+    def get_counters(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self._counters)
+
+    def to_dict(self) -> dict:
+        return {
+            "stages": [metrics.to_dict() for metrics in self.get_stage_metrics()],
+            "counters": self.get_counters(),
+        }
+
+    def reset(self) -> None:
+        with self.lock:
+            self._name_to_stage_metrics.clear()
+            self._counters.clear()
+
+
+# the instrumentation of this process, saved with the job metrics (see evaluate.job_metrics)
+instrumentation = Instrumentation()
+stage = instrumentation.stage
+iterate = instrumentation.iterate
+count = instrumentation.count
+
+
+def get_slowest_stages(job_metrics: Iterable[dict]) -> "pd.DataFrame":
+    """
+    Table of the stages of all the jobs of a run, summed per (rule, stage), from the slowest to the fastest.
+    """
+    # imported here: this module is imported by every step, most of which do not need pandas
+    import pandas as pd
+
+    rows = [
+        {"rule": metrics["rule"], **stage_metrics}
+        for metrics in job_metrics for stage_metrics in metrics.get("stages", [])
+    ]
+    columns = ["rule", "stage", "nb_of_jobs", "nb_of_runs", "wall_time_s", "max_wall_time_s", "cpu_time_s",
+               "nb_of_records", "records_per_s"]
+    if not rows:
+        return pd.DataFrame(columns=columns)
+
+    stages = pd.DataFrame(rows)
+    slowest_stages = stages.groupby(["rule", "stage"], sort=False).agg(
+        nb_of_jobs=("wall_time_s", "size"),
+        nb_of_runs=("nb_of_runs", "sum"),
+        wall_time_s=("wall_time_s", "sum"),
+        max_wall_time_s=("wall_time_s", "max"),
+        cpu_time_s=("cpu_time_s", "sum"),
+        nb_of_records=("nb_of_records", "sum"),
+    ).reset_index()
+    wall_time_s = slowest_stages["wall_time_s"].where(slowest_stages["wall_time_s"] > 0)
+    slowest_stages["records_per_s"] = (slowest_stages["nb_of_records"] / wall_time_s).fillna(0.0)
+    return slowest_stages.sort_values("wall_time_s", ascending=False, kind="mergesort")[columns] \
+        .reset_index(drop=True)
@@ -0,0 +1,252 @@
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from collections import defaultdict
+import atexit
+import json
+import math
+import os
+import resource
+import time
+import psutil
+from evaluate.instrumentation import instrumentation
+
+METRICS_FILE_SUFFIX = ".metrics.json"
+
+# RSS of this process when it was forked to run a job (see start_measuring_forked_job()), or None if it was not
+_rss_at_fork_mb: Optional[float] = None
+_peak_rss_was_reset = False
+
+
+def get_size_mb(paths: Iterable[Union[str, Path]]) -> float:
+    """
+    Total size of the given files, in MB. Directories (e.g. mask bitmaps) count with all the files in them, and paths
+    that do not exist yet count as empty.
+    """
+    size = 0
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            size += sum(file.stat().st_size for file in path.rglob("*") if file.is_file())
+        elif path.exists():
+            size += path.stat().st_size
+    return size / 1024 / 1024
+
+
+def _get_rss_mb() -> float:
+    return psutil.Process(os.getpid()).memory_info().rss / 1024 / 1024
+
+
+def _reset_peak_rss() -> bool:
+    """
+    Resets the peak RSS of this process (VmHWM) to its current RSS. Only Linux allows it. Returns whether it could.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _get_vm_hwm_mb() -> float:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                # in kB
+                return int(line.split()[1]) / 1024
+    raise ValueError("VmHWM not found in /proc/self/status")
+
+
+def start_measuring_forked_job() -> None:
+    """
+    To be called first thing in a process forked to run a job (see evaluate.batch_runner). A forked process starts with
+    the RSS of the interpreter it was forked from, in pages it shares with it, and its ru_maxrss starts from there: the
+    peak RSS of the job is then measured as the growth of its RSS over the RSS at fork, from VmHWM reset here where
+    possible, from ru_maxrss otherwise.
+    """
+    global _rss_at_fork_mb, _peak_rss_was_reset
+    _peak_rss_was_reset = _reset_peak_rss()
+    _rss_at_fork_mb = _get_rss_mb()
+
+
+def get_metrics_file(log_file: Union[str, Path]) -> Path:
+    return Path(f"{log_file}{METRICS_FILE_SUFFIX}")
+
+
+class JobMetricsRecorder:
+    """
+    Records the resources used by a pipeline job: peak RSS of the job and of its largest child process, CPU time
+    (including children) and wall time, along with the total size of its inputs, so that the memory requested for the
+    rule can be predicted from the input sizes of future jobs (see ResourceModel). The stages and counters of the job
+    (see evaluate.instrumentation) are saved with them. The peak RSS of a job forked from a long-lived interpreter
+    does not include the RSS it inherited (rss_at_fork_mb, see start_measuring_forked_job()).
+    """
+    def __init__(self, rule: str, input_files: Iterable[Union[str, Path]], metrics_file: Union[str, Path],
+                 wildcards: Optional[Dict[str, str]] = None, threads: int = 1):
+        self.rule = rule
+        self.input_files = [str(input_file) for input_file in input_files]
+        self.metrics_file = Path(metrics_file)
+        self.wildcards = dict(wildcards) if wildcards is not None else {}
+        self.threads = threads
+        self._start_wall_time = time.perf_counter()
+
+    @staticmethod
+    def _get_peak_rss_mb(who: int) -> float:
+        # ru_maxrss is in KB on Linux
+        return resource.getrusage(who).ru_maxrss / 1024
+
+    @classmethod
+    def _get_peak_rss_of_the_job_mb(cls) -> float:
+        if _rss_at_fork_mb is None:
+            return cls._get_peak_rss_mb(resource.RUSAGE_SELF)
+        peak_rss_mb = _get_vm_hwm_mb() if _peak_rss_was_reset else cls._get_peak_rss_mb(resource.RUSAGE_SELF)
+        return max(0.0, peak_rss_mb - _rss_at_fork_mb)
+
+    def get_metrics(self) -> dict:
+        cpu_times = psutil.Process(os.getpid()).cpu_times()
+        return {
+            "rule": self.rule,
+            "wildcards": self.wildcards,
+            "threads": self.threads,
+            "input_size_mb": get_size_mb(self.input_files),
+            "peak_rss_mb": self._get_peak_rss_of_the_job_mb(),
+            "rss_at_fork_mb": _rss_at_fork_mb,
+            "peak_children_rss_mb": self._get_peak_rss_mb(resource.RUSAGE_CHILDREN),
+            "cpu_time_s": cpu_times.user + cpu_times.system + cpu_times.children_user + cpu_times.children_system,
+            "wall_time_s": time.perf_counter() - self._start_wall_time,
+            **instrumentation.to_dict(),
+        }
+
+    def save(self) -> None:
+        self.metrics_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.metrics_file, "w") as metrics_file:
+            json.dump(self.get_metrics(), metrics_file, indent=4)
+
+
+def record_job_metrics(snakemake) -> Optional[JobMetricsRecorder]:
+    """
+    To be called at the start of a Snakemake script: the metrics of the job are saved when the script exits, next to
+    its log file as <log>.metrics.json. Jobs without a log file are not recorded. Jobs run by evaluate.batch_runner
+    save them when their script ends (see ScriptJob.add_job_metrics_recorder()), others when the interpreter exits.
+    """
+    if not snakemake.log:
+        return None
+    recorder = JobMetricsRecorder(
+        rule=snakemake.rule,
+        input_files=list(snakemake.input),
+        metrics_file=get_metrics_file(snakemake.log[0]),
+        wildcards=dict(snakemake.wildcards.items()),
+        threads=snakemake.threads,
+    )
+    if hasattr(snakemake, "add_job_metrics_recorder"):
+        snakemake.add_job_metrics_recorder(recorder)
+    else:
+        atexit.register(recorder.save)
+    return recorder
+
+
+def load_job_metrics(metrics_files: Iterable[Union[str, Path]]) -> List[dict]:
+    job_metrics = []
+    for metrics_file in metrics_files:
+        with open(metrics_file) as file:
+            job_metrics.append(json.load(file))
+    return job_metrics
+
+
+def find_metrics_files(directory: Union[str, Path]) -> List[Path]:
+    return sorted(Path(directory).rglob(f"*{METRICS_FILE_SUFFIX}"))
+
+
+class ResourceModel:
+    """
+    Peak memory of each rule as a linear function of the total size of its inputs, fitted from the metrics of past
+    jobs. The line is shifted up to cover every job it was fitted on, so it is an upper envelope of the observed peaks
+    rather than an average. Rules without metrics get the default memory of the rule.
+
+    As with the hard-coded requests, the memory is multiplied by the attempt number, so a job that still runs out of
+    memory is retried with more.
+    """
+    def __init__(self, rule_to_coefficients: Optional[Dict[str, Tuple[float, float]]] = None,
+                 margin: float = 1.2, min_mem_mb: int = 100):
+        if rule_to_coefficients is None:
+            rule_to_coefficients = {}
+        self.rule_to_coefficients = rule_to_coefficients
+        self.margin = margin
+        self.min_mem_mb = min_mem_mb
+
+    def __eq__(self, other: "ResourceModel") -> bool:
+        return self.rule_to_coefficients == other.rule_to_coefficients and self.margin == other.margin \
+            and self.min_mem_mb == other.min_mem_mb
+
+    @staticmethod
+    def _get_peak_mem_mb(job_metrics: dict) -> float:
+        return job_metrics["peak_rss_mb"] + job_metrics.get("peak_children_rss_mb", 0.0)
+
+    @staticmethod
+    def _fit_upper_envelope(input_sizes_mb: "np.ndarray", peak_mems_mb: "np.ndarray") -> Tuple[float, float]:
+        import numpy as np
+        if len(np.unique(input_sizes_mb)) < 2:
+            return float(peak_mems_mb.max()), 0.0
+        slope, intercept = np.polyfit(input_sizes_mb, peak_mems_mb, deg=1)
+        if slope <= 0:
+            return float(peak_mems_mb.max()), 0.0
+        intercept += (peak_mems_mb - (intercept + slope * input_sizes_mb)).max()
+        return float(intercept), float(slope)
+
+    @classmethod
+    def fit(cls, job_metrics: Iterable[dict], **kwargs) -> "ResourceModel":
+        rule_to_input_sizes_and_peak_mems = defaultdict(list)
+        for metrics in job_metrics:
+            rule_to_input_sizes_and_peak_mems[metrics["rule"]].append(
+                (metrics["input_size_mb"], cls._get_peak_mem_mb(metrics)))
+
+        # imported here: this module is imported by every step, while only fitting needs numpy
+        import numpy as np
+        rule_to_coefficients = {}
+        for rule, input_sizes_and_peak_mems in rule_to_input_sizes_and_peak_mems.items():
+            input_sizes_mb, peak_mems_mb = np.array(input_sizes_and_peak_mems, dtype=float).T
+            rule_to_coefficients[rule] = cls._fit_upper_envelope(input_sizes_mb, peak_mems_mb)
+        return cls(rule_to_coefficients, **kwargs)
+
+    @classmethod
+    def from_metrics_dir(cls, directory: Union[str, Path], **kwargs) -> "ResourceModel":
+        return cls.fit(load_job_metrics(find_metrics_files(directory)), **kwargs)
+
+    def save(self, path: Union[str, Path]) -> None:
+        with open(path, "w") as file:
+            json.dump({
+                "margin": self.margin,
+                "min_mem_mb": self.min_mem_mb,
+                "rules": {rule: {"intercept_mb": intercept, "mb_per_input_mb": slope}
+                          for rule, (intercept, slope) in self.rule_to_coefficients.items()},
+            }, file, indent=4)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "ResourceModel":
+        with open(path) as file:
+            model = json.load(file)
+        rule_to_coefficients = {
+            rule: (coefficients["intercept_mb"], coefficients["mb_per_input_mb"])
+            for rule, coefficients in model["rules"].items()
+        }
+        return cls(rule_to_coefficients, margin=model["margin"], min_mem_mb=model["min_mem_mb"])
+
+    def get_mem_mb_of_input_files(self, rule: str, input_files: Iterable[Union[str, Path]], attempt: int,
+                                  default_mem_mb: int) -> int:
+        """
+        The memory of a job of rule, predicted from the size of its input files. While some of them do not exist yet
+        (they are made by upstream jobs), their size is unknown: the default memory of the rule is returned instead
+        of a prediction from the inputs that exist, which would be too low. Snakemake evaluates the resources of a job
+        again when its inputs are ready, before submitting it.
+        """
+        input_files = [Path(input_file) for input_file in input_files]
+        if not all(input_file.exists() for input_file in input_files):
+            return default_mem_mb * attempt
+        return self.get_mem_mb(rule, get_size_mb(input_files), attempt, default_mem_mb)
+
+    def get_mem_mb(self, rule: str, input_size_mb: float, attempt: int, default_mem_mb: int) -> int:
+        if rule not in self.rule_to_coefficients:
+            return default_mem_mb * attempt
+        intercept, slope = self.rule_to_coefficients[rule]
+        mem_mb = max(self.min_mem_mb, math.ceil(self.margin * (intercept + slope * input_size_mb)))
+        return mem_mb * attempt
@@ -0,0 +1,164 @@
+from pathlib import Path
+from typing import Dict, Hashable, Iterable, List, Sequence, Tuple
+from collections import defaultdict
+import numpy as np
+
+from evaluate.mask_index import MaskIndex
+
+# FIRST_BITS_POPCOUNT[byte, k] is the number of set bits among the first k bits of byte (np.packbits is big-endian)
+FIRST_BITS_POPCOUNT = np.array(
+    [[bin(byte >> (8 - k)).count("1") for k in range(9)] for byte in range(256)], dtype=np.uint32
+)
+
+
+class ContigBitmap:
+    """
+    Masked bases of a contig as a packed bit array (one bit per base), with the number of masked bases before each
+    byte. The number of masked bases in [0, position) is then one prefix sum lookup plus a table lookup for the bits
+    of the last byte, so whether [start, end) touches the mask is answered in O(1).
+
+    Positions after the last masked base are not stored, and count as unmasked.
+    """
+
+    def __init__(self, bits: np.ndarray, byte_prefix_sums: np.ndarray):
+        self.bits = bits
+        self.byte_prefix_sums = byte_prefix_sums
+
+    @property
+    def length(self) -> int:
+        return (len(self.bits) - 1) * 8
+
+    @classmethod
+    def from_regions(cls, starts: np.ndarray, ends: np.ndarray) -> "ContigBitmap":
+        length = int(ends.max()) if len(ends) else 0
+        is_masked = np.zeros(length, dtype=bool)
+        for start, end in zip(starts, ends):
+            is_masked[start:end] = True
+
+        # one extra byte so that the byte of position == length always exists
+        bits = np.append(np.packbits(is_masked), np.uint8(0))
+        byte_prefix_sums = np.zeros(len(bits) + 1, dtype=np.uint32)
+        np.cumsum(FIRST_BITS_POPCOUNT[bits, 8], out=byte_prefix_sums[1:])
+        return cls(bits, byte_prefix_sums)
+
+    def nb_of_masked_bases_before(self, positions: np.ndarray) -> np.ndarray:
+        positions = np.clip(positions, 0, self.length)
+        byte_indexes, bit_offsets = np.divmod(positions, 8)
+        return self.byte_prefix_sums[byte_indexes] + FIRST_BITS_POPCOUNT[self.bits[byte_indexes], bit_offsets]
+
+    def overlaps(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        nb_of_masked_bases = self.nb_of_masked_bases_before(ends).astype(np.int64) - \
+                             self.nb_of_masked_bases_before(starts).astype(np.int64)
+        return (nb_of_masked_bases > 0) & (starts < ends)
+
+
+class MaskBitmaps:
+    """
+    Mask compiled once into one ContigBitmap per contig and saved as .npy files in a directory (conventionally next to
+    the BED file, as <mask>.bitmaps). Jobs memory-map the arrays instead of re-reading and re-indexing the BED, so
+    concurrent jobs on a node share them through the page cache.
+
+    Offers the same overlap queries as MaskIndex.
+
+    Bitmaps memory-mapped from a directory are pickled as the directory, so that worker processes memory-map the same
+    files instead of receiving a copy of the arrays.
+    """
+    contigs_filename = "contigs.txt"
+
+    def __init__(self, chrom_to_bitmap: Dict[Hashable, ContigBitmap] = None):
+        if chrom_to_bitmap is None:
+            chrom_to_bitmap = {}
+        self._chrom_to_bitmap = chrom_to_bitmap
+        self._memory_mapped_directory = None
+
+    def __reduce__(self):
+        if self._memory_mapped_directory is not None:
+            return MaskBitmaps.load, (self._memory_mapped_directory,)
+        return MaskBitmaps, (self._chrom_to_bitmap,)
+
+    def __eq__(self, other: "MaskBitmaps") -> bool:
+        if self._chrom_to_bitmap.keys() != other._chrom_to_bitmap.keys():
+            return False
+        return all(
+            np.array_equal(bitmap.bits, other._chrom_to_bitmap[chrom].bits)
+            and np.array_equal(bitmap.byte_prefix_sums, other._chrom_to_bitmap[chrom].byte_prefix_sums)
+            for chrom, bitmap in self._chrom_to_bitmap.items()
+        )
+
+    @property
+    def chroms(self) -> List[Hashable]:
+        return list(self._chrom_to_bitmap.keys())
+
+    @classmethod
+    def from_mask_index(cls, mask_index: MaskIndex) -> "MaskBitmaps":
+        return cls({
+            chrom: ContigBitmap.from_regions(*mask_index.get_regions(chrom))
+            for chrom in mask_index.chroms
+        })
+
+    @classmethod
+    def from_regions(cls, regions: Iterable[Tuple[Hashable, int, int]]) -> "MaskBitmaps":
+        return cls.from_mask_index(MaskIndex.from_regions(regions))
+
+    @staticmethod
+    def _get_bits_filepath(directory: Path, contig_index: int) -> Path:
+        return directory / f"{contig_index}.bits.npy"
+
+    @staticmethod
+    def _get_byte_prefix_sums_filepath(directory: Path, contig_index: int) -> Path:
+        return directory / f"{contig_index}.byte_prefix_sums.npy"
+
+    def save(self, directory: Path):
+        # contigs are saved by index, as contig names are not necessarily valid filenames
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        with open(directory / self.contigs_filename, "w") as contigs_file:
+            for contig_index, (chrom, bitmap) in enumerate(self._chrom_to_bitmap.items()):
+                print(chrom, file=contigs_file)
+                np.save(self._get_bits_filepath(directory, contig_index), bitmap.bits)
+                np.save(self._get_byte_prefix_sums_filepath(directory, contig_index), bitmap.byte_prefix_sums)
+
+    @classmethod
+    def load(cls, directory: Path, memory_map: bool = True) -> "MaskBitmaps":
+        directory = Path(directory)
+        mmap_mode = "r" if memory_map else None
+        with open(directory / cls.contigs_filename) as contigs_file:
+            chroms = [line.rstrip("\n") for line in contigs_file]
+
+        chrom_to_bitmap = {
+            chrom: ContigBitmap(
+                np.load(cls._get_bits_filepath(directory, contig_index), mmap_mode=mmap_mode),
+                np.load(cls._get_byte_prefix_sums_filepath(directory, contig_index), mmap_mode=mmap_mode),
+            )
+            for contig_index, chrom in enumerate(chroms)
+        }
+        mask_bitmaps = cls(chrom_to_bitmap)
+        if memory_map:
+            mask_bitmaps._memory_mapped_directory = directory
+        return mask_bitmaps
+
+    def overlaps(self, chroms: Sequence[Hashable], starts: Sequence[int], ends: Sequence[int]) -> np.ndarray:
+        """
+        Vectorized overlap query: returns a boolean array telling, for each i, whether [starts[i], ends[i]) on
+        chroms[i] overlaps a masked region. Empty intervals never overlap.
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        result = np.zeros(len(starts), dtype=bool)
+
+        chrom_to_indexes = defaultdict(list)
+        for index, chrom in enumerate(chroms):
+            chrom_to_indexes[chrom].append(index)
+
+        for chrom, indexes in chrom_to_indexes.items():
+            if chrom not in self._chrom_to_bitmap:
+                continue
+            indexes = np.array(indexes, dtype=np.int64)
+            result[indexes] = self._chrom_to_bitmap[chrom].overlaps(starts[indexes], ends[indexes])
+
+        return result
+
+    def overlap(self, chrom: Hashable, start: int, end: int) -> bool:
+        if start >= end or chrom not in self._chrom_to_bitmap:
+            return False
+        return bool(self._chrom_to_bitmap[chrom].overlaps(np.array([start]), np.array([end]))[0])
@@ -0,0 +1,105 @@
+from typing import Dict, Hashable, Iterable, List, Sequence, Tuple
+from collections import defaultdict
+import numpy as np
+
+
+class MaskIndex:
+    """
+    Index of masked regions: for each chromosome, the starts and ends of the masked regions, merged so that they are
+    disjoint and sorted in two NumPy arrays. Whether [start, end) touches the mask is then answered with a single
+    searchsorted: the only masked region that can overlap it is the last one starting before end.
+    """
+
+    def __init__(self, chrom_to_regions: Dict[Hashable, Tuple[np.ndarray, np.ndarray]] = None):
+        if chrom_to_regions is None:
+            chrom_to_regions = {}
+        self._chrom_to_regions = chrom_to_regions
+
+    def __eq__(self, other: "MaskIndex") -> bool:
+        if self._chrom_to_regions.keys() != other._chrom_to_regions.keys():
+            return False
+        return all(
+            np.array_equal(starts, other._chrom_to_regions[chrom][0])
+            and np.array_equal(ends, other._chrom_to_regions[chrom][1])
+            for chrom, (starts, ends) in self._chrom_to_regions.items()
+        )
+
+    def __repr__(self) -> str:
+        return f"MaskIndex({self._chrom_to_regions})"
+
+    @property
+    def chroms(self) -> List[Hashable]:
+        return list(self._chrom_to_regions.keys())
+
+    def get_regions(self, chrom: Hashable) -> Tuple[np.ndarray, np.ndarray]:
+        empty = np.empty(0, dtype=np.int64)
+        return self._chrom_to_regions.get(chrom, (empty, empty))
+
+    @classmethod
+    def from_regions(cls, regions: Iterable[Tuple[Hashable, int, int]]) -> "MaskIndex":
+        """
+        Builds the index from (chrom, start, end) half-open regions. Empty regions are ignored.
+        """
+        chrom_to_starts_and_ends = defaultdict(list)
+        for chrom, start, end in regions:
+            if start < end:
+                chrom_to_starts_and_ends[chrom].append((start, end))
+
+        chrom_to_regions = {
+            chrom: cls._merge_regions(starts_and_ends)
+            for chrom, starts_and_ends in chrom_to_starts_and_ends.items()
+        }
+        return cls(chrom_to_regions)
+
+    @staticmethod
+    def _merge_regions(starts_and_ends: List[Tuple[int, int]]) -> Tuple[np.ndarray, np.ndarray]:
+        starts_and_ends = np.array(starts_and_ends, dtype=np.int64)
+        starts_and_ends = starts_and_ends[np.argsort(starts_and_ends[:, 0], kind="stable")]
+        starts, ends = starts_and_ends[:, 0], starts_and_ends[:, 1]
+
+        # a region starts a new merged region if it starts after every previous region ended
+        max_end_before = np.maximum.accumulate(ends)
+        is_first_of_merged_region = np.ones(len(starts), dtype=bool)
+        is_first_of_merged_region[1:] = starts[1:] > max_end_before[:-1]
+
+        first_indexes = np.flatnonzero(is_first_of_merged_region)
+        last_indexes = np.append(first_indexes[1:], len(starts)) - 1
+        return starts[first_indexes], max_end_before[last_indexes]
+
+    @staticmethod
+    def _overlaps_regions(
+        mask_starts: np.ndarray, mask_ends: np.ndarray, starts: np.ndarray, ends: np.ndarray
+    ) -> np.ndarray:
+        index_of_last_region_starting_before_end = np.searchsorted(mask_starts, ends, side="left") - 1
+        there_is_such_region = index_of_last_region_starting_before_end >= 0
+        region_ends = mask_ends[np.maximum(index_of_last_region_starting_before_end, 0)]
+        return there_is_such_region & (region_ends > starts) & (starts < ends)
+
+    def overlaps(self, chroms: Sequence[Hashable], starts: Sequence[int], ends: Sequence[int]) -> np.ndarray:
+        """
+        Vectorized overlap query: returns a boolean array telling, for each i, whether [starts[i], ends[i]) on
+        chroms[i] overlaps a masked region. Empty intervals never overlap.
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        result = np.zeros(len(starts), dtype=bool)
+
+        chrom_to_indexes = defaultdict(list)
+        for index, chrom in enumerate(chroms):
+            chrom_to_indexes[chrom].append(index)
+
+        for chrom, indexes in chrom_to_indexes.items():
+            if chrom not in self._chrom_to_regions:
+                continue
+            mask_starts, mask_ends = self._chrom_to_regions[chrom]
+            indexes = np.array(indexes, dtype=np.int64)
+            result[indexes] = self._overlaps_regions(mask_starts, mask_ends, starts[indexes], ends[indexes])
+
+        return result
+
+    def overlap(self, chrom: Hashable, start: int, end: int) -> bool:
+        if start >= end or chrom not in self._chrom_to_regions:
+            return False
+        mask_starts, mask_ends = self._chrom_to_regions[chrom]
+        index_of_last_region_starting_before_end = int(np.searchsorted(mask_starts, end, side="left")) - 1
+        return index_of_last_region_starting_before_end >= 0 and bool(mask_ends[index_of_last_region_starting_before_end] > start)
@@ -1,39 +1,85 @@
 from intervaltree import IntervalTree, Interval
-import math
 from evaluate.classification import Classification
-from typing import TextIO, Type, Optional
+from evaluate.mask_index import MaskIndex
+from evaluate.mask_bitmaps import MaskBitmaps
+from pathlib import Path
+from evaluate.utils import split_in_batches
+from typing import TextIO, Type, Optional, Union, Iterable, Iterator, List, Tuple
+import numpy as np
 import pysam
 from evaluate.filter import Filter
 
 
 class Masker(Filter):
-    def __init__(self, tree: IntervalTree = None):
-        if tree is None:
-            tree = IntervalTree()
-        self.tree = tree
+    """
+    Filters out records whose probe aligns to a masked region of the truth. Masked regions are held in a MaskIndex, or
+    in MaskBitmaps compiled beforehand; tree is accepted for convenience and converted into a MaskIndex (the chromosome
+    being the data of each interval).
+    """
+    def __init__(self, tree: IntervalTree = None, index: Union[MaskIndex, MaskBitmaps] = None,
+                 batch_size: int = 10000):
+        if index is None:
+            regions = ((interval.data, interval.begin, interval.end) for interval in tree) if tree is not None else ()
+            index = MaskIndex.from_regions(regions)
+        self.index = index
+        self.batch_size = batch_size
 
     def __eq__(self, other: "Masker") -> bool:
-        return self.tree == other.tree
+        return self.index == other.index
 
-    @classmethod
-    def from_bed(cls: Type, bed: TextIO) -> "Type[Masker]":
-        tree = IntervalTree()
+    @staticmethod
+    def get_regions_from_bed(bed: TextIO) -> Iterator[Tuple[str, int, int]]:
         for region in bed:
             chrom, start, end = region.strip().split("\t")
-            tree.addi(int(start), int(end), chrom)
-        return cls(tree=tree)
+            yield chrom, int(start), int(end)
 
-    def record_should_be_filtered_out(self, record: pysam.AlignedSegment) -> bool:
+    @classmethod
+    def from_bed(cls: Type, bed: TextIO) -> "Type[Masker]":
+        return cls(index=MaskIndex.from_regions(cls.get_regions_from_bed(bed)))
+
+    @classmethod
+    def from_bitmaps(cls: Type, directory: Path) -> "Type[Masker]":
+        return cls(index=MaskBitmaps.load(directory))
+
+    def record_should_be_filtered_out(self, record: Union[Classification, pysam.AlignedSegment]) -> bool:
         return self.record_overlaps_mask(record)
 
-    def record_overlaps_mask(self, record: pysam.AlignedSegment) -> bool:
-        classification = Classification(record)
+    def record_overlaps_mask(self, record: Union[Classification, pysam.AlignedSegment]) -> bool:
+        classification = record if isinstance(record, Classification) else Classification(record)
         interval = self.get_interval_where_probe_aligns_to_truth(classification)
         if interval is None:
             return False
 
-        overlaps = self.tree.overlap(interval)
-        return any(interval.data == iv.data for iv in overlaps)
+        return self.index.overlap(interval.data, interval.begin, interval.end)
+
+    def records_overlap_mask(self, records: List[Union[Classification, pysam.AlignedSegment]]) -> np.ndarray:
+        """
+        Batch version of record_overlaps_mask: the intervals of all records are checked against the index at once.
+        """
+        chroms, starts, ends = [], [], []
+        for record in records:
+            classification = record if isinstance(record, Classification) else Classification(record)
+            interval = self.get_interval_where_probe_aligns_to_truth(classification)
+            if interval is None:
+                # an empty interval never overlaps the mask
+                chroms.append(None)
+                starts.append(0)
+                ends.append(0)
+            else:
+                chroms.append(interval.data)
+                starts.append(interval.begin)
+                ends.append(interval.end)
+
+        return self.index.overlaps(chroms, starts, ends)
+
+    def filter_records_lazily(self, records: Iterable) -> Iterator:
+        for batch in split_in_batches(records, self.batch_size):
+            overlaps_mask = self.records_overlap_mask(batch)
+            yield from (
+                record
+                for record, record_overlaps_mask in zip(batch, overlaps_mask)
+                if not record_overlaps_mask
+            )
 
     @staticmethod
     def get_interval_where_probe_aligns_to_truth(
@@ -50,24 +96,15 @@ class PrecisionMasker(Masker):
         if record.is_unmapped:
             return None
 
-        aligned_pairs = record.get_aligned_pairs(with_seq=True)
-        query_interval = aligned_pairs.get_index_of_query_interval(
-            Interval(*record.query_probe.get_interval_or_default_interval_if_none())
-        )
-        ref_positions = aligned_pairs.get_ref_positions(
-            transform_Nones_into_halfway_positions=True
+        score = record.get_compact_alignment().score_query_interval(
+            *record.query_probe.get_interval_or_default_interval_if_none()
         )
-        ref_positions_query_aligns_to = ref_positions[slice(*query_interval)]
-        if len(ref_positions_query_aligns_to)==0:
+        if score.nb_of_aligned_pairs == 0:
             return None
 
-        ref_start, ref_end = (
-            math.floor(ref_positions_query_aligns_to[0]),
-            math.ceil(ref_positions_query_aligns_to[-1]),
-        )
         chromosome = record.ref_probe.chrom
 
-        return Interval(max(0, ref_start), ref_end + 1, chromosome)
+        return Interval(max(0, score.ref_start), score.ref_end, chromosome)
 
 
 class RecallMasker(Masker):
@@ -0,0 +1,103 @@
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple, Union
+import hashlib
+import json
+import logging
+import os
+
+import pandas as pd
+
+from evaluate.binary_report import load_binary_report, save_binary_report
+from evaluate.instrumentation import count
+
+PathLike = Union[str, Path]
+
+
+class PartialAggregates:
+    """
+    Persistent store of the partial aggregate of each report of an aggregation (e.g. the best mappings of each recall
+    report of a sample pair), so that when the set of reports grows, e.g. when a sample is added to the cohort, only the
+    new reports are loaded and aggregated: the others are read back from the store and merged with them.
+
+    Each partial aggregate is stored in folder as a binary report, with the path, size and modification time of the
+    report it was computed from. It is only reused while the report is unchanged, so a report recreated since (e.g.
+    because its truth probeset changed) is aggregated again. kind names the aggregation, and label anything else the
+    partial aggregate depends on (e.g. the sample and sample pair it is assigned to).
+    """
+
+    def __init__(self, folder: PathLike, kind: str):
+        self.folder = Path(folder)
+        self.kind = kind
+
+    @staticmethod
+    def _get_fingerprint(report_file: PathLike) -> dict:
+        stat = os.stat(report_file)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def _get_entry(self, report_file: PathLike, label: str) -> dict:
+        return {"kind": self.kind, "report_file": str(Path(report_file).absolute()), "label": label,
+                **self._get_fingerprint(report_file)}
+
+    def _get_paths(self, entry: dict) -> Tuple[Path, Path]:
+        key = json.dumps([entry["kind"], entry["report_file"], entry["label"]])
+        name = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return self.folder / f"{name}.partial_aggregate.npz", self.folder / f"{name}.partial_aggregate.json"
+
+    def load(self, report_file: PathLike, label: str = "", as_categorical: bool = True) -> Optional[pd.DataFrame]:
+        """
+        The partial aggregate stored for the current version of report_file, or None. String columns are loaded as
+        categoricals if as_categorical, as by load_binary_report().
+        """
+        entry = self._get_entry(report_file, label)
+        partial_aggregate_file, entry_file = self._get_paths(entry)
+        try:
+            with open(entry_file) as file:
+                stored_entry = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if stored_entry != entry or not partial_aggregate_file.exists():
+            return None
+        return load_binary_report(partial_aggregate_file, as_categorical=as_categorical)
+
+    def save(self, report_file: PathLike, partial_aggregate: pd.DataFrame, label: str = "") -> None:
+        """
+        Files are written under temporary names and renamed, the entry last, so that an interrupted save is never
+        loaded.
+        """
+        entry = self._get_entry(report_file, label)
+        partial_aggregate_file, entry_file = self._get_paths(entry)
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+        temporary_file = partial_aggregate_file.with_name(f"{partial_aggregate_file.name}.{os.getpid()}.tmp")
+        save_binary_report(partial_aggregate, temporary_file)
+        os.replace(temporary_file, partial_aggregate_file)
+
+        temporary_entry_file = entry_file.with_name(f"{entry_file.name}.{os.getpid()}.tmp")
+        with open(temporary_entry_file, "w") as file:
+            json.dump(entry, file)
+        os.replace(temporary_entry_file, entry_file)
+
+    def get(self, report_files: Sequence[PathLike],
+            aggregate: Callable[[List[int]], Iterable[pd.DataFrame]],
+            labels: Optional[Sequence[str]] = None, as_categorical: bool = True) -> List[pd.DataFrame]:
+        """
+        The partial aggregate of each report of report_files, in order. Those not in the store are computed with
+        aggregate(indexes), which is given the indexes of these reports in report_files and yields their partial
+        aggregates in the same order, and are stored.
+        """
+        labels = list(labels) if labels is not None else [""] * len(report_files)
+        partial_aggregates = [self.load(report_file, label, as_categorical)
+                              for report_file, label in zip(report_files, labels)]
+        indexes_to_aggregate = [index for index, partial_aggregate in enumerate(partial_aggregates)
+                                if partial_aggregate is None]
+        nb_of_reused = len(report_files) - len(indexes_to_aggregate)
+        logging.info(f"PartialAggregates({self.kind}): reusing {nb_of_reused} partial aggregates, aggregating "
+                     f"{len(indexes_to_aggregate)} reports")
+        count("nb_of_partial_aggregates_reused", nb_of_reused)
+        count("nb_of_partial_aggregates_computed", len(indexes_to_aggregate))
+
+        if indexes_to_aggregate:
+            for index, partial_aggregate in zip(indexes_to_aggregate, aggregate(indexes_to_aggregate)):
+                self.save(report_files[index], partial_aggregate, labels[index])
+                partial_aggregates[index] = partial_aggregate
+        return partial_aggregates
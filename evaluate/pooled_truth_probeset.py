@@ -0,0 +1,94 @@
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Mapping, Tuple, Union
+
+import pandas as pd
+import pysam
+
+from evaluate.classification import Classification
+
+
+class PooledTruthProbeset:
+    """
+    The truth probes of a sample in all of its sample pairs, pooled so that each distinct sequence is mapped once instead
+    of once per pair: a probe of a sample is usually in the truth probeset of many of its pairs.
+
+    The pooled probeset has one probe per distinct sequence, named pooled_probe_<index>. The probes table gives back,
+    for each pooled probe, the probes of each sample pair it stands for: their name in the truth probeset of the pair
+    and their index in it. Mappings of the pooled probes are attributed back to the probes of each pair with
+    attribute(), in the order of the truth probeset of each pair, as if each truth probeset had been mapped on its own
+    (bwa maps each single-end query independently of the others).
+    """
+    columns = ["pooled_probe", "sample_pair", "probe_index", "probe_name"]
+
+    def __init__(self, sequences: List[str], probes: pd.DataFrame):
+        self.sequences = sequences
+        self.probes = probes
+        self.sample_pairs = list(dict.fromkeys(probes["sample_pair"]))
+        # the (probe index, pooled probe, probe name) of the probes of each pair, in the order of its truth probeset
+        self._sample_pair_to_probes: Dict[str, List[Tuple[int, str, str]]] = {
+            sample_pair: [] for sample_pair in self.sample_pairs}
+        for pooled_probe, sample_pair, probe_index, probe_name in probes[self.columns].itertuples(index=False):
+            self._sample_pair_to_probes[sample_pair].append((int(probe_index), pooled_probe, probe_name))
+        for probes_of_sample_pair in self._sample_pair_to_probes.values():
+            probes_of_sample_pair.sort()
+        self._pooled_probes = set(probes["pooled_probe"])
+
+    @staticmethod
+    def get_pooled_probe_name(index: int) -> str:
+        return f"pooled_probe_{index}"
+
+    @classmethod
+    def from_truth_probesets(cls, sample_pair_to_truth_probeset: Mapping[str, Union[str, Path]]) -> "PooledTruthProbeset":
+        """
+        Probe names are read as bwa reads them, up to the first whitespace.
+        """
+        sequence_to_pooled_probe: Dict[str, str] = {}
+        rows = []
+        for sample_pair, truth_probeset in sample_pair_to_truth_probeset.items():
+            with pysam.FastxFile(str(truth_probeset)) as probes:
+                for probe_index, probe in enumerate(probes):
+                    pooled_probe = sequence_to_pooled_probe.get(probe.sequence)
+                    if pooled_probe is None:
+                        pooled_probe = sequence_to_pooled_probe[probe.sequence] = \
+                            cls.get_pooled_probe_name(len(sequence_to_pooled_probe))
+                    rows.append((pooled_probe, sample_pair, probe_index, probe.name))
+        return cls(list(sequence_to_pooled_probe), pd.DataFrame(rows, columns=cls.columns))
+
+    def save(self, pooled_truth_probeset: Union[str, Path], probes_table: Union[str, Path]) -> None:
+        with open(pooled_truth_probeset, "w") as fasta:
+            for index, sequence in enumerate(self.sequences):
+                fasta.write(f">{self.get_pooled_probe_name(index)}\n{sequence}\n")
+        self.probes.to_csv(probes_table, sep="\t", index=False)
+
+    @classmethod
+    def load(cls, probes_table: Union[str, Path]) -> "PooledTruthProbeset":
+        """
+        Only the probes table is loaded: the sequences are only needed to map the pooled probeset.
+        """
+        probes = pd.read_csv(probes_table, sep="\t", dtype={"pooled_probe": str, "sample_pair": str,
+                                                            "probe_index": int, "probe_name": str})
+        return cls([], probes)
+
+    def attribute(self, classifications: Iterable[Classification]) -> Dict[str, Iterator[Classification]]:
+        """
+        The classifications of the mappings of the pooled probes, copied for each probe of each sample pair they stand
+        for (see Classification.with_query_name()). The classifications of a pair are in the order of its truth
+        probeset, the mappings of a probe in the order they were given.
+
+        classifications are read at once, but the copies of each pair are generated lazily: only the classifications
+        of the pooled probes are held in memory, not their copies for every pair.
+        """
+        pooled_probe_to_classifications: Dict[str, List[Classification]] = {}
+        for classification in classifications:
+            if classification.query_name not in self._pooled_probes:
+                raise KeyError(f"{classification.query_name} is not a probe of the pooled truth probeset")
+            pooled_probe_to_classifications.setdefault(classification.query_name, []).append(classification)
+        return {sample_pair: self._generate_classifications_of_sample_pair(sample_pair, pooled_probe_to_classifications)
+                for sample_pair in self.sample_pairs}
+
+    def _generate_classifications_of_sample_pair(
+            self, sample_pair: str,
+            pooled_probe_to_classifications: Dict[str, List[Classification]]) -> Iterator[Classification]:
+        for _, pooled_probe, probe_name in self._sample_pair_to_probes[sample_pair]:
+            for classification in pooled_probe_to_classifications.get(pooled_probe, []):
+                yield classification.with_query_name(probe_name)
@@ -6,6 +6,7 @@ import pysam
 from .probe import ProbeHeader, Probe, ProbeInterval
 from .vcf import VCF
 from .vcf_file import VCFFile
+from .instrumentation import stage
 
 
 class OverlappingRecordsError(Exception):
@@ -24,12 +25,13 @@ class Query:
 
     def make_probes(self) -> Dict[str, str]:
         sample_to_probes_for_all_genes: Dict[str, str] = {sample: "" for sample in self.samples}
-        with pysam.FastxFile(str(self.vcf_ref)) as genes_fasta:
+        with stage("Query.make_probes") as making_probes, pysam.FastxFile(str(self.vcf_ref)) as genes_fasta:
             for gene in genes_fasta:
                 for sample in self.samples:
                     vcf_records = self.vcf_file.get_VCF_records_given_sample_and_gene(
                         sample, gene.name
                     )
+                    making_probes.add_records(len(vcf_records))
 
                     sample_to_probe_for_this_gene: Dict[
                         str, str
@@ -0,0 +1,80 @@
+from evaluate.classification import Classification
+from evaluate.filter import Filter
+from evaluate.masker import Masker
+from evaluate.mapq_sam_records_filter import MAPQSamRecordsFilter
+from typing import Dict, Iterable, Iterator, List, Optional
+from itertools import groupby
+
+
+class QueryNameNotGroupedError(Exception):
+    pass
+
+
+def group_records_by_query_name(records: Iterable[Classification],
+                                check_grouping: bool = False) -> Iterator[List[Classification]]:
+    """
+    Yields the records of each query as a list, relying on the records of a query being adjacent (as BWA outputs them):
+    a query whose records are not adjacent is yielded as several groups. Only the records of the current query are
+    held in memory.
+
+    If check_grouping, raises QueryNameNotGroupedError if a query reappears after another query instead. This is a
+    debugging aid: the query names seen are kept to detect it, so memory grows with the number of queries.
+    """
+    query_names_seen = set()
+    for query_name, records_of_the_query in groupby(records, key=lambda record: record.query_name):
+        if check_grouping:
+            if query_name in query_names_seen:
+                raise QueryNameNotGroupedError(
+                    f"Records of query {query_name} are not adjacent, SAM records must be grouped by query name")
+            query_names_seen.add(query_name)
+        yield list(records_of_the_query)
+
+
+class QueryNameGroupsFilter(Filter):
+    """
+    Applies, in a single pass over records grouped by query name, the filters that need all records of a query:
+        -uniqueness (optional): queries with more than one record are removed (see UniqueSamRecordsFilter);
+        -MAPQ: keeps only the best record of the query (see MAPQSamRecordsFilter);
+        -masking (optional): the kept record is removed if it overlaps the mask.
+
+    Only the records of the current query are held in memory, unless check_grouping (see group_records_by_query_name()).
+    The number of records seen before and after the MAPQ filter is counted as records are consumed.
+    """
+    def __init__(self, mapping_quality_threshold: int = 10, masker: Optional[Masker] = None,
+                 keep_only_unique_records: bool = False, check_grouping: bool = False):
+        self._mapq_sam_records_filter = MAPQSamRecordsFilter(mapping_quality_threshold=mapping_quality_threshold)
+        self._masker = masker
+        self._keep_only_unique_records = keep_only_unique_records
+        self._check_grouping = check_grouping
+        self.nb_of_records_before_mapq_sam_records_filter = 0
+        self.nb_of_records_after_mapq_sam_records_filter = 0
+
+    @property
+    def nb_of_records_removed_with_mapq_sam_records_filter(self) -> int:
+        return self.nb_of_records_before_mapq_sam_records_filter - self.nb_of_records_after_mapq_sam_records_filter
+
+    def get_record_to_keep_of_query(self, records: List[Classification]) -> Optional[Classification]:
+        if self._keep_only_unique_records and len(records) > 1:
+            return None
+        return self._mapq_sam_records_filter.get_best_record_of_query(records)
+
+    def filter_records_lazily(self, records: Iterable[Classification]) -> Iterator[Classification]:
+        for records_of_the_query in group_records_by_query_name(records, self._check_grouping):
+            self.nb_of_records_before_mapq_sam_records_filter += len(records_of_the_query)
+            record_to_keep = self.get_record_to_keep_of_query(records_of_the_query)
+            if record_to_keep is None:
+                continue
+            self.nb_of_records_after_mapq_sam_records_filter += 1
+
+            if self._masker is not None and self._masker.record_should_be_filtered_out(record_to_keep):
+                continue
+            yield record_to_keep
+
+    def filter_records(self, records: Iterable[Classification]) -> List[Classification]:
+        return list(self.filter_records_lazily(records))
+
+    def get_counts(self) -> Dict[str, int]:
+        return {
+            "nb_of_records_before_mapq_sam_records_filter": self.nb_of_records_before_mapq_sam_records_filter,
+            "nb_of_records_after_mapq_sam_records_filter": self.nb_of_records_after_mapq_sam_records_filter,
+        }
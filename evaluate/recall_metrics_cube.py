@@ -0,0 +1,124 @@
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+import logging
+import pandas as pd
+
+from evaluate.calculator import RecallCalculator
+from evaluate.instrumentation import stage
+from evaluate.partial_aggregates import PartialAggregates
+from evaluate.report import RecallReport, BestMappingReducer, concat_with_shared_categories, read_report_files
+from evaluate.reporter import RecallReporter
+
+
+class RecallMetricsCube:
+    """
+    Recall metrics with no GT_CONF filter of a set of recall reports, one per (sample, sample pair), at every level the
+    pipeline reports them: per sample pair, per sample, per sample and number of samples, and over all reports.
+
+    Each report is loaded once and reduced to the best mapping of each truth probe. The best mappings of all reports
+    are then sorted once by (good_eval, GT_CONF), so the best mappings of a group of reports are the first row of each
+    truth probe in the group: exactly the rows RecallReport.from_files() keeps when loading the reports of the group.
+    """
+    columns_to_load = ["query_probe_header", "ref_probe_header", "classification"]
+    # only threshold sweep reports have it
+    optional_columns_to_load = [RecallReporter.threshold_column]
+
+    def __init__(self, best_mappings: pd.DataFrame):
+        self._best_mappings = best_mappings.sort_values(["good_eval", "GT_CONF"], ascending=False, kind="mergesort")
+
+    @classmethod
+    def from_files(cls, samples_sample_pairs_and_report_files: Iterable[Tuple[str, str, Path]],
+                   threads: int = 1, gt_conf_percentile: int = 0,
+                   partial_aggregates: Optional[PartialAggregates] = None) -> "RecallMetricsCube":
+        """
+        Reports can be threshold sweep reports (see RecallReporter.write_threshold_sweep_report()): only their rows of
+        gt_conf_percentile are then used, i.e. the rows with no GT_CONF filter by default.
+
+        The best mappings of each report are mergeable partial aggregates: with partial_aggregates, those of the
+        reports already aggregated in a previous run are read back from it, and only the other reports are loaded.
+        """
+        samples_sample_pairs_and_report_files = list(samples_sample_pairs_and_report_files)
+        report_files = [report_file for _, _, report_file in samples_sample_pairs_and_report_files]
+
+        def get_best_mappings_of_each_report(indexes: List[int]) -> Iterator[pd.DataFrame]:
+            dfs = read_report_files([report_files[index] for index in indexes], columns=cls.columns_to_load,
+                                    as_categorical=True, threads=threads, dtypes=RecallReport.column_dtypes,
+                                    optional_columns=cls.optional_columns_to_load)
+            for index, df in zip(indexes, dfs):
+                sample, sample_pair, report_file = samples_sample_pairs_and_report_files[index]
+                logging.info(f"RecallMetricsCube.from_files: processing report {index+1} ({report_file})...")
+                df = cls._get_rows_of_gt_conf_percentile(df, gt_conf_percentile)
+                loading.add_records(len(df))
+                yield cls._get_best_mappings_of_report(df, sample, sample_pair)
+
+        with stage("RecallMetricsCube.from_files") as loading:
+            if partial_aggregates is None:
+                best_mappings_of_each_report = list(get_best_mappings_of_each_report(list(range(len(report_files)))))
+            else:
+                labels = [f"{sample}/{sample_pair}/gt_conf_percentile_{gt_conf_percentile}"
+                          for sample, sample_pair, _ in samples_sample_pairs_and_report_files]
+                best_mappings_of_each_report = partial_aggregates.get(report_files, get_best_mappings_of_each_report,
+                                                                      labels)
+            return cls(concat_with_shared_categories(best_mappings_of_each_report, ignore_index=True))
+
+    @staticmethod
+    def _get_rows_of_gt_conf_percentile(df: pd.DataFrame, gt_conf_percentile: int) -> pd.DataFrame:
+        if RecallReporter.threshold_column not in df.columns:
+            return df
+        is_of_gt_conf_percentile = df[RecallReporter.threshold_column] == gt_conf_percentile
+        return df[is_of_gt_conf_percentile].drop(columns=RecallReporter.threshold_column)
+
+    @staticmethod
+    def _get_best_mappings_of_report(df: pd.DataFrame, sample: str, sample_pair: str) -> pd.DataFrame:
+        best_mapping_reducer = BestMappingReducer()
+        best_mapping_reducer.fold(df)
+        best_mappings = RecallReport([best_mapping_reducer.get_best_mappings()],
+                                     concatenate_dfs_one_by_one_keeping_only_best_mappings=False,
+                                     encode_columns=True).report
+        return best_mappings.assign(
+            sample=pd.Categorical([sample] * len(best_mappings)),
+            sample_pair=pd.Categorical([sample_pair] * len(best_mappings)),
+        )
+
+    @staticmethod
+    def _get_recall_calculator(best_mappings: pd.DataFrame) -> RecallCalculator:
+        return RecallCalculator(RecallReport([best_mappings], concatenate_dfs_one_by_one_keeping_only_best_mappings=False))
+
+    def _get_best_mappings_per(self, keys: List[str]) -> pd.DataFrame:
+        return self._best_mappings.drop_duplicates(keys + ["query_probe_header"], keep="first")
+
+    def _get_recall_reports_per(self, keys: List[str], get_recall_report) -> pd.DataFrame:
+        """
+        Applies get_recall_report(calculator) to the calculator of each group of reports, and concatenates the results
+        with the keys of the group as last columns.
+        """
+        recall_dfs = []
+        by = keys if len(keys) > 1 else keys[0]
+        for group, best_mappings in self._get_best_mappings_per(keys).groupby(by, observed=True, sort=True):
+            group = group if isinstance(group, tuple) else (group,)
+            recall_df = get_recall_report(self._get_recall_calculator(best_mappings))
+            recall_dfs.append(recall_df.assign(**dict(zip(keys, group))))
+        return pd.concat(recall_dfs, ignore_index=True)
+
+    def get_recall_report_per_sample_pair(self, all_gts=(0,)) -> pd.DataFrame:
+        return self._get_recall_reports_per(
+            ["sample", "sample_pair"], lambda calculator: calculator.get_recall_report(all_gts))
+
+    def get_recall_report_per_sample(self, all_gts=(0,)) -> pd.DataFrame:
+        return self._get_recall_reports_per(
+            ["sample"], lambda calculator: calculator.get_recall_report(all_gts))
+
+    def get_recall_report_per_sample_wrt_truth_probes_for_those_present_in_a_given_nb_of_samples(
+            self, list_of_nb_of_samples) -> pd.DataFrame:
+        return self._get_recall_reports_per(
+            ["sample"],
+            lambda calculator: calculator.get_recall_report_wrt_truth_probes_for_those_present_in_a_given_nb_of_samples(
+                list_of_nb_of_samples))
+
+    def get_recall_allele_seqs_vs_nb_of_samples_report(self, list_with_nb_of_samples) -> pd.DataFrame:
+        return self._get_recall_calculator(self._get_best_mappings_per([])) \
+            .get_recall_allele_seqs_vs_nb_of_samples_report(list_with_nb_of_samples)
+
+    def get_recall_alleles_vs_nb_of_samples_report(self, list_with_nb_of_samples) -> pd.DataFrame:
+        return self._get_recall_calculator(self._get_best_mappings_per([])) \
+            .get_recall_alleles_vs_nb_of_samples_report(list_with_nb_of_samples)
@@ -1,17 +1,115 @@
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 import pandas as pd
-from typing import Iterable, List
+from pandas.api.types import union_categoricals
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+import json
 import logging
 import math
+import time
+from evaluate.binary_report import is_binary_report_path, read_report_file, save_binary_report
+from evaluate.instrumentation import stage
+from evaluate.partial_aggregates import PartialAggregates
+
+INT32_MIN, INT32_MAX = -2 ** 31, 2 ** 31 - 1
+
 
 class DelimNotFoundError(Exception):
     pass
 class ReturnTypeDoesNotMatchError(Exception):
     pass
 
+def encode_report_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Interns the repeated strings of a report: probe headers, classification, sample and tool become categoricals
+    (integer codes plus a dictionary of the distinct values). Numeric columns are left untouched.
+    """
+    df = df.copy()
+    for column in Report.columns_to_encode:
+        if column in df.columns and df[column].dtype == object:
+            df[column] = df[column].astype("category")
+    return df
+
+
+def concat_with_shared_categories(dfs: Iterable[pd.DataFrame], **concat_kwargs) -> pd.DataFrame:
+    """
+    pd.concat falls back to object columns when categoricals have different categories, so the categories of each
+    categorical column are first unified (and sorted) across all dfs.
+    """
+    dfs = list(dfs)
+    if not dfs:
+        return pd.concat(dfs, **concat_kwargs)
+
+    categorical_columns = [column for column in dfs[0].columns if isinstance(dfs[0][column].dtype, pd.CategoricalDtype)]
+    for column in categorical_columns:
+        shared_categories = union_categoricals(
+            [df[column] for df in dfs], sort_categories=True, ignore_order=True).categories
+        dfs = [df.assign(**{column: df[column].cat.set_categories(shared_categories)}) for df in dfs]
+    return pd.concat(dfs, **concat_kwargs)
+
+
+def read_report_files(paths: Iterable[Path], columns: List[str] = None, as_categorical: bool = False,
+                      threads: int = 1, dtypes: Optional[Dict[str, str]] = None,
+                      optional_columns: Sequence[str] = ()) -> Iterator[pd.DataFrame]:
+    """
+    Lazily reads report files, yielding them in the order of paths. With threads > 1, up to 2 * threads files are
+    read ahead concurrently in a thread pool (file reads and parsing release the GIL), which hides the latency of each
+    file on network filesystems while keeping a bounded number of files in memory. dtypes are the dtypes of the
+    columns of TSV reports (see read_report_file()), Report.column_dtypes by default. Every report must have columns,
+    optional_columns are loaded from the reports that have them.
+    """
+    if dtypes is None:
+        dtypes = Report.column_dtypes
+
+    def read(path: Path) -> pd.DataFrame:
+        start = time.perf_counter()
+        with stage("Report.read_file", log=False) as reading:
+            df = read_report_file(path, columns=columns, as_categorical=as_categorical, dtypes=dtypes,
+                                  optional_columns=optional_columns)
+            reading.add_records(len(df))
+        logging.info(f"read_report_files: loaded {path} ({len(df)} rows) in {time.perf_counter() - start:.3f}s")
+        return df
+
+    if threads <= 1:
+        yield from map(read, paths)
+        return
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        dfs_being_read = deque()
+        for path in paths:
+            dfs_being_read.append(executor.submit(read, path))
+            if len(dfs_being_read) > 2 * threads:
+                yield dfs_being_read.popleft().result()
+        while dfs_being_read:
+            yield dfs_being_read.popleft().result()
+
+
 class Report:
-    def __init__(self, dfs: Iterable[pd.DataFrame]):
-        self.report = pd.concat(dfs, ignore_index=True)
+    # dtypes of the report columns when reading TSV reports, to skip type inference. The classification column holds
+    # the assessments, strings in recall reports and floats in precision reports: RecallReport declares it, and it is
+    # inferred in precision reports. Binary reports keep their dtypes.
+    column_dtypes = {
+        "sample": "str", "tool": "str", "query_probe_header": "str", "ref_probe_header": "str",
+        "GT_CONF": "float64", "good_eval": "bool", "gt_conf_percentile": "int64",
+    }
+    columns_to_encode = ["sample", "tool", "query_probe_header", "ref_probe_header", "classification"]
+    helper_columns = []
+    # helper columns the report derives from the other columns when they are not in the files it is loaded from
+    optional_helper_columns = []
+
+    def __init__(self, dfs: Iterable[pd.DataFrame], encode_columns: bool = False):
+        self.report = self._concat(dfs, encode_columns, ignore_index=True)
+
+    @staticmethod
+    def _concat(dfs: Iterable[pd.DataFrame], encode: bool, **concat_kwargs) -> pd.DataFrame:
+        if encode:
+            return concat_with_shared_categories((encode_report_columns(df) for df in dfs), **concat_kwargs)
+        return pd.concat(dfs, **concat_kwargs)
+
+    def is_encoded(self) -> bool:
+        return "query_probe_header" in self.report.columns and \
+               isinstance(self.report["query_probe_header"].dtype, pd.CategoricalDtype)
 
     def get_report_satisfying_confidence_threshold(
         self, conf_threshold: float
@@ -30,9 +128,25 @@ class Report:
         return self.report["GT_CONF"].min()
 
     @classmethod
-    def from_files(cls, paths: List[Path]) -> ["PrecisionReport", "RecallReport"]:
-        reports = (pd.read_csv(path, sep="\t", keep_default_na=False) for path in paths)
-        return cls(reports)
+    def from_files(cls, paths: List[Path], encode_columns: bool = False,
+                   columns: List[str] = None, threads: int = 1) -> ["PrecisionReport", "RecallReport"]:
+        """
+        Reads TSV or binary (.npz) reports, with threads threads. If columns is given, only these columns are loaded:
+        they must be in every file, except the optional_helper_columns.
+        """
+        with stage(f"{cls.__name__}.from_files") as loading:
+            reports = list(read_report_files(paths, columns=cls._get_required_columns(columns),
+                                             as_categorical=encode_columns, threads=threads, dtypes=cls.column_dtypes,
+                                             optional_columns=cls.optional_helper_columns))
+            report = cls(reports, encode_columns=encode_columns)
+            loading.add_records(len(report.report))
+        return report
+
+    @classmethod
+    def _get_required_columns(cls, columns: Optional[List[str]]) -> Optional[List[str]]:
+        if columns is None:
+            return None
+        return [column for column in columns if column not in cls.optional_helper_columns]
 
     def __eq__(self, other: "Report"):
         return self.report.equals(other.report)
@@ -57,10 +171,23 @@ class Report:
         except ValueError:
             raise ReturnTypeDoesNotMatchError
 
+    @staticmethod
+    def get_values_from_headers(headers: pd.Series, field: str, field_type, default_value) -> pd.Series:
+        get_value = lambda header: Report.get_value_from_header_fast(header, field, field_type, default_value)
+        if isinstance(headers.dtype, pd.CategoricalDtype) and not headers.isna().any():
+            # parses each distinct header once, then expands the values through the codes
+            values = headers.cat.categories.map(get_value).to_numpy()[headers.cat.codes.to_numpy()]
+            values = pd.Series(values, index=headers.index, dtype=values.dtype)
+            if field_type is int and values.dtype.kind == "i" and \
+                    (len(values) == 0 or (values.min() >= INT32_MIN and values.max() <= INT32_MAX)):
+                # int32 and no narrower: arithmetic on the columns (e.g. NUMBER_OF_DIFFERENT_ALLELE_SEQUENCES + 1)
+                # keeps their dtype, and would overflow in int8 or int16
+                values = values.astype("int32")
+            return values
+        return headers.apply(get_value)
+
     def _create_field_from_header(self, field:str, probe_header: str, field_type, default_value) -> None:
-        self.report[field] = self.report[probe_header].apply(
-            lambda header: Report.get_value_from_header_fast(header, field, field_type, default_value)
-        )
+        self.report[field] = self.get_values_from_headers(self.report[probe_header], field, field_type, default_value)
 
     def _create_gt_conf_column_from(self, probe_header: str) -> None:
         self._create_field_from_header("GT_CONF", probe_header, float, 0.0)
@@ -79,30 +206,112 @@ class Report:
 
 
     def _create_good_eval_column(self) -> None:
-        self.report["good_eval"] = self.report["classification"].apply(
-            lambda classification: classification in ["primary_correct", "secondary_correct", "supplementary_correct"]
+        self.report["good_eval"] = self.report["classification"].isin(
+            ["primary_correct", "secondary_correct", "supplementary_correct"]
         )
 
-    # Note: not tested (trivial method)
-    def save_report(self, file_handle):
-        self.report.to_csv(file_handle, sep="\t", header=True, index=False)
+    def _has_helper_columns(self) -> bool:
+        """
+        Whether the helper columns were already parsed, e.g. when loading a report saved with them.
+        """
+        return all(
+            column in self.report.columns and self.report[column].dtype != object
+            for column in self.helper_columns
+        )
+
+    def save_report(self, file):
+        """
+        Saves the report with its helper columns, in binary format if file is a path ending with .npz, as TSV otherwise.
+        """
+        if is_binary_report_path(file):
+            save_binary_report(self.report, file)
+        else:
+            self.report.to_csv(file, sep="\t", header=True, index=False)
 
 
 class PrecisionReport(Report):
-    def __init__(self, dfs: Iterable[pd.DataFrame]):
-        self.report = pd.concat(dfs)
-        self._create_gt_conf_column_from("query_probe_header")
+    helper_columns = ["GT_CONF"]
+    # GT_CONF is parsed from the query probe header if the report was saved without it
+    optional_helper_columns = helper_columns
+    columns_needed_by_calculator = ["query_probe_header", "classification"] + helper_columns
+
+    def __init__(self, dfs: Iterable[pd.DataFrame], encode_columns: bool = False):
+        self.report = self._concat(dfs, encode_columns)
+        if not self._has_helper_columns():
+            self._create_gt_conf_column_from("query_probe_header")
+
+
+class BestMappingReducer:
+    """
+    Keeps, for each truth probe (query_probe_header), only its best mapping among all the dfs folded in: a mapping
+    with good evaluation is better than one without, then the highest GT_CONF is better. Ties are won by the mapping
+    seen first. dfs are folded one at a time into a frame indexed by query_probe_header, so memory is proportional to
+    the number of truth probes and time is linear in the total number of rows.
+    """
+    def __init__(self):
+        self._best = None
+        self._columns = None
+
+    @staticmethod
+    def _get_best_mapping_of_each_truth_probe(df: pd.DataFrame) -> pd.DataFrame:
+        df = df.assign(
+            _gt_conf=Report.get_values_from_headers(df["ref_probe_header"], "GT_CONF", float, 0.0),
+            _good_eval=df["classification"].isin(["primary_correct", "secondary_correct", "supplementary_correct"]),
+        )
+        df = df.sort_values(["_good_eval", "_gt_conf"], ascending=False, kind="mergesort")
+        return df.drop_duplicates("query_probe_header", keep="first").set_index("query_probe_header")
+
+    def fold(self, df: pd.DataFrame) -> None:
+        if self._columns is None:
+            self._columns = df.columns
+        df = self._get_best_mapping_of_each_truth_probe(df)
+
+        if self._best is None:
+            self._best = df
+            return
+
+        truth_probes_seen_before = df.index.intersection(self._best.index)
+        new_mappings = df.loc[truth_probes_seen_before]
+        best_mappings = self._best.loc[truth_probes_seen_before]
+        new_mapping_is_better = (new_mappings["_good_eval"] > best_mappings["_good_eval"]) | (
+            (new_mappings["_good_eval"] == best_mappings["_good_eval"]) &
+            (new_mappings["_gt_conf"] > best_mappings["_gt_conf"])
+        )
+        truth_probes_with_better_mapping = truth_probes_seen_before[new_mapping_is_better.to_numpy()]
+        self._best.loc[truth_probes_with_better_mapping] = new_mappings.loc[truth_probes_with_better_mapping]
+
+        truth_probes_not_seen_before = df.index.difference(self._best.index)
+        self._best = pd.concat([self._best, df.loc[truth_probes_not_seen_before]])
+
+    def get_best_mappings(self) -> pd.DataFrame:
+        """
+        Returns the best mappings sorted by query_probe_header, with the columns of the first df folded in.
+        """
+        if self._best is None:
+            return pd.DataFrame()
+        best = self._best.sort_index().reset_index()
+        return best[self._columns].reset_index(drop=True)
 
 
 class RecallReport(Report):
+    column_dtypes = {**Report.column_dtypes, "classification": "str"}
+    helper_columns = ["GT_CONF", "PANGENOME_VARIATION_ID", "NUMBER_OF_ALLELES", "ALLELE_ID",
+                      "NUMBER_OF_DIFFERENT_ALLELE_SEQUENCES", "ALLELE_SEQUENCE_ID", "NB_OF_SAMPLES", "good_eval"]
+    # for reports saved with their helper columns, which do not need the ref probe header
+    columns_needed_by_calculator = ["query_probe_header", "classification"] + helper_columns
+
     def __init__(self, dfs: Iterable[pd.DataFrame],
-                 concatenate_dfs_one_by_one_keeping_only_best_mappings: bool = True):
+                 concatenate_dfs_one_by_one_keeping_only_best_mappings: bool = True,
+                 encode_columns: bool = False):
         if concatenate_dfs_one_by_one_keeping_only_best_mappings:
-            self._concatenate_dfs_one_by_one_keeping_only_best_mappings(dfs)
+            self._reduce_dfs_keeping_only_best_mappings(dfs)
+            if encode_columns:
+                self.report = encode_report_columns(self.report)
         else:
             #  simple concatenation
-            super().__init__(dfs)
-        self._create_helper_columns()
+            super().__init__(dfs, encode_columns=encode_columns)
+        if not self._has_helper_columns():
+            self._create_helper_columns()
         self.assure_there_are_no_duplicated_evaluation()
 
 
@@ -134,19 +343,58 @@ class RecallReport(Report):
 
 
     @classmethod
-    def from_files(cls, paths: List[Path], concatenate_dfs_one_by_one_keeping_only_best_mappings: bool = True) -> "RecallReport":
-        reports = (pd.read_csv(path, sep="\t", keep_default_na=False) for path in paths)
-        return cls(reports, concatenate_dfs_one_by_one_keeping_only_best_mappings)
+    def from_files(cls, paths: List[Path], concatenate_dfs_one_by_one_keeping_only_best_mappings: bool = True,
+                   encode_columns: bool = False, columns: List[str] = None, threads: int = 1,
+                   partial_aggregates: Optional[PartialAggregates] = None) -> "RecallReport":
+        """
+        With concatenate_dfs_one_by_one_keeping_only_best_mappings, the best mappings of each report are mergeable
+        partial aggregates: with partial_aggregates, those of the reports already aggregated in a previous run are read
+        back from it, and only the other reports are loaded.
+        """
+        # reports are folded one at a time into the best mappings, so they are read lazily
+        with stage(f"{cls.__name__}.from_files") as loading:
+            if partial_aggregates is not None and concatenate_dfs_one_by_one_keeping_only_best_mappings:
+                reports = partial_aggregates.get(
+                    paths, lambda indexes: cls._get_best_mappings_of_each_report(
+                        [paths[index] for index in indexes], columns, encode_columns, threads),
+                    labels=[json.dumps(columns)] * len(paths), as_categorical=encode_columns)
+            else:
+                reports = read_report_files(paths, columns=columns, as_categorical=encode_columns, threads=threads,
+                                            dtypes=cls.column_dtypes)
+            report = cls(reports, concatenate_dfs_one_by_one_keeping_only_best_mappings, encode_columns)
+            loading.add_records(len(report.report))
+        return report
+
+    @staticmethod
+    def _get_best_mappings_of_each_report(paths: List[Path], columns: Optional[List[str]], encode_columns: bool,
+                                          threads: int) -> Iterator[pd.DataFrame]:
+        for df in read_report_files(paths, columns=columns, as_categorical=encode_columns, threads=threads,
+                                    dtypes=RecallReport.column_dtypes):
+            best_mapping_reducer = BestMappingReducer()
+            best_mapping_reducer.fold(df)
+            yield best_mapping_reducer.get_best_mappings()
 
 
     # Note: trivial method, not tested
     def get_number_of_truth_probes(self):
-        return len(self.report["query_probe_header"].unique())
+        return self.report["query_probe_header"].nunique(dropna=False)
     def get_number_of_variants(self) -> int:
         return len(self.report["PANGENOME_VARIATION_ID"].unique())
 
 
+    def _reduce_dfs_keeping_only_best_mappings(self, dfs: Iterable[pd.DataFrame]) -> None:
+        best_mapping_reducer = BestMappingReducer()
+        for index, df in enumerate(dfs):
+            logging.info(f"RecallReport._reduce_dfs_keeping_only_best_mappings: processing df {index+1}...")
+            best_mapping_reducer.fold(df)
+        self.report = best_mapping_reducer.get_best_mappings()
+
+
     def _concatenate_dfs_one_by_one_keeping_only_best_mappings(self, dfs: Iterable[pd.DataFrame]) -> None:
+        """
+        The slower reference version of _reduce_dfs_keeping_only_best_mappings(): concatenates and re-sorts the
+        accumulated report with each df.
+        """
         self.report = None
         original_columns = []
         for index, df in enumerate(dfs):
@@ -164,7 +412,7 @@ class RecallReport(Report):
     def _keep_only_best_mapping_for_all_truth_probes(self) -> None:
         self._create_gt_conf_column_from("ref_probe_header")
         self._create_good_eval_column()
-        self.report = self.report.sort_values(["good_eval", "GT_CONF"], ascending=False).groupby("query_probe_header", as_index=False).first()
+        self.report = self.report.sort_values(["good_eval", "GT_CONF"], ascending=False).groupby("query_probe_header", as_index=False, observed=True).first()
 
 
 
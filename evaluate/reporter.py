@@ -1,12 +1,83 @@
-from typing import Iterable, TextIO
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, TextIO, List, Iterator, Tuple, Union
+from operator import attrgetter
+import csv
+import multiprocessing.pool
 import pandas as pd
+import pysam
 from evaluate.classifier import Classifier
+from evaluate.classification import Classification, SamRecord
+from evaluate.utils import split_in_batches, split_in_batches_of_groups
+from evaluate.instrumentation import iterate, stage
+from evaluate.binary_report import BinaryReportWriter, is_binary_report_path, save_binary_report
+
+
+def get_report_entries(classifier_name: str,
+                       classifications: Iterable[Classification],
+                       fixed_info_to_add_to_query_probe_header: str = None,
+                       fixed_info_to_add_to_ref_probe_header: str = None) -> List[list]:
+    report_entries = []
+    for classification in classifications:
+        assessment = classification.assessment()
+
+        query_probe_header = str(classification.query_probe.header)
+        if fixed_info_to_add_to_query_probe_header is not None:
+            query_probe_header += fixed_info_to_add_to_query_probe_header
+
+        ref_probe_header = str(classification.ref_probe.header)
+        if fixed_info_to_add_to_ref_probe_header is not None:
+            ref_probe_header += fixed_info_to_add_to_ref_probe_header
+
+        report_entries.append(
+            [classifier_name, query_probe_header, ref_probe_header, assessment]
+        )
+    return report_entries
+
+
+# Note: module-level so that it can be pickled and sent to the worker processes
+def _get_report_entries_for_a_batch(args: tuple) -> Tuple[List[list], Dict[str, int]]:
+    """
+    Classifies, filters and assesses a batch of records in a worker process. Returns the report entries, with
+    extra_columns appended to each, and how much the counts of the records filter grew while filtering the batch.
+    """
+    (classifier_type, classifier_name, records_filter, records,
+     fixed_info_to_add_to_query_probe_header, fixed_info_to_add_to_ref_probe_header, extra_columns) = args
+    counts_before = records_filter.get_counts() if records_filter is not None else {}
+    classifier = classifier_type(sam=records, name=classifier_name, records_filter=records_filter)
+    report_entries = get_report_entries(classifier_name, classifier.generate_classifications(),
+                                        fixed_info_to_add_to_query_probe_header, fixed_info_to_add_to_ref_probe_header)
+    if extra_columns:
+        report_entries = [report_entry + extra_columns for report_entry in report_entries]
+    counts_added = {
+        name: value - counts_before[name] for name, value in records_filter.get_counts().items()
+    } if records_filter is not None else {}
+    return report_entries, counts_added
+
+
+def _get_record_to_send_to_workers(record: Union[Classification, pysam.AlignedSegment, SamRecord]):
+    if isinstance(record, pysam.AlignedSegment):
+        return SamRecord.from_record(record)
+    return record
 
 
 class Reporter:
-    def __init__(self, classifiers: Iterable[Classifier], delim: str = "\t"):
+    """
+    If processes > 1, the records of each classifier are read in the parent process and sent in batches of batch_size
+    to a pool of worker processes, which build the classifications, apply the records filter of the classifier and
+    assess them. pysam records are sent as SamRecords; records a classifier already holds as classifications are sent
+    as they are. Batches never split the records of a query, as the filter may need them all, and are merged back in
+    their original order, so the report is the same as the one generated with a single process. The counts of the
+    records filter are added back to the filter of the classifier. A single pool serves all the classifiers of a
+    report (e.g. all the thresholds of a sweep), and at most 2 * processes batches are in flight at a time, so records
+    are not read faster than they are assessed.
+    """
+    def __init__(self, classifiers: Iterable[Classifier], delim: str = "\t",
+                 processes: int = 1, batch_size: int = 10000):
         self.classifiers = classifiers
         self.delim = delim
+        self.processes = processes
+        self.batch_size = batch_size
         self.columns = [
             "sample",
             "query_probe_header",
@@ -17,36 +88,182 @@ class Reporter:
     def _generate_report(self,
                          fixed_info_to_add_to_query_probe_header: str = None,
                          fixed_info_to_add_to_ref_probe_header: str = None) -> pd.DataFrame:
-        report_entries = []
-        for classifier in self.classifiers:
-            classifications = classifier.classify()
-            for classification in classifications:
-                assessment = classification.assessment()
+        report_entries = self._generate_report_entries(fixed_info_to_add_to_query_probe_header,
+                                                       fixed_info_to_add_to_ref_probe_header)
+        return pd.DataFrame(data=list(report_entries), columns=self.columns)
+
+    def _generate_report_entries(self,
+                                 fixed_info_to_add_to_query_probe_header: str = None,
+                                 fixed_info_to_add_to_ref_probe_header: str = None) -> Iterator[list]:
+        return self._generate_report_entries_of_classifiers(
+            (classifier, fixed_info_to_add_to_query_probe_header, fixed_info_to_add_to_ref_probe_header, [])
+            for classifier in self.classifiers)
+
+    def _generate_report_entries_of_classifiers(
+            self, classifiers_and_fixed_infos: Iterable[Tuple[Classifier, str, str, list]]) -> Iterator[list]:
+        """
+        Lazily yields the report rows of each (classifier, fixed info to add to the query probe header, fixed info to
+        add to the ref probe header, extra columns) of classifiers_and_fixed_infos, in order, the extra columns
+        appended to each row: classifications are produced, assessed and formatted one batch at a time.
+        The time spent reading and classifying records and the time spent assessing them are timed as two stages.
+        """
+        if self.processes > 1:
+            yield from self._generate_report_entries_in_parallel(classifiers_and_fixed_infos)
+            return
+
+        for (classifier, fixed_info_to_add_to_query_probe_header, fixed_info_to_add_to_ref_probe_header,
+             extra_columns) in classifiers_and_fixed_infos:
+            classifications = iterate("Classifier.classify", classifier.generate_classifications(), log=False)
+            for batch in split_in_batches(classifications, self.batch_size):
+                with stage("Reporter.assess", log=False) as assessing:
+                    report_entries = get_report_entries(
+                        classifier.name, batch,
+                        fixed_info_to_add_to_query_probe_header, fixed_info_to_add_to_ref_probe_header)
+                    assessing.add_records(len(report_entries))
+                if extra_columns:
+                    report_entries = [report_entry + extra_columns for report_entry in report_entries]
+                yield from report_entries
+
+    def _write_report(self, file: Union[TextIO, str, Path],
+                      fixed_info_to_add_to_query_probe_header: str = None,
+                      fixed_info_to_add_to_ref_probe_header: str = None) -> int:
+        """
+        Writes the report incrementally, without building the DataFrame, in the same format as save_report(): file is
+        a file handle or a path, and paths ending with .npz get a binary report. Returns the number of rows written.
+        """
+        report_entries = self._generate_report_entries(fixed_info_to_add_to_query_probe_header,
+                                                       fixed_info_to_add_to_ref_probe_header)
+        return self._write_report_entries(file, report_entries, self.columns)
 
-                query_probe_header = str(classification.query_probe.header)
-                if fixed_info_to_add_to_query_probe_header is not None:
-                    query_probe_header += fixed_info_to_add_to_query_probe_header
+    def _write_report_entries(self, file: Union[TextIO, str, Path], report_entries: Iterable[list],
+                              columns: List[str]) -> int:
+        with stage("Reporter.write_report") as writing:
+            if is_binary_report_path(file):
+                nb_of_rows = self._write_binary_report(file, report_entries, columns)
+            elif isinstance(file, (str, Path)):
+                with open(file, "w") as file_handle:
+                    nb_of_rows = self._write_text_report(file_handle, report_entries, columns)
+            else:
+                nb_of_rows = self._write_text_report(file, report_entries, columns)
+            writing.add_records(nb_of_rows)
+        return nb_of_rows
 
-                ref_probe_header = str(classification.ref_probe.header)
-                if fixed_info_to_add_to_ref_probe_header is not None:
-                    ref_probe_header += fixed_info_to_add_to_ref_probe_header
+    def _write_text_report(self, file_handle: TextIO, report_entries: Iterable[list], columns: List[str]) -> int:
+        writer = csv.writer(file_handle, delimiter=self.delim, lineterminator="\n")
+        writer.writerow(columns)
+        nb_of_rows = 0
+        for report_entry in report_entries:
+            writer.writerow(report_entry)
+            nb_of_rows += 1
+        return nb_of_rows
 
-                report_entries.append(
-                    [classifier.name, query_probe_header, ref_probe_header, assessment]
-                )
+    def _write_binary_report(self, path: Union[str, Path], report_entries: Iterable[list], columns: List[str]) -> int:
+        writer = BinaryReportWriter(columns)
+        nb_of_rows = 0
+        for report_entry in report_entries:
+            writer.write_row(report_entry)
+            nb_of_rows += 1
+        writer.save(path)
+        return nb_of_rows
 
-        return pd.DataFrame(data=report_entries, columns=self.columns)
+    def _generate_batches_args(
+            self, classifiers_and_fixed_infos: Iterable[Tuple[Classifier, str, str, list]]
+    ) -> Iterator[Tuple[Classifier, tuple]]:
+        for (classifier, fixed_info_to_add_to_query_probe_header, fixed_info_to_add_to_ref_probe_header,
+             extra_columns) in classifiers_and_fixed_infos:
+            records = iterate("Reporter.read_records",
+                              (_get_record_to_send_to_workers(record) for record in classifier.sam), log=False)
+            for batch in split_in_batches_of_groups(records, self.batch_size, key=attrgetter("query_name")):
+                yield classifier, (type(classifier), classifier.name, classifier.records_filter, batch,
+                                   fixed_info_to_add_to_query_probe_header, fixed_info_to_add_to_ref_probe_header,
+                                   extra_columns)
 
-    def save_report(self, report: pd.DataFrame, file_handle: TextIO) -> None:
-        report.to_csv(file_handle, sep=self.delim, header=True, index=False)
+    def _generate_report_entries_in_parallel(
+            self, classifiers_and_fixed_infos: Iterable[Tuple[Classifier, str, str, list]]) -> Iterator[list]:
+        max_nb_of_batches_in_flight = 2 * self.processes
+        with multiprocessing.Pool(self.processes) as pool:
+            batches_in_flight = deque()
+            for classifier, batch_args in self._generate_batches_args(classifiers_and_fixed_infos):
+                batches_in_flight.append((classifier, pool.apply_async(_get_report_entries_for_a_batch, (batch_args,))))
+                if len(batches_in_flight) >= max_nb_of_batches_in_flight:
+                    yield from self._get_report_entries_of_a_batch_in_flight(*batches_in_flight.popleft())
+            while batches_in_flight:
+                yield from self._get_report_entries_of_a_batch_in_flight(*batches_in_flight.popleft())
+
+    @staticmethod
+    def _get_report_entries_of_a_batch_in_flight(classifier: Classifier,
+                                                 async_result: multiprocessing.pool.AsyncResult) -> List[list]:
+        # the workers are not instrumented, so this stage is the time spent waiting for them
+        with stage("Reporter.assess_in_parallel", log=False) as waiting:
+            report_entries, records_filter_counts = async_result.get()
+            waiting.add_records(len(report_entries))
+        if classifier.records_filter is not None:
+            classifier.records_filter.add_counts(records_filter_counts)
+        return report_entries
+
+    def save_report(self, report: pd.DataFrame, file: Union[TextIO, str, Path]) -> None:
+        if is_binary_report_path(file):
+            save_binary_report(report, file)
+        else:
+            report.to_csv(file, sep=self.delim, header=True, index=False)
 
 
 class PrecisionReporter(Reporter):
     def generate_report(self) -> pd.DataFrame:
         return self._generate_report()
 
+    def write_report(self, file: Union[TextIO, str, Path]) -> int:
+        return self._write_report(file)
+
 
 class RecallReporter(Reporter):
+    threshold_column = "gt_conf_percentile"
+
     def generate_report(self, ref_gt_conf: int) -> pd.DataFrame:
         return self._generate_report(fixed_info_to_add_to_ref_probe_header=f"GT_CONF={ref_gt_conf};")
 
+    def write_report(self, file: Union[TextIO, str, Path], ref_gt_conf: int) -> int:
+        return self._write_report(file, fixed_info_to_add_to_ref_probe_header=f"GT_CONF={ref_gt_conf};")
+
+    def _generate_threshold_sweep_report_entries(self, ref_gt_confs: Iterable[int]) -> Iterator[list]:
+        return self._generate_report_entries_of_classifiers(
+            (classifier, None, f"GT_CONF={ref_gt_conf};", [ref_gt_conf])
+            for classifier, ref_gt_conf in zip(self.classifiers, ref_gt_confs))
+
+    def generate_threshold_sweep_report(self, ref_gt_confs: Iterable[int]) -> pd.DataFrame:
+        """
+        Report of all GT_CONF thresholds of a sweep at once: self.classifiers holds one classifier per threshold, in the
+        order of ref_gt_confs. The rows of each classifier are the ones generate_report(ref_gt_conf) gives, with the
+        threshold in an extra threshold_column column.
+        """
+        return pd.DataFrame(data=list(self._generate_threshold_sweep_report_entries(ref_gt_confs)),
+                            columns=self.columns + [self.threshold_column])
+
+    def write_threshold_sweep_report(self, file: Union[TextIO, str, Path], ref_gt_confs: Iterable[int]) -> int:
+        return self._write_report_entries(file, self._generate_threshold_sweep_report_entries(ref_gt_confs),
+                                          self.columns + [self.threshold_column])
+
+
+class PooledRecallReporter(RecallReporter):
+    """
+    Threshold sweep report of all the sample pairs of a pooled truth probeset at once (see
+    evaluate.pooled_truth_probeset): self.classifiers holds, for each GT_CONF threshold in the order of ref_gt_confs,
+    the (sample pair, classifier) of each pair, which can be generated lazily. Rows have the sample pair in an extra
+    sample_pair_column column; the rows of a pair are the ones RecallReporter.write_threshold_sweep_report() writes for
+    the classifiers of the pair.
+    """
+    sample_pair_column = "sample_pair"
+
+    def _generate_threshold_sweep_report_entries(self, ref_gt_confs: Iterable[int]) -> Iterator[list]:
+        return self._generate_report_entries_of_classifiers(
+            (classifier, None, f"GT_CONF={ref_gt_conf};", [ref_gt_conf, sample_pair])
+            for sample_pairs_and_classifiers, ref_gt_conf in zip(self.classifiers, ref_gt_confs)
+            for sample_pair, classifier in sample_pairs_and_classifiers)
+
+    def generate_threshold_sweep_report(self, ref_gt_confs: Iterable[int]) -> pd.DataFrame:
+        return pd.DataFrame(data=list(self._generate_threshold_sweep_report_entries(ref_gt_confs)),
+                            columns=self.columns + [self.threshold_column, self.sample_pair_column])
+
+    def write_threshold_sweep_report(self, file: Union[TextIO, str, Path], ref_gt_confs: Iterable[int]) -> int:
+        return self._write_report_entries(file, self._generate_threshold_sweep_report_entries(ref_gt_confs),
+                                          self.columns + [self.threshold_column, self.sample_pair_column])
@@ -12,6 +12,7 @@ class UniqueSamRecordsFilter(Filter):
             if occurence == 1:
                 self._all_unique_query_names.append(query_name)
         self._all_unique_query_names = sorted(self._all_unique_query_names)
+        self._all_unique_query_names_set = frozenset(self._all_unique_query_names)
 
     @property
     def all_unique_query_names(self):
@@ -19,4 +20,4 @@ class UniqueSamRecordsFilter(Filter):
 
     def record_should_be_filtered_out(self, record) -> bool:
         query_name = record.query_name
-        return query_name not in self.all_unique_query_names
\ No newline at end of file
+        return query_name not in self._all_unique_query_names_set
\ No newline at end of file
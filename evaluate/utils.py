@@ -1,5 +1,6 @@
 from pathlib import Path
-from typing import List, Tuple
+from typing import Callable, Hashable, Iterable, Iterator, List, Tuple
+from itertools import groupby, islice
 
 
 def strip_extensions(path: Path) -> Path:
@@ -35,3 +36,27 @@ def consecutive(x: int, y: int) -> bool:
 
 def collapse_ranges(ranges: List[List[int]]) -> List[Tuple[int, int]]:
     return [(xs[0], xs[-1] + 1) for xs in ranges if xs]
+
+
+def split_in_batches(iterable: Iterable, batch_size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def split_in_batches_of_groups(iterable: Iterable, batch_size: int, key: Callable[..., Hashable]) -> Iterator[List]:
+    """
+    Like split_in_batches(), but a run of adjacent items with the same key is never split across batches: a batch ends
+    at the first run boundary after batch_size items, so it can be longer.
+    """
+    batch = []
+    for _, group in groupby(iterable, key=key):
+        batch.extend(group)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
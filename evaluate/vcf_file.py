@@ -2,20 +2,23 @@ import pysam
 from typing import List, Dict, TextIO
 from .vcf import VCF, NullVCFError, VCFFactory
 from collections import defaultdict
+from evaluate.instrumentation import stage
 
 
 class VCFFile:
     def __init__(self, pysam_variant_file: pysam.VariantFile, VCF_creator_method):
         self._header = pysam_variant_file.header
         self._sample_to_gene_to_VCFs = defaultdict(lambda: defaultdict(list))
-        for variant_record in pysam_variant_file:
-            for sample in variant_record.samples:
-                gene = variant_record.chrom
-                try:
-                    vcf = VCF_creator_method(variant_record, sample)
-                    self._sample_to_gene_to_VCFs[sample][gene].append(vcf)
-                except NullVCFError:
-                    pass
+        with stage("VCFFile.parse") as parsing:
+            for variant_record in pysam_variant_file:
+                parsing.add_records()
+                for sample in variant_record.samples:
+                    gene = variant_record.chrom
+                    try:
+                        vcf = VCF_creator_method(variant_record, sample)
+                        self._sample_to_gene_to_VCFs[sample][gene].append(vcf)
+                    except NullVCFError:
+                        pass
 
     @property
     def sample_to_gene_to_VCFs(self) -> Dict[str, Dict[str, List[VCF]]]:
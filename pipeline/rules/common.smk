@@ -12,6 +12,34 @@ rule bwa_index:
     shell: "bwa index {input.fasta} > {log} 2>&1"
 
 
+rule compile_mask_into_bitmaps:
+    input:
+        mask = "{mask}"
+    output:
+        mask_bitmaps = directory("{mask}.bitmaps")
+    threads: 1
+    log: "logs/compile_mask_into_bitmaps{mask}.log"
+    resources:
+        mem_mb = get_mem_mb("compile_mask_into_bitmaps", 2000)
+    script:
+        "../scripts/compile_mask_into_bitmaps.py"
+
+
+# reports are saved in binary format (.npz): this exports one to TSV, e.g. for inspection
+rule export_binary_report_as_tsv:
+    input:
+        binary_report = "{report}.npz"
+    output:
+        tsv_report = "{report}.exported.tsv"
+    threads: 1
+    resources:
+        mem_mb = lambda wildcards, attempt: 2000 * attempt
+    log:
+        "logs/export_binary_report_as_tsv/{report}.log"
+    script:
+        "../scripts/export_binary_report_as_tsv.py"
+
+
 rule fix_pandora_vcf_for_pipeline:
     input:
          pandora_original_vcf = "{pandora_results_dir}/{technology}/{coverage}/{subsampling}/compare_{mode}_{genotyping_mode}_genotyping/pandora_multisample_genotyped_{genotyping_mode}.vcf"
@@ -126,3 +154,20 @@ rule index_gzipped_vcf_file:
         "docker://leandroishilima/pandora1_paper_basic_tools:pandora_paper_tag1"
     shell:
         "tabix -p vcf {input.gzipped_vcf_file}"
+
+
+# runs last: table of the stages of all the jobs (see evaluate.instrumentation), from the slowest to the fastest
+rule aggregate_stage_metrics:
+    input:
+        pipeline_outputs = pipeline_outputs
+    output:
+        slowest_stages = slowest_stages_file
+    params:
+        metrics_dir = "logs"
+    threads: 1
+    resources:
+        mem_mb = lambda wildcards, attempt: 2000 * attempt
+    log:
+        "logs/aggregate_stage_metrics/slowest_stages.log"
+    script:
+        "../scripts/aggregate_stage_metrics.py"
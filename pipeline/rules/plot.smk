@@ -9,8 +9,8 @@ rule merge_precision_and_recall_dfs:
         mem_mb = lambda wildcards, attempt: 4000 * attempt
     log:
         "logs/merge_precision_and_recall_dfs/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/ROC_data.log"
-    script:
-        "../scripts/merge_precision_and_recall_dfs.py"
+    run:
+        run_script_in_this_interpreter("pipeline/scripts/merge_precision_and_recall_dfs.py", rule, input, output, params, wildcards, threads, log, resources)
 
 
 rule concat_all_plot_data:
@@ -23,8 +23,8 @@ rule concat_all_plot_data:
         mem_mb = lambda wildcards, attempt: 4000 * attempt
     log:
         "logs/concat_all_plot_data/ROC_data.log"
-    script:
-        "../scripts/concat_all_plot_data.py"
+    run:
+        run_script_in_this_interpreter("pipeline/scripts/concat_all_plot_data.py", rule, input, output, params, wildcards, threads, log, resources)
 
 
 rule concat_all_nb_of_records_removed_with_mapq_sam_records_filter_files_for_precision:
@@ -37,8 +37,8 @@ rule concat_all_nb_of_records_removed_with_mapq_sam_records_filter_files_for_pre
         mem_mb = lambda wildcards, attempt: 4000 * attempt
     log:
         "logs/concat_all_nb_of_records_removed_with_mapq_sam_records_filter_files_for_precision/nb_of_records_removed_with_mapq_sam_records_filter_for_precision.log"
-    script:
-        "../scripts/concat_all_nb_of_records_removed_with_mapq_sam_records_filter_files.py"
+    run:
+        run_script_in_this_interpreter("pipeline/scripts/concat_all_nb_of_records_removed_with_mapq_sam_records_filter_files.py", rule, input, output, params, wildcards, threads, log, resources)
 
 
 rule concat_all_recall_per_sample_no_gt_conf_filter:
@@ -51,8 +51,8 @@ rule concat_all_recall_per_sample_no_gt_conf_filter:
         mem_mb = lambda wildcards, attempt: 4000 * attempt
     log:
         "logs/concat_all_recall_per_sample_no_gt_conf_filter/recall_per_sample.log"
-    script:
-        "../scripts/concat_all_recall_per_sample_no_gt_conf_filter.py"
+    run:
+        run_script_in_this_interpreter("pipeline/scripts/concat_all_recall_per_sample_no_gt_conf_filter.py", rule, input, output, params, wildcards, threads, log, resources)
 
 
 rule concat_all_recall_per_sample_per_nb_of_samples:
@@ -132,8 +132,8 @@ rule concat_all_precision_per_sample_no_gt_conf_filter:
         mem_mb = lambda wildcards, attempt: 4000 * attempt
     log:
         "logs/concat_all_precision_per_sample_no_gt_conf_filter.log"
-    script:
-        "../scripts/concat_all_precision_per_sample_no_gt_conf_filter.py"
+    run:
+        run_script_in_this_interpreter("pipeline/scripts/concat_all_precision_per_sample_no_gt_conf_filter.py", rule, input, output, params, wildcards, threads, log, resources)
 
 
 rule make_enrichment_of_FPs_per_sample_plot:
@@ -1,5 +1,3 @@
-from pipeline.scripts.utils import get_sample_pairs_containing_given_sample
-
 rule make_vcf_for_a_single_sample:
     input:
         gzipped_multisample_vcf_file = rules.gzip_vcf_file.output.gzipped_vcf_file,
@@ -22,7 +20,7 @@ rule filter_vcf_for_a_single_sample_by_gt_conf_percentile_for_pandora:
         gzipped_singlesample_vcf_file = "{filename}.vcf.sample_{sample_id}.vcf.gz",
         indexed_gzipped_singlesample_vcf_file = "{filename}.vcf.sample_{sample_id}.vcf.gz.tbi"
     output:
-        singlesample_vcf_files_gt_conf_percentile_filtered = expand("{{filename}}.vcf.sample_{{sample_id}}.gt_conf_percentile_{gt_conf_percentile}.vcf", gt_conf_percentile=gt_conf_percentiles)
+        singlesample_vcf_files_gt_conf_percentile_filtered = recall_intermediate(expand("{{filename}}.vcf.sample_{{sample_id}}.gt_conf_percentile_{gt_conf_percentile}.vcf", gt_conf_percentile=gt_conf_percentiles))
     wildcard_constraints:
         filename=".*/pandora_multisample_genotyped_.*\.vcf\.\~\~vcf\~\~fixed\~\~"
     params:
@@ -45,7 +43,7 @@ rule filter_vcf_for_a_single_sample_by_gt_conf_percentile_for_snippy:
         gzipped_singlesample_vcf_file = "{filename}.vcf.sample_{sample_id}.vcf.gz",
         indexed_gzipped_singlesample_vcf_file = "{filename}.vcf.sample_{sample_id}.vcf.gz.tbi"
     output:
-        singlesample_vcf_files_gt_conf_percentile_filtered = expand("{{filename}}.vcf.sample_{{sample_id}}.gt_conf_percentile_{gt_conf_percentile}.vcf", gt_conf_percentile=gt_conf_percentiles)
+        singlesample_vcf_files_gt_conf_percentile_filtered = recall_intermediate(expand("{{filename}}.vcf.sample_{{sample_id}}.gt_conf_percentile_{gt_conf_percentile}.vcf", gt_conf_percentile=gt_conf_percentiles))
     wildcard_constraints:
         filename=".*/snippy_[^/]+\.vcf\.\~\~vcf\~\~fixed\~\~"
     params:
@@ -68,7 +66,7 @@ rule filter_vcf_for_a_single_sample_by_gt_conf_percentile_for_samtools:
         gzipped_singlesample_vcf_file = "{filename}.vcf.sample_{sample_id}.vcf.gz",
         indexed_gzipped_singlesample_vcf_file = "{filename}.vcf.sample_{sample_id}.vcf.gz.tbi"
     output:
-        singlesample_vcf_files_gt_conf_percentile_filtered = expand("{{filename}}.vcf.sample_{{sample_id}}.gt_conf_percentile_{gt_conf_percentile}.vcf", gt_conf_percentile=gt_conf_percentiles)
+        singlesample_vcf_files_gt_conf_percentile_filtered = recall_intermediate(expand("{{filename}}.vcf.sample_{{sample_id}}.gt_conf_percentile_{gt_conf_percentile}.vcf", gt_conf_percentile=gt_conf_percentiles))
     wildcard_constraints:
         filename=".*/samtools_[^/]+\.vcf\.\~\~vcf\~\~fixed\~\~"
     params:
@@ -91,7 +89,7 @@ rule filter_vcf_for_a_single_sample_by_gt_conf_percentile_for_medaka:
         gzipped_singlesample_vcf_file = "{filename}.vcf.sample_{sample_id}.vcf.gz",
         indexed_gzipped_singlesample_vcf_file = "{filename}.vcf.sample_{sample_id}.vcf.gz.tbi"
     output:
-        singlesample_vcf_files_gt_conf_percentile_filtered = expand("{{filename}}.vcf.sample_{{sample_id}}.gt_conf_percentile_{gt_conf_percentile}.vcf", gt_conf_percentile=gt_conf_percentiles)
+        singlesample_vcf_files_gt_conf_percentile_filtered = recall_intermediate(expand("{{filename}}.vcf.sample_{{sample_id}}.gt_conf_percentile_{gt_conf_percentile}.vcf", gt_conf_percentile=gt_conf_percentiles))
     wildcard_constraints:
         filename=".*/medaka_[^/]+\.vcf\.\~\~vcf\~\~fixed\~\~"
     params:
@@ -114,7 +112,7 @@ rule filter_vcf_for_a_single_sample_by_gt_conf_percentile_for_nanopolish:
         gzipped_singlesample_vcf_file = "{filename}.vcf.sample_{sample_id}.vcf.gz",
         indexed_gzipped_singlesample_vcf_file = "{filename}.vcf.sample_{sample_id}.vcf.gz.tbi"
     output:
-        singlesample_vcf_files_gt_conf_percentile_filtered = expand("{{filename}}.vcf.sample_{{sample_id}}.gt_conf_percentile_{gt_conf_percentile}.vcf", gt_conf_percentile=gt_conf_percentiles)
+        singlesample_vcf_files_gt_conf_percentile_filtered = recall_intermediate(expand("{{filename}}.vcf.sample_{{sample_id}}.gt_conf_percentile_{gt_conf_percentile}.vcf", gt_conf_percentile=gt_conf_percentiles))
     wildcard_constraints:
         filename=".*/nanopolish_[^/]+\.vcf\.\~\~vcf\~\~fixed\~\~"
     params:
@@ -134,18 +132,18 @@ ruleorder: filter_vcf_for_a_single_sample_by_gt_conf_percentile_for_nanopolish >
 
 rule make_mutated_vcf_ref_for_recall:
     input:
-         singlesample_vcf_files_gt_conf_percentile_filtered = lambda wildcards: expand(f"{data.xs((wildcards.sample_id, wildcards.coverage, wildcards.tool))['vcf']}.sample_{wildcards.sample_id}.gt_conf_percentile_{{gt_conf_percentile}}.vcf", gt_conf_percentile=gt_conf_percentiles),
-         vcf_ref = lambda wildcards: data.xs((wildcards.sample_id, wildcards.coverage, wildcards.tool))['vcf_reference'],
-         empty_depth_file = lambda wildcards: f"{data.xs((wildcards.sample_id, wildcards.coverage, wildcards.tool))['vcf_reference']}.depth",
+         singlesample_vcf_files_gt_conf_percentile_filtered = lambda wildcards: expand(f"{sample_cov_and_tool_to_variant_call[(wildcards.sample_id, wildcards.coverage, wildcards.tool)]['vcf']}.sample_{wildcards.sample_id}.gt_conf_percentile_{{gt_conf_percentile}}.vcf", gt_conf_percentile=gt_conf_percentiles),
+         vcf_ref = lambda wildcards: sample_cov_and_tool_to_variant_call[(wildcards.sample_id, wildcards.coverage, wildcards.tool)]['vcf_reference'],
+         empty_depth_file = lambda wildcards: f"{sample_cov_and_tool_to_variant_call[(wildcards.sample_id, wildcards.coverage, wildcards.tool)]['vcf_reference']}.depth",
     output:
-          filtered_vcf_files = expand(output_folder + "/recall/mutated_refs/{{sample_id}}/{{coverage}}/{{tool}}/coverage_filter_{{coverage_threshold}}/strand_bias_filter_{{strand_bias_threshold}}/gaps_filter_{{gaps_threshold}}/gt_conf_percentile_{gt_conf_percentile}/filtered_vcf.vcf", gt_conf_percentile=gt_conf_percentiles),
-          mutated_vcf_refs = expand(output_folder + "/recall/mutated_refs/{{sample_id}}/{{coverage}}/{{tool}}/coverage_filter_{{coverage_threshold}}/strand_bias_filter_{{strand_bias_threshold}}/gaps_filter_{{gaps_threshold}}/gt_conf_percentile_{gt_conf_percentile}/mutated_ref.fa", gt_conf_percentile=gt_conf_percentiles),
-          indexes = expand(output_folder + "/recall/mutated_refs/{{sample_id}}/{{coverage}}/{{tool}}/coverage_filter_{{coverage_threshold}}/strand_bias_filter_{{strand_bias_threshold}}/gaps_filter_{{gaps_threshold}}/gt_conf_percentile_{gt_conf_percentile}/mutated_ref.fa.amb", gt_conf_percentile=gt_conf_percentiles)
+          filtered_vcf_files = recall_intermediate(expand(output_folder + "/recall/mutated_refs/{{sample_id}}/{{coverage}}/{{tool}}/coverage_filter_{{coverage_threshold}}/strand_bias_filter_{{strand_bias_threshold}}/gaps_filter_{{gaps_threshold}}/gt_conf_percentile_{gt_conf_percentile}/filtered_vcf.vcf", gt_conf_percentile=gt_conf_percentiles)),
+          mutated_vcf_refs = recall_intermediate(expand(output_folder + "/recall/mutated_refs/{{sample_id}}/{{coverage}}/{{tool}}/coverage_filter_{{coverage_threshold}}/strand_bias_filter_{{strand_bias_threshold}}/gaps_filter_{{gaps_threshold}}/gt_conf_percentile_{gt_conf_percentile}/mutated_ref.fa", gt_conf_percentile=gt_conf_percentiles)),
+          indexes = recall_intermediate(expand(output_folder + "/recall/mutated_refs/{{sample_id}}/{{coverage}}/{{tool}}/coverage_filter_{{coverage_threshold}}/strand_bias_filter_{{strand_bias_threshold}}/gaps_filter_{{gaps_threshold}}/gt_conf_percentile_{gt_conf_percentile}/mutated_ref.fa.{extension}", gt_conf_percentile=gt_conf_percentiles, extension=bwa_index_extensions))
     params:
         gt_conf_percentiles = gt_conf_percentiles
     threads: 1
     resources:
-        mem_mb = lambda wildcards, attempt: 4000 * attempt
+        mem_mb = get_mem_mb("make_mutated_vcf_ref_for_recall", 4000)
     log:
         "logs/make_mutated_vcf_ref_for_recall/{sample_id}/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/mutated_ref.log"
     singularity:
@@ -158,11 +156,12 @@ rule map_recall_truth_probeset_to_mutated_vcf_ref:
     input:
          truth_probeset = deduplicated_variants_output_folder + "/truth_probesets/{sample_id}/{sample_pair}.truth_probeset.fa",
          mutated_vcf_refs = rules.make_mutated_vcf_ref_for_recall.output.mutated_vcf_refs,
+         indexes = rules.make_mutated_vcf_ref_for_recall.output.indexes,
     output:
-         sams = expand(output_folder + "/recall/map_probes/{{sample_id}}/{{coverage}}/{{tool}}/coverage_filter_{{coverage_threshold}}/strand_bias_filter_{{strand_bias_threshold}}/gaps_filter_{{gaps_threshold}}/gt_conf_percentile_{gt_conf_percentile}/{{sample_pair}}.sam", gt_conf_percentile=gt_conf_percentiles)
+         sams = probe_mappings(expand(output_folder + "/recall/map_probes/{{sample_id}}/{{coverage}}/{{tool}}/coverage_filter_{{coverage_threshold}}/strand_bias_filter_{{strand_bias_threshold}}/gaps_filter_{{gaps_threshold}}/gt_conf_percentile_{gt_conf_percentile}/{{sample_pair}}.sam", gt_conf_percentile=gt_conf_percentiles))
     threads: 1
     resources:
-        mem_mb = 4000
+        mem_mb = get_mem_mb("map_recall_truth_probeset_to_mutated_vcf_ref", 4000)
     log:
         "logs/map_recall_truth_probeset_to_mutated_vcf_ref/{sample_id}/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/{sample_pair}.log"
     singularity:
@@ -171,117 +170,222 @@ rule map_recall_truth_probeset_to_mutated_vcf_ref:
         "../scripts/map_recall_truth_variants_to_mutated_vcf_ref.py"
 
 
+# one report per (sample, coverage, tool, filters, sample pair) with the rows of all GT_CONF percentiles and a
+# gt_conf_percentile column, instead of one report per percentile
 rule create_recall_report_for_truth_variants_mappings:
     input:
         sams = rules.map_recall_truth_probeset_to_mutated_vcf_ref.output.sams,
-        mask = lambda wildcards: samples.xs(wildcards.sample_id)["mask"]
+        mask_bitmaps = lambda wildcards: sample_to_sample_info[wildcards.sample_id]["mask"] + ".bitmaps"
     output:
-        reports = expand(output_folder + "/recall/reports/{{sample_id}}/{{coverage}}/{{tool}}/coverage_filter_{{coverage_threshold}}/strand_bias_filter_{{strand_bias_threshold}}/gaps_filter_{{gaps_threshold}}/gt_conf_percentile_{gt_conf_percentile}/{{sample_pair}}.report.tsv", gt_conf_percentile=gt_conf_percentiles)
+        report = output_folder + "/recall/reports/{sample_id}/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/{sample_pair}.threshold_sweep.report.npz"
     params:
         gt_conf_percentiles = gt_conf_percentiles
-    threads: 1
+    threads: report_creation_threads
     resources:
-        mem_mb = lambda wildcards, attempt: 4000 * attempt
+        mem_mb = get_mem_mb("create_recall_report_for_truth_variants_mappings", 2000)
     log:
         "logs/create_recall_report_for_truth_variants_mappings/{sample_id}/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/{sample_pair}.report.log"
-    script:
-        "../scripts/create_recall_report_for_probe_mappings.py"
+    group: evaluation_jobs_group
+    run:
+        run_script_in_this_interpreter("pipeline/scripts/create_recall_report_for_probe_mappings.py", rule, input, output, params, wildcards, threads, log, resources)
+
+
+if fuse_mapping_and_report_creation:
+    # maps the truth probes and creates the report in one job, streaming the SAM records of each mutated ref from bwa
+    # into its classifier, so that the SAMs are neither written nor read (they are only written with
+    # config["keep_probe_mappings"], to debug)
+    rule map_recall_truth_probeset_and_create_recall_report:
+        input:
+            truth_probeset = rules.map_recall_truth_probeset_to_mutated_vcf_ref.input.truth_probeset,
+            mutated_vcf_refs = rules.make_mutated_vcf_ref_for_recall.output.mutated_vcf_refs,
+            indexes = rules.make_mutated_vcf_ref_for_recall.output.indexes,
+            mask_bitmaps = lambda wildcards: sample_to_sample_info[wildcards.sample_id]["mask"] + ".bitmaps"
+        output:
+            report = rules.create_recall_report_for_truth_variants_mappings.output.report
+        params:
+            gt_conf_percentiles = gt_conf_percentiles,
+            sams = rules.map_recall_truth_probeset_to_mutated_vcf_ref.output.sams if keep_probe_mappings else []
+        threads: report_creation_threads
+        resources:
+            mem_mb = get_mem_mb("map_recall_truth_probeset_and_create_recall_report", 4000)
+        log:
+            "logs/map_recall_truth_probeset_and_create_recall_report/{sample_id}/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/{sample_pair}.report.log"
+        singularity:
+            "docker://leandroishilima/pandora1_paper_basic_tools:pandora_paper_tag1"
+        script:
+            "../scripts/map_and_create_recall_report.py"
+    ruleorder: map_recall_truth_probeset_and_create_recall_report > create_recall_report_for_truth_variants_mappings
+
+
+if pool_truth_probes_per_sample:
+    # a probe of a sample is in the truth probeset of most of its sample pairs: the truth probesets of all the pairs of
+    # a sample are pooled, each distinct probe is mapped once per (coverage, tool, filters), and the report of each pair
+    # is split from the pooled report, with the same rows as if the truth probeset of the pair had been mapped
+    rule pool_truth_probesets_of_sample:
+        input:
+            truth_probesets = lambda wildcards: expand(deduplicated_variants_output_folder + "/truth_probesets/{sample_id}/{sample_pair}.truth_probeset.fa", sample_id=wildcards.sample_id, sample_pair=sample_to_sample_pairs[wildcards.sample_id])
+        output:
+            pooled_truth_probeset = output_folder + "/recall/pooled_truth_probesets/{sample_id}.truth_probeset.fa",
+            probes_table = output_folder + "/recall/pooled_truth_probesets/{sample_id}.probe_to_sample_pairs.tsv"
+        params:
+            sample_pairs = lambda wildcards: sample_to_sample_pairs[wildcards.sample_id]
+        threads: 1
+        resources:
+            mem_mb = get_mem_mb("pool_truth_probesets_of_sample", 2000)
+        log:
+            "logs/pool_truth_probesets_of_sample/{sample_id}.log"
+        group: evaluation_jobs_group
+        run:
+            run_script_in_this_interpreter("pipeline/scripts/pool_truth_probesets.py", rule, input, output, params, wildcards, threads, log, resources)
+
+
+    rule map_pooled_truth_probeset_to_mutated_vcf_ref:
+        input:
+            truth_probeset = rules.pool_truth_probesets_of_sample.output.pooled_truth_probeset,
+            mutated_vcf_refs = rules.make_mutated_vcf_ref_for_recall.output.mutated_vcf_refs,
+            indexes = rules.make_mutated_vcf_ref_for_recall.output.indexes,
+        output:
+            sams = probe_mappings(expand(output_folder + "/recall/map_pooled_probes/{{sample_id}}/{{coverage}}/{{tool}}/coverage_filter_{{coverage_threshold}}/strand_bias_filter_{{strand_bias_threshold}}/gaps_filter_{{gaps_threshold}}/gt_conf_percentile_{gt_conf_percentile}/pooled.sam", gt_conf_percentile=gt_conf_percentiles))
+        threads: 1
+        resources:
+            mem_mb = get_mem_mb("map_pooled_truth_probeset_to_mutated_vcf_ref", 4000)
+        log:
+            "logs/map_pooled_truth_probeset_to_mutated_vcf_ref/{sample_id}/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/pooled.log"
+        singularity:
+            "docker://leandroishilima/pandora1_paper_basic_tools:pandora_paper_tag1"
+        script:
+            "../scripts/map_recall_truth_variants_to_mutated_vcf_ref.py"
+
+
+    # one report per (sample, coverage, tool, filters) with the rows of all the sample pairs of the sample and a
+    # sample_pair column
+    rule create_pooled_recall_report:
+        input:
+            sams = rules.map_pooled_truth_probeset_to_mutated_vcf_ref.output.sams,
+            probes_table = rules.pool_truth_probesets_of_sample.output.probes_table,
+            mask_bitmaps = lambda wildcards: sample_to_sample_info[wildcards.sample_id]["mask"] + ".bitmaps"
+        output:
+            report = output_folder + "/recall/pooled_reports/{sample_id}/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/pooled.threshold_sweep.report.npz"
+        params:
+            gt_conf_percentiles = gt_conf_percentiles
+        threads: report_creation_threads
+        resources:
+            mem_mb = get_mem_mb("create_pooled_recall_report", 4000)
+        log:
+            "logs/create_pooled_recall_report/{sample_id}/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/pooled.report.log"
+        group: evaluation_jobs_group
+        run:
+            run_script_in_this_interpreter("pipeline/scripts/create_pooled_recall_report.py", rule, input, output, params, wildcards, threads, log, resources)
+
+
+    if fuse_mapping_and_report_creation:
+        rule map_pooled_truth_probeset_and_create_pooled_recall_report:
+            input:
+                pooled_truth_probeset = rules.pool_truth_probesets_of_sample.output.pooled_truth_probeset,
+                probes_table = rules.pool_truth_probesets_of_sample.output.probes_table,
+                mutated_vcf_refs = rules.make_mutated_vcf_ref_for_recall.output.mutated_vcf_refs,
+                indexes = rules.make_mutated_vcf_ref_for_recall.output.indexes,
+                mask_bitmaps = lambda wildcards: sample_to_sample_info[wildcards.sample_id]["mask"] + ".bitmaps"
+            output:
+                report = rules.create_pooled_recall_report.output.report
+            params:
+                gt_conf_percentiles = gt_conf_percentiles,
+                sams = rules.map_pooled_truth_probeset_to_mutated_vcf_ref.output.sams if keep_probe_mappings else []
+            threads: report_creation_threads
+            resources:
+                mem_mb = get_mem_mb("map_pooled_truth_probeset_and_create_pooled_recall_report", 4000)
+            log:
+                "logs/map_pooled_truth_probeset_and_create_pooled_recall_report/{sample_id}/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/pooled.report.log"
+            singularity:
+                "docker://leandroishilima/pandora1_paper_basic_tools:pandora_paper_tag1"
+            script:
+                "../scripts/map_and_create_pooled_recall_report.py"
+        ruleorder: map_pooled_truth_probeset_and_create_pooled_recall_report > create_pooled_recall_report
+
+
+    rule split_pooled_recall_report:
+        input:
+            pooled_report = rules.create_pooled_recall_report.output.report
+        output:
+            report = rules.create_recall_report_for_truth_variants_mappings.output.report
+        threads: 1
+        resources:
+            mem_mb = get_mem_mb("split_pooled_recall_report", 2000)
+        log:
+            "logs/split_pooled_recall_report/{sample_id}/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/{sample_pair}.report.log"
+        group: evaluation_jobs_group
+        run:
+            run_script_in_this_interpreter("pipeline/scripts/split_pooled_recall_report.py", rule, input, output, params, wildcards, threads, log, resources)
+    ruleorder: split_pooled_recall_report > create_recall_report_for_truth_variants_mappings
+    if fuse_mapping_and_report_creation:
+        ruleorder: split_pooled_recall_report > map_recall_truth_probeset_and_create_recall_report
 
 
 rule create_recall_report_per_sample_for_calculator:
     input:
          recall_report_files_for_one_sample_and_all_gt_conf_percentiles = lambda wildcards: sample_cov_tool_and_filters_to_recall_report_files[(wildcards.sample, wildcards.coverage, wildcards.tool, wildcards.coverage_threshold, wildcards.strand_bias_threshold, wildcards.gaps_threshold)]
     output:
-         recall_report_per_sample_for_calculator = output_folder + "/recall/recall_report_per_sample_for_calculator/{sample}/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/recall_report_per_sample_for_calculator.tsv"
+         recall_report_per_sample_for_calculator = output_folder + "/recall/recall_report_per_sample_for_calculator/{sample}/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/recall_report_per_sample_for_calculator.npz"
     params:
-         gt_conf_percentiles = gt_conf_percentiles
-    threads: 1
+         gt_conf_percentiles = gt_conf_percentiles,
+         partial_aggregates_folder = partial_aggregates_folder
+    threads: report_loading_threads
     resources:
-        mem_mb = lambda wildcards, attempt: 8000 * attempt
+        mem_mb = get_mem_mb("create_recall_report_per_sample_for_calculator", 4000)
     log:
         "logs/create_recall_report_per_sample_for_calculator/{sample}/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/create_recall_report_per_sample_for_calculator.log"
-    script:
-        "../scripts/create_recall_report_per_sample_for_calculator.py"
+    group: evaluation_jobs_group
+    run:
+        run_script_in_this_interpreter("pipeline/scripts/create_recall_report_per_sample_for_calculator.py", rule, input, output, params, wildcards, threads, log, resources)
 
 
 
 rule calculate_recall:
     input:
-         recall_report_per_sample_for_calculator = expand(output_folder + "/recall/recall_report_per_sample_for_calculator/{sample}/{{coverage}}/{{tool}}/coverage_filter_{{coverage_threshold}}/strand_bias_filter_{{strand_bias_threshold}}/gaps_filter_{{gaps_threshold}}/recall_report_per_sample_for_calculator.tsv", sample=samples["sample_id"])
+         recall_report_per_sample_for_calculator = expand(output_folder + "/recall/recall_report_per_sample_for_calculator/{sample}/{{coverage}}/{{tool}}/coverage_filter_{{coverage_threshold}}/strand_bias_filter_{{strand_bias_threshold}}/gaps_filter_{{gaps_threshold}}/recall_report_per_sample_for_calculator.npz", sample=samples["sample_id"])
     output:
          recall_file_for_all_samples_and_all_gt_conf_percentile = output_folder + "/recall/recall_files/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/recall.tsv",
     params:
          gt_conf_percentiles = gt_conf_percentiles
-    threads: 1
+    threads: report_loading_threads
     resources:
-        mem_mb = lambda wildcards, attempt: 8000 * attempt
+        mem_mb = get_mem_mb("calculate_recall", 8000)
     log:
         "logs/calculate_recall/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/recall.log"
-    script:
-        "../scripts/calculate_recall.py"
-
-
-rule calculate_recall_per_sample_no_gt_conf_filter:
-    input:
-         all_recall_reports_for_one_sample_with_no_gt_conf_filter = lambda wildcards: expand(output_folder + "/recall/reports/{{sample_id}}/{{coverage}}/{{tool}}/coverage_filter_{{coverage_threshold}}/strand_bias_filter_{{strand_bias_threshold}}/gaps_filter_{{gaps_threshold}}/gt_conf_percentile_0/{sample_pairs}.report.tsv", sample_pairs = get_sample_pairs_containing_given_sample(sample_pairs, wildcards.sample_id))
-    output:
-         recall_file_for_one_sample_with_no_gt_conf_filter = output_folder + "/recall/recall_files_per_sample/{sample_id}/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/recall.tsv"
-    threads: 1
-    resources:
-        mem_mb = lambda wildcards, attempt: 4000 * attempt
-    log:
-        "logs/calculate_recall_per_sample_no_gt_conf_filter/{sample_id}/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/recall.log"
-    script:
-        "../scripts/calculate_recall_per_sample_no_gt_conf_filter.py"
-
-
-rule calculate_recall_per_sample_vs_nb_of_samples:
-    input:
-         all_recall_reports_for_one_sample = lambda wildcards: expand(output_folder + "/recall/reports/{{sample_id}}/{{coverage}}/{{tool}}/coverage_filter_{{coverage_threshold}}/strand_bias_filter_{{strand_bias_threshold}}/gaps_filter_{{gaps_threshold}}/gt_conf_percentile_0/{sample_pairs}.report.tsv", sample_pairs = get_sample_pairs_containing_given_sample(sample_pairs, wildcards.sample_id))
-    output:
-         recall_file_for_one_sample_vs_nb_samples = output_folder + "/recall/recall_files_per_sample_vs_nb_of_samples/{sample_id}/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/recall_per_sample_per_number_of_samples.csv"
-    threads: 1
-    resources:
-        mem_mb = lambda wildcards, attempt: 4000 * attempt
-    params:
-         list_with_number_of_samples = list_with_number_of_samples
-    log:
-        "logs/calculate_recall_per_sample_vs_nb_of_samples/{sample_id}/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/recall.log"
-    script:
-        "../scripts/calculate_recall_per_sample_vs_nb_of_samples.py"
+    group: evaluation_jobs_group
+    run:
+        run_script_in_this_interpreter("pipeline/scripts/calculate_recall.py", rule, input, output, params, wildcards, threads, log, resources)
 
 
-rule calculate_recall_per_number_of_samples_no_gt_conf_filter_pvr:
-    input:
-         all_recall_reports_with_no_gt_conf_filter = lambda wildcards: cov_tool_and_filters_to_recall_reports_with_no_gt_conf_filter[(
-             wildcards.coverage, wildcards.tool, wildcards.coverage_threshold, wildcards.strand_bias_threshold, wildcards.gaps_threshold
-         )]
-    output:
-         recall_per_number_of_samples = output_folder + "/recall/recall_per_number_of_samples/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/recall_per_number_of_samples_pvr.csv"
-    params:
-         list_with_number_of_samples = list_with_number_of_samples
-    threads: 1
-    resources:
-        mem_mb = lambda wildcards, attempt: 12000 * attempt
-    log:
-        "logs/calculate_recall_per_number_of_samples_no_gt_conf_filter/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/recall_per_number_of_samples_pvr.log"
-    script:
-        "../scripts/calculate_recall_per_number_of_samples_no_gt_conf_filter_pvr.py"
+def get_samples_sample_pairs_and_recall_reports_with_no_gt_conf_filter(wildcards):
+    return cov_tool_and_filters_to_recall_reports_with_no_gt_conf_filter[(
+        wildcards.coverage, wildcards.tool, wildcards.coverage_threshold, wildcards.strand_bias_threshold, wildcards.gaps_threshold
+    )]
 
 
-rule calculate_recall_per_number_of_samples_no_gt_conf_filter_avgar:
+# computes all recall metrics with no GT_CONF filter of a (coverage, tool, filters) from its reports, loaded once
+rule calculate_recall_metrics_no_gt_conf_filter:
     input:
-         all_recall_reports_with_no_gt_conf_filter = lambda wildcards: cov_tool_and_filters_to_recall_reports_with_no_gt_conf_filter[(
-             wildcards.coverage, wildcards.tool, wildcards.coverage_threshold, wildcards.strand_bias_threshold, wildcards.gaps_threshold
-         )]
+         all_recall_reports_with_no_gt_conf_filter = lambda wildcards: [
+             report for sample, sample_pair, report in get_samples_sample_pairs_and_recall_reports_with_no_gt_conf_filter(wildcards)
+         ]
     output:
-         recall_per_number_of_samples = output_folder + "/recall/recall_per_number_of_samples/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/recall_per_number_of_samples_avgar.csv"
+         recall_files_per_sample_with_no_gt_conf_filter = expand(output_folder + "/recall/recall_files_per_sample/{sample_id}/{{coverage}}/{{tool}}/coverage_filter_{{coverage_threshold}}/strand_bias_filter_{{strand_bias_threshold}}/gaps_filter_{{gaps_threshold}}/recall.tsv", sample_id=samples["sample_id"]),
+         recall_files_per_sample_vs_nb_samples = expand(output_folder + "/recall/recall_files_per_sample_vs_nb_of_samples/{sample_id}/{{coverage}}/{{tool}}/coverage_filter_{{coverage_threshold}}/strand_bias_filter_{{strand_bias_threshold}}/gaps_filter_{{gaps_threshold}}/recall_per_sample_per_number_of_samples.csv", sample_id=samples["sample_id"]),
+         recall_per_number_of_samples_pvr = output_folder + "/recall/recall_per_number_of_samples/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/recall_per_number_of_samples_pvr.csv",
+         recall_per_number_of_samples_avgar = output_folder + "/recall/recall_per_number_of_samples/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/recall_per_number_of_samples_avgar.csv"
     params:
-         list_with_number_of_samples = list_with_number_of_samples
-    threads: 1
+         samples_and_sample_pairs = lambda wildcards: [
+             (sample, sample_pair) for sample, sample_pair, report in get_samples_sample_pairs_and_recall_reports_with_no_gt_conf_filter(wildcards)
+         ],
+         samples = list(samples["sample_id"]),
+         list_with_number_of_samples = list_with_number_of_samples,
+         partial_aggregates_folder = partial_aggregates_folder
+    threads: report_loading_threads
     resources:
-        mem_mb = lambda wildcards, attempt: 12000 * attempt
+        mem_mb = get_mem_mb("calculate_recall_metrics_no_gt_conf_filter", 12000)
     log:
-        "logs/calculate_recall_per_number_of_samples_no_gt_conf_filter/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/recall_per_number_of_samples_avgar.log"
-    script:
-        "../scripts/calculate_recall_per_number_of_samples_no_gt_conf_filter_avgar.py"
\ No newline at end of file
+        "logs/calculate_recall_metrics_no_gt_conf_filter/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/recall_metrics.log"
+    group: evaluation_jobs_group
+    run:
+        run_script_in_this_interpreter("pipeline/scripts/calculate_recall_metrics_no_gt_conf_filter.py", rule, input, output, params, wildcards, threads, log, resources)
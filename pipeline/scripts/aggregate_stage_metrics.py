@@ -0,0 +1,35 @@
+from pathlib import Path
+import sys
+sys.path.append(str(Path().absolute()))
+import logging
+log_level = "INFO"
+logging.basicConfig(
+    filename=str(snakemake.log),
+    filemode="w",
+    level=log_level,
+    format="[%(asctime)s]:%(levelname)s: %(message)s",
+    datefmt="%d/%m/%Y %I:%M:%S %p",
+)
+
+
+
+from evaluate.job_metrics import find_metrics_files, load_job_metrics
+from evaluate.instrumentation import get_slowest_stages
+
+
+# setup
+metrics_dir = snakemake.params.metrics_dir
+slowest_stages_file = snakemake.output.slowest_stages
+
+
+# API usage
+logging.info(f"Loading job metrics from {metrics_dir}")
+job_metrics = load_job_metrics(find_metrics_files(metrics_dir))
+
+logging.info(f"Aggregating the stages of {len(job_metrics)} jobs")
+slowest_stages = get_slowest_stages(job_metrics)
+
+logging.info(f"Saving {slowest_stages_file}")
+slowest_stages.to_csv(slowest_stages_file, sep="\t", index=False)
+
+logging.info("Done")
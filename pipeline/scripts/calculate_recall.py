@@ -10,52 +10,26 @@ logging.basicConfig(
     format="[%(asctime)s]:%(levelname)s: %(message)s",
     datefmt="%d/%m/%Y %I:%M:%S %p",
 )
+from evaluate.job_metrics import record_job_metrics
+record_job_metrics(snakemake)
 
 
 
-from evaluate.calculator import RecallCalculator, EmptyReportError
-from evaluate.report import RecallReport
-import pandas as pd
+from evaluate.commands import calculate_recall
 
 
-# setup
-recall_report_per_sample_for_calculator = (
-    snakemake.input.recall_report_per_sample_for_calculator
+calculate_recall(
+    reports=snakemake.input.recall_report_per_sample_for_calculator,
+    output=snakemake.output.recall_file_for_all_samples_and_all_gt_conf_percentile,
+    gt_conf_percentiles=snakemake.params.gt_conf_percentiles,
+    metadata={
+        "tool": snakemake.wildcards.tool,
+        "coverage": snakemake.wildcards.coverage,
+        "coverage_threshold": snakemake.wildcards.coverage_threshold,
+        "strand_bias_threshold": snakemake.wildcards.strand_bias_threshold,
+        "gaps_threshold": snakemake.wildcards.gaps_threshold,
+    },
+    threads=snakemake.threads,
 )
-gt_conf_percentiles = snakemake.params.gt_conf_percentiles
-tool = snakemake.wildcards.tool
-coverage = snakemake.wildcards.coverage
-coverage_threshold = snakemake.wildcards.coverage_threshold
-strand_bias_threshold = snakemake.wildcards.strand_bias_threshold
-gaps_threshold = snakemake.wildcards.gaps_threshold
 
-recall_file_for_all_samples_and_all_gt_conf_percentile = Path(snakemake.output.recall_file_for_all_samples_and_all_gt_conf_percentile)
-
-
-# API usage
-logging.info(f"Loading report")
-recall_report = RecallReport.from_files(recall_report_per_sample_for_calculator,
-                                        concatenate_dfs_one_by_one_keeping_only_best_mappings=False)
-
-logging.info(f"Creating calculator")
-recall_calculator = RecallCalculator(recall_report)
-
-logging.info(f"Calculating recall")
-recall_df = recall_calculator.get_recall_report(gt_conf_percentiles)
-
-metadata_df = pd.DataFrame(
-    data={
-        "tool": [tool] * len(recall_df),
-        "coverage": [coverage] * len(recall_df),
-        "coverage_threshold": [coverage_threshold] * len(recall_df),
-        "strand_bias_threshold": [strand_bias_threshold] * len(recall_df),
-        "gaps_threshold": [gaps_threshold] * len(recall_df),
-    }
-)
-output_df = pd.concat([recall_df, metadata_df], axis=1)
-
-
-# output
-logging.info(f"Outputting recall file")
-output_df.to_csv(recall_file_for_all_samples_and_all_gt_conf_percentile, sep="\t")
 logging.info(f"Done")
@@ -0,0 +1,87 @@
+from pathlib import Path
+import sys
+sys.path.append(str(Path().absolute()))
+import logging
+log_level = "INFO"
+logging.basicConfig(
+    filename=str(snakemake.log),
+    filemode="w",
+    level=log_level,
+    format="[%(asctime)s]:%(levelname)s: %(message)s",
+    datefmt="%d/%m/%Y %I:%M:%S %p",
+)
+from evaluate.job_metrics import record_job_metrics
+record_job_metrics(snakemake)
+
+
+
+from evaluate.partial_aggregates import PartialAggregates
+from evaluate.recall_metrics_cube import RecallMetricsCube
+import pandas as pd
+
+
+# setup
+all_recall_reports_with_no_gt_conf_filter = snakemake.input.all_recall_reports_with_no_gt_conf_filter
+samples_and_sample_pairs = snakemake.params.samples_and_sample_pairs
+samples = snakemake.params.samples
+list_with_number_of_samples = snakemake.params.list_with_number_of_samples
+partial_aggregates = PartialAggregates(f"{snakemake.params.partial_aggregates_folder}/recall_metrics_cube",
+                                       "recall_metrics_cube") \
+    if snakemake.params.partial_aggregates_folder else None
+tool = snakemake.wildcards.tool
+coverage = snakemake.wildcards.coverage
+coverage_threshold = snakemake.wildcards.coverage_threshold
+strand_bias_threshold = snakemake.wildcards.strand_bias_threshold
+gaps_threshold = snakemake.wildcards.gaps_threshold
+
+recall_files_per_sample_with_no_gt_conf_filter = snakemake.output.recall_files_per_sample_with_no_gt_conf_filter
+recall_files_per_sample_vs_nb_samples = snakemake.output.recall_files_per_sample_vs_nb_samples
+recall_per_number_of_samples_pvr_filename = snakemake.output.recall_per_number_of_samples_pvr
+recall_per_number_of_samples_avgar_filename = snakemake.output.recall_per_number_of_samples_avgar
+
+
+def add_metadata(recall_df: pd.DataFrame, sample: str) -> pd.DataFrame:
+    metadata_df = pd.DataFrame(
+        data={
+            "tool": [tool] * len(recall_df),
+            "coverage": [coverage] * len(recall_df),
+            "coverage_threshold": [coverage_threshold] * len(recall_df),
+            "strand_bias_threshold": [strand_bias_threshold] * len(recall_df),
+            "gaps_threshold": [gaps_threshold] * len(recall_df),
+            "sample": [sample] * len(recall_df)
+        }
+    )
+    return pd.concat([recall_df.reset_index(drop=True), metadata_df], axis=1)
+
+
+def get_recall_df_of_sample(recall_df_per_sample: pd.DataFrame, sample: str) -> pd.DataFrame:
+    return recall_df_per_sample[recall_df_per_sample["sample"] == sample].drop(columns="sample")
+
+
+# API usage
+logging.info(f"Loading reports")
+samples_sample_pairs_and_report_files = [
+    (sample, sample_pair, report_file)
+    for (sample, sample_pair), report_file in zip(samples_and_sample_pairs, all_recall_reports_with_no_gt_conf_filter)
+]
+recall_metrics_cube = RecallMetricsCube.from_files(samples_sample_pairs_and_report_files, threads=snakemake.threads,
+                                                   partial_aggregates=partial_aggregates)
+
+logging.info(f"Calculating recall per sample")
+recall_df_per_sample = recall_metrics_cube.get_recall_report_per_sample([0])
+for sample, recall_file in zip(samples, recall_files_per_sample_with_no_gt_conf_filter):
+    add_metadata(get_recall_df_of_sample(recall_df_per_sample, sample), sample).to_csv(recall_file, sep="\t", index=False)
+
+logging.info(f"Calculating recall per sample vs nb of samples")
+recall_df_per_sample_vs_nb_samples = recall_metrics_cube.\
+    get_recall_report_per_sample_wrt_truth_probes_for_those_present_in_a_given_nb_of_samples(list_with_number_of_samples)
+for sample, recall_file in zip(samples, recall_files_per_sample_vs_nb_samples):
+    add_metadata(get_recall_df_of_sample(recall_df_per_sample_vs_nb_samples, sample), sample).to_csv(recall_file, index=False)
+
+logging.info(f"Calculating recall per number of samples")
+recall_metrics_cube.get_recall_allele_seqs_vs_nb_of_samples_report(list_with_number_of_samples)\
+    .to_csv(recall_per_number_of_samples_pvr_filename, index=False)
+recall_metrics_cube.get_recall_alleles_vs_nb_of_samples_report(list_with_number_of_samples)\
+    .to_csv(recall_per_number_of_samples_avgar_filename, index=False)
+
+logging.info(f"Done")
@@ -0,0 +1,37 @@
+from pathlib import Path
+import sys
+sys.path.append(str(Path().absolute()))
+import logging
+log_level = "INFO"
+logging.basicConfig(
+    filename=str(snakemake.log),
+    filemode="w",
+    level=log_level,
+    format="[%(asctime)s]:%(levelname)s: %(message)s",
+    datefmt="%d/%m/%Y %I:%M:%S %p",
+)
+from evaluate.job_metrics import record_job_metrics
+record_job_metrics(snakemake)
+
+
+
+from evaluate.masker import Masker
+from evaluate.mask_bitmaps import MaskBitmaps
+
+
+# setup
+mask_filepath = snakemake.input.mask
+mask_bitmaps_dir = snakemake.output.mask_bitmaps
+
+
+# API usage
+logging.info(f"Reading mask from {mask_filepath}")
+with open(mask_filepath) as bed:
+    mask_bitmaps = MaskBitmaps.from_regions(Masker.get_regions_from_bed(bed))
+
+
+# output
+logging.info(f"Saving mask bitmaps to {mask_bitmaps_dir}")
+mask_bitmaps.save(mask_bitmaps_dir)
+
+logging.info("Done")
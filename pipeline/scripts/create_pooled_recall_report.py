@@ -0,0 +1,31 @@
+from pathlib import Path
+import sys
+sys.path.append(str(Path().absolute()))
+import logging
+log_level = "INFO"
+logging.basicConfig(
+    filename=str(snakemake.log),
+    filemode="w",
+    level=log_level,
+    format="[%(asctime)s]:%(levelname)s: %(message)s",
+    datefmt="%d/%m/%Y %I:%M:%S %p",
+)
+from evaluate.job_metrics import record_job_metrics
+record_job_metrics(snakemake)
+
+
+
+from evaluate.commands import create_pooled_recall_report
+
+
+create_pooled_recall_report(
+    sams=snakemake.input.sams,
+    probes_table=snakemake.input.probes_table,
+    mask_bitmaps=snakemake.input.mask_bitmaps,
+    sample_id=snakemake.wildcards.sample_id,
+    gt_conf_percentiles=snakemake.params.gt_conf_percentiles,
+    report=snakemake.output.report,
+    processes=snakemake.threads,
+)
+
+logging.info("Done")
@@ -10,6 +10,9 @@ logging.basicConfig(
     format="[%(asctime)s]:%(levelname)s: %(message)s",
     datefmt="%d/%m/%Y %I:%M:%S %p",
 )
+from evaluate.job_metrics import record_job_metrics
+record_job_metrics(snakemake)
+from evaluate.partial_aggregates import PartialAggregates
 from evaluate.report import RecallReport
 
 
@@ -18,14 +21,19 @@ recall_report_files_for_one_sample_and_all_gt_conf_percentiles = (
     snakemake.input.recall_report_files_for_one_sample_and_all_gt_conf_percentiles
 )
 recall_report_per_sample_for_calculator = snakemake.output.recall_report_per_sample_for_calculator
+partial_aggregates = PartialAggregates(f"{snakemake.params.partial_aggregates_folder}/recall_report_best_mappings",
+                                       "recall_report_best_mappings") \
+    if snakemake.params.partial_aggregates_folder else None
 
 
 # API usage
 logging.info(f"Loading report")
 recall_report = RecallReport.from_files(recall_report_files_for_one_sample_and_all_gt_conf_percentiles,
-                                        concatenate_dfs_one_by_one_keeping_only_best_mappings=True)
+                                        concatenate_dfs_one_by_one_keeping_only_best_mappings=True,
+                                        threads=snakemake.threads,
+                                        partial_aggregates=partial_aggregates)
 
-with open(recall_report_per_sample_for_calculator, "w") as recall_report_per_sample_for_calculator_filehandler:
-    recall_report.save_report(recall_report_per_sample_for_calculator_filehandler)
+# saved with the helper columns already parsed, so that the calculator does not need to re-parse the probe headers
+recall_report.save_report(recall_report_per_sample_for_calculator)
 
 logging.info(f"Done")
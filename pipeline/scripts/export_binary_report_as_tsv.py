@@ -0,0 +1,22 @@
+from pathlib import Path
+import sys
+sys.path.append(str(Path().absolute()))
+import logging
+log_level = "INFO"
+logging.basicConfig(
+    filename=str(snakemake.log),
+    filemode="w",
+    level=log_level,
+    format="[%(asctime)s]:%(levelname)s: %(message)s",
+    datefmt="%d/%m/%Y %I:%M:%S %p",
+)
+
+
+
+from evaluate.commands import export_report
+
+
+logging.info(f"Exporting {snakemake.input.binary_report} to {snakemake.output.tsv_report}")
+export_report(binary_report=snakemake.input.binary_report, tsv_report=snakemake.output.tsv_report)
+
+logging.info("Done")
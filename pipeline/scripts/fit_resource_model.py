@@ -0,0 +1,31 @@
+"""
+Fits the resource model used to request memory for the rules (config["resource_model"]) from the job metrics
+(<log>.metrics.json files) recorded by past runs of the pipeline.
+
+Usage: python pipeline/scripts/fit_resource_model.py logs resource_model.json
+"""
+from pathlib import Path
+import sys
+sys.path.append(str(Path().absolute()))
+import argparse
+from evaluate.job_metrics import ResourceModel, find_metrics_files, load_job_metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("metrics_dir", help="Directory with the job metrics, searched recursively (usually logs)")
+    parser.add_argument("resource_model", help="Where to save the fitted model (JSON)")
+    parser.add_argument("--margin", type=float, default=1.2,
+                        help="Factor applied to the predicted peak memory (default 1.2)")
+    parser.add_argument("--min-mem-mb", type=int, default=100,
+                        help="Smallest memory requested for a rule with metrics (default 100)")
+    args = parser.parse_args()
+
+    job_metrics = load_job_metrics(find_metrics_files(args.metrics_dir))
+    resource_model = ResourceModel.fit(job_metrics, margin=args.margin, min_mem_mb=args.min_mem_mb)
+    resource_model.save(args.resource_model)
+    print(f"Fitted {len(resource_model.rule_to_coefficients)} rules from {len(job_metrics)} jobs")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,8 @@ logging.basicConfig(
     format="[%(asctime)s]:%(levelname)s: %(message)s",
     datefmt="%d/%m/%Y %I:%M:%S %p",
 )
+from evaluate.job_metrics import record_job_metrics
+record_job_metrics(snakemake)
 from evaluate.filtered_vcf_file import FilteredVCFFile
 from evaluate.vcf_filters import VCF_Filters
 from evaluate.vcf import VCFFactory
@@ -0,0 +1,34 @@
+from pathlib import Path
+import sys
+sys.path.append(str(Path().absolute()))
+import logging
+log_level = "INFO"
+logging.basicConfig(
+    filename=str(snakemake.log),
+    filemode="w",
+    level=log_level,
+    format="[%(asctime)s]:%(levelname)s: %(message)s",
+    datefmt="%d/%m/%Y %I:%M:%S %p",
+)
+from evaluate.job_metrics import record_job_metrics
+record_job_metrics(snakemake)
+
+
+
+from evaluate.commands import map_and_create_pooled_recall_report
+
+
+map_and_create_pooled_recall_report(
+    query=snakemake.input.pooled_truth_probeset,
+    refs=snakemake.input.mutated_vcf_refs,
+    probes_table=snakemake.input.probes_table,
+    mask_bitmaps=snakemake.input.mask_bitmaps,
+    sample_id=snakemake.wildcards.sample_id,
+    gt_conf_percentiles=snakemake.params.gt_conf_percentiles,
+    report=snakemake.output.report,
+    threads=int(snakemake.threads),
+    processes=int(snakemake.threads),
+    sams_to_keep=snakemake.params.sams or None,
+)
+
+logging.info("Done")
@@ -0,0 +1,35 @@
+from pathlib import Path
+import sys
+sys.path.append(str(Path().absolute()))
+import logging
+log_level = "INFO"
+logging.basicConfig(
+    filename=str(snakemake.log),
+    filemode="w",
+    level=log_level,
+    format="[%(asctime)s]:%(levelname)s: %(message)s",
+    datefmt="%d/%m/%Y %I:%M:%S %p",
+)
+from evaluate.job_metrics import record_job_metrics
+record_job_metrics(snakemake)
+
+
+
+
+from evaluate.commands import map_and_create_precision_report
+
+
+map_and_create_precision_report(
+    query=snakemake.input.variant_call_probeset,
+    ref=snakemake.input.reference_assembly,
+    mask_bitmaps=snakemake.input.mask_bitmaps,
+    sample_id=snakemake.wildcards.sample_id,
+    tool=snakemake.wildcards.tool,
+    report=snakemake.output.variant_call_precision_report,
+    nb_of_records_removed_file=snakemake.output.nb_of_records_removed_with_mapq_sam_records_filter_filepath,
+    threads=int(snakemake.threads),
+    processes=int(snakemake.threads),
+    sam_to_keep=snakemake.params.variant_call_probeset_mapped_to_ref or None,
+)
+
+logging.info("Done")
@@ -10,24 +10,19 @@ logging.basicConfig(
     format="[%(asctime)s]:%(levelname)s: %(message)s",
     datefmt="%d/%m/%Y %I:%M:%S %p",
 )
-from evaluate.bwa import BWA
+from evaluate.job_metrics import record_job_metrics
+record_job_metrics(snakemake)
 
 
-# setup
-query = Path(snakemake.input.truth_probeset)
-refs = [Path(ref) for ref in snakemake.input.mutated_vcf_refs]
-outputs = [Path(sam) for sam in snakemake.output.sams]
-threads = int(snakemake.threads)
 
+from evaluate.commands import map_probes
 
-# API usage
-for ref, output in zip(refs, outputs):
-    BWA.map_query_to_ref(
-        query=query,
-        ref=ref,
-        output=output,
-        threads=threads,
-    )
 
+map_probes(
+    query=snakemake.input.truth_probeset,
+    refs=snakemake.input.mutated_vcf_refs,
+    outputs=snakemake.output.sams,
+    threads=int(snakemake.threads),
+)
 
-logging.info(f"Done")
\ No newline at end of file
+logging.info(f"Done")
@@ -10,27 +10,19 @@ logging.basicConfig(
     format="[%(asctime)s]:%(levelname)s: %(message)s",
     datefmt="%d/%m/%Y %I:%M:%S %p",
 )
+from evaluate.job_metrics import record_job_metrics
+record_job_metrics(snakemake)
 
 
 
-from evaluate.bwa import BWA
+from evaluate.commands import map_probes
 
 
-
-# setup
-query = Path(snakemake.input.variant_call_probeset)
-ref = Path(snakemake.input.reference_assembly)
-output = Path(snakemake.output.variant_call_probeset_mapped_to_ref)
-threads = snakemake.threads
-
-
-
-# API usage
-logging.info(f"Mapping {query} to {ref}")
-BWA.map_query_to_ref(
-    query=query,
-    ref=ref,
-    output=output,
-    threads=threads,
+map_probes(
+    query=snakemake.input.variant_call_probeset,
+    refs=[snakemake.input.reference_assembly],
+    outputs=[snakemake.output.variant_call_probeset_mapped_to_ref],
+    threads=snakemake.threads,
 )
-logging.info(f"Done")
\ No newline at end of file
+
+logging.info(f"Done")
@@ -0,0 +1,28 @@
+from pathlib import Path
+import sys
+sys.path.append(str(Path().absolute()))
+import logging
+log_level = "INFO"
+logging.basicConfig(
+    filename=str(snakemake.log),
+    filemode="w",
+    level=log_level,
+    format="[%(asctime)s]:%(levelname)s: %(message)s",
+    datefmt="%d/%m/%Y %I:%M:%S %p",
+)
+from evaluate.job_metrics import record_job_metrics
+record_job_metrics(snakemake)
+
+
+
+from evaluate.commands import pool_truth_probesets
+
+
+pool_truth_probesets(
+    truth_probesets=snakemake.input.truth_probesets,
+    sample_pairs=snakemake.params.sample_pairs,
+    pooled_truth_probeset=snakemake.output.pooled_truth_probeset,
+    probes_table=snakemake.output.probes_table,
+)
+
+logging.info("Done")
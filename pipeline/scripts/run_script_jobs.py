@@ -0,0 +1,35 @@
+"""
+Runs a batch of pipeline script jobs in one interpreter: the modules the scripts use are imported once, and each job is
+run in a fork of the interpreter with the snakemake object its script expects. jobs.json is a list of jobs, e.g.
+[{"rule": "calculate_precision", "script": "pipeline/scripts/calculate_precision.py",
+  "input": {"precision_report_files_for_all_samples": [...]}, "output": {...}, "params": {...},
+  "wildcards": {...}, "log": ["logs/calculate_precision.log"], "threads": 1}]
+
+Usage: python pipeline/scripts/run_script_jobs.py jobs.json -j 8
+"""
+from pathlib import Path
+import sys
+sys.path.append(str(Path().absolute()))
+import argparse
+import logging
+from evaluate.batch_runner import load_jobs, preload_modules, run_jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("jobs", help="JSON file with the list of jobs")
+    parser.add_argument("-j", "--processes", type=int, default=1, help="Number of jobs run at a time (default 1)")
+    args = parser.parse_args()
+    logging.basicConfig(level="INFO", format="[%(asctime)s]:%(levelname)s: %(message)s")
+
+    jobs = load_jobs(args.jobs)
+    preload_modules()
+    failed_jobs = run_jobs(jobs, processes=args.processes)
+    print(f"Ran {len(jobs)} jobs, {len(failed_jobs)} failed")
+    for job, exit_code in failed_jobs:
+        print(f"{job} failed with exit code {exit_code}")
+    sys.exit(1 if failed_jobs else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+from pathlib import Path
+import sys
+sys.path.append(str(Path().absolute()))
+import logging
+log_level = "INFO"
+logging.basicConfig(
+    filename=str(snakemake.log),
+    filemode="w",
+    level=log_level,
+    format="[%(asctime)s]:%(levelname)s: %(message)s",
+    datefmt="%d/%m/%Y %I:%M:%S %p",
+)
+from evaluate.job_metrics import record_job_metrics
+record_job_metrics(snakemake)
+
+
+
+from evaluate.commands import split_pooled_recall_report
+
+
+split_pooled_recall_report(
+    pooled_report=snakemake.input.pooled_report,
+    sample_pairs=[snakemake.wildcards.sample_pair],
+    reports=[snakemake.output.report],
+)
+
+logging.info("Done")
@@ -0,0 +1,193 @@
+from typing import Dict, Hashable, List, Sequence, Tuple
+import numpy as np
+import pandas as pd
+
+FILTER_NOT_APPLICABLE = "Not_App"
+
+
+def _cross_join(left: pd.DataFrame, right: pd.DataFrame) -> pd.DataFrame:
+    # merge(how="cross") needs pandas >= 1.2
+    return left.assign(_key=0).merge(right.assign(_key=0), on="_key").drop(columns="_key")
+
+
+def _group(df: pd.DataFrame, group_column: str, group_to_key: Dict[int, Tuple], column: str) -> Dict[Tuple, List]:
+    """
+    Groups the values of column by the integer group_column, keyed by group_to_key. Grouping by an integer column and
+    GroupBy.indices (the positions of the rows of each group, in order) avoids hashing the key columns of every row
+    and building a Series per group.
+    """
+    values = df[column].to_numpy()
+    return {
+        group_to_key[group]: values[indexes].tolist()
+        for group, indexes in df.groupby(group_column, sort=False).indices.items()
+    }
+
+
+class TargetManifest:
+    """
+    All the targets of the pipeline, and the lookups of the input functions of the rules, computed once when the
+    Snakefile is parsed. Paths are built column-wise on a DataFrame with one row per (sample, coverage, tool, filters)
+    and one per (sample, coverage, tool, filters, sample pair), instead of nested loops over the rows of the variant
+    calls, the filters and a linear scan of the sample pairs of each sample. Input functions look the variant calls
+    and samples up in dicts instead of calling data.xs() on each job.
+
+    All keys and path components are strings, as wildcards are.
+    """
+    cov_tool_and_filters = ["coverage", "tool", "coverage_threshold", "strand_bias_threshold", "gaps_threshold"]
+    sample_cov_tool_and_filters = ["sample_id"] + cov_tool_and_filters
+
+    def __init__(self, data: pd.DataFrame, samples: pd.DataFrame, sample_pairs: Sequence[Tuple[str, str]],
+                 output_folder: str, coverage_filters: Sequence, strand_bias_filters: Sequence,
+                 gaps_filters: Sequence):
+        self.output_folder = output_folder
+
+        calls = data.reset_index(drop=True).astype({"sample_id": str, "coverage": str, "tool": str})
+        self.sample_cov_and_tool_to_variant_call: Dict[Tuple[str, str, str], Dict[Hashable, object]] = {
+            (call["sample_id"], call["coverage"], call["tool"]): call for call in calls.to_dict("records")
+        }
+        self.sample_to_sample_info: Dict[str, Dict[Hashable, object]] = {
+            str(sample["sample_id"]): sample for sample in samples.to_dict("records")
+        }
+
+        self._calls_and_filters = self._get_calls_and_filters(
+            calls[["sample_id", "coverage", "tool"]], coverage_filters, strand_bias_filters, gaps_filters)
+        self._call_and_filters_id_to_key = self._get_ids_to_keys(
+            self._calls_and_filters, "_call_and_filters_id", self.sample_cov_tool_and_filters)
+        self._filters_id_to_key = self._get_ids_to_keys(
+            self._calls_and_filters, "_filters_id", self.cov_tool_and_filters)
+        self._calls_filters_and_sample_pairs = self._calls_and_filters[
+            ["sample_id", "filters_dir", "_call_and_filters_id", "_filters_id"]
+        ].merge(self._get_samples_and_sample_pairs(sample_pairs), on="sample_id", how="inner", sort=False)
+
+        self._build_precision_targets()
+        self._build_recall_targets()
+        self._build_plot_targets()
+
+    @staticmethod
+    def _get_calls_and_filters(calls: pd.DataFrame, coverage_filters: Sequence, strand_bias_filters: Sequence,
+                               gaps_filters: Sequence) -> pd.DataFrame:
+        """
+        One row per (sample_id, coverage, tool, coverage_threshold, strand_bias_threshold, gaps_threshold), in the order
+        of the calls. The strand bias and gaps filters only apply to pandora.
+        """
+        coverage_filters = pd.DataFrame({"coverage_threshold": [str(elem) for elem in coverage_filters]})
+        pandora_filters = _cross_join(
+            pd.DataFrame({"strand_bias_threshold": [str(elem) for elem in strand_bias_filters]}),
+            pd.DataFrame({"gaps_threshold": [str(elem) for elem in gaps_filters]}))
+        other_filters = pd.DataFrame({"strand_bias_threshold": [FILTER_NOT_APPLICABLE],
+                                      "gaps_threshold": [FILTER_NOT_APPLICABLE]})
+
+        calls = calls.assign(_call_index=range(len(calls)))
+        is_pandora = calls["tool"].str.startswith("pandora")
+        calls_and_filters = pd.concat([
+            _cross_join(_cross_join(calls[is_pandora], coverage_filters), pandora_filters),
+            _cross_join(_cross_join(calls[~is_pandora], coverage_filters), other_filters),
+        ], ignore_index=True)
+        calls_and_filters = calls_and_filters.sort_values("_call_index", kind="mergesort") \
+            .drop(columns="_call_index").reset_index(drop=True)
+        calls_and_filters["filters_dir"] = (
+            calls_and_filters["coverage"] + "/" + calls_and_filters["tool"]
+            + "/coverage_filter_" + calls_and_filters["coverage_threshold"]
+            + "/strand_bias_filter_" + calls_and_filters["strand_bias_threshold"]
+            + "/gaps_filter_" + calls_and_filters["gaps_threshold"]
+        )
+        # integer ids of the (sample, coverage, tool, filters) and of the (coverage, tool, filters) of each row
+        calls_and_filters["_call_and_filters_id"] = range(len(calls_and_filters))
+        calls_and_filters["_filters_id"] = pd.factorize(calls_and_filters["filters_dir"])[0]
+        return calls_and_filters
+
+    @staticmethod
+    def _get_ids_to_keys(calls_and_filters: pd.DataFrame, id_column: str, keys: List[str]) -> Dict[int, Tuple]:
+        calls_and_filters = calls_and_filters.drop_duplicates(id_column)
+        return dict(zip(calls_and_filters[id_column], calls_and_filters[keys].itertuples(index=False, name=None)))
+
+    @staticmethod
+    def _get_samples_and_sample_pairs(sample_pairs: Sequence[Tuple[str, str]]) -> pd.DataFrame:
+        """
+        One row per (sample_id, sample_pair) for each sample of each pair, the pairs of a sample in the order of
+        sample_pairs: the same as get_sample_pairs_containing_given_sample() for every sample at once.
+        """
+        rows = []
+        for pair_index, (sample1, sample2) in enumerate(sample_pairs):
+            sample_pair = f"{sample1}_and_{sample2}"
+            rows.append((str(sample1), sample_pair, pair_index))
+            rows.append((str(sample2), sample_pair, pair_index))
+        samples_and_sample_pairs = pd.DataFrame(rows, columns=["sample_id", "sample_pair", "_pair_index"])
+        return samples_and_sample_pairs.sort_values(["sample_id", "_pair_index"], kind="mergesort") \
+            .drop(columns="_pair_index")
+
+    def _build_precision_targets(self) -> None:
+        df = self._calls_and_filters
+        output_folder = self.output_folder
+        reports_dir = output_folder + "/precision/reports_from_probe_mappings/" + df["sample_id"] + "/" + df["filters_dir"]
+        df = df.assign(
+            report_file=reports_dir + "/variant_calls_probeset_report.npz",
+            nb_of_records_removed_file=reports_dir + "/nb_of_records_removed_with_mapq_sam_records_filter.csv",
+        )
+
+        self.cov_tool_and_filters_to_precision_report_files = _group(
+            df, "_filters_id", self._filters_id_to_key, "report_file")
+        self.sample_cov_tool_and_filters_to_precision_report_files = _group(
+            df, "_call_and_filters_id", self._call_and_filters_id_to_key, "report_file")
+        self.all_nb_of_records_removed_with_mapq_sam_records_filter_files_for_precision = \
+            list(df["nb_of_records_removed_file"])
+
+        # precision per sample is computed for every sample, whether it has calls for this (coverage, tool) or not
+        filters_dirs = df["filters_dir"].unique()
+        self.all_precision_per_sample_no_gt_conf_filter = [
+            f"{output_folder}/precision/precision_files_per_sample/{sample}/{filters_dir}/precision.tsv"
+            for filters_dir in filters_dirs for sample in self.sample_to_sample_info
+        ]
+        self.all_precision_files = [
+            f"{output_folder}/precision/precision_files/{filters_dir}/precision.tsv" for filters_dir in filters_dirs
+        ] + self.all_precision_per_sample_no_gt_conf_filter
+
+    def _build_recall_targets(self) -> None:
+        output_folder = self.output_folder
+        df = self._calls_filters_and_sample_pairs
+        # the directories are built once per (sample, coverage, tool, filters), rows only add their sample pair
+        sample_dirs = (self._calls_and_filters["sample_id"] + "/" + self._calls_and_filters["filters_dir"]).to_numpy()
+        call_and_filters_id_of_each_row = df["_call_and_filters_id"].to_numpy()
+        sample_pair_of_each_row = df["sample_pair"].to_numpy()
+        df = df.assign(
+            report_file=(output_folder + "/recall/reports/" + sample_dirs + "/")[call_and_filters_id_of_each_row]
+                        + sample_pair_of_each_row + ".threshold_sweep.report.npz",
+        )
+
+        self.sample_cov_tool_and_filters_to_recall_report_files = _group(
+            df, "_call_and_filters_id", self._call_and_filters_id_to_key, "report_file")
+        # (sample, sample_pair, report) of each threshold sweep report, whose rows with no GT_CONF filter are used
+        df["sample_sample_pair_and_report"] = list(zip(df["sample_id"], df["sample_pair"], df["report_file"]))
+        self.cov_tool_and_filters_to_recall_reports_with_no_gt_conf_filter = _group(
+            df, "_filters_id", self._filters_id_to_key, "sample_sample_pair_and_report")
+        self.all_recall_per_sample_pair_no_gt_conf_filter = list(
+            (output_folder + "/recall/recall_files_per_sample_pair/" + sample_dirs + "/")[call_and_filters_id_of_each_row]
+            + sample_pair_of_each_row + ".recall.tsv")
+
+        # recall is only computed for the samples in a sample pair
+        calls_and_filters = self._calls_and_filters.iloc[np.unique(df["_call_and_filters_id"].to_numpy())]
+        sample_dirs = calls_and_filters["sample_id"] + "/" + calls_and_filters["filters_dir"]
+        self.all_recall_per_sample_no_gt_conf_filter = list(
+            output_folder + "/recall/recall_files_per_sample/" + sample_dirs + "/recall.tsv")
+        self.cov_tool_and_filters_recall_per_sample_per_number_of_samples = dict(zip(
+            calls_and_filters[self.sample_cov_tool_and_filters].itertuples(index=False, name=None),
+            output_folder + "/recall/recall_files_per_sample_vs_nb_of_samples/" + sample_dirs
+            + "/recall_per_sample_per_number_of_samples.csv"))
+
+        filters = calls_and_filters.drop_duplicates("_filters_id")
+        filters_keys = list(filters[self.cov_tool_and_filters].itertuples(index=False, name=None))
+        self.cov_tool_and_filters_recall_per_number_of_samples_pvr = dict(zip(
+            filters_keys,
+            output_folder + "/recall/recall_per_number_of_samples/" + filters["filters_dir"]
+            + "/recall_per_number_of_samples_pvr.csv"))
+        self.cov_tool_and_filters_recall_per_number_of_samples_avgar = dict(zip(
+            filters_keys,
+            output_folder + "/recall/recall_per_number_of_samples/" + filters["filters_dir"]
+            + "/recall_per_number_of_samples_avgar.csv"))
+        self.all_recall_files = list(output_folder + "/recall/recall_files/" + filters["filters_dir"] + "/recall.tsv")
+        self._recall_filters_dirs = list(filters["filters_dir"])
+
+    def _build_plot_targets(self) -> None:
+        self.all_plot_data_intermediate_files = [
+            f"{self.output_folder}/plot_data/{filters_dir}/ROC_data.tsv" for filters_dir in self._recall_filters_dirs
+        ]
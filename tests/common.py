@@ -313,3 +313,32 @@ def create_precision_report_row(
         "classification": classification,
     }
     return pd.Series(data=data)
+
+
+def create_fake_bwa(directory: Path, sam: Path, exit_code: int = 0, stderr: str = "") -> Path:
+    """
+    Writes a bwa executable to directory/bin that ignores its arguments, outputs sam and stderr, and exits with
+    exit_code. Prepend the returned directory to PATH to use it instead of bwa.
+    """
+    bin_dir = directory / "bin"
+    bin_dir.mkdir(exist_ok=True)
+    bwa = bin_dir / "bwa"
+    bwa.write_text(f"#!/bin/sh\ncat {sam}\necho '{stderr}' >&2\nexit {exit_code}\n")
+    bwa.chmod(0o755)
+    return bin_dir
+
+
+def create_probe_mappings_sam(path: Path) -> Path:
+    """
+    Writes a SAM with a correct and an incorrect mapping of two probes to path, as bwa would output it.
+    """
+    ref_header = ProbeHeader(chrom="GC00000422_2", sample="CFT073", pos=603, interval=ProbeInterval(25, 32),
+                             svtype="PH_SNPs", gt_conf=89.5987)
+    sequence = "AAAAAAAAAAACGGCTCGCATAGACACGACGACGACACGTACGATCGATCAGTCAT"
+    lines = [str(create_sam_header(str(ref_header), 64))]
+    for index, (nm, md) in enumerate([("NM:i:0", "MD:Z:56"), ("NM:i:1", "MD:Z:12T43")]):
+        query_header = ProbeHeader(sample="sample_1", chrom="chrom_1", pos=100 + index, interval=ProbeInterval(12, 17))
+        lines.append(f"{query_header}\t0\t{ref_header}\t1\t60\t56M\t*\t0\t0\t{sequence}\t*\t{nm}\t{md}\tAS:i:43\tXS:i:32")
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
@@ -0,0 +1,129 @@
+import json
+
+import pytest
+
+from evaluate.batch_runner import (
+    NamedList,
+    ScriptJob,
+    ScriptJobError,
+    load_jobs,
+    run_jobs,
+    run_script,
+    run_script_in_fork,
+    save_jobs,
+)
+
+SCRIPT = """
+import logging
+logging.basicConfig(filename=str(snakemake.log), filemode="w", level="INFO")
+from evaluate.job_metrics import record_job_metrics
+record_job_metrics(snakemake)
+from evaluate.instrumentation import count
+count("nb_of_lines", len(snakemake.input))
+
+with open(snakemake.output.concatenated, "w") as output_file:
+    for input_file in snakemake.input.files:
+        with open(input_file) as file:
+            output_file.write(file.read())
+if snakemake.params.fail:
+    raise ValueError("failing on purpose")
+logging.info(f"Done {snakemake.wildcards.sample} with {snakemake.threads} threads")
+"""
+
+
+def create_job(tmp_path, name: str, fail: bool = False) -> ScriptJob:
+    script = tmp_path / "script.py"
+    script.write_text(SCRIPT)
+    input_files = []
+    for index in range(2):
+        input_file = tmp_path / f"{name}.input_{index}.txt"
+        input_file.write_text(f"{name} {index}\n")
+        input_files.append(str(input_file))
+    return ScriptJob(rule="concat", script=script, input={"files": input_files},
+                     output={"concatenated": str(tmp_path / f"{name}.out.txt")},
+                     params={"fail": fail}, wildcards={"sample": name},
+                     log=[str(tmp_path / f"{name}.log")], threads=2)
+
+
+class TestNamedList:
+    def test_fromValue_dictWithListsIsFlattened(self):
+        actual = NamedList.from_value({"a": "1", "b": ["2", "3"]})
+
+        assert list(actual) == ["1", "2", "3"]
+        assert actual.a == "1"
+        assert actual.b == ["2", "3"]
+        assert dict(actual.items()) == {"a": "1", "b": ["2", "3"]}
+
+    def test_fromValue_listIsNotNamed(self):
+        actual = NamedList.from_value(["log"])
+
+        assert list(actual) == ["log"]
+        assert str(actual) == "log"
+        assert dict(actual.items()) == {}
+
+    def test_getattr_unknownNameRaisesAttributeError(self):
+        with pytest.raises(AttributeError):
+            NamedList.from_value({"a": "1"}).b
+
+
+class TestScriptJob:
+    def test_saveAndLoadJobs(self, tmp_path):
+        jobs = [create_job(tmp_path, "s1"), create_job(tmp_path, "s2", fail=True)]
+
+        save_jobs(jobs, tmp_path / "jobs.json")
+        actual = load_jobs(tmp_path / "jobs.json")
+
+        assert [job.to_dict() for job in actual] == [job.to_dict() for job in jobs]
+
+    def test_runScriptInFork_scriptSeesTheSnakemakeObject(self, tmp_path):
+        job = create_job(tmp_path, "s1")
+
+        run_script_in_fork(job)
+
+        assert (tmp_path / "s1.out.txt").read_text() == "s1 0\ns1 1\n"
+        assert "Done s1 with 2 threads" in (tmp_path / "s1.log").read_text()
+
+    def test_runScriptInFork_jobMetricsAreSavedWhenTheJobEnds(self, tmp_path):
+        run_script_in_fork(create_job(tmp_path, "s1"))
+
+        with open(tmp_path / "s1.log.metrics.json") as metrics_file:
+            metrics = json.load(metrics_file)
+        assert metrics["rule"] == "concat"
+        assert metrics["wildcards"] == {"sample": "s1"}
+        assert metrics["counters"] == {"nb_of_lines": 2}
+
+    def test_runScript_failingScriptStillSavesItsJobMetrics(self, tmp_path):
+        job = create_job(tmp_path, "s1", fail=True)
+
+        exit_code = run_script(job)
+
+        assert exit_code == 1
+        assert len(job.job_metrics_recorders) == 1
+        assert (tmp_path / "s1.log.metrics.json").exists()
+
+    def test_runScriptInFork_failingScriptRaisesScriptJobError(self, tmp_path):
+        with pytest.raises(ScriptJobError):
+            run_script_in_fork(create_job(tmp_path, "s1", fail=True))
+
+
+class TestRunJobs:
+    def test_allJobsRunAndFailedJobsAreReturnedInOrder(self, tmp_path):
+        jobs = [create_job(tmp_path, f"s{index}", fail=index in (1, 3)) for index in range(5)]
+
+        failed_jobs = run_jobs(jobs, processes=2)
+
+        assert [(job.wildcards.sample, exit_code) for job, exit_code in failed_jobs] == [("s1", 1), ("s3", 1)]
+        for index in range(5):
+            assert (tmp_path / f"s{index}.out.txt").read_text() == f"s{index} 0\ns{index} 1\n"
+
+    def test_jobMetricsDoNotCountTheMemoryOfTheInterpreterTheJobIsForkedFrom(self, tmp_path):
+        memory_of_this_interpreter = bytearray(200 * 1024 * 1024)
+
+        failed_jobs = run_jobs([create_job(tmp_path, "s1")])
+
+        with open(tmp_path / "s1.log.metrics.json") as metrics_file:
+            metrics = json.load(metrics_file)
+        assert failed_jobs == []
+        assert metrics["rss_at_fork_mb"] >= 200
+        assert metrics["peak_rss_mb"] < 100
+        del memory_of_this_interpreter
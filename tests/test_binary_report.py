@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from evaluate.binary_report import (
+    BinaryReportWriter,
+    ColumnNotStorableError,
+    MissingColumnsError,
+    get_binary_report_columns,
+    is_binary_report_path,
+    load_binary_report,
+    read_report_file,
+    save_binary_report,
+)
+
+
+def create_report_df() -> pd.DataFrame:
+    return pd.DataFrame({
+        "sample": ["CFT073", "CFT073", "H131800734"],
+        "query_probe_header": [">GT_CONF=1.5;", ">GT_CONF=2;", ""],
+        "classification": pd.Categorical(["unmapped", "primary_correct", "unmapped"]),
+        "GT_CONF": [1.5, 2.0, 0.0],
+        "NB_OF_SAMPLES": np.array([1, 2, 3], dtype=np.int8),
+        "good_eval": [False, True, False],
+    })
+
+
+class TestBinaryReport:
+    def test_isBinaryReportPath(self):
+        assert is_binary_report_path("report.npz")
+        assert not is_binary_report_path("report.tsv")
+        assert not is_binary_report_path(None)
+
+    def test_saveAndLoad_sameReport(self, tmp_path):
+        df = create_report_df()
+        save_binary_report(df, tmp_path / "report.npz")
+
+        actual = load_binary_report(tmp_path / "report.npz")
+
+        expected = df.assign(classification=df["classification"].astype(object))
+        assert_frame_equal(actual, expected)
+
+    def test_saveAndLoad_asCategorical(self, tmp_path):
+        df = create_report_df()
+        save_binary_report(df, tmp_path / "report.npz")
+
+        actual = load_binary_report(tmp_path / "report.npz", as_categorical=True)
+
+        assert isinstance(actual["sample"].dtype, pd.CategoricalDtype)
+        assert actual["sample"].to_list() == df["sample"].to_list()
+        assert actual["NB_OF_SAMPLES"].dtype == np.int8
+
+    def test_load_onlyGivenColumnsInFileOrder(self, tmp_path):
+        save_binary_report(create_report_df(), tmp_path / "report.npz")
+
+        actual = load_binary_report(tmp_path / "report.npz", columns=["GT_CONF", "sample"],
+                                    optional_columns=["absent"])
+
+        assert actual.columns.to_list() == ["sample", "GT_CONF"]
+
+    def test_getBinaryReportColumns(self, tmp_path):
+        save_binary_report(create_report_df(), tmp_path / "report.npz")
+        assert get_binary_report_columns(tmp_path / "report.npz") == create_report_df().columns.to_list()
+
+    def test_save_emptyReport(self, tmp_path):
+        df = pd.DataFrame(columns=["sample", "classification"])
+        save_binary_report(df, tmp_path / "report.npz")
+
+        actual = load_binary_report(tmp_path / "report.npz")
+
+        assert actual.columns.to_list() == ["sample", "classification"]
+        assert len(actual) == 0
+
+    def test_save_nonStringObjectColumnRaisesColumnNotStorableError(self, tmp_path):
+        df = pd.DataFrame({"PANGENOME_VARIATION_ID": [1, None]}, dtype=object)
+        with pytest.raises(ColumnNotStorableError):
+            save_binary_report(df, tmp_path / "report.npz")
+
+    def test_readReportFile_tsvAndBinaryAreTheSame(self, tmp_path):
+        df = create_report_df()
+        df.to_csv(tmp_path / "report.tsv", sep="\t", index=False)
+        save_binary_report(df, tmp_path / "report.npz")
+
+        columns = ["sample", "query_probe_header", "GT_CONF"]
+        actual = read_report_file(tmp_path / "report.npz", columns=columns)
+        expected = read_report_file(tmp_path / "report.tsv", columns=columns)
+
+        assert_frame_equal(actual, expected)
+
+    @pytest.mark.parametrize("file_name", ["report.npz", "report.tsv"])
+    def test_readReportFile_missingColumnRaisesMissingColumnsError(self, tmp_path, file_name):
+        df = create_report_df()
+        df.to_csv(tmp_path / "report.tsv", sep="\t", index=False)
+        save_binary_report(df, tmp_path / "report.npz")
+
+        with pytest.raises(MissingColumnsError, match="GT_CONFF"):
+            read_report_file(tmp_path / file_name, columns=["sample", "GT_CONFF"])
+
+    @pytest.mark.parametrize("file_name", ["report.npz", "report.tsv"])
+    def test_readReportFile_missingOptionalColumnIsNotLoaded(self, tmp_path, file_name):
+        df = create_report_df().drop(columns="GT_CONF")
+        df.to_csv(tmp_path / "report.tsv", sep="\t", index=False)
+        save_binary_report(df, tmp_path / "report.npz")
+
+        actual = read_report_file(tmp_path / file_name, columns=["sample"], optional_columns=["GT_CONF"])
+
+        assert actual.columns.to_list() == ["sample"]
+
+
+class TestBinaryReportWriter:
+    def test_writeRows_sameAsSavingTheDataFrame(self, tmp_path):
+        rows = [["CFT073", ">a;", "unmapped"], ["CFT073", ">b;", "primary_correct"], ["H131800734", ">a;", "unmapped"]]
+        writer = BinaryReportWriter(["sample", "query_probe_header", "classification"])
+        for row in rows:
+            writer.write_row(row)
+        writer.save(tmp_path / "report.npz")
+
+        actual = load_binary_report(tmp_path / "report.npz")
+        expected = pd.DataFrame(rows, columns=["sample", "query_probe_header", "classification"])
+
+        assert_frame_equal(actual, expected)
+
+    def test_noRows(self, tmp_path):
+        writer = BinaryReportWriter(["sample"])
+        writer.save(tmp_path / "report.npz")
+
+        assert len(load_binary_report(tmp_path / "report.npz")) == 0
+
+    def test_writeRows_numbersKeepTheirTypes(self, tmp_path):
+        rows = [["CFT073", 0.5, 10, True], ["CFT073", 1, 20, False]]
+        writer = BinaryReportWriter(["sample", "classification", "gt_conf_percentile", "good_eval"])
+        for row in rows:
+            writer.write_row(row)
+        writer.save(tmp_path / "report.npz")
+
+        actual = load_binary_report(tmp_path / "report.npz")
+        expected = pd.DataFrame({"sample": ["CFT073", "CFT073"], "classification": [0.5, 1.0],
+                                 "gt_conf_percentile": [10, 20], "good_eval": [True, False]})
+
+        assert_frame_equal(actual, expected)
+
+    def test_writeRows_stringInANumberColumn_raisesColumnNotStorableError(self):
+        writer = BinaryReportWriter(["classification"])
+        writer.write_row([0.5])
+
+        with pytest.raises(ColumnNotStorableError):
+            writer.write_row(["unmapped"])
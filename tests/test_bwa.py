@@ -1,8 +1,10 @@
 from pathlib import Path
+import os
 
 import pytest
 
 from evaluate.bwa import *
+from tests.common import create_fake_bwa, create_probe_mappings_sam
 
 TEST_CASES = Path("tests/test_cases")
 TEST_PANEL = TEST_CASES / "test_panel.fa"
@@ -66,3 +68,55 @@ class TestBwa:
         expected = ["-t", "3"]
 
         assert actual == expected
+
+
+class TestBwaOpenAlignments:
+    @pytest.fixture
+    def sam(self, tmp_path):
+        return create_probe_mappings_sam(tmp_path / "mappings.sam")
+
+    def use_fake_bwa(self, tmp_path, monkeypatch, sam, exit_code=0, stderr=""):
+        bin_dir = create_fake_bwa(tmp_path, sam, exit_code, stderr)
+        monkeypatch.setenv("PATH", f"{bin_dir}:{os.environ['PATH']}")
+
+    def test_openAlignments_recordsAreTheSameAsInTheSam(self, tmp_path, monkeypatch, sam):
+        self.use_fake_bwa(tmp_path, monkeypatch, sam)
+
+        with BWA.stream_query_to_ref(Path("query.fa"), Path("ref.fa")) as alignment_file:
+            actual = [record.to_string() for record in alignment_file]
+
+        with pysam.AlignmentFile(str(sam)) as sam_file:
+            expected = [record.to_string() for record in sam_file]
+        assert actual == expected
+
+    def test_openAlignments_outputGiven_samIsAlsoWritten(self, tmp_path, monkeypatch, sam):
+        self.use_fake_bwa(tmp_path, monkeypatch, sam)
+        output = tmp_path / "kept.sam"
+
+        with BWA.stream_query_to_ref(Path("query.fa"), Path("ref.fa"), output=output) as alignment_file:
+            nb_of_records = sum(1 for _ in alignment_file)
+
+        assert nb_of_records == 2
+        assert output.read_text() == sam.read_text()
+
+    def test_openAlignments_refNotIndexed_raiseIndexError(self, tmp_path, monkeypatch):
+        empty_sam = tmp_path / "empty.sam"
+        empty_sam.write_text("")
+        self.use_fake_bwa(tmp_path, monkeypatch, empty_sam, exit_code=1,
+                          stderr="[E::bwa_idx_load_from_disk] fail to locate the index files")
+
+        with pytest.raises(IndexError) as excinfo:
+            with BWA.stream_query_to_ref(Path("query.fa"), Path("ref.fa")) as alignment_file:
+                list(alignment_file)
+
+        assert "indexed by BWA" in str(excinfo.value)
+
+    def test_openAlignments_bwaFailsAfterTheHeader_raiseCalledProcessError(self, tmp_path, monkeypatch, sam):
+        self.use_fake_bwa(tmp_path, monkeypatch, sam, exit_code=2, stderr="out of memory")
+
+        with pytest.raises(subprocess.CalledProcessError) as excinfo:
+            with BWA.stream_query_to_ref(Path("query.fa"), Path("ref.fa")) as alignment_file:
+                list(alignment_file)
+
+        assert b"out of memory" in excinfo.value.stderr
+
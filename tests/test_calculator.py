@@ -3,8 +3,12 @@ from evaluate.calculator import (
     RecallCalculator,
     PrecisionCalculator,
     EmptyReportError,
+    get_prefix_sums,
 )
+import math
+import numpy as np
 import pytest
+import random
 from unittest.mock import patch, Mock
 from evaluate.report import (
     Report,
@@ -127,11 +131,144 @@ class TestPrecisionCalculator:
         assert actual.true_positives == 0.7
         assert actual.total == 2.0
 
+    def test_getPrecisionReport_thresholdsWithoutCallsAreSkipped(self):
+        columns = ["sample", "query_probe_header", "ref_probe_header", "classification"]
+        df = pd.DataFrame(
+            data=[
+                create_precision_report_row(0.4, gt_conf=100),
+                create_precision_report_row(0.8, gt_conf=20),
+                create_precision_report_row(0.3, gt_conf=100),
+            ],
+            columns=columns,
+        )
+        calculator = PrecisionCalculator(PrecisionReport([df]))
+
+        actual = calculator.get_precision_report([0, 20, 21, 100, 101])
+        expected = pd.DataFrame(data={
+            "GT": [0, 20, 21, 100],
+            "step_GT": [0, 1, 2, 3],
+            "precision": [1.5/3, 1.5/3, 0.7/2, 0.7/2],
+            "error_rate": [1 - 1.5/3, 1 - 1.5/3, 1 - 0.7/2, 1 - 0.7/2],
+            "nb_of_correct_calls": [1.5, 1.5, 0.7, 0.7],
+            "nb_of_total_calls": [3.0, 3.0, 2.0, 2.0],
+        })
+
+        pd.testing.assert_frame_equal(actual, expected)
+
+    def test_getPrecisionReport_sameAsFilteringTheReportAtEachThreshold(self):
+        columns = ["sample", "query_probe_header", "ref_probe_header", "classification"]
+        rows = [create_precision_report_row(classification / 10, gt_conf=gt_conf)
+                for classification, gt_conf in [(3, 5), (10, 50), (0, 7), (7, 50), (10, 1), (5, 33), (10, 90), (2, 7)]]
+        calculator = PrecisionCalculator(PrecisionReport([pd.DataFrame(data=rows, columns=columns)]))
+        all_gts = list(range(0, 100, 3))
+
+        actual = calculator.get_precision_report(all_gts)
+        expected = calculator.get_precision_report_by_filtering_the_report(all_gts)
+
+        pd.testing.assert_frame_equal(actual, expected)
+
+    def test_getPrecisionReport_valuesWhoseSumDependsOnTheOrder_sameAsFilteringTheReportAtEachThreshold(self):
+        columns = ["sample", "query_probe_header", "ref_probe_header", "classification"]
+        random.seed(1)
+        rows = [create_precision_report_row(random.random(), gt_conf=random.randrange(100)) for _ in range(200)]
+        calculator = PrecisionCalculator(PrecisionReport([pd.DataFrame(data=rows, columns=columns)]))
+        all_gts = list(range(0, 100))
+
+        actual = calculator.get_precision_report(all_gts)
+        expected = calculator.get_precision_report_by_filtering_the_report(all_gts)
+
+        pd.testing.assert_frame_equal(actual, expected, check_exact=True)
+
+    def test_getPrecisionReportForEveryGtConf(self):
+        columns = ["sample", "query_probe_header", "ref_probe_header", "classification"]
+        df = pd.DataFrame(
+            data=[
+                create_precision_report_row(0.4, gt_conf=100),
+                create_precision_report_row(0.8, gt_conf=20),
+                create_precision_report_row(0.3, gt_conf=100),
+            ],
+            columns=columns,
+        )
+        calculator = PrecisionCalculator(PrecisionReport([df]))
+
+        actual = calculator.get_precision_report_for_every_gt_conf()
+
+        assert actual["GT"].to_list() == [20.0, 100.0]
+        assert actual["nb_of_total_calls"].to_list() == [3.0, 2.0]
+
+
+
+
+
+class TestGetPrefixSums:
+    def test_getPrefixSums_correctlyRoundedSumOfEachPrefix(self):
+        random.seed(1)
+        values = np.array([random.uniform(-1, 1) * 10 ** random.randint(-20, 20) for _ in range(1000)])
+        prefix_lengths = np.array([1000, 0, 10, 500, 10, 999])
+
+        actual = get_prefix_sums(values, prefix_lengths)
+        expected = [math.fsum(values[:prefix_length]) for prefix_length in prefix_lengths]
+
+        assert actual.tolist() == expected
 
+    def test_getPrefixSums_sumThatCancelsOut_zero(self):
+        actual = get_prefix_sums(np.array([1e100, 1.0, -1e100, -1.0]), np.array([3, 4]))
 
+        assert actual.tolist() == [1.0, 0.0]
+
+
+def create_random_recall_report(seed: int, nb_of_variants: int = 40, encode_columns: bool = False) -> RecallReport:
+    random.seed(seed)
+    classifications = ["unmapped", "partially_mapped", "primary_correct", "primary_incorrect",
+                       "secondary_correct", "supplementary_incorrect"]
+    lines = ["sample\tquery_probe_header\tref_probe_header\tclassification"]
+    pos = 0
+    for pangenome_variation_id in range(nb_of_variants):
+        nb_of_alleles = random.randint(1, 3)
+        nb_of_different_allele_sequences = random.randint(1, 3)
+        nb_of_samples = random.randint(2, 5)
+        for _ in range(random.randint(1, 6)):
+            pos += 1
+            allele_id = random.randrange(nb_of_alleles)
+            allele_sequence_id = random.randrange(nb_of_different_allele_sequences)
+            query_probe_header = f"CHROM=1;POS={pos};INTERVAL=[0,10);PANGENOME_VARIATION_ID={pangenome_variation_id};" \
+                                 f"NUMBER_OF_ALLELES={nb_of_alleles};ALLELE_ID={allele_id};" \
+                                 f"NUMBER_OF_DIFFERENT_ALLELE_SEQUENCES={nb_of_different_allele_sequences};" \
+                                 f"ALLELE_SEQUENCE_ID={allele_sequence_id};NB_OF_SAMPLES={nb_of_samples};"
+            ref_probe_header = f"GT_CONF={random.choice([0, 1, 5, 5.5, 10, 20, 50])};"
+            lines.append(f"sample\t{query_probe_header}\t{ref_probe_header}\t{random.choice(classifications)}")
+    df = pd.read_csv(StringIO("\n".join(lines)), sep="\t", keep_default_na=False)
+    return RecallReport([df], False, encode_columns=encode_columns)
 
 
 class TestRecallCalculator:
+    @pytest.mark.parametrize("seed", [1, 2, 3])
+    def test___get_recall_report___same_as_filtering_the_report_at_each_threshold(self, seed):
+        calculator = RecallCalculator(create_random_recall_report(seed))
+        all_gts = [0, 1, 2, 5, 5.5, 6, 10, 20, 30, 50]
+
+        actual = calculator.get_recall_report(all_gts)
+        expected = calculator.get_recall_report_by_filtering_the_report(all_gts)
+
+        pd.testing.assert_frame_equal(actual, expected, check_exact=True)
+
+    def test___get_recall_report___encoded_report_gives_same_recall(self):
+        all_gts = [0, 1, 5, 10, 50]
+
+        actual = RecallCalculator(create_random_recall_report(5, encode_columns=True)).get_recall_report(all_gts)
+        expected = RecallCalculator(create_random_recall_report(5)).get_recall_report(all_gts)
+
+        pd.testing.assert_frame_equal(actual, expected)
+
+    def test___get_recall_report___thresholds_without_truth_probes_are_skipped(self):
+        calculator = RecallCalculator(create_random_recall_report(seed=4, nb_of_variants=3))
+
+        actual = calculator.get_recall_report([0, 100, 1000])
+
+        assert actual["GT"].to_list() == [0]
+        assert actual["step_GT"].to_list() == [0]
+
+
     @patch.object(Report, Report.get_classifications_as_list.__name__, return_value=[
         "unmapped", "partially_mapped", "primary_correct", "primary_incorrect",
         "secondary_correct", "secondary_incorrect", "supplementary_correct",
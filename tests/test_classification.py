@@ -10,10 +10,26 @@ from tests.common import (
     create_incorrect_primary_sam_record,
 )
 from evaluate.classification import *
+import pickle
 import pytest
 
 
 class TestClassification:
+    @pytest.mark.parametrize("create_sam_record", [create_unmapped_sam_record, create_partially_mapped_sam_record,
+                                                   create_correct_secondary_sam_record,
+                                                   create_incorrect_supplementary_sam_record,
+                                                   create_incorrect_primary_sam_record])
+    def test_fromSamRecord_sameClassificationAsFromPysamRecord(self, create_sam_record):
+        record = create_sam_record()
+        sam_record = pickle.loads(pickle.dumps(SamRecord.from_record(record)))
+
+        expected = RecallClassification(record)
+        actual = RecallClassification(sam_record)
+
+        assert actual.assessment() == expected.assessment()
+        assert PrecisionClassification(sam_record).assessment() == PrecisionClassification(record).assessment()
+        assert all(getattr(actual, attribute) == getattr(expected, attribute) for attribute in Classification.__slots__)
+
     def test_equality_twoEqualReturnsTrue(self):
         c1 = Classification()
         c1.query_probe = Probe(ProbeHeader(chrom="2", pos=5))
@@ -248,6 +264,27 @@ class TestClassification:
         with pytest.raises(NotImplementedError):
             classification.assessment()
 
+    def test_init_extractsAlignmentFieldsOnce(self):
+        record = create_correct_secondary_sam_record()
+        classification = Classification(record=record)
+
+        assert classification.query_name == record.query_name
+        assert classification.mapping_quality == record.mapping_quality
+        assert classification.query_alignment_start == record.query_alignment_start
+        assert classification.query_alignment_end == record.query_alignment_end
+        assert classification.ref_probe.chrom == "GC00000422_2"
+        assert not classification.is_unmapped
+        assert classification.is_secondary
+        assert not classification.is_supplementary
+        assert not hasattr(classification, "__dict__")
+
+    def test_init_unmappedRecord(self):
+        classification = Classification(record=create_unmapped_sam_record())
+
+        assert classification.is_unmapped
+        assert not classification.is_secondary
+        assert not classification.is_supplementary
+
 
 class TestRecallClassification:
     def test_isCorrect_probeIsSnpAndIsMismatchReturnsFalse(self):
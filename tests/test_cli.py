@@ -0,0 +1,127 @@
+from pathlib import Path
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+from evaluate.binary_report import load_binary_report
+from evaluate.calculator import PrecisionCalculator
+from evaluate.cli import get_parser, main
+from evaluate.report import PrecisionReport
+from evaluate.mask_bitmaps import MaskBitmaps
+from tests.common import create_fake_bwa, create_precision_report_row, create_probe_mappings_sam
+
+REPO_DIR = Path(__file__).absolute().parent.parent
+
+
+class TestCli:
+    @pytest.mark.parametrize("args", [
+        ["map-probes", "--query", "query.fa", "--refs", "ref.fa", "--outputs", "out.sam"],
+        ["export-report", "report.npz", "report.tsv"],
+        ["calculate-precision", "--reports", "report.npz", "--output", "precision.tsv"],
+    ])
+    def test_parsingArgumentsDoesNotImportHeavyModules(self, args):
+        code = f"""
+import sys
+from evaluate.cli import get_parser
+get_parser().parse_args({args})
+print(" ".join(module for module in ["pandas", "numpy", "pysam", "intervaltree"] if module in sys.modules))
+"""
+        actual = subprocess.run([sys.executable, "-c", code], cwd=REPO_DIR, check=True, stdout=subprocess.PIPE,
+                                universal_newlines=True).stdout.strip()
+        assert actual == ""
+
+    def test_help(self):
+        completed_process = subprocess.run([sys.executable, "-m", "evaluate", "--help"], cwd=REPO_DIR, check=True,
+                                           stdout=subprocess.PIPE, universal_newlines=True)
+        assert "calculate-precision" in completed_process.stdout
+
+    def test_metadataWithoutValue_usageError(self, capsys):
+        args = ["calculate-precision", "--reports", "report.tsv", "--output", "precision.tsv", "--metadata", "tool"]
+        with pytest.raises(SystemExit) as exit_info:
+            main(args)
+        assert exit_info.value.code == 2
+        assert "--metadata: should be KEY=VALUE, got tool" in capsys.readouterr().err
+
+    def test_mapProbes_refsAndOutputsOfDifferentLengths_usageError(self, capsys):
+        args = ["map-probes", "--query", "query.fa", "--refs", "ref_1.fa", "ref_2.fa", "--outputs", "out_1.sam"]
+        with pytest.raises(SystemExit) as exit_info:
+            main(args)
+        assert exit_info.value.code == 2
+        error = capsys.readouterr().err
+        assert "usage: python -m evaluate map-probes" in error
+        assert "got 2 --refs but 1 --outputs" in error
+
+    def test_mapAndRecallReport_keepSamsOfDifferentLengthThanRefs_usageError(self, capsys):
+        args = ["map-and-recall-report", "--query", "query.fa", "--refs", "ref_1.fa", "ref_2.fa",
+                "--gt-conf-percentiles", "0", "1", "--mask-bitmaps", "mask.bitmaps", "--sample-id", "sample",
+                "--report", "report.npz", "--keep-sams", "1.sam"]
+        with pytest.raises(SystemExit) as exit_info:
+            main(args)
+        assert exit_info.value.code == 2
+        assert "got 2 --refs but 1 --keep-sams" in capsys.readouterr().err
+
+    def test_calculatePrecision_sameAsCalculatorWithMetadataColumns(self, tmp_path):
+        columns = ["sample", "query_probe_header", "ref_probe_header", "classification"]
+        report = pd.DataFrame(data=[create_precision_report_row(1.0, gt_conf=100),
+                                    create_precision_report_row(0.0, gt_conf=50),
+                                    create_precision_report_row(0.5, gt_conf=10)], columns=columns)
+        report.to_csv(tmp_path / "report.tsv", sep="\t", index=False)
+
+        main(["--log", str(tmp_path / "log"), "calculate-precision", "--reports", str(tmp_path / "report.tsv"),
+              "--output", str(tmp_path / "precision.tsv"), "--gt-conf-percentiles", "0", "60",
+              "--metadata", "tool=pandora", "--metadata", "coverage=100x", "--no-index"])
+        actual = pd.read_csv(tmp_path / "precision.tsv", sep="\t")
+
+        expected = PrecisionCalculator(PrecisionReport([report])).get_precision_report([0, 60])
+        expected["tool"] = "pandora"
+        expected["coverage"] = "100x"
+        pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+    def test_getParser_recallReportArguments(self):
+        args = get_parser().parse_args(["recall-report", "--sams", "0.sam", "1.sam", "--gt-conf-percentiles", "0", "1",
+                                        "--mask-bitmaps", "mask.bitmaps", "--sample-id", "sample",
+                                        "--report", "report.npz"])
+        assert args.sams == ["0.sam", "1.sam"]
+        assert args.gt_conf_percentiles == [0, 1]
+        assert args.processes == 1
+
+    @pytest.fixture
+    def probe_mappings(self, tmp_path, monkeypatch):
+        sam = create_probe_mappings_sam(tmp_path / "mappings.sam")
+        bin_dir = create_fake_bwa(tmp_path, sam)
+        monkeypatch.setenv("PATH", f"{bin_dir}:{os.environ['PATH']}")
+        MaskBitmaps.from_regions([("chrom_1", 0, 1)]).save(tmp_path / "mask.bitmaps")
+        return sam
+
+    def test_mapAndRecallReport_sameReportAsRecallReportOfTheSams(self, tmp_path, probe_mappings):
+        main(["recall-report", "--sams", str(probe_mappings), str(probe_mappings), "--gt-conf-percentiles", "0", "1",
+              "--mask-bitmaps", str(tmp_path / "mask.bitmaps"), "--sample-id", "sample_1",
+              "--report", str(tmp_path / "expected.npz")])
+        main(["map-and-recall-report", "--query", "truth_probeset.fa", "--refs", "ref_0.fa", "ref_1.fa",
+              "--gt-conf-percentiles", "0", "1", "--mask-bitmaps", str(tmp_path / "mask.bitmaps"),
+              "--sample-id", "sample_1", "--report", str(tmp_path / "actual.npz"),
+              "--keep-sams", str(tmp_path / "kept/0.sam"), str(tmp_path / "kept/1.sam")])
+
+        actual = load_binary_report(tmp_path / "actual.npz")
+        expected = load_binary_report(tmp_path / "expected.npz")
+        assert len(actual) == 4
+        pd.testing.assert_frame_equal(actual, expected)
+        assert (tmp_path / "kept/1.sam").read_text() == probe_mappings.read_text()
+
+    def test_mapAndPrecisionReport_sameReportAsPrecisionReportOfTheSam(self, tmp_path, probe_mappings):
+        main(["precision-report", "--sam", str(probe_mappings), "--mask-bitmaps", str(tmp_path / "mask.bitmaps"),
+              "--sample-id", "sample_1", "--tool", "pandora", "--report", str(tmp_path / "expected.npz"),
+              "--nb-of-records-removed", str(tmp_path / "expected.csv")])
+        main(["map-and-precision-report", "--query", "variant_call_probeset.fa", "--ref", "ref.fa",
+              "--mask-bitmaps", str(tmp_path / "mask.bitmaps"), "--sample-id", "sample_1", "--tool", "pandora",
+              "--report", str(tmp_path / "actual.npz"), "--nb-of-records-removed", str(tmp_path / "actual.csv")])
+
+        actual = load_binary_report(tmp_path / "actual.npz")
+        expected = load_binary_report(tmp_path / "expected.npz")
+        assert len(actual) == 2
+        pd.testing.assert_frame_equal(actual, expected)
+        assert (tmp_path / "actual.csv").read_text() == (tmp_path / "expected.csv").read_text()
+
@@ -0,0 +1,131 @@
+from collections import Counter
+import math
+
+import pysam
+import pytest
+from intervaltree import Interval
+
+from evaluate.aligned_pairs import AlignedPairs, AlignmentType
+from evaluate.compact_alignment import (
+    CompactAlignment,
+    QueryIntervalScore,
+    MDTagNotFoundError,
+)
+from tests.common import create_sam_header, create_unmapped_sam_record
+
+
+def create_record(cigar: str, md: str, pos: int = 1, sequence: str = None) -> pysam.AlignedSegment:
+    query_length = sum(length for length, operation in _parse_cigar(cigar) if operation in "MIS=X")
+    if sequence is None:
+        sequence = "ACGT" * (query_length // 4 + 1)
+        sequence = sequence[:query_length]
+    header = create_sam_header("reference", 1000)
+    sam_string = f"query\t0\treference\t{pos}\t60\t{cigar}\t*\t0\t0\t{sequence}\t*\tMD:Z:{md}"
+    return pysam.AlignedSegment.fromstring(sam_string, header)
+
+
+def _parse_cigar(cigar: str):
+    number = ""
+    for char in cigar:
+        if char.isdigit():
+            number += char
+        else:
+            yield int(number), char
+            number = ""
+
+
+def score_with_aligned_pairs(record: pysam.AlignedSegment, query_start: int, query_end: int) -> QueryIntervalScore:
+    aligned_pairs = AlignedPairs(record.get_aligned_pairs(with_seq=True))
+    interval = Interval(query_start, query_end)
+    pairs_in_interval = aligned_pairs.get_pairs_in_query_interval(interval)
+    alignment_type_count = Counter(pairs_in_interval.get_alignment_types())
+    ref_positions = aligned_pairs.get_ref_positions(transform_Nones_into_halfway_positions=True)
+    ref_positions = ref_positions[slice(*aligned_pairs.get_index_of_query_interval(interval))]
+    if not ref_positions:
+        return QueryIntervalScore(alignment_type_count[AlignmentType.MATCH], len(pairs_in_interval))
+    return QueryIntervalScore(
+        alignment_type_count[AlignmentType.MATCH],
+        len(pairs_in_interval),
+        math.floor(ref_positions[0]),
+        math.ceil(ref_positions[-1]) + 1,
+    )
+
+
+class TestCompactAlignment:
+    def test_getMismatchIndexesFromMd_noMismatches(self):
+        assert CompactAlignment.get_mismatch_indexes_from_md("56") == ()
+
+    def test_getMismatchIndexesFromMd_mismatchesAndDeletion(self):
+        actual = CompactAlignment.get_mismatch_indexes_from_md("12A2AGC38")
+        expected = (12, 15, 16, 17)
+        assert actual == expected
+
+    def test_getMismatchIndexesFromMd_deletedBasesDoNotConsumeAlignedBases(self):
+        actual = CompactAlignment.get_mismatch_indexes_from_md("15G3^T36")
+        expected = (15,)
+        assert actual == expected
+
+    def test_getMismatchIndexesFromMd_mismatchAfterDeletion(self):
+        actual = CompactAlignment.get_mismatch_indexes_from_md("3^AC0T5")
+        expected = (3,)
+        assert actual == expected
+
+    def test_fromRecord_unmappedRecordReturnsEmptyAlignment(self):
+        actual = CompactAlignment.from_record(create_unmapped_sam_record())
+        expected = CompactAlignment()
+        assert actual == expected
+
+    def test_scoreQueryInterval_recordWithoutMdTagRaisesMDTagNotFoundError(self):
+        header = create_sam_header("reference", 100)
+        record = pysam.AlignedSegment.fromstring(
+            "query\t0\treference\t1\t60\t4M\t*\t0\t0\tACGT\t*", header
+        )
+        compact_alignment = CompactAlignment.from_record(record)
+        with pytest.raises(MDTagNotFoundError):
+            compact_alignment.score_query_interval(0, 2)
+
+    def test_fromRecord(self):
+        record = create_record("2S11M1I8M1D36M", "15G3^T36", pos=5)
+        actual = CompactAlignment.from_record(record)
+        expected = CompactAlignment(
+            cigartuples=[(4, 2), (0, 11), (1, 1), (0, 8), (2, 1), (0, 36)],
+            reference_start=4,
+            mismatch_indexes=(15,),
+        )
+        assert actual == expected
+
+    def test_scoreQueryInterval_emptyAlignmentReturnsEmptyScore(self):
+        actual = CompactAlignment().score_query_interval(0, 10)
+        expected = QueryIntervalScore(0, 0, None, None)
+        assert actual == expected
+
+    def test_scoreQueryInterval_mismatch1insertion1deletion1ProbeBases(self):
+        record = create_record("11M1I8M1D36M", "15G3^T36")
+        actual = CompactAlignment.from_record(record).score_query_interval(11, 21)
+        expected = QueryIntervalScore(8, 11, 10, 21)
+        assert actual == expected
+
+    @pytest.mark.parametrize(
+        "cigar,md,pos",
+        [
+            ("56M", "56", 1),
+            ("56M", "12A2AGC38", 1),
+            ("12M1D44M", "12^G44", 1),
+            ("11M1I44M", "55", 1),
+            ("11M1I8M1D36M", "15G3^T36", 3),
+            ("5S20M3D10M2I4M", "3C16^GGA0T13", 7),
+            ("3M2I2D3M4S", "1A1^TT3", 1),
+            ("4M100N6M", "2G7", 10),
+            ("3H6M2I6M3H", "0A11", 2),
+            ("6S1M1S", "1", 1),
+        ],
+    )
+    def test_scoreQueryInterval_sameScoreAsAlignedPairsForEveryQueryInterval(self, cigar, md, pos):
+        record = create_record(cigar, md, pos=pos)
+        compact_alignment = CompactAlignment.from_record(record)
+        query_length = record.query_length
+        for query_start in range(-1, query_length + 1):
+            for query_end in range(query_start + 1, query_length + 3):
+                actual = compact_alignment.score_query_interval(query_start, query_end)
+                expected = score_with_aligned_pairs(record, query_start, query_end)
+                assert actual == expected, (query_start, query_end)
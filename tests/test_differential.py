@@ -0,0 +1,131 @@
+import json
+
+import pandas as pd
+import pytest
+
+from benchmarks.differential import ENGINES, DifferentialInputs, Engine, compare_tables, register_engine, run_engine
+from benchmarks.synthetic_data import SyntheticDataConfig, SyntheticDataGenerator
+
+
+@pytest.fixture(scope="module")
+def inputs(tmp_path_factory):
+    config = SyntheticDataConfig(nb_of_samples=2, nb_of_genes=10, gene_length=500, variant_density=0.02,
+                                 tools=("pandora_illumina", "snippy"))
+    dataset = SyntheticDataGenerator(config).generate(tmp_path_factory.mktemp("synthetic_data"))
+    return DifferentialInputs.from_synthetic_dataset(dataset)
+
+
+class WrongPrecisionSweepEngine(ENGINES["precision_sweep"]):
+    name = "wrong_precision_sweep"
+
+    def run_engine(self, case):
+        precision_report = super().run_engine(case)
+        precision_report["nb_of_total_calls"] += 1
+        return precision_report
+
+
+class TestCompareTables:
+    def test_sameValuesOfDifferentDtypes_equal(self):
+        reference = pd.DataFrame({"GT": [0, 1], "precision": [1.0, 0.5]})
+        actual = pd.DataFrame({"GT": [0.0, 1.0], "precision": [1.0, 0.5]})
+
+        comparison = compare_tables(reference, actual)
+
+        assert comparison.equal
+        assert comparison.within_tolerance
+        assert comparison.differences == []
+
+    def test_differentValue_differenceReported(self):
+        reference = pd.DataFrame({"GT": [0, 1], "precision": [1.0, 0.5]})
+        actual = pd.DataFrame({"GT": [0, 1], "precision": [1.0, 0.25]})
+
+        comparison = compare_tables(reference, actual)
+
+        assert not comparison.equal
+        assert not comparison.within_tolerance
+        assert comparison.differences == ["row 1, precision: 0.5 != 0.25"]
+
+    def test_differenceWithinDeclaredTolerance_withinTolerance(self):
+        reference = pd.DataFrame({"GT": [0, 1], "precision": [1.0, 0.5]})
+        actual = pd.DataFrame({"GT": [0, 1], "precision": [1.0, 0.5 + 1e-12]})
+
+        comparison = compare_tables(reference, actual, float_tolerances={"precision": 1e-9})
+
+        assert not comparison.equal
+        assert comparison.within_tolerance
+
+    def test_differenceBeyondDeclaredTolerance_differenceReported(self):
+        reference = pd.DataFrame({"precision": [1.0, 0.5]})
+        actual = pd.DataFrame({"precision": [1.0, 0.5 + 1e-6]})
+
+        comparison = compare_tables(reference, actual, float_tolerances={"precision": 1e-9})
+
+        assert not comparison.within_tolerance
+
+    def test_missingValuesInBoth_equal(self):
+        reference = pd.DataFrame({"ref_start": [None, 1]})
+        actual = pd.DataFrame({"ref_start": [None, 1]})
+
+        assert compare_tables(reference, actual).equal
+
+    def test_rowsInAnotherOrder_equalOnlyIfRowOrderIgnored(self):
+        reference = pd.DataFrame({"query_name": ["a", "b"], "overlaps_mask": [True, False]})
+        actual = pd.DataFrame({"query_name": ["b", "a"], "overlaps_mask": [False, True]})
+
+        assert not compare_tables(reference, actual).equal
+        assert compare_tables(reference, actual, ignore_row_order=True).equal
+
+    def test_differentColumns_differenceReported(self):
+        reference = pd.DataFrame({"GT": [0], "precision": [1.0]})
+        actual = pd.DataFrame({"GT": [0], "recall": [1.0]})
+
+        comparison = compare_tables(reference, actual)
+
+        assert not comparison.within_tolerance
+        assert comparison.differences == ["columns: ['GT', 'precision'] != ['GT', 'recall']"]
+
+    def test_differentNumberOfRows_differenceReported(self):
+        comparison = compare_tables(pd.DataFrame({"GT": [0, 1]}), pd.DataFrame({"GT": [0]}))
+
+        assert comparison.differences == ["number of rows: 2 != 1"]
+
+
+class TestDifferential:
+    @pytest.mark.parametrize("engine_name", list(ENGINES))
+    def test_registeredEngineAgreesWithItsReference(self, inputs, tmp_path, engine_name):
+        results = list(run_engine(ENGINES[engine_name](), inputs, tmp_path))
+
+        assert len(results) > 0
+        assert sum(result.nb_of_rows for result in results) > 0
+        assert [result.differences for result in results if result.status == "DIFFERENT"] == []
+
+    def test_engineDisagreeingWithItsReference_different(self, inputs, tmp_path):
+        results = list(run_engine(WrongPrecisionSweepEngine(), inputs, tmp_path))
+
+        assert {result.status for result in results} == {"DIFFERENT"}
+        assert results[0].differences[0].startswith("row 0, nb_of_total_calls:")
+
+    def test_registerEngine_nameAlreadyRegistered_raisesValueError(self):
+        class PrecisionSweepEngineAgain(Engine):
+            name = "precision_sweep"
+
+        with pytest.raises(ValueError):
+            register_engine(PrecisionSweepEngineAgain)
+
+    def test_fromJson_pathsRelativeToTheJsonFile(self, tmp_path):
+        json_file = tmp_path / "inputs.json"
+        json_file.write_text(json.dumps({
+            "vcf_ref": "ref.fa",
+            "vcfs": {"pandora.vcf": ["sample_1", "sample_2"]},
+            "precision_sams": [["snippy_sample_1.sam", "sample_1", "snippy", "sample_1.mask.bed"]],
+        }))
+
+        actual = DifferentialInputs.from_json(json_file)
+
+        expected = DifferentialInputs(
+            vcf_ref=tmp_path / "ref.fa",
+            vcfs={tmp_path / "pandora.vcf": ["sample_1", "sample_2"]},
+            precision_sams=[(tmp_path / "snippy_sample_1.sam", "sample_1", "snippy", tmp_path / "sample_1.mask.bed")],
+            recall_sams=[],
+        )
+        assert actual == expected
@@ -81,3 +81,20 @@ class TestFilter:
         expected = []
 
         assert actual == expected
+
+    @patch.object(
+        Filter, Filter.record_should_be_filtered_out.__name__, side_effect=[True, False]
+    )
+    def test_filterRecordsLazily_recordsAreOnlyConsumedWhenRequested(self, *mock):
+        record_filtered_out = MagicMock()
+        record_not_filtered_out = MagicMock()
+        records = iter([record_filtered_out, record_not_filtered_out])
+        filter = Filter()
+
+        filtered_records = filter.filter_records_lazily(records)
+        assert next(records) is record_filtered_out
+
+        actual = list(filtered_records)
+        expected = []
+
+        assert actual == expected
@@ -0,0 +1,132 @@
+import threading
+
+import pandas as pd
+import pytest
+
+from evaluate.instrumentation import Instrumentation, get_slowest_stages
+
+
+def get_stage_metrics(instrumentation: Instrumentation) -> dict:
+    return {metrics["stage"]: metrics for metrics in instrumentation.to_dict()["stages"]}
+
+
+class TestInstrumentation:
+    def test_stage_accumulatesRunsAndRecords(self):
+        instrumentation = Instrumentation()
+
+        for nb_of_records in [3, 5]:
+            with instrumentation.stage("stage", log=False) as stage:
+                stage.add_records(nb_of_records)
+
+        actual = get_stage_metrics(instrumentation)["stage"]
+        assert actual["nb_of_runs"] == 2
+        assert actual["nb_of_records"] == 8
+        assert actual["wall_time_s"] >= 0
+        assert actual["cpu_time_s"] >= 0
+
+    def test_stage_exceptionIsRaisedAndStageIsStillTimed(self):
+        instrumentation = Instrumentation()
+
+        with pytest.raises(ValueError):
+            with instrumentation.stage("stage", log=False):
+                raise ValueError()
+
+        assert get_stage_metrics(instrumentation)["stage"]["nb_of_runs"] == 1
+
+    def test_stage_logsTheStage(self, caplog):
+        instrumentation = Instrumentation()
+
+        with caplog.at_level("INFO"):
+            with instrumentation.stage("stage") as stage:
+                stage.add_records(2)
+
+        assert "Stage stage: done (2 records)" in caplog.text
+
+    def test_iterate_yieldsAllItemsAndCountsThem(self):
+        instrumentation = Instrumentation()
+
+        actual = list(instrumentation.iterate("stage", iter([1, 2, 3]), log=False))
+
+        assert actual == [1, 2, 3]
+        metrics = get_stage_metrics(instrumentation)["stage"]
+        assert metrics["nb_of_runs"] == 1
+        assert metrics["nb_of_records"] == 3
+
+    def test_iterate_partiallyConsumedIteratorIsRecordedWhenClosed(self):
+        instrumentation = Instrumentation()
+
+        items = instrumentation.iterate("stage", iter([1, 2, 3]), log=False)
+        next(items)
+        items.close()
+
+        assert get_stage_metrics(instrumentation)["stage"]["nb_of_records"] == 1
+
+    def test_count(self):
+        instrumentation = Instrumentation()
+
+        instrumentation.count("counter")
+        instrumentation.count("counter", 4)
+
+        assert instrumentation.to_dict()["counters"] == {"counter": 5}
+
+    def test_stage_threadSafe(self):
+        instrumentation = Instrumentation()
+
+        def run_stages():
+            for _ in range(1000):
+                with instrumentation.stage("stage", log=False) as stage:
+                    stage.add_records()
+        threads = [threading.Thread(target=run_stages) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        actual = get_stage_metrics(instrumentation)["stage"]
+        assert actual["nb_of_runs"] == 4000
+        assert actual["nb_of_records"] == 4000
+
+    def test_reset(self):
+        instrumentation = Instrumentation()
+        with instrumentation.stage("stage", log=False):
+            instrumentation.count("counter")
+
+        instrumentation.reset()
+
+        assert instrumentation.to_dict() == {"stages": [], "counters": {}}
+
+
+class TestGetSlowestStages:
+    @staticmethod
+    def create_stage_metrics(stage: str, wall_time_s: float, nb_of_records: int) -> dict:
+        return {"stage": stage, "nb_of_runs": 1, "wall_time_s": wall_time_s, "cpu_time_s": wall_time_s,
+                "nb_of_records": nb_of_records, "records_per_s": 0.0}
+
+    def test_noStages(self):
+        actual = get_slowest_stages([{"rule": "rule"}])
+        assert actual.empty
+        assert list(actual.columns) == ["rule", "stage", "nb_of_jobs", "nb_of_runs", "wall_time_s",
+                                        "max_wall_time_s", "cpu_time_s", "nb_of_records", "records_per_s"]
+
+    def test_stagesAreSummedPerRuleAndStageAndSortedBySlowest(self):
+        job_metrics = [
+            {"rule": "rule_1", "stages": [self.create_stage_metrics("read", 1.0, 100),
+                                          self.create_stage_metrics("write", 0.0, 0)]},
+            {"rule": "rule_1", "stages": [self.create_stage_metrics("read", 3.0, 300)]},
+            {"rule": "rule_2", "stages": [self.create_stage_metrics("read", 2.0, 50)]},
+        ]
+
+        actual = get_slowest_stages(job_metrics)
+
+        expected = pd.DataFrame({
+            "rule": ["rule_1", "rule_2", "rule_1"],
+            "stage": ["read", "read", "write"],
+            "nb_of_jobs": [2, 1, 1],
+            "nb_of_runs": [2, 1, 1],
+            "wall_time_s": [4.0, 2.0, 0.0],
+            "max_wall_time_s": [3.0, 2.0, 0.0],
+            "cpu_time_s": [4.0, 2.0, 0.0],
+            "nb_of_records": [400, 50, 0],
+            "records_per_s": [100.0, 25.0, 0.0],
+        })
+        pd.testing.assert_frame_equal(actual, expected)
@@ -0,0 +1,130 @@
+import json
+from unittest.mock import Mock
+
+import pytest
+
+from evaluate.job_metrics import (
+    JobMetricsRecorder,
+    ResourceModel,
+    find_metrics_files,
+    get_size_mb,
+    load_job_metrics,
+    record_job_metrics,
+)
+
+
+def create_job_metrics(rule: str, input_size_mb: float, peak_rss_mb: float, peak_children_rss_mb: float = 0.0) -> dict:
+    return {"rule": rule, "input_size_mb": input_size_mb, "peak_rss_mb": peak_rss_mb,
+            "peak_children_rss_mb": peak_children_rss_mb}
+
+
+class TestGetSizeMb:
+    def test_filesDirectoriesAndMissingPaths(self, tmp_path):
+        (tmp_path / "file").write_bytes(b"0" * 1024 * 1024)
+        (tmp_path / "dir" / "subdir").mkdir(parents=True)
+        (tmp_path / "dir" / "a").write_bytes(b"0" * 512 * 1024)
+        (tmp_path / "dir" / "subdir" / "b").write_bytes(b"0" * 512 * 1024)
+
+        actual = get_size_mb([tmp_path / "file", tmp_path / "dir", tmp_path / "missing"])
+
+        assert actual == 2.0
+
+
+class TestJobMetricsRecorder:
+    def test_save_writesMetricsOfTheJob(self, tmp_path):
+        (tmp_path / "input").write_bytes(b"0" * 1024 * 1024)
+        recorder = JobMetricsRecorder("rule_name", [tmp_path / "input"], tmp_path / "logs" / "job.log.metrics.json",
+                                      wildcards={"sample": "s1"}, threads=2)
+
+        recorder.save()
+        with open(tmp_path / "logs" / "job.log.metrics.json") as metrics_file:
+            actual = json.load(metrics_file)
+
+        assert actual["rule"] == "rule_name"
+        assert actual["wildcards"] == {"sample": "s1"}
+        assert actual["threads"] == 2
+        assert actual["input_size_mb"] == 1.0
+        assert actual["peak_rss_mb"] > 0
+        assert actual["cpu_time_s"] > 0
+        assert actual["wall_time_s"] >= 0
+
+    def test_recordJobMetrics_jobWithoutLogIsNotRecorded(self):
+        snakemake = Mock(log=[])
+        assert record_job_metrics(snakemake) is None
+
+    def test_findAndLoadMetricsFiles(self, tmp_path):
+        for index in range(2):
+            JobMetricsRecorder(f"rule_{index}", [], tmp_path / f"rule_{index}" / "job.log.metrics.json").save()
+
+        actual = [job_metrics["rule"] for job_metrics in load_job_metrics(find_metrics_files(tmp_path))]
+
+        assert actual == ["rule_0", "rule_1"]
+
+
+class TestResourceModel:
+    def test_getMemMb_ruleWithoutMetricsGetsDefaultTimesAttempt(self):
+        resource_model = ResourceModel()
+        assert resource_model.get_mem_mb("rule", 100.0, attempt=2, default_mem_mb=4000) == 8000
+
+    def test_fit_singleInputSizeGivesTheLargestPeak(self):
+        resource_model = ResourceModel.fit([create_job_metrics("rule", 10.0, 500.0, 100.0),
+                                            create_job_metrics("rule", 10.0, 700.0)])
+        assert resource_model.rule_to_coefficients == {"rule": (700.0, 0.0)}
+
+    def test_fit_upperEnvelopeCoversAllJobs(self):
+        job_metrics = [create_job_metrics("rule", input_size_mb, peak_rss_mb)
+                       for input_size_mb, peak_rss_mb in [(100.0, 300.0), (200.0, 550.0), (300.0, 700.0), (400.0, 1000.0)]]
+        resource_model = ResourceModel.fit(job_metrics, margin=1.0, min_mem_mb=0)
+
+        intercept, slope = resource_model.rule_to_coefficients["rule"]
+        assert slope > 0
+        for metrics in job_metrics:
+            assert intercept + slope * metrics["input_size_mb"] >= metrics["peak_rss_mb"] - 1e-6
+
+    def test_fit_peakDecreasingWithInputSizeGivesTheLargestPeak(self):
+        resource_model = ResourceModel.fit([create_job_metrics("rule", 100.0, 900.0),
+                                            create_job_metrics("rule", 200.0, 500.0)])
+        assert resource_model.rule_to_coefficients == {"rule": (900.0, 0.0)}
+
+    @pytest.mark.parametrize("input_size_mb,attempt,expected", [(0.0, 1, 120), (100.0, 1, 240), (100.0, 2, 480)])
+    def test_getMemMb_predictionWithMarginTimesAttempt(self, input_size_mb, attempt, expected):
+        resource_model = ResourceModel({"rule": (100.0, 1.0)}, margin=1.2, min_mem_mb=50)
+        assert resource_model.get_mem_mb("rule", input_size_mb, attempt, default_mem_mb=4000) == expected
+
+    def test_getMemMbOfInputFiles_predictionFromTheSizeOfTheInputs(self, tmp_path):
+        (tmp_path / "input").write_bytes(b"0" * 100 * 1024 * 1024)
+        resource_model = ResourceModel({"rule": (100.0, 1.0)}, margin=1.2, min_mem_mb=50)
+
+        actual = resource_model.get_mem_mb_of_input_files("rule", [tmp_path / "input"], attempt=2, default_mem_mb=4000)
+
+        assert actual == 480
+
+    def test_getMemMbOfInputFiles_inputNotMadeYetGivesDefaultTimesAttempt(self, tmp_path):
+        (tmp_path / "input").write_bytes(b"0" * 100 * 1024 * 1024)
+        resource_model = ResourceModel({"rule": (100.0, 1.0)}, margin=1.2, min_mem_mb=50)
+
+        actual = resource_model.get_mem_mb_of_input_files("rule", [tmp_path / "input", tmp_path / "not_made_yet"],
+                                                          attempt=2, default_mem_mb=4000)
+
+        assert actual == 8000
+
+    def test_getMemMb_atLeastMinMemMb(self):
+        resource_model = ResourceModel({"rule": (10.0, 0.0)}, margin=1.2, min_mem_mb=100)
+        assert resource_model.get_mem_mb("rule", 0.0, attempt=1, default_mem_mb=4000) == 100
+
+    def test_saveAndLoad(self, tmp_path):
+        resource_model = ResourceModel({"rule_1": (100.0, 1.5), "rule_2": (700.0, 0.0)}, margin=1.5, min_mem_mb=200)
+        resource_model.save(tmp_path / "resource_model.json")
+        assert ResourceModel.load(tmp_path / "resource_model.json") == resource_model
+
+    def test_getMetrics_includesTheStagesAndCountersOfTheJob(self, tmp_path):
+        from evaluate.instrumentation import instrumentation
+        instrumentation.reset()
+        with instrumentation.stage("stage", log=False):
+            instrumentation.count("counter", 2)
+
+        actual = JobMetricsRecorder("rule_name", [], tmp_path / "job.log.metrics.json").get_metrics()
+        instrumentation.reset()
+
+        assert [metrics["stage"] for metrics in actual["stages"]] == ["stage"]
+        assert actual["counters"] == {"counter": 2}
@@ -1,5 +1,7 @@
 from unittest.mock import patch, Mock, PropertyMock
 from evaluate.mapq_sam_records_filter import MAPQSamRecordsFilter
+from evaluate.classification import PrecisionClassification
+from tests.common import create_correct_primary_sam_record
 
 
 mapping_quality_60_mock = Mock(query_name="query_name_1", mapping_quality = 60)
@@ -9,8 +11,8 @@ mapping_quality_49_mock = Mock(query_name="query_name_1", mapping_quality = 49)
 mapping_quality_40_mock = Mock(query_name="query_name_1", mapping_quality = 49)
 
 
-record_cover_allele_mock_1 = Mock(_whole_query_probe_maps=Mock(return_value=True), record="record_1")
-record_cover_allele_mock_2 = Mock(_whole_query_probe_maps=Mock(return_value=True), record="record_2")
+record_cover_allele_mock_1 = Mock(_whole_query_probe_maps=Mock(return_value=True))
+record_cover_allele_mock_2 = Mock(_whole_query_probe_maps=Mock(return_value=True))
 record_do_not_cover_allele_mock = Mock(_whole_query_probe_maps=Mock(return_value=False))
 
 class TestMAPQSamRecordsFilter:
@@ -18,14 +20,14 @@ class TestMAPQSamRecordsFilter:
     def test___constructor___no_sam_records___records_to_keep_is_empty(self, get_query_name_to_best_record_mock):
         records_mock = Mock()
         mapq_sam_records_filter = MAPQSamRecordsFilter(records_mock)
-        assert mapq_sam_records_filter.records_to_keep == set()
+        assert mapq_sam_records_filter.records_to_keep == []
         assert get_query_name_to_best_record_mock.called_once_with(records_mock)
 
     @patch.object(MAPQSamRecordsFilter, MAPQSamRecordsFilter._get_query_name_to_best_record.__name__, return_value={"record_1": "best_record_1"})
     def test___constructor___one_sam_record___records_to_keep_has_sam_record(self, get_query_name_to_best_record_mock):
         records_mock = Mock()
         mapq_sam_records_filter = MAPQSamRecordsFilter(records_mock)
-        assert mapq_sam_records_filter.records_to_keep == {"best_record_1"}
+        assert mapq_sam_records_filter.records_to_keep == ["best_record_1"]
         assert get_query_name_to_best_record_mock.called_once_with(records_mock)
 
     @patch.object(MAPQSamRecordsFilter, MAPQSamRecordsFilter._get_query_name_to_best_record.__name__,
@@ -35,33 +37,33 @@ class TestMAPQSamRecordsFilter:
     def test___constructor___three_sam_records___records_to_keep_has_the_three_sam_records(self, get_query_name_to_best_record_mock):
         records_mock = Mock()
         mapq_sam_records_filter = MAPQSamRecordsFilter(records_mock)
-        assert mapq_sam_records_filter.records_to_keep == {"best_record_1", "best_record_2", "best_record_3"}
+        assert mapq_sam_records_filter.records_to_keep == ["best_record_1", "best_record_2", "best_record_3"]
         assert get_query_name_to_best_record_mock.called_once_with(records_mock)
 
 
-    def test____get_only_records_that_cover_the_allele_core___no_classifications___returns_empty_list(self):
+    def test____get_only_records_that_cover_the_allele___no_classifications___returns_empty_list(self):
         mapq_sam_records_filter = MAPQSamRecordsFilter([])
 
         classifications = []
-        actual = mapq_sam_records_filter._get_only_records_that_cover_the_allele_core(classifications)
+        actual = mapq_sam_records_filter._get_only_records_that_cover_the_allele(classifications)
         expected = []
         assert actual == expected
 
-    def test____get_only_records_that_cover_the_allele_core___several_classifications_only_one_cover_allele___returns_one_record(self):
+    def test____get_only_records_that_cover_the_allele___several_classifications_only_one_cover_allele___returns_one_record(self):
         mapq_sam_records_filter = MAPQSamRecordsFilter([])
 
         records = [record_do_not_cover_allele_mock, record_do_not_cover_allele_mock, record_cover_allele_mock_1, record_do_not_cover_allele_mock, record_do_not_cover_allele_mock]
-        actual = mapq_sam_records_filter._get_only_records_that_cover_the_allele_core(records)
-        expected = ["record_1"]
+        actual = mapq_sam_records_filter._get_only_records_that_cover_the_allele(records)
+        expected = [record_cover_allele_mock_1]
         assert actual == expected
 
-    def test____get_only_records_that_cover_the_allele_core___several_classifications_only_two_cover_allele___returns_two_records(self):
+    def test____get_only_records_that_cover_the_allele___several_classifications_only_two_cover_allele___returns_two_records(self):
         mapq_sam_records_filter = MAPQSamRecordsFilter([])
 
         records = [record_do_not_cover_allele_mock, record_do_not_cover_allele_mock, record_cover_allele_mock_1,
                    record_do_not_cover_allele_mock, record_do_not_cover_allele_mock, record_cover_allele_mock_2]
-        actual = mapq_sam_records_filter._get_only_records_that_cover_the_allele_core(records)
-        expected = ["record_1", "record_2"]
+        actual = mapq_sam_records_filter._get_only_records_that_cover_the_allele(records)
+        expected = [record_cover_allele_mock_1, record_cover_allele_mock_2]
         assert actual == expected
 
     def test___get_record_with_highest_mapping_quality___no_records___returns_None(self):
@@ -167,14 +169,14 @@ class TestMAPQSamRecordsFilter:
                           "query_name_3": query_name_3_mapping_quality_30_mock,
                           "query_name_4": query_name_4_mapping_quality_32_mock}
 
-    @patch.object(MAPQSamRecordsFilter, "records_to_keep", new_callable=PropertyMock,
-                  return_value=[mapping_quality_60_mock, mapping_quality_51_mock])
+    @patch.object(MAPQSamRecordsFilter, MAPQSamRecordsFilter._get_query_name_to_best_record.__name__,
+                  return_value={"query_name_1": mapping_quality_60_mock, "query_name_2": mapping_quality_51_mock})
     def test___record_should_be_filtered_out___record_is_in_records_to_keep___should_NOT_be_filtered_out(self, *mocks):
         mapq_sam_records_filter = MAPQSamRecordsFilter([])
         assert not mapq_sam_records_filter.record_should_be_filtered_out(mapping_quality_51_mock)
 
-    @patch.object(MAPQSamRecordsFilter, "records_to_keep", new_callable=PropertyMock,
-                  return_value=[mapping_quality_60_mock, mapping_quality_51_mock])
+    @patch.object(MAPQSamRecordsFilter, MAPQSamRecordsFilter._get_query_name_to_best_record.__name__,
+                  return_value={"query_name_1": mapping_quality_60_mock, "query_name_2": mapping_quality_51_mock})
     def test___record_should_be_filtered_out___record_is_NOT_in_records_to_keep___should_be_filtered_out(self, *mocks):
         mapq_sam_records_filter = MAPQSamRecordsFilter([])
         assert mapq_sam_records_filter.record_should_be_filtered_out(mapping_quality_50_mock)
@@ -213,4 +215,19 @@ class TestMAPQSamRecordsFilter:
         mapq_sam_records_filter = MAPQSamRecordsFilter([])
         actual = mapq_sam_records_filter._get_first_and_second_records_with_highest_mapping_qualities_that_covers_the_allele([])
         expected=(mapping_quality_60_mock, mapping_quality_51_mock)
-        assert actual == expected
\ No newline at end of file
+        assert actual == expected
+
+    def test___get_query_name_to_best_record___classifications_of_the_same_query___best_is_selected_by_identity(self):
+        # classifications of the same query compare equal, the best one must still be told apart from the others
+        records = []
+        for mapping_quality in [30, 60, 45]:
+            record = create_correct_primary_sam_record()
+            record.mapping_quality = mapping_quality
+            records.append(PrecisionClassification(record))
+
+        mapq_sam_records_filter = MAPQSamRecordsFilter(records)
+
+        assert len(mapq_sam_records_filter.records_to_keep) == 1
+        assert mapq_sam_records_filter.records_to_keep[0] is records[1]
+        assert mapq_sam_records_filter.filter_records(records) == [records[1]]
+        assert mapq_sam_records_filter.filter_records(records)[0] is records[1]
@@ -0,0 +1,88 @@
+import pickle
+import random
+
+import numpy as np
+
+from evaluate.mask_bitmaps import ContigBitmap, MaskBitmaps
+from evaluate.mask_index import MaskIndex
+from evaluate.masker import RecallMasker
+
+
+class TestContigBitmap:
+    def test_fromRegions_bitsArePacked(self):
+        bitmap = ContigBitmap.from_regions(np.array([1, 8]), np.array([3, 10]))
+
+        assert bitmap.bits.tolist() == [0b01100000, 0b11000000, 0]
+        assert bitmap.byte_prefix_sums.tolist() == [0, 2, 4, 4]
+
+    def test_nbOfMaskedBasesBefore(self):
+        bitmap = ContigBitmap.from_regions(np.array([1, 8]), np.array([3, 10]))
+
+        actual = bitmap.nb_of_masked_bases_before(np.array([-5, 0, 1, 2, 3, 8, 9, 10, 100])).tolist()
+        expected = [0, 0, 0, 1, 2, 2, 3, 4, 4]
+
+        assert actual == expected
+
+    def test_overlaps_edgesOfTheMask(self):
+        bitmap = ContigBitmap.from_regions(np.array([10]), np.array([20]))
+
+        actual = bitmap.overlaps(np.array([19, 5, 12, 20, 5, 15]), np.array([25, 11, 18, 25, 10, 15])).tolist()
+        expected = [True, True, True, False, False, False]
+
+        assert actual == expected
+
+
+class TestMaskBitmaps:
+    def test_overlaps_sameAnswersAsMaskIndex(self):
+        random.seed(7)
+        regions = []
+        for _ in range(200):
+            chrom = random.choice(["chrom1", "chrom2"])
+            start = random.randrange(0, 1000)
+            regions.append((chrom, start, start + random.randrange(1, 20)))
+        mask_index = MaskIndex.from_regions(regions)
+        mask_bitmaps = MaskBitmaps.from_regions(regions)
+
+        chroms, starts, ends = [], [], []
+        for _ in range(3000):
+            chroms.append(random.choice(["chrom1", "chrom2", "chrom3"]))
+            start = random.randrange(-10, 1050)
+            starts.append(start)
+            ends.append(start + random.randrange(0, 30))
+
+        actual = mask_bitmaps.overlaps(chroms, starts, ends).tolist()
+        expected = mask_index.overlaps(chroms, starts, ends).tolist()
+
+        assert actual == expected
+        assert [mask_bitmaps.overlap(*query) for query in zip(chroms, starts, ends)] == expected
+
+    def test_saveAndLoad_memoryMappedBitmapsAreTheSame(self, tmp_path):
+        mask_bitmaps = MaskBitmaps.from_regions([("chrom 1", 3, 7), ("chrom2", 100, 200)])
+        directory = tmp_path / "mask.bed.bitmaps"
+
+        mask_bitmaps.save(directory)
+        actual = MaskBitmaps.load(directory)
+
+        assert actual == mask_bitmaps
+        assert actual.chroms == ["chrom 1", "chrom2"]
+        assert isinstance(actual._chrom_to_bitmap["chrom2"].bits, np.memmap)
+
+    def test_pickle_memoryMappedBitmapsArePickledAsTheirDirectory(self, tmp_path):
+        mask_bitmaps = MaskBitmaps.from_regions([("chrom1", 3, 7)])
+        mask_bitmaps.save(tmp_path)
+        memory_mapped = MaskBitmaps.load(tmp_path)
+
+        actual = pickle.loads(pickle.dumps(memory_mapped))
+
+        assert len(pickle.dumps(memory_mapped)) < len(pickle.dumps(mask_bitmaps))
+        assert actual == mask_bitmaps
+        assert isinstance(actual._chrom_to_bitmap["chrom1"].bits, np.memmap)
+
+    def test_maskerFromBitmaps_sameAsMaskerFromBed(self, tmp_path):
+        regions = [("chrom1", 3, 7), ("chrom1", 12, 15)]
+        MaskBitmaps.from_regions(regions).save(tmp_path)
+
+        masker = RecallMasker.from_bitmaps(tmp_path)
+
+        assert masker.index.overlap("chrom1", 6, 8)
+        assert not masker.index.overlap("chrom1", 7, 12)
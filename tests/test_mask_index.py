@@ -0,0 +1,91 @@
+import random
+
+import numpy as np
+from intervaltree import IntervalTree, Interval
+
+from evaluate.mask_index import MaskIndex
+
+
+class TestMaskIndex:
+    def test_fromRegions_noRegionsReturnsEmptyIndex(self):
+        actual = MaskIndex.from_regions([])
+        expected = MaskIndex()
+
+        assert actual == expected
+
+    def test_fromRegions_emptyRegionIsIgnored(self):
+        actual = MaskIndex.from_regions([("chrom", 3, 3)])
+        expected = MaskIndex()
+
+        assert actual == expected
+
+    def test_fromRegions_overlappingAndContainedRegionsAreMerged(self):
+        index = MaskIndex.from_regions([("chrom", 8, 10), ("chrom", 3, 7), ("chrom", 4, 5), ("chrom", 6, 9),
+                                        ("chrom", 12, 15)])
+
+        actual_starts, actual_ends = index.get_regions("chrom")
+
+        assert actual_starts.tolist() == [3, 12]
+        assert actual_ends.tolist() == [10, 15]
+
+    def test_fromRegions_regionsOnDifferentChromsAreKeptApart(self):
+        index = MaskIndex.from_regions([("chrom1", 3, 7), ("chrom2", 5, 9)])
+
+        assert index.chroms == ["chrom1", "chrom2"]
+        assert index.get_regions("chrom1")[0].tolist() == [3]
+        assert index.get_regions("chrom2")[0].tolist() == [5]
+
+    def test_overlap_edgesOfTheMask(self):
+        index = MaskIndex.from_regions([("chrom", 10, 20)])
+
+        assert index.overlap("chrom", 19, 25)
+        assert index.overlap("chrom", 5, 11)
+        assert index.overlap("chrom", 12, 18)
+        assert index.overlap("chrom", 5, 25)
+        assert not index.overlap("chrom", 20, 25)
+        assert not index.overlap("chrom", 5, 10)
+
+    def test_overlap_emptyIntervalOrUnknownChromReturnsFalse(self):
+        index = MaskIndex.from_regions([("chrom", 10, 20)])
+
+        assert not index.overlap("chrom", 15, 15)
+        assert not index.overlap("chrom", 18, 12)
+        assert not index.overlap("other_chrom", 10, 20)
+
+    def test_overlaps_batchOverSeveralChroms(self):
+        index = MaskIndex.from_regions([("chrom1", 10, 20), ("chrom2", 30, 40)])
+
+        actual = index.overlaps(["chrom1", "chrom2", "chrom1", None, "chrom2"], [15, 15, 35, 0, 39], [16, 16, 36, 0, 50])
+        expected = np.array([True, False, False, False, True])
+
+        assert np.array_equal(actual, expected)
+
+    def test_overlaps_emptyBatchReturnsEmptyArray(self):
+        actual = MaskIndex.from_regions([("chrom", 10, 20)]).overlaps([], [], [])
+
+        assert actual.tolist() == []
+
+    def test_overlaps_sameAnswersAsIntervalTree(self):
+        random.seed(42)
+        regions = []
+        for _ in range(300):
+            chrom = random.choice(["chrom1", "chrom2"])
+            start = random.randrange(0, 2000)
+            regions.append((chrom, start, start + random.randrange(1, 30)))
+        tree = IntervalTree(Interval(start, end, chrom) for chrom, start, end in regions)
+        index = MaskIndex.from_regions(regions)
+
+        chroms, starts, ends = [], [], []
+        for _ in range(3000):
+            chroms.append(random.choice(["chrom1", "chrom2", "chrom3"]))
+            start = random.randrange(-10, 2050)
+            starts.append(start)
+            ends.append(start + random.randrange(0, 40))
+
+        actual = index.overlaps(chroms, starts, ends).tolist()
+        expected = [
+            any(chrom == interval.data for interval in tree.overlap(start, end))
+            for chrom, start, end in zip(chroms, starts, ends)
+        ]
+
+        assert actual == expected
@@ -1,9 +1,9 @@
 from evaluate.masker import Masker, PrecisionMasker, RecallMasker
-from unittest.mock import patch, PropertyMock
+from unittest.mock import patch, PropertyMock, Mock
 from intervaltree import IntervalTree, Interval
 from evaluate.probe import Probe, ProbeInterval
 from evaluate.classification import Classification
-from evaluate.aligned_pairs import AlignedPairs
+from tests.common import create_sam_header
 from io import StringIO
 from pysam import AlignedSegment
 
@@ -227,6 +227,26 @@ class TestMasker:
 
         assert actual == expected
 
+    @patch.object(
+        Masker,
+        "get_interval_where_probe_aligns_to_truth",
+        side_effect=lambda classification: classification.interval,
+    )
+    def test_filterRecords_batchesGiveSameResultAsRecordShouldBeFilteredOut(self, *mock):
+        masker = Masker(
+            tree=IntervalTree([Interval(10, 20, "chrom1"), Interval(30, 40, "chrom2")]),
+            batch_size=2,
+        )
+        intervals = [Interval(15, 16, "chrom1"), None, Interval(20, 30, "chrom1"), Interval(35, 45, "chrom2"),
+                     Interval(35, 36, "chrom1")]
+        records = [Mock(spec=Classification, interval=interval) for interval in intervals]
+
+        actual = masker.filter_records(records)
+        expected = [record for record in records if not masker.record_should_be_filtered_out(record)]
+
+        assert actual == expected
+        assert actual == [records[1], records[2], records[4]]
+
 
 class TestPrecisionMasker:
     @patch.object(
@@ -242,20 +262,21 @@ class TestPrecisionMasker:
 
         assert actual == expected
 
-    @patch.object(
-        Classification, "is_unmapped", return_value=False, new_callable=PropertyMock
-    )
-    @patch.object(Probe, "chrom", return_value="chrom1", new_callable=PropertyMock)
-    @patch.object(
-        Classification,
-        "get_aligned_pairs",
-        return_value=AlignedPairs(
-            [(0, 34, "A"), (1, None, None), (2, 35, "A"), (None, 36, "A")]
-        ),
-    )
-    @patch.object(AlignedPairs, "get_index_of_query_interval", return_value=(0, 4))
-    def test_getIntervalWhereProbeAlignsToTruth_probeMapsReturnsInterval(self, *mock):
-        classification = Classification()
+    @staticmethod
+    def create_classification(
+        query_interval: str, cigar: str, pos: int, sequence: str, md: str
+    ) -> Classification:
+        header = create_sam_header("chrom1", 100)
+        record = AlignedSegment.fromstring(
+            f"INTERVAL={query_interval};\t0\tchrom1\t{pos}\t60\t{cigar}\t*\t0\t0\t{sequence}\t*\tMD:Z:{md}",
+            header,
+        )
+        return Classification(record)
+
+    def test_getIntervalWhereProbeAlignsToTruth_probeMapsReturnsInterval(self):
+        classification = self.create_classification(
+            "[0,4)", cigar="1M1I1M1D", pos=35, sequence="AAA", md="2^A0"
+        )
 
         actual = PrecisionMasker.get_interval_where_probe_aligns_to_truth(
             classification
@@ -264,28 +285,12 @@ class TestPrecisionMasker:
 
         assert actual == expected
 
-    @patch.object(
-        Classification, "is_unmapped", return_value=False, new_callable=PropertyMock
-    )
-    @patch.object(Probe, "chrom", return_value="chrom1", new_callable=PropertyMock)
-    @patch.object(
-        Classification,
-        "get_aligned_pairs",
-        return_value=AlignedPairs(
-            [
-                (8, 50, "A"),
-                (9, None, None),
-                (10, None, None),
-                (11, None, None),
-                (12, 51, "C"),
-            ]
-        ),
-    )
-    @patch.object(AlignedPairs, "get_index_of_query_interval", return_value=(1, 2))
     def test_getIntervalWhereProbeAlignsToTruth_probeIsInsertionWithTwoNonesAfterReturnsIntervalAroundInsertion(
-        self, *mock
+        self
     ):
-        classification = Classification()
+        classification = self.create_classification(
+            "[9,10)", cigar="8S1M3I1M", pos=51, sequence="AAAAAAAAACCCC", md="2"
+        )
 
         actual = PrecisionMasker.get_interval_where_probe_aligns_to_truth(
             classification
@@ -294,28 +299,12 @@ class TestPrecisionMasker:
 
         assert actual == expected
 
-    @patch.object(
-        Classification, "is_unmapped", return_value=False, new_callable=PropertyMock
-    )
-    @patch.object(Probe, "chrom", return_value="chrom1", new_callable=PropertyMock)
-    @patch.object(
-        Classification,
-        "get_aligned_pairs",
-        return_value=AlignedPairs(
-            [
-                (8, 50, "A"),
-                (9, None, None),
-                (10, None, None),
-                (11, None, None),
-                (12, 51, "C"),
-            ]
-        ),
-    )
-    @patch.object(AlignedPairs, "get_index_of_query_interval", return_value=(2, 3))
     def test_getIntervalWhereProbeAlignsToTruth_probeIsInsertionFlankedByNoneReturnsIntervalAroundInsertion(
-        self, *mock
+        self
     ):
-        classification = Classification()
+        classification = self.create_classification(
+            "[10,11)", cigar="8S1M3I1M", pos=51, sequence="AAAAAAAAACCCC", md="2"
+        )
 
         actual = PrecisionMasker.get_interval_where_probe_aligns_to_truth(
             classification
@@ -324,28 +313,12 @@ class TestPrecisionMasker:
 
         assert actual == expected
 
-    @patch.object(
-        Classification, "is_unmapped", return_value=False, new_callable=PropertyMock
-    )
-    @patch.object(Probe, "chrom", return_value="chrom1", new_callable=PropertyMock)
-    @patch.object(
-        Classification,
-        "get_aligned_pairs",
-        return_value=AlignedPairs(
-            [
-                (8, 50, "A"),
-                (9, None, None),
-                (10, None, None),
-                (11, None, None),
-                (12, 51, "C"),
-            ]
-        ),
-    )
-    @patch.object(AlignedPairs, "get_index_of_query_interval", return_value=(3, 4))
     def test_getIntervalWhereProbeAlignsToTruth_probeIsInsertionWithTwoNonesBeforeReturnsIntervalAroundInsertion(
-        self, *mock
+        self
     ):
-        classification = Classification()
+        classification = self.create_classification(
+            "[11,12)", cigar="8S1M3I1M", pos=51, sequence="AAAAAAAAACCCC", md="2"
+        )
 
         actual = PrecisionMasker.get_interval_where_probe_aligns_to_truth(
             classification
@@ -354,20 +327,12 @@ class TestPrecisionMasker:
 
         assert actual == expected
 
-    @patch.object(
-        Classification, "is_unmapped", return_value=False, new_callable=PropertyMock
-    )
-    @patch.object(Probe, "chrom", return_value="chrom1", new_callable=PropertyMock)
-    @patch.object(
-        Classification,
-        "get_aligned_pairs",
-        return_value=AlignedPairs([(5, None, None), (6, 4, "A"), (7, None, None)]),
-    )
-    @patch.object(AlignedPairs, "get_index_of_query_interval", return_value=(0, 3))
     def test_getIntervalWhereProbeAlignsToTruth_refPositionsWhereProbeMapsFlankedByNoneReturnsInterval(
-        self, *mock
+        self
     ):
-        classification = Classification()
+        classification = self.create_classification(
+            "[5,8)", cigar="6S1M1S", pos=5, sequence="AAAAAAAA", md="1"
+        )
 
         actual = PrecisionMasker.get_interval_where_probe_aligns_to_truth(
             classification
@@ -376,20 +341,12 @@ class TestPrecisionMasker:
 
         assert actual == expected
 
-    @patch.object(
-        Classification, "is_unmapped", return_value=False, new_callable=PropertyMock
-    )
-    @patch.object(Probe, "chrom", return_value="chrom1", new_callable=PropertyMock)
-    @patch.object(
-        Classification,
-        "get_aligned_pairs",
-        return_value=AlignedPairs([(5, None, None), (6, 0, "A"), (7, None, None)]),
-    )
-    @patch.object(AlignedPairs, "get_index_of_query_interval", return_value=(0, 3))
     def test_getIntervalWhereProbeAlignsToTruth_refPositionsWhereProbeMapsContainsZeroDontReturnNegative(
-        self, *mock
+        self
     ):
-        classification = Classification()
+        classification = self.create_classification(
+            "[5,8)", cigar="6S1M1S", pos=1, sequence="AAAAAAAA", md="1"
+        )
 
         actual = PrecisionMasker.get_interval_where_probe_aligns_to_truth(
             classification
@@ -398,20 +355,12 @@ class TestPrecisionMasker:
 
         assert actual == expected
 
-    @patch.object(
-        Classification, "is_unmapped", return_value=False, new_callable=PropertyMock
-    )
-    @patch.object(
-        Classification,
-        "get_aligned_pairs",
-        return_value=AlignedPairs([(5, 0, "A"), (6, 1, "C"), (7, 2, "G"), (8, 3, "G")]),
-    )
-    @patch.object(AlignedPairs, "get_index_of_query_interval", return_value=(0, 0))
-    @patch.object(AlignedPairs, "get_ref_positions", return_value=[])
     def test_getIntervalWhereProbeAlignsToTruth_refPositionsQueryAlignsToIsEmpty_returnsNone(
-            self, *mock
+            self
     ):
-        classification = Classification()
+        classification = self.create_classification(
+            "[10,12)", cigar="4M", pos=1, sequence="ACGG", md="4"
+        )
 
         actual = PrecisionMasker.get_interval_where_probe_aligns_to_truth(
             classification
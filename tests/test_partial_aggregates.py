@@ -0,0 +1,81 @@
+import os
+
+import pandas as pd
+
+from evaluate.partial_aggregates import PartialAggregates
+from evaluate.report import RecallReport
+from tests.test_recall_metrics_cube import create_random_report_files
+
+
+def aggregate_by_counting_rows(report_files, aggregated_report_files):
+    def aggregate(indexes):
+        for index in indexes:
+            aggregated_report_files.append(report_files[index])
+            yield pd.DataFrame({"nb_of_rows": [len(pd.read_csv(report_files[index], sep="\t"))]})
+    return aggregate
+
+
+class TestPartialAggregates:
+    def test_load_nothingStored_returnsNone(self, tmp_path):
+        report_file = tmp_path / "report.tsv"
+        report_file.write_text("classification\nunmapped\n")
+
+        assert PartialAggregates(tmp_path / "store", "kind").load(report_file) is None
+
+    def test_saveAndLoad_samePartialAggregate(self, tmp_path):
+        report_file = tmp_path / "report.tsv"
+        report_file.write_text("classification\nunmapped\n")
+        partial_aggregates = PartialAggregates(tmp_path / "store", "kind")
+        partial_aggregate = pd.DataFrame({"query_probe_header": ["probe_1", "probe_2"], "GT_CONF": [1.0, 2.0]})
+
+        partial_aggregates.save(report_file, partial_aggregate)
+        actual = partial_aggregates.load(report_file, as_categorical=False)
+
+        pd.testing.assert_frame_equal(actual, partial_aggregate)
+
+    def test_load_otherKindOrLabel_returnsNone(self, tmp_path):
+        report_file = tmp_path / "report.tsv"
+        report_file.write_text("classification\nunmapped\n")
+        PartialAggregates(tmp_path / "store", "kind").save(report_file, pd.DataFrame({"GT_CONF": [1.0]}), label="s1")
+
+        assert PartialAggregates(tmp_path / "store", "other_kind").load(report_file, label="s1") is None
+        assert PartialAggregates(tmp_path / "store", "kind").load(report_file, label="s2") is None
+
+    def test_load_reportChangedSinceSaved_returnsNone(self, tmp_path):
+        report_file = tmp_path / "report.tsv"
+        report_file.write_text("classification\nunmapped\n")
+        partial_aggregates = PartialAggregates(tmp_path / "store", "kind")
+        partial_aggregates.save(report_file, pd.DataFrame({"GT_CONF": [1.0]}))
+
+        report_file.write_text("classification\nunmapped\nprimary_correct\n")
+
+        assert partial_aggregates.load(report_file) is None
+
+    def test_get_onlyReportsNotStoredOrChangedAreAggregated(self, tmp_path):
+        report_files = [tmp_path / f"report_{index}.tsv" for index in range(4)]
+        for report_file in report_files:
+            report_file.write_text("classification\nunmapped\n")
+        partial_aggregates = PartialAggregates(tmp_path / "store", "kind")
+        partial_aggregates.get(report_files[:3], aggregate_by_counting_rows(report_files[:3], []))
+        report_files[1].write_text("classification\nunmapped\nprimary_correct\n")
+        stat = os.stat(report_files[1])
+        os.utime(report_files[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        aggregated_report_files = []
+
+        actual = partial_aggregates.get(report_files, aggregate_by_counting_rows(report_files, aggregated_report_files))
+
+        assert aggregated_report_files == [report_files[1], report_files[3]]
+        assert [partial_aggregate["nb_of_rows"][0] for partial_aggregate in actual] == [1, 2, 1, 1]
+
+
+class TestRecallReportFromFilesWithPartialAggregates:
+    def test_reportOfASampleWithANewSamplePair_sameAsLoadingAllReports(self, tmp_path):
+        report_files = [report_file for sample, _, report_file in create_random_report_files(10, tmp_path)
+                        if sample == "s1"]
+        partial_aggregates = PartialAggregates(tmp_path / "store", "recall_report_best_mappings")
+        RecallReport.from_files(report_files[:-1], partial_aggregates=partial_aggregates)
+
+        actual = RecallReport.from_files(report_files, partial_aggregates=partial_aggregates)
+        expected = RecallReport.from_files(report_files)
+
+        pd.testing.assert_frame_equal(actual.report, expected.report)
@@ -0,0 +1,184 @@
+from unittest.mock import patch
+
+import pandas as pd
+import pysam
+import pytest
+
+from benchmarks.synthetic_data import SyntheticDataConfig, SyntheticDataGenerator
+from evaluate.binary_report import load_binary_report
+from evaluate.classification import RecallClassification
+from evaluate.commands import create_pooled_recall_report, create_recall_report, pool_truth_probesets, \
+    split_pooled_recall_report
+from evaluate.pooled_truth_probeset import PooledTruthProbeset
+
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    config = SyntheticDataConfig(nb_of_samples=3, nb_of_genes=10, gene_length=500, variant_density=0.02,
+                                 tools=("snippy",))
+    return SyntheticDataGenerator(config).generate(tmp_path_factory.mktemp("synthetic_data"))
+
+
+def create_classification(query_name, flag):
+    classification = RecallClassification()
+    classification.query_name = query_name
+    classification.flag = flag
+    return classification
+
+
+def write_fasta(path, name_and_sequences):
+    with open(path, "w") as fasta:
+        for name, sequence in name_and_sequences:
+            fasta.write(f">{name}\n{sequence}\n")
+    return path
+
+
+def create_pooled_sam(sams, probes_table, pooled_sam):
+    """
+    The SAM bwa outputs for the pooled truth probeset: the mappings of the first probe of each pooled probe, renamed.
+    """
+    probes = PooledTruthProbeset.load(probes_table).probes
+    probe_to_pooled_probe = dict(zip(zip(probes["sample_pair"], probes["probe_name"]), probes["pooled_probe"]))
+    mapped_pooled_probes = set()
+    with pysam.AlignmentFile(str(sams[0][1])) as template, \
+            pysam.AlignmentFile(str(pooled_sam), "w", template=template) as pooled_alignment_file:
+        for sample_pair, sam in sams:
+            with pysam.AlignmentFile(str(sam)) as alignment_file:
+                records = list(alignment_file)
+            pooled_probes_of_this_sam = set()
+            for record in records:
+                pooled_probe = probe_to_pooled_probe[(sample_pair, record.query_name)]
+                if pooled_probe in mapped_pooled_probes:
+                    continue
+                pooled_probes_of_this_sam.add(pooled_probe)
+                record.query_name = pooled_probe
+                pooled_alignment_file.write(record)
+            mapped_pooled_probes |= pooled_probes_of_this_sam
+    return pooled_sam
+
+
+class TestPooledTruthProbeset:
+    def test_fromTruthProbesets_probeInSeveralPairs_pooledOnce(self, tmp_path):
+        truth_probesets = {
+            "s1_and_s2": write_fasta(tmp_path / "s1_and_s2.fa", [("probe_a", "ACGT"), ("probe_b", "TTTT")]),
+            "s1_and_s3": write_fasta(tmp_path / "s1_and_s3.fa", [("probe_c", "GGGG"), ("probe_d", "ACGT")]),
+        }
+
+        actual = PooledTruthProbeset.from_truth_probesets(truth_probesets)
+
+        assert actual.sequences == ["ACGT", "TTTT", "GGGG"]
+        expected_probes = pd.DataFrame(
+            [("pooled_probe_0", "s1_and_s2", 0, "probe_a"),
+             ("pooled_probe_1", "s1_and_s2", 1, "probe_b"),
+             ("pooled_probe_2", "s1_and_s3", 0, "probe_c"),
+             ("pooled_probe_0", "s1_and_s3", 1, "probe_d")],
+            columns=PooledTruthProbeset.columns)
+        pd.testing.assert_frame_equal(actual.probes, expected_probes)
+
+    def test_saveAndLoad_sameProbesTable(self, tmp_path):
+        truth_probesets = {"s1_and_s2": write_fasta(tmp_path / "s1_and_s2.fa", [("probe_a", "ACGT")])}
+        pooled = PooledTruthProbeset.from_truth_probesets(truth_probesets)
+
+        pooled.save(tmp_path / "pooled.fa", tmp_path / "probes.tsv")
+        actual = PooledTruthProbeset.load(tmp_path / "probes.tsv")
+
+        assert (tmp_path / "pooled.fa").read_text() == ">pooled_probe_0\nACGT\n"
+        pd.testing.assert_frame_equal(actual.probes, pooled.probes)
+
+    def test_attribute_classificationsInTheOrderOfTheTruthProbesetOfEachPair(self):
+        probes = pd.DataFrame(
+            [("pooled_probe_0", "s1_and_s2", 0, "probe_a"),
+             ("pooled_probe_1", "s1_and_s2", 1, "probe_b"),
+             ("pooled_probe_1", "s1_and_s3", 0, "probe_c"),
+             ("pooled_probe_0", "s1_and_s3", 1, "probe_d")],
+            columns=PooledTruthProbeset.columns)
+        pooled = PooledTruthProbeset([], probes)
+        pooled_probe_0 = create_classification(query_name="pooled_probe_0", flag=0)
+        pooled_probe_1_primary = create_classification(query_name="pooled_probe_1", flag=0)
+        pooled_probe_1_secondary = create_classification(query_name="pooled_probe_1", flag=256)
+
+        actual = pooled.attribute([pooled_probe_0, pooled_probe_1_primary, pooled_probe_1_secondary])
+
+        assert {sample_pair: [(classification.query_name, classification.flag) for classification in classifications]
+                for sample_pair, classifications in actual.items()} == {
+            "s1_and_s2": [("probe_a", 0), ("probe_b", 0), ("probe_b", 256)],
+            "s1_and_s3": [("probe_c", 0), ("probe_c", 256), ("probe_d", 0)],
+        }
+
+    def test_attribute_copiesOfEachPairGeneratedOnlyWhenItIsIterated(self):
+        probes = pd.DataFrame([("pooled_probe_0", "s1_and_s2", 0, "probe_a"),
+                               ("pooled_probe_0", "s1_and_s3", 0, "probe_b")],
+                              columns=PooledTruthProbeset.columns)
+        pooled = PooledTruthProbeset([], probes)
+        classification = create_classification(query_name="pooled_probe_0", flag=0)
+
+        with patch.object(RecallClassification, "with_query_name", autospec=True,
+                          side_effect=lambda self, query_name: query_name) as with_query_name_mock:
+            actual = pooled.attribute([classification])
+            assert with_query_name_mock.call_count == 0
+            assert list(actual["s1_and_s3"]) == ["probe_b"]
+            assert with_query_name_mock.call_count == 1
+
+    def test_attribute_unknownPooledProbeRaisesKeyError(self):
+        probes = pd.DataFrame([("pooled_probe_0", "s1_and_s2", 0, "probe_a")], columns=PooledTruthProbeset.columns)
+        pooled = PooledTruthProbeset([], probes)
+
+        with pytest.raises(KeyError):
+            pooled.attribute([create_classification(query_name="pooled_probe_1", flag=0)])
+
+    def test_attribute_queryProbeHeaderParsedFromTheNameOfTheProbe(self):
+        probes = pd.DataFrame([("pooled_probe_0", "s1_and_s2", 0, "CHROM=1;POS=3;IV=[2,5);")],
+                              columns=PooledTruthProbeset.columns)
+        pooled = PooledTruthProbeset([], probes)
+        classification = create_classification(query_name="pooled_probe_0", flag=0)
+
+        actual = next(pooled.attribute([classification])["s1_and_s2"])
+
+        assert actual.query_probe.header.pos == 3
+        assert classification.query_name == "pooled_probe_0"
+
+
+class TestPooledRecallReport:
+    def test_splitPooledRecallReport_sameReportsAsTheRecallReportOfEachPair(self, dataset, tmp_path):
+        sample = dataset.samples[0]
+        sample_pairs_and_sams = [(dataset.get_sample_pair_as_str((sample1, sample2)), sam)
+                                 for (sample_of_sam, tool, sample1, sample2), sam in sorted(dataset.recall_sams.items())
+                                 if sample_of_sam == sample]
+        sample_pairs_and_truth_probesets = [
+            (dataset.get_sample_pair_as_str((sample1, sample2)), truth_probeset)
+            for (sample_of_probeset, sample1, sample2), truth_probeset in sorted(dataset.truth_probesets.items())
+            if sample_of_probeset == sample]
+        assert [sample_pair for sample_pair, _ in sample_pairs_and_sams] == \
+               [sample_pair for sample_pair, _ in sample_pairs_and_truth_probesets]
+        sample_pairs = [sample_pair for sample_pair, _ in sample_pairs_and_sams]
+        pool_truth_probesets([truth_probeset for _, truth_probeset in sample_pairs_and_truth_probesets], sample_pairs,
+                             tmp_path / "pooled.fa", tmp_path / "probes.tsv")
+        pooled_sam = create_pooled_sam(sample_pairs_and_sams, tmp_path / "probes.tsv", tmp_path / "pooled.sam")
+        mask_bitmaps = dataset.mask_bitmaps[sample]
+
+        create_pooled_recall_report([pooled_sam, pooled_sam], tmp_path / "probes.tsv", mask_bitmaps, sample, [0, 10],
+                                    tmp_path / "pooled.npz")
+        reports = [tmp_path / f"{sample_pair}.npz" for sample_pair in sample_pairs]
+        split_pooled_recall_report(tmp_path / "pooled.npz", sample_pairs, reports)
+
+        for (sample_pair, sam), report in zip(sample_pairs_and_sams, reports):
+            create_recall_report([sam, sam], mask_bitmaps, sample, [0, 10], tmp_path / f"{sample_pair}.expected.npz")
+            expected = load_binary_report(tmp_path / f"{sample_pair}.expected.npz")
+            actual = load_binary_report(report)
+            assert len(actual) > 0
+            pd.testing.assert_frame_equal(actual, expected)
+
+    def test_splitPooledRecallReport_pairWithNoRows_emptyReport(self, dataset, tmp_path):
+        sample = dataset.samples[0]
+        (_, _, sample1, sample2), sam = next((key, sam) for key, sam in sorted(dataset.recall_sams.items())
+                                             if key[0] == sample)
+        sample_pair = dataset.get_sample_pair_as_str((sample1, sample2))
+        truth_probeset = dataset.truth_probesets[sample, sample1, sample2]
+        pool_truth_probesets([truth_probeset], [sample_pair], tmp_path / "pooled.fa", tmp_path / "probes.tsv")
+        pooled_sam = create_pooled_sam([(sample_pair, sam)], tmp_path / "probes.tsv", tmp_path / "pooled.sam")
+        create_pooled_recall_report([pooled_sam], tmp_path / "probes.tsv", dataset.mask_bitmaps[sample], sample, [0],
+                                    tmp_path / "pooled.npz")
+
+        split_pooled_recall_report(tmp_path / "pooled.npz", ["other_pair"], [tmp_path / "other_pair.npz"])
+
+        assert len(load_binary_report(tmp_path / "other_pair.npz")) == 0
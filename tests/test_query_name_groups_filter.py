@@ -0,0 +1,109 @@
+from unittest.mock import Mock
+import pytest
+from evaluate.query_name_groups_filter import (
+    QueryNameGroupsFilter,
+    QueryNameNotGroupedError,
+    group_records_by_query_name,
+)
+from evaluate.mapq_sam_records_filter import MAPQSamRecordsFilter
+
+
+def create_record_mock(query_name, mapping_quality=60, covers_allele=True):
+    return Mock(query_name=query_name, mapping_quality=mapping_quality,
+                _whole_query_probe_maps=Mock(return_value=covers_allele))
+
+
+class TestGroupRecordsByQueryName:
+    def test___group_records_by_query_name___no_records___no_groups(self):
+        assert list(group_records_by_query_name([])) == []
+
+    def test___group_records_by_query_name___adjacent_records___grouped(self):
+        record_1, record_2, record_3 = create_record_mock("q1"), create_record_mock("q1"), create_record_mock("q2")
+
+        actual = list(group_records_by_query_name([record_1, record_2, record_3]))
+        expected = [[record_1, record_2], [record_3]]
+
+        assert actual == expected
+
+    def test___group_records_by_query_name___query_reappears_and_check_grouping___raises_QueryNameNotGroupedError(self):
+        records = [create_record_mock("q1"), create_record_mock("q2"), create_record_mock("q1")]
+
+        with pytest.raises(QueryNameNotGroupedError):
+            list(group_records_by_query_name(records, check_grouping=True))
+
+    def test___group_records_by_query_name___query_reappears___one_group_per_run(self):
+        records = [create_record_mock("q1"), create_record_mock("q2"), create_record_mock("q1")]
+
+        actual = list(group_records_by_query_name(records))
+        expected = [[records[0]], [records[1]], [records[2]]]
+
+        assert actual == expected
+
+
+class TestQueryNameGroupsFilter:
+    def test___filter_records___one_record_per_query___all_records_kept(self):
+        records = [create_record_mock("q1"), create_record_mock("q2", covers_allele=False)]
+        query_name_groups_filter = QueryNameGroupsFilter()
+
+        actual = query_name_groups_filter.filter_records(records)
+
+        assert actual == records
+        assert query_name_groups_filter.nb_of_records_before_mapq_sam_records_filter == 2
+        assert query_name_groups_filter.nb_of_records_after_mapq_sam_records_filter == 2
+
+    def test___filter_records___mapping_quality_gap_large_enough___keeps_best_record(self):
+        best_record = create_record_mock("q1", mapping_quality=60)
+        records = [create_record_mock("q1", mapping_quality=40), best_record]
+        query_name_groups_filter = QueryNameGroupsFilter()
+
+        actual = query_name_groups_filter.filter_records(records)
+        expected = [best_record]
+
+        assert actual == expected
+        assert query_name_groups_filter.nb_of_records_removed_with_mapq_sam_records_filter == 1
+
+    def test___filter_records___mapping_quality_gap_too_small___query_removed(self):
+        records = [create_record_mock("q1", mapping_quality=55), create_record_mock("q1", mapping_quality=60)]
+        query_name_groups_filter = QueryNameGroupsFilter()
+
+        actual = query_name_groups_filter.filter_records(records)
+
+        assert actual == []
+        assert query_name_groups_filter.nb_of_records_removed_with_mapq_sam_records_filter == 2
+
+    def test___filter_records___keep_only_unique_records___multimapped_query_removed(self):
+        unique_record = create_record_mock("q2")
+        records = [create_record_mock("q1", mapping_quality=0), create_record_mock("q1", mapping_quality=60),
+                   unique_record]
+        query_name_groups_filter = QueryNameGroupsFilter(keep_only_unique_records=True)
+
+        actual = query_name_groups_filter.filter_records(records)
+        expected = [unique_record]
+
+        assert actual == expected
+
+    def test___filter_records___masker_filters_kept_records(self):
+        masked_record = create_record_mock("q1")
+        unmasked_record = create_record_mock("q2")
+        masker = Mock(record_should_be_filtered_out=lambda record: record is masked_record)
+        query_name_groups_filter = QueryNameGroupsFilter(masker=masker)
+
+        actual = query_name_groups_filter.filter_records([masked_record, unmasked_record])
+        expected = [unmasked_record]
+
+        assert actual == expected
+        assert query_name_groups_filter.nb_of_records_after_mapq_sam_records_filter == 2
+
+    def test___filter_records___same_records_as_MAPQSamRecordsFilter(self):
+        records = [
+            create_record_mock("q1", mapping_quality=60), create_record_mock("q1", mapping_quality=10),
+            create_record_mock("q2", mapping_quality=30, covers_allele=False), create_record_mock("q2", mapping_quality=60, covers_allele=False),
+            create_record_mock("q3", mapping_quality=60), create_record_mock("q3", mapping_quality=59),
+            create_record_mock("q4", mapping_quality=0),
+            create_record_mock("q5", mapping_quality=3), create_record_mock("q5", mapping_quality=50, covers_allele=False),
+        ]
+
+        actual = QueryNameGroupsFilter().filter_records(records)
+        expected = MAPQSamRecordsFilter(records).filter_records(records)
+
+        assert actual == expected
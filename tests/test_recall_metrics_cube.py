@@ -0,0 +1,168 @@
+import random
+
+import pandas as pd
+import pytest
+
+from evaluate.binary_report import save_binary_report
+from evaluate.calculator import RecallCalculator
+from evaluate.partial_aggregates import PartialAggregates
+from evaluate.recall_metrics_cube import RecallMetricsCube
+from evaluate.report import RecallReport
+
+
+def create_truth_probe_headers(nb_of_variants: int = 20):
+    truth_probe_headers = []
+    pos = 0
+    for pangenome_variation_id in range(nb_of_variants):
+        nb_of_alleles = random.randint(1, 3)
+        nb_of_different_allele_sequences = random.randint(1, 3)
+        nb_of_samples = random.randint(2, 4)
+        for _ in range(random.randint(1, 4)):
+            pos += 1
+            truth_probe_headers.append(
+                f"CHROM=1;POS={pos};INTERVAL=[0,10);PANGENOME_VARIATION_ID={pangenome_variation_id};"
+                f"NUMBER_OF_ALLELES={nb_of_alleles};ALLELE_ID={random.randrange(nb_of_alleles)};"
+                f"NUMBER_OF_DIFFERENT_ALLELE_SEQUENCES={nb_of_different_allele_sequences};"
+                f"ALLELE_SEQUENCE_ID={random.randrange(nb_of_different_allele_sequences)};NB_OF_SAMPLES={nb_of_samples};")
+    return truth_probe_headers
+
+
+def create_random_report_files(seed: int, directory, suffix: str = ".tsv"):
+    """
+    Creates one recall report (with several mappings per truth probe) per sample and sample pair, with truth probes
+    shared between reports. Returns the (sample, sample_pair, report_file) triples.
+    """
+    random.seed(seed)
+    classifications = ["unmapped", "primary_correct", "primary_incorrect", "secondary_correct", "supplementary_incorrect"]
+    truth_probe_headers = create_truth_probe_headers()
+    samples = ["s1", "s2", "s3"]
+    sample_pairs = ["s1_and_s2", "s1_and_s3", "s2_and_s3"]
+
+    samples_sample_pairs_and_report_files = []
+    for sample in samples:
+        for sample_pair in [sample_pair for sample_pair in sample_pairs if sample in sample_pair]:
+            rows = []
+            for truth_probe_header in random.sample(truth_probe_headers, k=len(truth_probe_headers) // 2):
+                for _ in range(random.randint(1, 3)):
+                    rows.append([sample, truth_probe_header, f"GT_CONF={random.choice([0, 1, 5, 10, 20])};",
+                                 random.choice(classifications)])
+            df = pd.DataFrame(rows, columns=["sample", "query_probe_header", "ref_probe_header", "classification"])
+            report_file = directory / f"{sample}.{sample_pair}{suffix}"
+            if suffix == ".npz":
+                save_binary_report(df, report_file)
+            else:
+                df.to_csv(report_file, sep="\t", index=False)
+            samples_sample_pairs_and_report_files.append((sample, sample_pair, report_file))
+    return samples_sample_pairs_and_report_files
+
+
+def get_recall_calculator_from_files(report_files) -> RecallCalculator:
+    return RecallCalculator(RecallReport.from_files(report_files, concatenate_dfs_one_by_one_keeping_only_best_mappings=True))
+
+
+class TestRecallMetricsCube:
+    @pytest.mark.parametrize("seed", [1, 2, 3])
+    def test___get_recall_report_per_sample___same_as_loading_the_reports_of_each_sample(self, seed, tmp_path):
+        samples_sample_pairs_and_report_files = create_random_report_files(seed, tmp_path)
+        cube = RecallMetricsCube.from_files(samples_sample_pairs_and_report_files)
+
+        actual = cube.get_recall_report_per_sample()
+
+        for sample in ["s1", "s2", "s3"]:
+            report_files = [report_file for report_sample, _, report_file in samples_sample_pairs_and_report_files
+                            if report_sample == sample]
+            expected = get_recall_calculator_from_files(report_files).get_recall_report([0])
+            actual_for_sample = actual[actual["sample"] == sample].drop(columns="sample").reset_index(drop=True)
+            pd.testing.assert_frame_equal(actual_for_sample, expected)
+
+    def test___get_recall_report_per_sample_pair___same_as_loading_each_report(self, tmp_path):
+        samples_sample_pairs_and_report_files = create_random_report_files(4, tmp_path)
+        cube = RecallMetricsCube.from_files(samples_sample_pairs_and_report_files)
+
+        actual = cube.get_recall_report_per_sample_pair()
+
+        assert len(actual) == len(samples_sample_pairs_and_report_files)
+        for sample, sample_pair, report_file in samples_sample_pairs_and_report_files:
+            expected = get_recall_calculator_from_files([report_file]).get_recall_report([0])
+            is_group = (actual["sample"] == sample) & (actual["sample_pair"] == sample_pair)
+            actual_for_group = actual[is_group].drop(columns=["sample", "sample_pair"]).reset_index(drop=True)
+            pd.testing.assert_frame_equal(actual_for_group, expected)
+
+    def test___get_recall_report_per_sample_wrt_truth_probes_for_those_present_in_a_given_nb_of_samples(self, tmp_path):
+        samples_sample_pairs_and_report_files = create_random_report_files(5, tmp_path)
+        cube = RecallMetricsCube.from_files(samples_sample_pairs_and_report_files)
+
+        actual = cube.get_recall_report_per_sample_wrt_truth_probes_for_those_present_in_a_given_nb_of_samples([2, 3, 4])
+
+        for sample in ["s1", "s2", "s3"]:
+            report_files = [report_file for report_sample, _, report_file in samples_sample_pairs_and_report_files
+                            if report_sample == sample]
+            expected = get_recall_calculator_from_files(report_files) \
+                .get_recall_report_wrt_truth_probes_for_those_present_in_a_given_nb_of_samples([2, 3, 4])
+            actual_for_sample = actual[actual["sample"] == sample].drop(columns="sample").reset_index(drop=True)
+            pd.testing.assert_frame_equal(actual_for_sample, expected)
+
+    @pytest.mark.parametrize("suffix", [".tsv", ".npz"])
+    def test___recall_vs_nb_of_samples_reports___same_as_loading_all_reports(self, suffix, tmp_path):
+        samples_sample_pairs_and_report_files = create_random_report_files(6, tmp_path, suffix)
+        cube = RecallMetricsCube.from_files(samples_sample_pairs_and_report_files)
+        calculator = get_recall_calculator_from_files(
+            [report_file for _, _, report_file in samples_sample_pairs_and_report_files])
+
+        pd.testing.assert_frame_equal(cube.get_recall_allele_seqs_vs_nb_of_samples_report([2, 3, 4, 5]),
+                                      calculator.get_recall_allele_seqs_vs_nb_of_samples_report([2, 3, 4, 5]))
+        pd.testing.assert_frame_equal(cube.get_recall_alleles_vs_nb_of_samples_report([2, 3, 4, 5]),
+                                      calculator.get_recall_alleles_vs_nb_of_samples_report([2, 3, 4, 5]))
+
+    def test___from_files___threshold_sweep_reports___uses_only_the_rows_of_gt_conf_percentile(self, tmp_path):
+        samples_sample_pairs_and_report_files = create_random_report_files(7, tmp_path)
+        samples_sample_pairs_and_sweep_report_files = []
+        for sample, sample_pair, report_file in samples_sample_pairs_and_report_files:
+            df = pd.read_csv(report_file, sep="\t")
+            other_threshold_df = df.assign(classification="primary_correct")
+            sweep_report_file = tmp_path / f"{sample}.{sample_pair}.threshold_sweep.npz"
+            save_binary_report(pd.concat([df.assign(gt_conf_percentile=0),
+                                          other_threshold_df.assign(gt_conf_percentile=5)], ignore_index=True),
+                               sweep_report_file)
+            samples_sample_pairs_and_sweep_report_files.append((sample, sample_pair, sweep_report_file))
+
+        actual = RecallMetricsCube.from_files(samples_sample_pairs_and_sweep_report_files).get_recall_report_per_sample()
+        expected = RecallMetricsCube.from_files(samples_sample_pairs_and_report_files).get_recall_report_per_sample()
+
+        pd.testing.assert_frame_equal(actual, expected)
+
+    @pytest.mark.parametrize("suffix", [".tsv", ".npz"])
+    def test___from_files___partial_aggregates_of_the_previous_cohort___same_metrics_as_loading_all_reports(
+            self, suffix, tmp_path):
+        samples_sample_pairs_and_report_files = create_random_report_files(8, tmp_path, suffix)
+        # the reports of the pairs with s3 are those of the sample added to the cohort
+        previous_samples_sample_pairs_and_report_files = [
+            (sample, sample_pair, report_file) for sample, sample_pair, report_file in samples_sample_pairs_and_report_files
+            if "s3" not in sample_pair]
+        partial_aggregates = PartialAggregates(tmp_path / "partial_aggregates", "recall_metrics_cube")
+        RecallMetricsCube.from_files(previous_samples_sample_pairs_and_report_files, partial_aggregates=partial_aggregates)
+
+        actual = RecallMetricsCube.from_files(samples_sample_pairs_and_report_files, partial_aggregates=partial_aggregates)
+        expected = RecallMetricsCube.from_files(samples_sample_pairs_and_report_files)
+
+        pd.testing.assert_frame_equal(actual.get_recall_report_per_sample(), expected.get_recall_report_per_sample())
+        pd.testing.assert_frame_equal(actual.get_recall_report_per_sample_pair(),
+                                      expected.get_recall_report_per_sample_pair())
+        pd.testing.assert_frame_equal(actual.get_recall_allele_seqs_vs_nb_of_samples_report([2, 3, 4, 5]),
+                                      expected.get_recall_allele_seqs_vs_nb_of_samples_report([2, 3, 4, 5]))
+        pd.testing.assert_frame_equal(actual.get_recall_alleles_vs_nb_of_samples_report([2, 3, 4, 5]),
+                                      expected.get_recall_alleles_vs_nb_of_samples_report([2, 3, 4, 5]))
+
+    def test___from_files___partial_aggregates___only_the_new_reports_are_loaded(self, tmp_path, monkeypatch):
+        samples_sample_pairs_and_report_files = create_random_report_files(9, tmp_path)
+        partial_aggregates = PartialAggregates(tmp_path / "partial_aggregates", "recall_metrics_cube")
+        RecallMetricsCube.from_files(samples_sample_pairs_and_report_files[:-1], partial_aggregates=partial_aggregates)
+        loaded_report_files = []
+
+        def read_report_files(report_files, **kwargs):
+            loaded_report_files.extend(report_files)
+            return [pd.read_csv(report_file, sep="\t") for report_file in report_files]
+        monkeypatch.setattr("evaluate.recall_metrics_cube.read_report_files", read_report_files)
+        RecallMetricsCube.from_files(samples_sample_pairs_and_report_files, partial_aggregates=partial_aggregates)
+
+        assert loaded_report_files == [samples_sample_pairs_and_report_files[-1][2]]
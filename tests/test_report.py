@@ -1,9 +1,13 @@
 import pandas as pd
 from pandas.testing import assert_frame_equal
 from evaluate.report import (
+    read_report_files,
     PrecisionReport,
     RecallReport,
     Report,
+    BestMappingReducer,
+    encode_report_columns,
+    concat_with_shared_categories,
     DelimNotFoundError,
     ReturnTypeDoesNotMatchError
 )
@@ -13,6 +17,7 @@ from io import StringIO
 import math
 from tests.common import create_tmp_file, create_recall_report_row, create_precision_report_row
 from unittest.mock import patch
+import random
 
 class TestReport:
     def test___get_report_satisfying_confidence_threshold(self):
@@ -424,6 +429,40 @@ CFT073	>CHROM=1;POS=1252;INTERVAL=[40,50);PANGENOME_VARIATION_ID=3;NUMBER_OF_ALL
         assert_frame_equal(actual, expected, check_dtype=False)
 
 
+    def test_checkIfOnlyBestMappingIsKept_tiesAreWonByTheMappingSeenFirst(self):
+        dfs = [pd.DataFrame(data=[create_recall_report_row("truth_probe_1", AlignmentAssessment.PRIMARY_CORRECT, gt_conf=100, with_gt_conf=True, sample="sample1")]),
+               pd.DataFrame(data=[create_recall_report_row("truth_probe_1", AlignmentAssessment.SECONDARY_CORRECT, gt_conf=100, with_gt_conf=True, sample="sample2")])]
+        report = RecallReport(dfs)
+        actual = report.report
+        expected = pd.DataFrame(data=[create_recall_report_row("truth_probe_1", AlignmentAssessment.PRIMARY_CORRECT, gt_conf=100, with_gt_conf=True, sample="sample1")])
+        assert_frame_equal(actual, expected, check_dtype=False)
+
+    @pytest.mark.parametrize("seed", [1, 2, 3])
+    def test_reduceDfsKeepingOnlyBestMappings_sameAsConcatenatingDfsOneByOne(self, seed):
+        random.seed(seed)
+        classifications = ["unmapped", "partially_mapped", "primary_correct", "primary_incorrect",
+                           "secondary_correct", "supplementary_incorrect"]
+        dfs = []
+        for df_index in range(5):
+            lines = ["sample\tquery_probe_header\tref_probe_header\tclassification"]
+            for _ in range(30):
+                truth_probe = random.randrange(20)
+                lines.append(f"sample_{df_index}\t>CHROM=1;POS={truth_probe};\t"
+                             f">GT_CONF={random.choice([1, 2, 5, 10])};\t{random.choice(classifications)}")
+            dfs.append(pd.read_csv(StringIO("\n".join(lines)), sep="\t", keep_default_na=False))
+
+        reference_report = RecallReport([pd.DataFrame(data=[create_recall_report_row("truth_probe_1", AlignmentAssessment.UNMAPPED)])])
+        reference_report._concatenate_dfs_one_by_one_keeping_only_best_mappings(dfs)
+
+        best_mapping_reducer = BestMappingReducer()
+        for df in dfs:
+            best_mapping_reducer.fold(df)
+
+        actual = best_mapping_reducer.get_best_mappings()
+        expected = reference_report.report
+
+        assert_frame_equal(actual, expected)
+
 
     def test_simple_concatenation_with_several_dfs(self):
         df_1 = pd.DataFrame(
@@ -734,4 +773,163 @@ S1,16,3,1,2,False,0,0
         actual = report.get_proportion_of_alleles_found_for_each_variant()
         expected = [2 / 5]
 
-        assert actual == expected
\ No newline at end of file
+        assert actual == expected
+
+
+class TestEncodedReport:
+    recall_contents = """sample	query_probe_header	ref_probe_header	classification
+CFT073	>CHROM=1;POS=1246;INTERVAL=[20,30);PANGENOME_VARIATION_ID=1;NUMBER_OF_ALLELES=1;ALLELE_ID=1;NUMBER_OF_DIFFERENT_ALLELE_SEQUENCES=1;ALLELE_SEQUENCE_ID=1;NB_OF_SAMPLES=10;	>GT_CONF=1;	unmapped
+CFT073	>CHROM=1;POS=1248;INTERVAL=[30,40);PANGENOME_VARIATION_ID=2;NUMBER_OF_ALLELES=2;ALLELE_ID=2;NUMBER_OF_DIFFERENT_ALLELE_SEQUENCES=2;ALLELE_SEQUENCE_ID=2;NB_OF_SAMPLES=20;	>GT_CONF=60.1133;	primary_correct
+CFT073	>CHROM=1;POS=1252;INTERVAL=[40,50);PANGENOME_VARIATION_ID=3;NUMBER_OF_ALLELES=3;ALLELE_ID=3;NUMBER_OF_DIFFERENT_ALLELE_SEQUENCES=3;ALLELE_SEQUENCE_ID=3;NB_OF_SAMPLES=30;	>GT_CONF=3;	unmapped
+"""
+    other_recall_contents = """sample	query_probe_header	ref_probe_header	classification
+063_STEC	>CHROM=1;POS=1260;INTERVAL=[50,60);PANGENOME_VARIATION_ID=2;NUMBER_OF_ALLELES=2;ALLELE_ID=1;NUMBER_OF_DIFFERENT_ALLELE_SEQUENCES=2;ALLELE_SEQUENCE_ID=1;NB_OF_SAMPLES=20;	>GT_CONF=3.22199;	primary_incorrect
+063_STEC	>CHROM=1;POS=1262;INTERVAL=[60,70);PANGENOME_VARIATION_ID=4;NUMBER_OF_ALLELES=1;ALLELE_ID=1;NUMBER_OF_DIFFERENT_ALLELE_SEQUENCES=1;ALLELE_SEQUENCE_ID=1;NB_OF_SAMPLES=5;	>GT_CONF=5;	secondary_correct
+"""
+
+    def read_recall_dfs(self):
+        return [pd.read_csv(StringIO(contents), sep="\t", keep_default_na=False)
+                for contents in [self.recall_contents, self.other_recall_contents]]
+
+    def test_encodeReportColumns_stringColumnsBecomeCategoricals(self):
+        df = pd.DataFrame({"sample": ["s1", "s1"], "classification": [0.5, 1.0], "other": ["a", "b"]})
+
+        actual = encode_report_columns(df)
+
+        assert isinstance(actual["sample"].dtype, pd.CategoricalDtype)
+        assert actual["classification"].dtype == float
+        assert actual["other"].dtype == object
+
+    def test_concatWithSharedCategories_keepsCategoricalsWithDifferentCategories(self):
+        df_1 = encode_report_columns(pd.DataFrame({"sample": ["s2", "s1"]}))
+        df_2 = encode_report_columns(pd.DataFrame({"sample": ["s3"]}))
+
+        actual = concat_with_shared_categories([df_1, df_2], ignore_index=True)
+
+        assert isinstance(actual["sample"].dtype, pd.CategoricalDtype)
+        assert actual["sample"].cat.categories.to_list() == ["s1", "s2", "s3"]
+        assert actual["sample"].to_list() == ["s2", "s1", "s3"]
+
+    def test_recallReport_encodedHasSameValuesAsNotEncoded(self):
+        report = RecallReport(self.read_recall_dfs(), False)
+        encoded_report = RecallReport(self.read_recall_dfs(), False, encode_columns=True)
+
+        assert encoded_report.is_encoded()
+        assert not report.is_encoded()
+        assert encoded_report.report["PANGENOME_VARIATION_ID"].dtype == "int32"
+        assert_frame_equal(encoded_report.report, report.report, check_dtype=False, check_categorical=False)
+        assert encoded_report.get_number_of_truth_probes() == report.get_number_of_truth_probes() == 5
+        assert encoded_report.get_proportion_of_alleles_found_for_each_variant() == \
+               report.get_proportion_of_alleles_found_for_each_variant()
+
+    def test_getValuesFromHeaders_categoricalHeadersWithSmallInts_int32ThatDoesNotOverflow(self):
+        headers = pd.Series(["NUMBER_OF_DIFFERENT_ALLELE_SEQUENCES=127;", "NUMBER_OF_DIFFERENT_ALLELE_SEQUENCES=1;"],
+                            dtype="category")
+
+        actual = Report.get_values_from_headers(headers, "NUMBER_OF_DIFFERENT_ALLELE_SEQUENCES", int, None)
+
+        assert actual.dtype == "int32"
+        assert (actual + 1).to_list() == [128, 2]
+
+    def test_recallReport_encodedKeepsOnlyBestMappings(self):
+        dfs = [pd.DataFrame(data=[create_recall_report_row("truth_probe_1", AlignmentAssessment.UNMAPPED, gt_conf=100, with_gt_conf=True)]),
+               pd.DataFrame(data=[create_recall_report_row("truth_probe_1", AlignmentAssessment.PRIMARY_CORRECT, gt_conf=10, with_gt_conf=True)])]
+
+        report = RecallReport(dfs, encode_columns=True)
+
+        assert report.get_classifications_as_list() == ["primary_correct"]
+        assert report.get_report_satisfying_confidence_threshold(50).get_number_of_truth_probes() == 0
+
+    def test_saveReport_encodedAndNotEncodedWriteTheSame(self):
+        encoded_output = StringIO()
+        output = StringIO()
+
+        RecallReport(self.read_recall_dfs(), False, encode_columns=True).save_report(encoded_output)
+        RecallReport(self.read_recall_dfs(), False).save_report(output)
+
+        assert encoded_output.getvalue() == output.getvalue()
+
+
+class TestBinaryReportFiles:
+    def read_recall_dfs(self):
+        return TestEncodedReport().read_recall_dfs()
+
+    def test_recallReport_savedAsBinaryAndReloadedIsTheSame(self, tmp_path):
+        report = RecallReport(self.read_recall_dfs(), False)
+        report.save_report(tmp_path / "report.npz")
+
+        actual = RecallReport.from_files([tmp_path / "report.npz"], False)
+
+        assert actual == report
+
+    def test_recallReport_binaryWithHelperColumnsIsNotReparsed(self, tmp_path):
+        report = RecallReport(self.read_recall_dfs(), False)
+        report.save_report(tmp_path / "report.npz")
+
+        with patch.object(RecallReport, RecallReport._create_helper_columns.__name__) as create_helper_columns_mock:
+            actual = RecallReport.from_files([tmp_path / "report.npz"], False, encode_columns=True,
+                                             columns=RecallReport.columns_needed_by_calculator)
+
+        create_helper_columns_mock.assert_not_called()
+        assert "ref_probe_header" not in actual.report.columns
+        assert actual.get_proportion_of_alleles_found_for_each_variant() == \
+               report.get_proportion_of_alleles_found_for_each_variant()
+
+    def test_precisionReport_fromTsvAndBinaryFilesIsTheSame(self, tmp_path):
+        df = pd.read_csv(StringIO(TestEncodedReport.recall_contents), sep="\t", keep_default_na=False)
+        df.to_csv(tmp_path / "report.tsv", sep="\t", index=False)
+        PrecisionReport([df]).save_report(tmp_path / "report.npz")
+
+        columns = PrecisionReport.columns_needed_by_calculator
+        actual = PrecisionReport.from_files([tmp_path / "report.npz"], columns=columns)
+        expected = PrecisionReport.from_files([tmp_path / "report.tsv"], columns=columns)
+
+        assert actual == expected
+        assert actual.report.columns.to_list() == ["query_probe_header", "classification", "GT_CONF"]
+
+
+class TestReadReportFiles:
+    @staticmethod
+    def create_report_files(tmp_path, nb_of_files: int = 10):
+        paths = []
+        for index in range(nb_of_files):
+            path = tmp_path / f"{index}.report.tsv"
+            pd.DataFrame({
+                "sample": [str(index)] * (index + 1),
+                "query_probe_header": [f">{index}_{row};" for row in range(index + 1)],
+                "ref_probe_header": [">GT_CONF=1;"] * (index + 1),
+                "classification": ["unmapped"] * (index + 1),
+            }).to_csv(path, sep="\t", index=False)
+            paths.append(path)
+        return paths
+
+    def test_readReportFiles_inThreadPool_sameDfsInSameOrderAsSerial(self, tmp_path):
+        paths = self.create_report_files(tmp_path)
+
+        expected = list(read_report_files(paths))
+        actual = list(read_report_files(paths, threads=2))
+
+        assert len(actual) == len(expected) == 10
+        for actual_df, expected_df in zip(actual, expected):
+            assert_frame_equal(actual_df, expected_df)
+
+    def test_readReportFiles_declaredDtypesAreNotInferred(self, tmp_path):
+        paths = self.create_report_files(tmp_path, nb_of_files=1)
+
+        df = next(read_report_files(paths))
+        encoded_df = next(read_report_files(paths, as_categorical=True))
+
+        assert df["sample"].to_list() == ["0"]
+        assert isinstance(encoded_df["query_probe_header"].dtype, pd.CategoricalDtype)
+
+    def test_readReportFiles_logsLoadTimeOfEachFile(self, tmp_path, caplog):
+        paths = self.create_report_files(tmp_path, nb_of_files=3)
+
+        with caplog.at_level("INFO"):
+            list(read_report_files(paths, threads=2))
+
+        assert all(any(str(path) in message for message in caplog.messages) for path in paths)
+
+    def test_fromFiles_inThreadPool_sameReportAsSerial(self, tmp_path):
+        paths = self.create_report_files(tmp_path)
+        assert PrecisionReport.from_files(paths, threads=3) == PrecisionReport.from_files(paths)
@@ -1,14 +1,17 @@
 from io import StringIO
+import multiprocessing.pool
 
 import pandas as pd
 
 from evaluate.classification import AlignmentAssessment
-from evaluate.classifier import RecallClassifier
+from evaluate.classifier import RecallClassifier, PrecisionClassifier
 from evaluate.reporter import (
     Reporter,
     RecallReporter,
-    PrecisionReporter
+    PrecisionReporter,
 )
+from evaluate.binary_report import load_binary_report
+from evaluate.query_name_groups_filter import QueryNameGroupsFilter
 from tests.common import (
     create_classifier_with_two_entries,
     create_correct_primary_sam_record,
@@ -233,6 +236,137 @@ class TestReporter:
         assert actual == expected
 
 
+class TestReporterInParallel:
+    def test_generateReport_inParallel_sameReportAsSerial(self):
+        serial_reporter = RecallReporter(classifiers=[create_classifier_with_two_entries(RecallClassifier)])
+        parallel_reporter = RecallReporter(classifiers=[create_classifier_with_two_entries(RecallClassifier)],
+                                           processes=2, batch_size=1)
+
+        expected = serial_reporter.generate_report(10)
+        actual = parallel_reporter.generate_report(10)
+
+        assert len(actual) == 2
+        assert actual.equals(expected)
+
+    def test_generateReport_inParallelWithRecordsFilter_sameReportAndCountsAsSerial(self):
+        # three queries, the second one with two records
+        records = list(create_classifier_with_two_entries(PrecisionClassifier).sam)
+        records += [create_correct_primary_sam_record(), create_incorrect_supplementary_sam_record()]
+        for record, query_index in zip(records, [0, 1, 1, 2]):
+            record.query_name = f"{record.query_name}QUERY={query_index};"
+        serial_filter = QueryNameGroupsFilter(mapping_quality_threshold=0)
+        parallel_filter = QueryNameGroupsFilter(mapping_quality_threshold=0)
+        serial_reporter = PrecisionReporter(classifiers=[PrecisionClassifier(records, "sample", serial_filter)])
+        parallel_reporter = PrecisionReporter(classifiers=[PrecisionClassifier(records, "sample", parallel_filter)],
+                                              processes=2, batch_size=1)
+
+        expected = serial_reporter.generate_report()
+        actual = parallel_reporter.generate_report()
+
+        assert actual.equals(expected)
+        assert parallel_filter.get_counts() == serial_filter.get_counts()
+        assert parallel_filter.nb_of_records_before_mapq_sam_records_filter == len(records)
+
+
+class TestReporterStreaming:
+    def test_writeReport_recall_sameOutputAsSaveReport(self):
+        reporter = RecallReporter(classifiers=[create_classifier_with_two_entries(RecallClassifier)])
+        expected = StringIO()
+        reporter.save_report(reporter.generate_report(10), expected)
+
+        reporter = RecallReporter(classifiers=[create_classifier_with_two_entries(RecallClassifier)])
+        actual = StringIO()
+        nb_of_rows = reporter.write_report(actual, 10)
+
+        assert nb_of_rows == 2
+        assert actual.getvalue() == expected.getvalue()
+
+    def test_writeReport_precision_sameOutputAsSaveReport(self):
+        reporter = PrecisionReporter(classifiers=[create_classifier_with_two_entries(PrecisionClassifier)])
+        expected = StringIO()
+        reporter.save_report(reporter.generate_report(), expected)
+
+        reporter = PrecisionReporter(classifiers=[create_classifier_with_two_entries(PrecisionClassifier)],
+                                     batch_size=1)
+        actual = StringIO()
+        reporter.write_report(actual)
+
+        assert actual.getvalue() == expected.getvalue()
+
+    def test_writeReport_noClassifierWritesOnlyHeader(self):
+        reporter = RecallReporter(classifiers=[RecallClassifier(name="sample")])
+        actual = StringIO()
+        nb_of_rows = reporter.write_report(actual, 10)
+
+        assert nb_of_rows == 0
+        assert actual.getvalue() == "sample\tquery_probe_header\tref_probe_header\tclassification\n"
+
+    def test_writeReport_binaryPath_sameReportAsGenerateReport(self, tmp_path):
+        reporter = RecallReporter(classifiers=[create_classifier_with_two_entries(RecallClassifier)])
+        # recall assessments are saved as strings, as in TSV reports
+        expected = reporter.generate_report(10).astype({"classification": str})
+
+        reporter = RecallReporter(classifiers=[create_classifier_with_two_entries(RecallClassifier)])
+        nb_of_rows = reporter.write_report(tmp_path / "report.npz", 10)
+        actual = load_binary_report(tmp_path / "report.npz")
+
+        assert nb_of_rows == 2
+        assert actual.equals(expected)
+
+    def test_writeReport_precisionBinaryPath_assessmentsSavedAsFloats(self, tmp_path):
+        reporter = PrecisionReporter(classifiers=[create_classifier_with_two_entries(PrecisionClassifier)])
+        expected = reporter.generate_report()
+
+        reporter = PrecisionReporter(classifiers=[create_classifier_with_two_entries(PrecisionClassifier)])
+        reporter.write_report(tmp_path / "report.npz")
+        actual = load_binary_report(tmp_path / "report.npz")
+
+        assert actual["classification"].dtype == float
+        assert actual.equals(expected)
+
+
+class TestRecallReporterThresholdSweep:
+    def test_generateThresholdSweepReport_sameRowsAsOneReportPerThresholdWithThresholdColumn(self):
+        reporter = RecallReporter(classifiers=[create_classifier_with_two_entries(RecallClassifier),
+                                               create_classifier_with_two_entries(RecallClassifier)])
+        actual = reporter.generate_threshold_sweep_report([0, 5])
+
+        expected = pd.concat([
+            RecallReporter(classifiers=[create_classifier_with_two_entries(RecallClassifier)])
+            .generate_report(gt_conf_percentile).assign(gt_conf_percentile=gt_conf_percentile)
+            for gt_conf_percentile in [0, 5]
+        ], ignore_index=True)
+        assert actual.equals(expected)
+
+    def test_writeThresholdSweepReport_binaryPath_sameReportAsGenerateThresholdSweepReport(self, tmp_path):
+        reporter = RecallReporter(classifiers=[create_classifier_with_two_entries(RecallClassifier),
+                                               create_classifier_with_two_entries(RecallClassifier)])
+        # recall assessments are saved as strings, thresholds as integers
+        expected = reporter.generate_threshold_sweep_report([0, 5]).astype({"classification": str})
+
+        reporter = RecallReporter(classifiers=[create_classifier_with_two_entries(RecallClassifier),
+                                               create_classifier_with_two_entries(RecallClassifier)])
+        nb_of_rows = reporter.write_threshold_sweep_report(tmp_path / "report.npz", [0, 5])
+        actual = load_binary_report(tmp_path / "report.npz")
+
+        assert nb_of_rows == 4
+        assert actual.equals(expected)
+
+    def test_generateThresholdSweepReport_inParallel_onePoolForAllThresholdsAndSameReportAsSerial(self):
+        serial_reporter = RecallReporter(classifiers=[create_classifier_with_two_entries(RecallClassifier),
+                                                      create_classifier_with_two_entries(RecallClassifier)])
+        expected = serial_reporter.generate_threshold_sweep_report([0, 5])
+
+        parallel_reporter = RecallReporter(classifiers=[create_classifier_with_two_entries(RecallClassifier),
+                                                        create_classifier_with_two_entries(RecallClassifier)],
+                                           processes=2, batch_size=1)
+        with patch("multiprocessing.pool.Pool", wraps=multiprocessing.pool.Pool) as pool_mock:
+            actual = parallel_reporter.generate_threshold_sweep_report([0, 5])
+
+        assert pool_mock.call_count == 1
+        assert actual.equals(expected)
+
+
 class TestPrecisionReporter:
     @patch.object(Reporter, Reporter._generate_report.__name__)
     def test___generate_report(self, _generate_report_mock):
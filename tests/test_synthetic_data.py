@@ -0,0 +1,53 @@
+import pysam
+import pytest
+
+from benchmarks.synthetic_data import SyntheticDataConfig, SyntheticDataGenerator, get_md_and_nm
+from evaluate.binary_report import load_binary_report
+from evaluate.commands import _get_VCF_creator_method, create_precision_report, create_recall_report
+from evaluate.query import Query
+from evaluate.vcf_file import VCFFile
+
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    config = SyntheticDataConfig(nb_of_samples=3, nb_of_genes=20, gene_length=500, variant_density=0.02)
+    return SyntheticDataGenerator(config).generate(tmp_path_factory.mktemp("synthetic_data"))
+
+
+class TestSyntheticData:
+    def test_getMdAndNm(self):
+        assert get_md_and_nm("ACGTA", "ACGTA") == ("5", 0)
+        assert get_md_and_nm("ACGTA", "TCGAA") == ("0T2A1", 2)
+
+    @pytest.mark.parametrize("tool", ["pandora_illumina", "snippy", "samtools", "medaka", "nanopolish"])
+    def test_precisionSamHasTheProbesQueryMakesFromTheVcf(self, dataset, tool):
+        sample = dataset.samples[1]
+        vcf = dataset.vcfs[sample, tool]
+        with pysam.VariantFile(str(vcf)) as pysam_variant_file:
+            vcf_file = VCFFile(pysam_variant_file, _get_VCF_creator_method(vcf))
+        probes = Query(vcf_file, dataset.vcf_ref, samples=[sample],
+                       flank_width=dataset.config.flank_width).make_probes()[sample].splitlines()
+        expected = sorted(zip((header[1:] for header in probes[::2]), probes[1::2]))
+
+        with pysam.AlignmentFile(str(dataset.precision_sams[sample, tool])) as sam:
+            actual = sorted((record.query_name, record.query_sequence) for record in sam)
+
+        assert actual == expected
+
+    def test_reportsHaveTheRecallAndPrecisionOfTheTool(self, dataset, tmp_path):
+        sample = dataset.samples[0]
+        sample1, sample2 = dataset.sample_pairs[0]
+        create_recall_report([dataset.recall_sams[sample, "snippy", sample1, sample2]], dataset.mask_bitmaps[sample],
+                             sample, [0], tmp_path / "recall.npz")
+        create_precision_report(dataset.precision_sams[sample, "snippy"], dataset.mask_bitmaps[sample], sample,
+                                "snippy", tmp_path / "precision.npz", tmp_path / "nb_of_records_removed.csv")
+
+        recall_report = load_binary_report(tmp_path / "recall.npz")
+        precision_report = load_binary_report(tmp_path / "precision.npz")
+
+        # about half of the truth probes are of alt alleles, 90% of which are called, and no ref allele is miscalled
+        recall = (recall_report["classification"] == "primary_correct").mean()
+        assert 0.85 < recall < 1.0
+        # one false call per ten true calls
+        precision = precision_report["classification"].astype(float).mean()
+        assert 0.8 < precision < 1.0
@@ -0,0 +1,111 @@
+import itertools
+from collections import defaultdict
+
+import pandas as pd
+import pytest
+
+from pipeline.scripts.target_manifest import TargetManifest
+from pipeline.scripts.utils import get_sample_pairs_containing_given_sample
+
+
+def create_data_and_samples(nb_of_samples: int):
+    sample_ids = [f"sample_{index}" for index in range(nb_of_samples)]
+    samples = pd.DataFrame({"sample_id": sample_ids,
+                            "reference_assembly": [f"{sample_id}.ref.fa" for sample_id in sample_ids],
+                            "mask": [f"{sample_id}.mask.bed" for sample_id in sample_ids]})
+    variant_calls = pd.DataFrame([
+        {"sample_id": sample_id, "tool": tool, "coverage": coverage, "vcf_reference": f"{tool}.{sample_id}.ref.fa",
+         "vcf": f"{tool}.{sample_id}.{coverage}.vcf"}
+        for sample_id in sample_ids for tool in ["pandora_nanopore_withdenovo", "snippy_ref1"]
+        for coverage in ["100x", "60x"]
+    ])
+    data = pd.merge(variant_calls, samples, on="sample_id")
+    data = data.set_index(["sample_id", "coverage", "tool"], drop=False)
+    samples = samples.set_index(["sample_id"], drop=False)
+    sample_pairs = list(itertools.combinations(sorted(samples["sample_id"]), r=2))
+    return data, samples, sample_pairs
+
+
+def get_filters(filters, tool):
+    return [str(elem) for elem in filters] if tool.startswith("pandora") else ["Not_App"]
+
+
+def get_recall_targets_with_nested_loops(data, sample_pairs, output_folder, coverage_filters, strand_bias_filters,
+                                         gaps_filters):
+    """
+    How the Snakefile built the recall targets before TargetManifest.
+    """
+    sample_cov_tool_and_filters_to_recall_report_files = defaultdict(list)
+    for index, row in data.iterrows():
+        sample_id, coverage, tool = row["sample_id"], row["coverage"], row["tool"]
+        for filename_prefix in get_sample_pairs_containing_given_sample(sample_pairs, sample_id):
+            for coverage_threshold, strand_bias_threshold, gaps_threshold in \
+                    itertools.product([str(elem) for elem in coverage_filters], get_filters(strand_bias_filters, tool),
+                                      get_filters(gaps_filters, tool)):
+                report_file = f"{output_folder}/recall/reports/{sample_id}/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/{filename_prefix}.threshold_sweep.report.npz"
+                sample_cov_tool_and_filters_to_recall_report_files[(sample_id, coverage, tool, coverage_threshold, strand_bias_threshold, gaps_threshold)].append(report_file)
+
+    cov_tool_and_filters_to_recall_reports_with_no_gt_conf_filter = defaultdict(list)
+    cov_tool_and_filters_recall_per_sample_per_number_of_samples = {}
+    for sample, coverage, tool, coverage_threshold, strand_bias_threshold, gaps_threshold in sample_cov_tool_and_filters_to_recall_report_files:
+        for sample_pair in get_sample_pairs_containing_given_sample(sample_pairs, sample):
+            cov_tool_and_filters_to_recall_reports_with_no_gt_conf_filter[(coverage, tool, coverage_threshold, strand_bias_threshold, gaps_threshold)].\
+                append((sample, sample_pair, f"{output_folder}/recall/reports/{sample}/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/{sample_pair}.threshold_sweep.report.npz"))
+        cov_tool_and_filters_recall_per_sample_per_number_of_samples[(sample, coverage, tool, coverage_threshold, strand_bias_threshold, gaps_threshold)] = f"{output_folder}/recall/recall_files_per_sample_vs_nb_of_samples/{sample}/{coverage}/{tool}/coverage_filter_{coverage_threshold}/strand_bias_filter_{strand_bias_threshold}/gaps_filter_{gaps_threshold}/recall_per_sample_per_number_of_samples.csv"
+
+    return (dict(sample_cov_tool_and_filters_to_recall_report_files),
+            dict(cov_tool_and_filters_to_recall_reports_with_no_gt_conf_filter),
+            cov_tool_and_filters_recall_per_sample_per_number_of_samples)
+
+
+class TestTargetManifest:
+    @pytest.mark.parametrize("nb_of_samples", [2, 4])
+    def test___recall_targets___same_as_nested_loops(self, nb_of_samples):
+        data, samples, sample_pairs = create_data_and_samples(nb_of_samples)
+        manifest = TargetManifest(data, samples, sample_pairs, "out", [0, 5], [0.0, 0.1], [1.0])
+
+        expected_report_files, expected_reports_with_no_gt_conf_filter, expected_recall_per_sample_per_nb_of_samples = \
+            get_recall_targets_with_nested_loops(data, sample_pairs, "out", [0, 5], [0.0, 0.1], [1.0])
+
+        assert manifest.sample_cov_tool_and_filters_to_recall_report_files == expected_report_files
+        assert manifest.cov_tool_and_filters_to_recall_reports_with_no_gt_conf_filter == expected_reports_with_no_gt_conf_filter
+        assert manifest.cov_tool_and_filters_recall_per_sample_per_number_of_samples == expected_recall_per_sample_per_nb_of_samples
+
+    def test___precision_targets(self):
+        data, samples, sample_pairs = create_data_and_samples(2)
+        manifest = TargetManifest(data, samples, sample_pairs, "out", [0], [0.0], [1.0])
+
+        assert manifest.cov_tool_and_filters_to_precision_report_files[("100x", "snippy_ref1", "0", "Not_App", "Not_App")] == [
+            "out/precision/reports_from_probe_mappings/sample_0/100x/snippy_ref1/coverage_filter_0/strand_bias_filter_Not_App/gaps_filter_Not_App/variant_calls_probeset_report.npz",
+            "out/precision/reports_from_probe_mappings/sample_1/100x/snippy_ref1/coverage_filter_0/strand_bias_filter_Not_App/gaps_filter_Not_App/variant_calls_probeset_report.npz",
+        ]
+        assert manifest.sample_cov_tool_and_filters_to_precision_report_files[
+            ("sample_1", "60x", "pandora_nanopore_withdenovo", "0", "0.0", "1.0")] == [
+            "out/precision/reports_from_probe_mappings/sample_1/60x/pandora_nanopore_withdenovo/coverage_filter_0/strand_bias_filter_0.0/gaps_filter_1.0/variant_calls_probeset_report.npz"
+        ]
+        assert len(manifest.all_nb_of_records_removed_with_mapq_sam_records_filter_files_for_precision) == 8
+        # 4 (coverage, tool, filters) x (1 precision file + 2 precision files per sample)
+        assert len(manifest.all_precision_files) == 12
+
+    def test___recall_and_plot_targets___one_per_coverage_tool_and_filters(self):
+        data, samples, sample_pairs = create_data_and_samples(3)
+        manifest = TargetManifest(data, samples, sample_pairs, "out", [0], [0.0, 0.1], [1.0])
+
+        # (pandora with 2 strand bias filters + snippy) x 2 coverages
+        assert len(manifest.all_recall_files) == 6
+        assert len(manifest.all_plot_data_intermediate_files) == 6
+        assert manifest.cov_tool_and_filters_recall_per_number_of_samples_pvr[("60x", "snippy_ref1", "0", "Not_App", "Not_App")] == \
+            "out/recall/recall_per_number_of_samples/60x/snippy_ref1/coverage_filter_0/strand_bias_filter_Not_App/gaps_filter_Not_App/recall_per_number_of_samples_pvr.csv"
+        assert len(manifest.all_recall_per_sample_no_gt_conf_filter) == 18
+        assert len(manifest.all_recall_per_sample_pair_no_gt_conf_filter) == 36
+
+    def test___input_function_lookups___same_as_xs(self):
+        data, samples, sample_pairs = create_data_and_samples(2)
+        manifest = TargetManifest(data, samples, sample_pairs, "out", [0], [0.0], [1.0])
+
+        for sample_id, coverage, tool in data.index:
+            call = manifest.sample_cov_and_tool_to_variant_call[(sample_id, coverage, tool)]
+            for column in ["vcf", "vcf_reference", "reference_assembly", "mask"]:
+                assert call[column] == data.xs((sample_id, coverage, tool))[column]
+        for sample_id in samples.index:
+            assert manifest.sample_to_sample_info[sample_id]["mask"] == samples.xs(sample_id)["mask"]
@@ -1,4 +1,4 @@
-from unittest.mock import patch, PropertyMock, Mock
+from unittest.mock import Mock
 from evaluate.unique_sam_records_filter import UniqueSamRecordsFilter
 
 
@@ -48,14 +48,10 @@ class TestUniqueSamRecordsFilter:
         unique_sam_records_filter = UniqueSamRecordsFilter(records)
         assert unique_sam_records_filter.all_unique_query_names == [query_name_1_mock.query_name, query_name_4_mock.query_name]
 
-    @patch.object(UniqueSamRecordsFilter, "all_unique_query_names", new_callable=PropertyMock,
-                  return_value=[query_name_1_mock.query_name, query_name_2_mock.query_name, query_name_3_mock.query_name])
-    def test___record_should_be_filtered_out___record_is_not_in_all_unique_query_names___should_be_filtered_out(self, *mocks):
-        unique_sam_records_filter = UniqueSamRecordsFilter([])
+    def test___record_should_be_filtered_out___record_is_not_in_all_unique_query_names___should_be_filtered_out(self):
+        unique_sam_records_filter = UniqueSamRecordsFilter([query_name_1_mock, query_name_2_mock, query_name_3_mock, query_name_4_mock, query_name_4_mock])
         assert unique_sam_records_filter.record_should_be_filtered_out(query_name_4_mock)
 
-    @patch.object(UniqueSamRecordsFilter, "all_unique_query_names", new_callable=PropertyMock,
-                  return_value=[query_name_1_mock.query_name, query_name_2_mock.query_name, query_name_3_mock.query_name])
-    def test___record_should_be_filtered_out___record_is_in_all_unique_query_names___should_NOT_be_filtered_out(self, *mocks):
-        unique_sam_records_filter = UniqueSamRecordsFilter([])
-        assert not unique_sam_records_filter.record_should_be_filtered_out(query_name_2_mock)
\ No newline at end of file
+    def test___record_should_be_filtered_out___record_is_in_all_unique_query_names___should_NOT_be_filtered_out(self):
+        unique_sam_records_filter = UniqueSamRecordsFilter([query_name_1_mock, query_name_2_mock, query_name_3_mock])
+        assert not unique_sam_records_filter.record_should_be_filtered_out(query_name_2_mock)
@@ -172,3 +172,19 @@ def test_argRanges_multipleConsecutiveRanges():
     ]
 
     assert actual == expected
+
+
+def test_splitInBatches():
+    actual = list(split_in_batches(range(5), 2))
+    expected = [[0, 1], [2, 3], [4]]
+    assert actual == expected
+
+
+def test_splitInBatches_empty():
+    assert list(split_in_batches([], 2)) == []
+
+
+def test_splitInBatchesOfGroups_groupsAreNotSplit():
+    actual = list(split_in_batches_of_groups(["a", "b", "b", "b", "c", "d"], 2, key=lambda item: item))
+    expected = [["a", "b", "b", "b"], ["c", "d"]]
+    assert actual == expected